@@ -12,6 +12,8 @@ from .models import (
     CloneResult,
     SyncResult,
     VMInfo,
+    HostListing,
+    StoreGCResult,
     ProgressInfo,
     OperationStatus,
 )
@@ -36,6 +38,8 @@ __all__ = [
     "CloneResult",
     "SyncResult",
     "VMInfo",
+    "HostListing",
+    "StoreGCResult",
     "ProgressInfo",
     "OperationStatus",
     "KVMCloneError",
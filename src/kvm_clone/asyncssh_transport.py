@@ -0,0 +1,396 @@
+"""
+asyncssh backend of the SSH transport.
+
+The default backend runs paramiko's blocking calls in threads: every running
+command holds two reader threads and every pipe five, so a host with many
+concurrent operations spends its time switching threads. asyncssh speaks SSH
+on the event loop itself; channels of one connection are multiplexed without
+any threads, and flow control follows from awaiting reads and writes.
+
+``AsyncSSHConnection`` implements the ``SSHConnection`` interface and is used
+by ``SSHTransport`` when the ``asyncssh`` backend is selected. asyncssh is an
+optional dependency (``pip install kvm-clone[asyncssh]``).
+"""
+
+import asyncio
+import functools
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import asyncssh
+else:
+    try:
+        import asyncssh
+    except ImportError:
+        asyncssh = None
+
+from .logging import logger
+
+from .models import PipeResult
+from .exceptions import SSHError, AuthenticationError, ConnectionError
+from .security import SSHSecurity
+from .sftp_pipeline import LocalFile, SFTPPipeline
+from .transport import (
+    CommandStream,
+    SSHConnection,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_PIPE_BUFFERS,
+    DEFAULT_PIPE_CHUNK_SIZE,
+)
+
+
+def exit_code(completed: Any) -> int:
+    """Get the exit code of a finished process; -1 if it was killed."""
+    returncode = completed.returncode
+    return returncode if isinstance(returncode, int) and returncode >= 0 else -1
+
+
+class AsyncSSHCommandStream(CommandStream):
+    """
+    Output of a command run by asyncssh, delivered as it arrives.
+
+    The channel is an ``asyncssh.SSHClientProcess`` whose streams are read
+    on the event loop, so no worker pool is used. A full queue suspends the
+    reading task, which stops asyncssh from extending the SSH window, so a
+    slow consumer still throttles the remote command.
+    """
+
+    def _start_readers(self) -> None:
+        """Start tasks moving stdout and stderr into the queue."""
+        for name, reader in (
+            ("stdout", self.channel.stdout),
+            ("stderr", self.channel.stderr),
+        ):
+            recv = functools.partial(reader.read, self.chunk_size)
+            self._readers.append(asyncio.create_task(self._read(name, recv)))
+
+    async def _exit_status(self) -> int:
+        """Wait for the exit code of the command."""
+        return exit_code(await self.channel.wait())
+
+
+class AsyncSSHRemoteFile:
+    """File on an asyncssh SFTP session, with positional reads and writes."""
+
+    def __init__(self, file: Any, max_request_size: Optional[int] = None):
+        """Initialize remote file around an ``asyncssh.SFTPClientFile``."""
+        self.file = file
+        self.max_request_size = max_request_size
+
+    async def read(self, offset: int, size: int) -> bytes:
+        """Read up to ``size`` bytes at ``offset``."""
+        data: bytes = await self.file.read(size, offset)
+        return data
+
+    async def write(self, offset: int, data: bytes) -> None:
+        """Write data at ``offset``."""
+        await self.file.write(data, offset)
+
+    async def size(self) -> int:
+        """Get the size of the file."""
+        attrs = await self.file.stat()
+        return int(attrs.size or 0)
+
+    async def close(self) -> None:
+        """Close the file."""
+        await self.file.close()
+
+
+class AsyncSSHConnection(SSHConnection):
+    """SSH connection implemented with asyncssh."""
+
+    stream_class = AsyncSSHCommandStream
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        """Initialize SSH connection; see ``SSHConnection``."""
+        super().__init__(*args, **kwargs)
+        self.conn: Optional["asyncssh.SSHClientConnection"] = None
+        self._sftp: Optional["asyncssh.SFTPClient"] = None
+
+    async def connect(self) -> None:
+        """Establish SSH connection."""
+        if asyncssh is None:
+            raise ConnectionError(
+                "The asyncssh backend requires the asyncssh package", self.host
+            )
+
+        options: Dict[str, Any] = {
+            "port": self.port,
+            "connect_timeout": self.timeout,
+            "keepalive_interval": self.keepalive_interval,
+        }
+        if self.username:
+            options["username"] = self.username
+        if self.key_path:
+            options["client_keys"] = [SSHSecurity.validate_ssh_key_path(self.key_path)]
+        if self.known_hosts:
+            options["known_hosts"] = str(Path(self.known_hosts).expanduser())
+        if self.tuning.ciphers:
+            options["encryption_algs"] = self.tuning.ciphers
+        if self.tuning.macs:
+            options["mac_algs"] = self.tuning.macs
+        if self.tuning.kex:
+            options["kex_algs"] = self.tuning.kex
+        if self.tuning.window_size:
+            options["window"] = self.tuning.window_size
+        if self.tuning.max_packet_size:
+            options["max_pktsize"] = self.tuning.max_packet_size
+
+        try:
+            self.conn = await asyncssh.connect(self.host, **options)
+            logger.info(
+                f"SSH connection established to {self.host}:{self.port}",
+                host=self.host,
+                port=self.port,
+                backend="asyncssh",
+            )
+        except asyncssh.PermissionDenied as e:
+            logger.error(
+                f"Authentication failed for {self.host}: {e}",
+                host=self.host,
+                exc_info=True,
+            )
+            raise AuthenticationError(str(e), self.host)
+        except asyncssh.Error as e:
+            logger.error(
+                f"SSH error connecting to {self.host}: {e}",
+                host=self.host,
+                exc_info=True,
+            )
+            raise SSHError(str(e), self.host, "connection")
+        except Exception as e:
+            logger.error(
+                f"Connection error to {self.host}: {e}", host=self.host, exc_info=True
+            )
+            raise ConnectionError(str(e), self.host)
+
+    @classmethod
+    def supported_algorithms(cls) -> Dict[str, List[str]]:
+        """Get the algorithms the backend can negotiate."""
+        try:
+            from asyncssh.encryption import get_encryption_algs
+            from asyncssh.kex import get_kex_algs
+            from asyncssh.mac import get_mac_algs
+        except ImportError:
+            return {"ciphers": [], "macs": [], "kex": []}
+
+        return {
+            kind: [name.decode() for name in algs()]
+            for kind, algs in (
+                ("ciphers", get_encryption_algs),
+                ("macs", get_mac_algs),
+                ("kex", get_kex_algs),
+            )
+        }
+
+    @property
+    def connected(self) -> bool:
+        """Whether ``connect`` succeeded and ``close`` was not called."""
+        return self.conn is not None
+
+    def is_alive(self) -> bool:
+        """Check that the SSH session is still usable."""
+        return self.conn is not None and not self.conn.is_closed()
+
+    async def open_channel(self, command: str) -> Any:
+        """
+        Start a command on a new channel of this connection.
+
+        Returns:
+            Any: Process running the command (``asyncssh.SSHClientProcess``)
+            with binary streams; the caller must close it
+        """
+        if self.conn is None:
+            raise SSHError("Not connected", self.host, "command_execution")
+        try:
+            return await self.conn.create_process(command, encoding=None)
+        except Exception as e:
+            raise SSHError(str(e), self.host, "command_execution")
+
+    async def open_remote(
+        self,
+        path: str,
+        write: bool = False,
+        truncate: bool = False,
+    ) -> AsyncSSHRemoteFile:
+        """
+        Open a remote file for positional reads and writes over SFTP.
+
+        Args:
+            path: Remote path
+            write: Open for writing, creating the file if it is missing
+            truncate: Empty the file first when opening it for writing
+
+        Returns:
+            AsyncSSHRemoteFile: File accepting requests of any number of tasks
+        """
+        if self.conn is None:
+            raise SSHError("SFTP not available", self.host, "file_transfer")
+        if self._sftp is None:
+            self._sftp = await self.conn.start_sftp_client()
+
+        pflags = asyncssh.FXF_READ
+        if write:
+            pflags = asyncssh.FXF_WRITE | asyncssh.FXF_CREAT
+            if truncate:
+                pflags |= asyncssh.FXF_TRUNC
+        # block_size=0 sends every read and write as a single request
+        file = await self._sftp.open(path, pflags, encoding=None, block_size=0)
+        limits = self._sftp.limits
+        return AsyncSSHRemoteFile(
+            file, min(limits.max_read_len, limits.max_write_len) or None
+        )
+
+    async def _copy_range(
+        self,
+        local_path: str,
+        remote_path: str,
+        upload: bool,
+        offset: int,
+        length: Optional[int],
+        request_size: int,
+        window: int,
+        progress: Optional[Callable[[int], None]],
+    ) -> int:
+        """
+        Copy a byte range with ``window`` SFTP requests in flight.
+
+        Requests are capped at the server's read and write limits.
+
+        Returns:
+            int: Bytes copied
+        """
+        truncate = offset == 0 and length is None
+        local = await LocalFile.open(
+            local_path, self.stream_pool, write=not upload, truncate=truncate
+        )
+        try:
+            remote = await self.open_remote(
+                remote_path, write=upload, truncate=truncate
+            )
+            try:
+                source, dest = (local, remote) if upload else (remote, local)
+                if length is None:
+                    length = max(await source.size() - offset, 0)
+                if remote.max_request_size:
+                    request_size = min(request_size, remote.max_request_size)
+                pipeline = SFTPPipeline(request_size, window, progress)
+                return await pipeline.copy(source.read, dest.write, offset, length)
+            finally:
+                await remote.close()
+        finally:
+            await local.close()
+
+    async def pipe_to(
+        self,
+        reader_command: str,
+        dest: SSHConnection,
+        writer_command: str,
+        chunk_size: int = DEFAULT_PIPE_CHUNK_SIZE,
+        buffers: int = DEFAULT_PIPE_BUFFERS,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> PipeResult:
+        """
+        Stream the output of a command on this host into a command on another.
+
+        Chunks pass through a queue of ``buffers`` slots: a slow writer fills
+        it and suspends the reading task, which throttles the remote reader
+        through the SSH window. Side streams are drained by their own tasks.
+
+        Args:
+            reader_command: Command writing the data to stdout
+            dest: asyncssh connection to the host running the writer
+            writer_command: Command reading the data from stdin
+            chunk_size: Maximum bytes per chunk
+            buffers: Number of chunks buffered between reader and writer
+            progress: Called with the cumulative bytes sent
+
+        Returns:
+            PipeResult: Bytes sent, exit codes and side output of both commands
+        """
+        if chunk_size <= 0 or buffers <= 0:
+            raise ValueError("chunk_size and buffers must be positive")
+
+        start = time.monotonic()
+        reader = await self.open_channel(reader_command)
+        try:
+            writer = await dest.open_channel(writer_command)
+        except BaseException:
+            reader.close()
+            raise
+
+        ring: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(maxsize=buffers)
+
+        async def read() -> None:
+            try:
+                while True:
+                    data = await reader.stdout.read(chunk_size)
+                    if not data:
+                        break
+                    await ring.put(data)
+            finally:
+                await ring.put(None)
+
+        async def drain(stream: Any) -> bytes:
+            pieces: List[bytes] = []
+            while True:
+                data = await stream.read(DEFAULT_CHUNK_SIZE)
+                if not data:
+                    return b"".join(pieces)
+                pieces.append(data)
+
+        reading = asyncio.create_task(read())
+        side_streams = (reader.stderr, writer.stdout, writer.stderr)
+        draining = [asyncio.create_task(drain(stream)) for stream in side_streams]
+        sent = 0
+        try:
+            while True:
+                chunk = await ring.get()
+                if chunk is None:
+                    break
+                writer.stdin.write(chunk)
+                await writer.stdin.drain()
+                sent += len(chunk)
+                if progress:
+                    progress(sent)
+            await reading
+            writer.stdin.write_eof()
+
+            reader_done, writer_done = await asyncio.gather(
+                reader.wait(), writer.wait()
+            )
+            reader_stderr, writer_stdout, writer_stderr = await asyncio.gather(
+                *draining
+            )
+        except Exception as e:
+            raise SSHError(str(e), self.host, "pipe")
+        finally:
+            for task in [reading, *draining]:
+                task.cancel()
+            reader.close()
+            writer.close()
+
+        return PipeResult(
+            bytes_transferred=sent,
+            reader_exit_code=exit_code(reader_done),
+            writer_exit_code=exit_code(writer_done),
+            reader_stderr=reader_stderr.decode("utf-8", errors="replace"),
+            writer_stdout=writer_stdout.decode("utf-8", errors="replace"),
+            writer_stderr=writer_stderr.decode("utf-8", errors="replace"),
+            duration=time.monotonic() - start,
+        )
+
+    async def close(self) -> None:
+        """Close SSH connection."""
+        if self._sftp is not None:
+            self._sftp.exit()
+            self._sftp = None
+
+        if self.conn is not None:
+            self.conn.close()
+            await self.conn.wait_closed()
+            self.conn = None
+
+        logger.info(f"SSH connection closed to {self.host}", host=self.host)
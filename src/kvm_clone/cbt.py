@@ -0,0 +1,360 @@
+"""
+Changed-block tracking for VM synchronization.
+
+This module uses libvirt checkpoints (persistent QEMU dirty bitmaps) to find
+the blocks a running VM wrote since its previous sync, so a sync only has to
+move those blocks instead of hashing whole disks.
+
+The changes are exported by a pull-mode incremental backup: QEMU serves a
+point-in-time view of each disk over NBD together with the dirty bitmap. The
+changed ranges are read from that export while the backup job runs, never
+from the image file the VM keeps writing, and written on the destination
+with ``qemu-io``, which places them correctly in the destination image.
+
+Only the checkpoint of the last successful sync is kept: every checkpoint
+adds a bitmap that each guest write has to update.
+"""
+
+import json
+import time
+from typing import Callable, Dict, List, Optional
+
+from .models import ByteRange, ChangedBlockSession, DiskInfo, VMInfo
+from .exceptions import TransferError
+from .transport import SSHTransport, SSHConnection
+from .libvirt_wrapper import LibvirtWrapper
+from .security import CommandBuilder, SecurityValidator
+from .logging import logger
+
+CHECKPOINT_PREFIX = "kvm-clone-"
+DEFAULT_BACKUP_SOCKET_DIR = "/run"
+MAX_WRITE_SIZE = 64 * 1024 * 1024  # bytes per qemu-io write
+
+# Runs on the source host: prints a guest range of an NBD export on a Unix
+# socket. A minimal fixed-newstyle client (NBD_OPT_GO and simple replies), so
+# the host only needs python3.
+NBD_READ_SCRIPT = """
+import socket, struct, sys
+path, export = sys.argv[1], sys.argv[2].encode()
+offset, end = int(sys.argv[3]), int(sys.argv[3]) + int(sys.argv[4])
+sock = socket.socket(socket.AF_UNIX)
+sock.connect(path)
+def recv(size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            sys.exit("NBD server closed the connection")
+        data += chunk
+    return bytes(data)
+if recv(16) != b"NBDMAGICIHAVEOPT":
+    sys.exit("not an NBD newstyle server")
+sock.sendall(struct.pack(">I", struct.unpack(">H", recv(2))[0] & 3))
+option = struct.pack(">I", len(export)) + export + struct.pack(">H", 0)
+sock.sendall(b"IHAVEOPT" + struct.pack(">II", 7, len(option)) + option)
+while True:
+    _, _, reply, size = struct.unpack(">QIII", recv(20))
+    recv(size)
+    if reply == 1:
+        break
+    if reply & 0x80000000:
+        sys.exit("NBD export %s not available: error %d" % (sys.argv[2], reply))
+out = sys.stdout.buffer
+while offset < end:
+    size = min(4 << 20, end - offset)
+    sock.sendall(struct.pack(">IHHQQI", 0x25609513, 0, 0, 0, offset, size))
+    magic, error, _ = struct.unpack(">IIQ", recv(16))
+    if magic != 0x67446698 or error:
+        sys.exit("NBD read at %d failed: error %d" % (offset, error))
+    out.write(recv(size))
+    offset += size
+out.flush()
+sock.sendall(struct.pack(">IHHQQI", 0x25609513, 0, 2, 0, 0, 0))
+"""
+
+
+class ChangedBlockTracker:
+    """Tracks changed blocks of a VM between syncs with libvirt checkpoints."""
+
+    def __init__(
+        self,
+        transport: SSHTransport,
+        libvirt_wrapper: LibvirtWrapper,
+        socket_dir: str = DEFAULT_BACKUP_SOCKET_DIR,
+    ):
+        """Initialize changed-block tracker."""
+        self.transport = transport
+        self.libvirt = libvirt_wrapper
+        self.socket_dir = socket_dir
+
+    async def begin(self, host: str, vm_info: VMInfo) -> Optional[ChangedBlockSession]:
+        """
+        Start tracking for a sync and collect the blocks changed since the last one.
+
+        A new checkpoint is created first, so writes made while the sync runs
+        are reported by the next sync. An incremental backup since the
+        previous kvm-clone checkpoint is then started and the changed extents
+        are read from its dirty bitmaps. The backup job keeps running so that
+        ``transfer`` can read the changed blocks from its export; ``finish``
+        or ``discard`` ends it.
+
+        Args:
+            host: Host running the VM
+            vm_info: VM information
+
+        Returns:
+            Optional[ChangedBlockSession]: Tracking session, or None if the VM
+            cannot use changed-block tracking. ``extents`` of the session is
+            None when there is no usable checkpoint history.
+        """
+        if not vm_info.disks or any(disk.format != "qcow2" for disk in vm_info.disks):
+            logger.info(
+                f"Changed-block tracking needs qcow2 disks; not used for {vm_info.name}",
+                host=host,
+                vm_name=vm_info.name,
+            )
+            return None
+
+        targets = [disk.target for disk in vm_info.disks]
+        async with self.transport.connect(host) as conn:
+            if not await self.libvirt.is_active(conn, vm_info.name):
+                logger.info(
+                    f"VM {vm_info.name} is not running; changed-block tracking "
+                    "not used",
+                    host=host,
+                    vm_name=vm_info.name,
+                )
+                return None
+
+            checkpoints = await self.libvirt.list_checkpoints(conn, vm_info.name)
+            previous = self.latest_checkpoint(checkpoints)
+
+            checkpoint = f"{CHECKPOINT_PREFIX}{int(time.time() * 1000)}"
+            await self.libvirt.create_checkpoint(
+                conn, vm_info.name, checkpoint, targets
+            )
+            session = ChangedBlockSession(
+                host=host,
+                vm_name=vm_info.name,
+                checkpoint=checkpoint,
+                previous=previous,
+            )
+
+            if previous is None:
+                logger.info(
+                    f"No checkpoint history for {vm_info.name}; "
+                    "falling back to block hashing",
+                    host=host,
+                    vm_name=vm_info.name,
+                )
+                return session
+
+            try:
+                session.extents = await self._collect(conn, vm_info, previous, session)
+            except Exception as e:
+                logger.warning(
+                    f"Could not read dirty bitmaps of {vm_info.name}: {e}; "
+                    "falling back to block hashing",
+                    host=host,
+                    vm_name=vm_info.name,
+                )
+
+        return session
+
+    async def finish(self, session: ChangedBlockSession) -> None:
+        """
+        End the backup job of a successful sync and drop its base checkpoint.
+
+        The checkpoint created for the sync becomes the base of the next one.
+        Failures are only logged: the sync itself already succeeded.
+        """
+        try:
+            async with self.transport.connect(session.host) as conn:
+                await self._end_backup(conn, session)
+                if session.previous is not None:
+                    await self.libvirt.delete_checkpoint(
+                        conn, session.vm_name, session.previous
+                    )
+        except Exception as e:
+            logger.warning(
+                f"Failed to delete checkpoint {session.previous}: {e}",
+                host=session.host,
+                vm_name=session.vm_name,
+            )
+
+    async def discard(self, session: ChangedBlockSession) -> None:
+        """
+        End the backup job and drop the checkpoint of a failed sync.
+
+        Deleting the checkpoint merges its changes into the previous one, so
+        the next sync still sees every block written since the last good sync.
+        """
+        try:
+            async with self.transport.connect(session.host) as conn:
+                await self._end_backup(conn, session)
+                await self.libvirt.delete_checkpoint(
+                    conn, session.vm_name, session.checkpoint
+                )
+        except Exception as e:
+            logger.warning(
+                f"Failed to delete checkpoint {session.checkpoint}: {e}",
+                host=session.host,
+                vm_name=session.vm_name,
+            )
+
+    async def transfer(
+        self,
+        session: ChangedBlockSession,
+        dest_host: str,
+        source_disk: DiskInfo,
+        dest_path: str,
+        extents: List[ByteRange],
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> int:
+        """
+        Copy changed guest extents of a disk into the destination image.
+
+        The data is read from the NBD export of the session's backup job, so
+        it is the disk as it was when the backup started.
+
+        Args:
+            session: Tracking session with a running backup job
+            dest_host: Destination host
+            source_disk: Source disk
+            dest_path: Destination image path
+            extents: Changed guest extents
+            progress: Called with the cumulative bytes written
+
+        Returns:
+            int: Number of guest bytes written
+        """
+        if not extents:
+            return 0
+
+        source_host = session.host
+        if session.backup_socket is None:
+            raise TransferError(
+                f"No backup job exports {source_disk.target}", source_host, dest_host
+            )
+
+        async with self.transport.connect(source_host) as conn:
+            # Writes go through one image file; run them one after another
+            written = 0
+            for extent in self.split_extents(extents):
+                reader = CommandBuilder.build_python_command(
+                    NBD_READ_SCRIPT,
+                    session.backup_socket,
+                    SecurityValidator.validate_vm_name(source_disk.target),
+                    extent.offset,
+                    extent.length,
+                )
+                command = CommandBuilder.build_guest_write_command(
+                    dest_path,
+                    source_disk.format,
+                    extent.offset,
+                    extent.length,
+                    reader=reader,
+                    dest_host=None if dest_host == source_host else dest_host,
+                )
+                _, stderr, exit_code = await conn.execute_command(command)
+                if exit_code != 0:
+                    raise TransferError(
+                        f"Writing changed blocks failed: {stderr}",
+                        source_host,
+                        dest_host,
+                    )
+                written += extent.length
+                if progress:
+                    progress(written)
+
+        return written
+
+    @staticmethod
+    def latest_checkpoint(checkpoints: List[str]) -> Optional[str]:
+        """Get the most recent kvm-clone checkpoint from a list of names."""
+        ours = [name for name in checkpoints if name.startswith(CHECKPOINT_PREFIX)]
+        if not ours:
+            return None
+        return max(ours, key=lambda name: int(name[len(CHECKPOINT_PREFIX) :] or 0))
+
+    @staticmethod
+    def parse_dirty_map(output: str) -> List[ByteRange]:
+        """
+        Parse ``qemu-img map`` output of an NBD dirty-bitmap context.
+
+        With ``x-dirty-bitmap`` dirty areas are reported as ``"data": false``.
+        """
+        extents: List[ByteRange] = []
+        for entry in json.loads(output or "[]"):
+            if entry.get("data", True):
+                continue
+            start, length = int(entry["start"]), int(entry["length"])
+            if extents and extents[-1].offset + extents[-1].length == start:
+                extents[-1].length += length
+            else:
+                extents.append(ByteRange(offset=start, length=length))
+        return extents
+
+    @staticmethod
+    def split_extents(extents: List[ByteRange]) -> List[ByteRange]:
+        """Split extents into writes of at most MAX_WRITE_SIZE bytes."""
+        return [
+            ByteRange(offset=offset, length=min(MAX_WRITE_SIZE, end - offset))
+            for extent in extents
+            for end in (extent.offset + extent.length,)
+            for offset in range(extent.offset, end, MAX_WRITE_SIZE)
+        ]
+
+    async def _collect(
+        self,
+        conn: SSHConnection,
+        vm_info: VMInfo,
+        since_checkpoint: str,
+        session: ChangedBlockSession,
+    ) -> Dict[str, List[ByteRange]]:
+        """
+        Start the backup job of a session and read the changed guest extents.
+
+        The job is ended again if the dirty bitmaps cannot be read.
+        """
+        vm_uuid = SecurityValidator.validate_vm_name(vm_info.uuid)
+        socket_path = f"{self.socket_dir}/kvm-clone-{vm_uuid}.sock"
+        targets = [disk.target for disk in vm_info.disks]
+
+        await self.libvirt.begin_incremental_backup(
+            conn, vm_info.name, since_checkpoint, socket_path, targets
+        )
+        session.backup_socket = socket_path
+        try:
+            extents = {}
+            for disk in vm_info.disks:
+                target = SecurityValidator.validate_vm_name(disk.target)
+                image_opts = (
+                    f"driver=nbd,export={target},server.type=unix,"
+                    f"server.path={socket_path},"
+                    f"x-dirty-bitmap=qemu:dirty-bitmap:kvm-clone-{target}"
+                )
+                command = CommandBuilder.build_safe_command(
+                    "qemu-img map --output=json --image-opts {opts}", opts=image_opts
+                )
+                stdout, stderr, exit_code = await conn.execute_command(command)
+                if exit_code != 0:
+                    raise TransferError(
+                        f"Cannot read dirty bitmap of {disk.target}: {stderr}",
+                        conn.host,
+                        conn.host,
+                    )
+                extents[disk.path] = self.parse_dirty_map(stdout)
+            return extents
+        except BaseException:
+            await self._end_backup(conn, session)
+            raise
+
+    async def _end_backup(
+        self, conn: SSHConnection, session: ChangedBlockSession
+    ) -> None:
+        """Stop the backup job of a session, if it runs."""
+        if session.backup_socket is None:
+            return
+        session.backup_socket = None
+        await self.libvirt.abort_backup(conn, session.vm_name)
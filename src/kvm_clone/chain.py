@@ -0,0 +1,284 @@
+"""
+Backing chains of qcow2 overlay disks.
+
+A disk created from a golden image is a thin qcow2 overlay; blocks it never
+wrote are read from the images below it. A clone of such a disk needs the
+whole chain on the destination, but base images are shared by many VMs and
+rarely change, so each layer is identified by the SHA-256 of its content and
+only layers the destination does not have yet are transferred.
+
+A layer is reused in place when the destination holds an identical file at
+the same path, as with golden images deployed to every host. Otherwise it is
+kept in ``BASE_DIR`` under a name derived from its digest and the image below
+it, so later clones of overlays of the same golden image find it there.
+``BASE_DIR`` is part of the destination's image store (see
+:mod:`kvm_clone.store`), whose garbage collection evicts unused bases.
+"""
+
+import asyncio
+import hashlib
+import json
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .models import BackingLayer, DiskInfo
+from .exceptions import TransferError
+from .transport import SSHConnection, SSHTransport
+from .security import CommandBuilder, SecurityValidator
+from .store import PART_SUFFIX, STORE_DIR
+from .logging import logger
+
+BASE_DIR = f"{STORE_DIR}/bases"  # shared backing images on destinations
+
+
+class BackingChain:
+    """Finds the backing chain of disks and places its layers on a destination."""
+
+    def __init__(self, transport: SSHTransport, source_host: str, dest_host: str):
+        """Initialize backing chain handling between two hosts."""
+        self.transport = transport
+        self.source_host = source_host
+        self.dest_host = dest_host
+
+    async def discover(self, disk: DiskInfo) -> List[BackingLayer]:
+        """
+        Read and hash the images below a disk on the source host.
+
+        Args:
+            disk: Disk of the source VM
+
+        Returns:
+            List[BackingLayer]: Layers below the disk, nearest first; empty
+            when the disk has no backing file
+
+        Raises:
+            TransferError: If the chain cannot be read or hashed
+        """
+        command = CommandBuilder.build_safe_command(
+            "qemu-img info --backing-chain --output=json -U -f {fmt} {path}",
+            fmt=disk.format,
+            path=disk.path,
+        )
+        async with self.transport.connect(self.source_host) as conn:
+            stdout, stderr, exit_code = await conn.execute_command(command)
+            if exit_code != 0:
+                raise self._error(f"Cannot read backing chain of {disk.path}: {stderr}")
+            try:
+                layers = self.parse_chain(stdout)
+            except (ValueError, KeyError, TypeError) as e:
+                raise self._error(f"Cannot parse backing chain of {disk.path}: {e}")
+
+            identities = await asyncio.gather(
+                *(self._identify(conn, layer.path) for layer in layers)
+            )
+        for layer, (size, digest) in zip(layers, identities):
+            layer.size, layer.digest = size, digest
+        return layers
+
+    async def place(self, layers: List[BackingLayer]) -> None:
+        """
+        Choose the destination path of every layer of a chain.
+
+        Layers are handled from the bottom up, since where a layer may live
+        depends on where the image below it lives. ``dest_path`` and
+        ``reused`` of each layer are set; layers that are not reused have to
+        be transferred to ``dest_path`` + ``PART_SUFFIX`` and committed.
+
+        Args:
+            layers: Layers of one chain, nearest first
+        """
+        below: Optional[BackingLayer] = None
+        async with self.transport.connect(self.dest_host) as conn:
+            for layer in reversed(layers):
+                in_place = below is None or below.dest_path == below.path
+                if in_place and await self._has_copy(conn, layer):
+                    layer.dest_path = layer.path
+                    layer.reused = True
+                else:
+                    layer.dest_path = self.base_path(layer, below)
+                    layer.reused = await self._exists(conn, layer.dest_path)
+                    if layer.reused:
+                        # Marks the shared copy as recently used for store GC
+                        await self._run(
+                            conn,
+                            CommandBuilder.build_safe_command(
+                                "touch -c {path}", path=layer.dest_path
+                            ),
+                        )
+                    else:
+                        await self._run(
+                            conn,
+                            CommandBuilder.build_safe_command(
+                                "mkdir -p {path}", path=BASE_DIR
+                            ),
+                        )
+                logger.debug(
+                    f"Backing image {layer.path} "
+                    f"{'found' if layer.reused else 'missing'} at {layer.dest_path}",
+                    host=self.dest_host,
+                )
+                below = layer
+
+    async def commit(self, layer: BackingLayer, below: Optional[BackingLayer]) -> None:
+        """
+        Point a transferred layer at its new backing image and move it in place.
+
+        Args:
+            layer: Layer transferred to ``dest_path`` + ``PART_SUFFIX``
+            below: Layer below it, or None for the bottom of the chain
+        """
+        if layer.dest_path is None:
+            raise self._error(f"No destination chosen for {layer.path}")
+        part = layer.dest_path + PART_SUFFIX
+        async with self.transport.connect(self.dest_host) as conn:
+            if below is not None:
+                await self.rebase(conn, part, layer.format, below)
+            await self._run(
+                conn,
+                CommandBuilder.build_safe_command(
+                    "mv -f {part} {path}", part=part, path=layer.dest_path
+                ),
+            )
+
+    async def rebase(
+        self, conn: SSHConnection, path: str, fmt: str, backing: BackingLayer
+    ) -> None:
+        """
+        Rewrite the backing file reference of an image on the destination.
+
+        Only the image header changes; the backing image has identical content
+        at its new path.
+
+        Args:
+            conn: Connection to the destination host
+            path: Image to update
+            fmt: Format of the image
+            backing: Layer the image is backed by
+        """
+        await self._run(
+            conn,
+            CommandBuilder.build_safe_command(
+                "qemu-img rebase -u -f {fmt} -F {backing_fmt} -b {backing} {path}",
+                fmt=fmt,
+                backing_fmt=backing.format,
+                backing=backing.dest_path,
+                path=path,
+            ),
+        )
+
+    @staticmethod
+    def base_path(layer: BackingLayer, below: Optional[BackingLayer]) -> str:
+        """
+        Get the shared path of a layer in ``BASE_DIR``.
+
+        The name covers the path of the image below, so a shared copy always
+        refers to the backing image it was committed with.
+
+        Args:
+            layer: Hashed layer
+            below: Placed layer below it, or None for the bottom of the chain
+
+        Returns:
+            str: Destination path of the layer
+        """
+        backing = below.dest_path if below is not None else ""
+        key = hashlib.sha256(f"{layer.digest}\n{backing}".encode()).hexdigest()
+        return SecurityValidator.sanitize_path(
+            f"{key[:16]}-{Path(layer.path).name}", BASE_DIR
+        )
+
+    @staticmethod
+    def parse_chain(output: str) -> List[BackingLayer]:
+        """
+        Parse ``qemu-img info --backing-chain --output=json`` output.
+
+        Args:
+            output: JSON list describing the image and its backing files
+
+        Returns:
+            List[BackingLayer]: Layers below the image, nearest first; their
+            ``size`` is set by ``discover``, since qemu-img only reports the
+            allocated size
+        """
+        images = json.loads(output)
+        if isinstance(images, dict):
+            images = [images]
+        return [
+            BackingLayer(path=image["filename"], format=image.get("format", "raw"))
+            for image in images[1:]
+        ]
+
+    @staticmethod
+    def rewrite_xml(disk_elem: ET.Element, layers: List[BackingLayer]) -> None:
+        """
+        Replace the ``<backingStore>`` chain of a disk element.
+
+        Args:
+            disk_elem: ``<disk>`` element of the new domain XML
+            layers: Placed layers below the disk, nearest first
+        """
+        for old in disk_elem.findall("backingStore"):
+            disk_elem.remove(old)
+
+        parent = disk_elem
+        for layer in layers:
+            store = ET.Element("backingStore", type="file")
+            ET.SubElement(store, "format", type=layer.format)
+            ET.SubElement(store, "source", file=layer.dest_path or layer.path)
+            # libvirt expects the backing store right after the source
+            if parent is disk_elem:
+                source = disk_elem.find("source")
+                index = list(disk_elem).index(source) + 1 if source is not None else 0
+                disk_elem.insert(index, store)
+            else:
+                parent.append(store)
+            parent = store
+        if parent is not disk_elem:
+            ET.SubElement(parent, "backingStore")
+
+    async def _identify(self, conn: SSHConnection, path: str) -> Tuple[int, str]:
+        """Get the apparent size and the SHA-256 digest of a file."""
+        stdout = await self._run(
+            conn,
+            CommandBuilder.build_safe_command(
+                "stat -c %s {path} && sha256sum {path}", path=path
+            ),
+        )
+        fields = stdout.split()
+        if len(fields) < 2 or not fields[0].isdigit() or len(fields[1]) != 64:
+            raise self._error(
+                f"Unexpected stat/sha256sum output for {path}: {stdout!r}"
+            )
+        return int(fields[0]), fields[1]
+
+    async def _has_copy(self, conn: SSHConnection, layer: BackingLayer) -> bool:
+        """Check if the destination holds the layer's content at its path."""
+        # Only files of the same apparent size are hashed
+        command = CommandBuilder.build_safe_command(
+            'if [ "$(stat -c %s {path} 2>/dev/null)" = {size} ]; '
+            "then sha256sum {path}; fi",
+            path=layer.path,
+            size=layer.size,
+        )
+        stdout = await self._run(conn, command)
+        return bool(stdout.split()) and stdout.split()[0] == layer.digest
+
+    @staticmethod
+    async def _exists(conn: SSHConnection, path: str) -> bool:
+        """Check if a file exists on a host."""
+        _, _, exit_code = await conn.execute_command(
+            CommandBuilder.build_safe_command("test -f {path}", path=path)
+        )
+        return exit_code == 0
+
+    async def _run(self, conn: SSHConnection, command: str) -> str:
+        """Run a command and return its output, raising on failure."""
+        stdout, stderr, exit_code = await conn.execute_command(command)
+        if exit_code != 0:
+            raise self._error(f"Command failed: {command}: {stderr.strip()}")
+        return stdout
+
+    def _error(self, message: str) -> TransferError:
+        """Build a transfer error between the two hosts."""
+        return TransferError(message, self.source_host, self.dest_host)
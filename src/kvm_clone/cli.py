@@ -9,14 +9,34 @@ import asyncio
 import logging
 import sys
 from pathlib import Path
-from typing import Optional, Any
+from typing import Optional, Any, Dict, List
 
 import click
 import yaml
 
-from kvm_clone import KVMCloneClient, CloneOptions, SyncOptions
-from kvm_clone.exceptions import KVMCloneError, ConfigurationError
+from kvm_clone import CloneOptions, SyncOptions
+from kvm_clone.exceptions import KVMCloneError, ConfigurationError, ValidationError
+from kvm_clone.security import SecurityValidator
 from kvm_clone.config import config_loader
+from kvm_clone.libvirt_wrapper import LIST_DETAILS
+from kvm_clone.client import DEFAULT_LIST_CONCURRENCY, DEFAULT_LIST_HOST_TIMEOUT
+from kvm_clone.store import DEFAULT_GC_GRACE_PERIOD
+from kvm_clone.daemon import (
+    DEFAULT_DAEMON_IDLE_TIMEOUT,
+    SessionDaemon,
+    check_socket_directory,
+    default_socket_path,
+    open_client,
+    ping,
+    request,
+)
+from kvm_clone.link_tuning import (
+    DEFAULT_BENCH_BYTES,
+    DEFAULT_CIPHERS,
+    DEFAULT_WINDOW_SIZES,
+    candidate_tunings,
+    fastest,
+)
 
 
 # Configure logging
@@ -50,20 +70,56 @@ def load_config(config_path: Optional[str]) -> dict[str, Any]:
             "default_timeout": app_config.default_timeout,
             "log_level": app_config.log_level,
             "known_hosts_file": app_config.known_hosts_file,
+            "ssh_backend": app_config.ssh_backend,
             "parallel_transfers": app_config.default_parallel_transfers,
             "bandwidth_limit": app_config.default_bandwidth_limit,
+            "ssh_max_connections": app_config.ssh_max_connections,
+            "ssh_max_channels": app_config.ssh_max_channels,
+            "ssh_idle_timeout": app_config.ssh_idle_timeout,
+            "ssh_control_workers": app_config.ssh_control_workers,
+            "ssh_stream_workers": app_config.ssh_stream_workers,
+            "ssh_max_queued_calls": app_config.ssh_max_queued_calls,
+            "ssh_ciphers": app_config.ssh_ciphers,
+            "ssh_macs": app_config.ssh_macs,
+            "ssh_kex": app_config.ssh_kex,
+            "ssh_window_size": app_config.ssh_window_size,
+            "ssh_max_packet_size": app_config.ssh_max_packet_size,
+            "link_tuning_file": app_config.link_tuning_file,
+            "daemon_socket": app_config.daemon_socket,
+            "libvirt_max_workers": app_config.libvirt_max_workers,
+            "libvirt_call_timeout": app_config.libvirt_call_timeout,
+            "libvirt_cache_ttl": app_config.libvirt_cache_ttl,
         }
     except ConfigurationError as e:
         click.echo(f"Warning: {e}", err=True)
         return {}
 
 
+def daemon_options(ctx: Any) -> Dict[str, Any]:
+    """Get the ``open_client`` arguments selecting the session daemon."""
+    return {
+        "use_daemon": ctx.obj.get("use_daemon", True),
+        "socket_path": ctx.obj["config"].get("daemon_socket"),
+    }
+
+
+def validate_compression(ctx: Any, param: Any, value: Optional[str]) -> Optional[str]:
+    """Reject unknown compression codecs and levels early."""
+    if value is not None:
+        try:
+            SecurityValidator.validate_compression(value)
+        except ValidationError as e:
+            raise click.BadParameter(str(e))
+    return value
+
+
 def progress_callback(progress_info: Any) -> None:
     """Progress callback for operations."""
     click.echo(
         f"\rProgress: {progress_info.progress_percent:.1f}% "
         f"({progress_info.bytes_transferred}/{progress_info.total_bytes} bytes) "
-        f"Speed: {progress_info.speed / 1024 / 1024:.1f} MB/s",
+        f"Speed: {progress_info.speed / 1024 / 1024:.1f} MB/s"
+        + (f" ETA: {progress_info.eta}s" if progress_info.eta is not None else ""),
         nl=False,
     )
 
@@ -85,10 +141,21 @@ def progress_callback(progress_info: Any) -> None:
     default="INFO",
     help="Log level",
 )
+@click.option(
+    "--no-daemon",
+    is_flag=True,
+    help="Run locally even if the session daemon is running",
+)
 @click.version_option()
 @click.pass_context
 def cli(
-    ctx: Any, config: Any, verbose: bool, quiet: bool, output: str, log_level: str
+    ctx: Any,
+    config: Any,
+    verbose: bool,
+    quiet: bool,
+    output: str,
+    log_level: str,
+    no_daemon: bool,
 ) -> None:
     """KVM cloning over SSH tool."""
     setup_logging(verbose, quiet, log_level)
@@ -99,6 +166,8 @@ def cli(
     # Store in context
     ctx.ensure_object(dict)
     ctx.obj["config"] = config_data
+    ctx.obj["config_path"] = config
+    ctx.obj["use_daemon"] = not no_daemon
     ctx.obj["output_format"] = output
     ctx.obj["verbose"] = verbose
     ctx.obj["quiet"] = quiet
@@ -114,9 +183,41 @@ def cli(
 @click.option(
     "--parallel", "-p", type=int, default=4, help="Number of parallel transfers"
 )
-@click.option("--compress", is_flag=True, help="Enable compression during transfer")
 @click.option(
-    "--verify", is_flag=True, default=True, help="Verify integrity after transfer"
+    "--compress", is_flag=True, help="Enable adaptive zstd compression during transfer"
+)
+@click.option(
+    "--compression",
+    callback=validate_compression,
+    help="Compression codec: none, lz4, zstd, <codec>:<level> or adaptive",
+)
+@click.option(
+    "--transfer-mode",
+    type=click.Choice(["rsync", "striped", "sparse", "stream"]),
+    default="rsync",
+    help="Disk transfer backend",
+)
+@click.option(
+    "--stripe-size",
+    type=click.IntRange(min=1),
+    default=256,
+    help="Stripe size in MiB for striped transfers",
+)
+@click.option(
+    "--verify/--no-verify",
+    default=True,
+    help="Verify disk integrity and re-send blocks that differ",
+)
+@click.option(
+    "--resume",
+    metavar="OPERATION_ID",
+    help="Continue an interrupted clone from its transfer journal",
+)
+@click.option(
+    "--store",
+    "use_store",
+    is_flag=True,
+    help="Keep disks in the destination's image store and only send missing ones",
 )
 @click.option("--timeout", type=int, default=3600, help="Operation timeout in seconds")
 @click.option("--ssh-key", "-k", help="SSH private key path")
@@ -137,7 +238,12 @@ def clone(
     dry_run: bool,
     parallel: int,
     compress: bool,
+    compression: Optional[str],
+    transfer_mode: str,
+    stripe_size: int,
     verify: bool,
+    resume: Optional[str],
+    use_store: bool,
     timeout: int,
     ssh_key: Optional[str],
     preserve_mac: bool,
@@ -158,16 +264,22 @@ def clone(
             if ssh_key:
                 client_config["ssh_key_path"] = ssh_key
 
-            async with KVMCloneClient(config=client_config, timeout=timeout) as client:
+            async with open_client(
+                client_config, timeout=timeout, **daemon_options(ctx)
+            ) as client:
                 clone_options = CloneOptions(
                     new_name=new_name,
                     force=force,
                     dry_run=dry_run,
                     parallel=parallel,
-                    compress=compress,
+                    compress=compression if compression is not None else compress,
                     verify=verify,
                     preserve_mac=preserve_mac,
                     network_config=network_cfg,
+                    transfer_mode=transfer_mode,
+                    stripe_size=stripe_size * 1024 * 1024,
+                    resume=resume,
+                    use_store=use_store,
                 )
 
                 if not ctx.obj["quiet"]:
@@ -194,12 +306,36 @@ def clone(
                     )
                     click.echo(f"  Duration: {result.duration:.1f}s")
                     click.echo(f"  Bytes transferred: {result.bytes_transferred}")
+                    if result.virtual_bytes:
+                        click.echo(
+                            f"  Allocated/virtual bytes: "
+                            f"{result.allocated_bytes}/{result.virtual_bytes}"
+                        )
+                    if result.reused_bytes:
+                        click.echo(
+                            f"  Images already on destination: "
+                            f"{result.reused_bytes} bytes"
+                        )
+
+                    for disk in result.verification:
+                        click.echo(
+                            f"  Verified {disk.dest_path}: {disk.dest_root}"
+                            + (
+                                f" ({disk.mismatched_blocks} blocks re-sent)"
+                                if disk.mismatched_blocks
+                                else ""
+                            )
+                        )
 
                     if result.warnings:
                         for warning in result.warnings:
                             click.echo(f"  Warning: {warning}", err=True)
                 else:
                     click.echo(f"✗ Clone failed: {result.error}", err=True)
+                    if result.resumable:
+                        click.echo(
+                            f"  Resume with: --resume {result.operation_id}", err=True
+                        )
                     sys.exit(1)
 
         except KVMCloneError as e:
@@ -221,7 +357,18 @@ def clone(
 @click.option(
     "--delta-only", is_flag=True, default=True, help="Transfer only changed blocks"
 )
+@click.option(
+    "--cbt",
+    is_flag=True,
+    help="Find changed blocks with libvirt checkpoints (running qcow2 VMs)",
+)
 @click.option("--bandwidth-limit", "-b", help='Bandwidth limit (e.g., "100M", "1G")')
+@click.option(
+    "--compression",
+    callback=validate_compression,
+    default="none",
+    help="Compression codec: none, lz4, zstd, <codec>:<level> or adaptive",
+)
 @click.option("--ssh-key", "-k", help="SSH private key path")
 @click.option("--timeout", type=int, default=7200, help="Operation timeout in seconds")
 @click.pass_context
@@ -233,7 +380,9 @@ def sync(
     target_name: Optional[str],
     checkpoint: bool,
     delta_only: bool,
+    cbt: bool,
     bandwidth_limit: Optional[str],
+    compression: str,
     ssh_key: Optional[str],
     timeout: int,
 ) -> None:
@@ -246,12 +395,16 @@ def sync(
             if ssh_key:
                 client_config["ssh_key_path"] = ssh_key
 
-            async with KVMCloneClient(config=client_config, timeout=timeout) as client:
+            async with open_client(
+                client_config, timeout=timeout, **daemon_options(ctx)
+            ) as client:
                 sync_options = SyncOptions(
                     target_name=target_name,
                     checkpoint=checkpoint,
                     delta_only=delta_only,
                     bandwidth_limit=bandwidth_limit,
+                    changed_block_tracking=cbt,
+                    compress=compression,
                 )
 
                 if not ctx.obj["quiet"]:
@@ -300,12 +453,36 @@ def sync(
     default="all",
     help="Filter by status",
 )
+@click.option(
+    "--detail",
+    type=click.Choice(LIST_DETAILS),
+    default="summary",
+    show_default=True,
+    help="'full' also reads each VM's XML for disk formats and networks",
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=DEFAULT_LIST_CONCURRENCY,
+    show_default=True,
+    help="Hosts listed at once",
+)
+@click.option(
+    "--host-timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_LIST_HOST_TIMEOUT,
+    show_default=True,
+    help="Seconds to wait for each host",
+)
 @click.option("--ssh-key", "-k", help="SSH private key path")
 @click.pass_context
 def list_vms(
     ctx: Any,
     hosts: tuple[str, ...],
     status: str,
+    detail: str,
+    concurrency: int,
+    host_timeout: float,
     ssh_key: Optional[str],
 ) -> None:
     """List virtual machines on specified hosts."""
@@ -325,11 +502,23 @@ def list_vms(
             # Get output format from global context
             output_format = ctx.obj.get("output_format", "text")
 
-            async with KVMCloneClient(config=client_config) as client:
-                results = await client.list_vms(hosts_list, status_filter=status)
-
-                if output_format in ("text", "table"):
-                    for host, vms in results.items():
+            async with open_client(client_config, **daemon_options(ctx)) as client:
+                # Hosts are printed as they answer; JSON is printed at the end
+                json_data: Dict[str, List[Dict[str, Any]]] = {
+                    host: [] for host in hosts_list
+                }
+                async for listing in client.iter_vms(
+                    hosts_list,
+                    status_filter=status,
+                    detail=detail,
+                    max_concurrency=concurrency,
+                    host_timeout=host_timeout,
+                ):
+                    host, vms = listing.host, listing.vms
+                    if not listing.success:
+                        click.echo(f"✗ {host}: {listing.error}", err=True)
+                        continue
+                    if output_format in ("text", "table"):
                         click.echo(f"\n{host}:")
                         if vms:
                             click.echo(
@@ -340,14 +529,16 @@ def list_vms(
                                 click.echo(
                                     f"{vm.name:<20} {vm.state.value:<10} {vm.memory:<8} {vm.vcpus:<6}"
                                 )
+                                if detail == "full":
+                                    for disk in vm.disks:
+                                        click.echo(
+                                            f"  {disk.target:<6} {disk.format:<6} "
+                                            f"{disk.size:>14} {disk.path}"
+                                        )
                         else:
                             click.echo("  No VMs found")
-                elif output_format == "json":
-                    import json
-
-                    # Convert to JSON-serializable format
-                    json_data = {}
-                    for host, vms in results.items():
+                    elif output_format == "json":
+                        # Convert to JSON-serializable format
                         json_data[host] = [
                             {
                                 "name": vm.name,
@@ -355,9 +546,24 @@ def list_vms(
                                 "memory": vm.memory,
                                 "vcpus": vm.vcpus,
                                 "uuid": vm.uuid,
+                                "disks": [
+                                    {
+                                        "path": disk.path,
+                                        "target": disk.target,
+                                        "size": disk.size,
+                                        "allocation": disk.allocation,
+                                        "physical": disk.physical,
+                                        "format": disk.format,
+                                    }
+                                    for disk in vm.disks
+                                ],
                             }
                             for vm in vms
                         ]
+
+                if output_format == "json":
+                    import json
+
                     click.echo(json.dumps(json_data, indent=2))
 
         except KVMCloneError as e:
@@ -370,6 +576,277 @@ def list_vms(
     asyncio.run(run_list())
 
 
+@cli.command("store-gc")
+@click.argument("host")
+@click.option(
+    "--budget",
+    type=click.FloatRange(min=0),
+    required=True,
+    help="Size in GiB the image store may occupy",
+)
+@click.option(
+    "--grace-period",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_GC_GRACE_PERIOD,
+    show_default=True,
+    help="Seconds an image is kept after its last use",
+)
+@click.option("--dry-run", is_flag=True, help="Show what would be evicted")
+@click.option("--ssh-key", "-k", help="SSH private key path")
+@click.pass_context
+def store_gc(
+    ctx: Any,
+    host: str,
+    budget: float,
+    grace_period: float,
+    dry_run: bool,
+    ssh_key: Optional[str],
+) -> None:
+    """Evict unused images from the image store of a host."""
+
+    async def run_gc() -> None:
+        try:
+            client_config = ctx.obj["config"].copy()
+            if ssh_key:
+                client_config["ssh_key_path"] = ssh_key
+
+            async with open_client(client_config, **daemon_options(ctx)) as client:
+                result = await client.store_gc(
+                    host,
+                    int(budget * 1024**3),
+                    dry_run=dry_run,
+                    grace_period=grace_period,
+                )
+
+            if ctx.obj.get("output_format") == "json":
+                import json
+
+                click.echo(json.dumps(result.__dict__, indent=2))
+                return
+            verb = "Would evict" if dry_run else "Evicted"
+            for path in result.evicted:
+                click.echo(f"  {verb} {path}")
+            click.echo(
+                f"✓ {verb} {len(result.evicted)} images, "
+                f"{result.freed_bytes} of {result.total_bytes} bytes"
+            )
+
+        except KVMCloneError as e:
+            click.echo(f"✗ Error: {e}", err=True)
+            sys.exit(e.error_code)
+        except Exception as e:
+            click.echo(f"✗ Unexpected error: {e}", err=True)
+            sys.exit(1)
+
+    asyncio.run(run_gc())
+
+
+@cli.command("bench-link")
+@click.argument("source_host")
+@click.argument("dest_host")
+@click.option(
+    "--cipher",
+    "ciphers",
+    multiple=True,
+    help="Cipher to measure (repeatable); defaults to common fast ciphers",
+)
+@click.option(
+    "--window",
+    "windows",
+    type=click.IntRange(min=1),
+    multiple=True,
+    help="Channel window in KiB to measure (repeatable)",
+)
+@click.option(
+    "--max-packet",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Channel packet size in KiB used by every candidate",
+)
+@click.option(
+    "--size",
+    type=click.IntRange(min=1),
+    default=DEFAULT_BENCH_BYTES // 1024**2,
+    show_default=True,
+    help="MiB sent per candidate",
+)
+@click.option("--no-save", is_flag=True, help="Do not cache the fastest tuning")
+@click.option("--ssh-key", "-k", help="SSH private key path")
+@click.pass_context
+def bench_link(
+    ctx: Any,
+    source_host: str,
+    dest_host: str,
+    ciphers: tuple[str, ...],
+    windows: tuple[int, ...],
+    max_packet: Optional[int],
+    size: int,
+    no_save: bool,
+    ssh_key: Optional[str],
+) -> None:
+    """Measure SSH ciphers and windows between two hosts and cache the fastest."""
+
+    async def run_bench() -> None:
+        try:
+            client_config = ctx.obj["config"].copy()
+            if ssh_key:
+                client_config["ssh_key_path"] = ssh_key
+
+            candidates = candidate_tunings(
+                ciphers=ciphers or DEFAULT_CIPHERS,
+                window_sizes=[w * 1024 for w in windows] or DEFAULT_WINDOW_SIZES,
+                max_packet_size=max_packet * 1024 if max_packet else None,
+            )
+            async with open_client(client_config, **daemon_options(ctx)) as client:
+                results = await client.bench_link(
+                    source_host,
+                    dest_host,
+                    candidates=candidates,
+                    size=size * 1024**2,
+                    save=not no_save,
+                )
+
+            if ctx.obj.get("output_format") == "json":
+                import json
+                from dataclasses import asdict
+
+                click.echo(json.dumps([asdict(r) for r in results], indent=2))
+                return
+            best = fastest(results)
+            for result in results:
+                tuning = result.tuning
+                window = (
+                    f"{tuning.window_size // 1024} KiB window"
+                    if tuning.window_size
+                    else "default window"
+                )
+                outcome = (
+                    f"✗ {result.error}"
+                    if result.error
+                    else f"{result.bytes_per_second / 1024**2:8.1f} MiB/s"
+                )
+                marker = "*" if result is best else " "
+                click.echo(
+                    f"{marker} {', '.join(tuning.ciphers):32} {window:18} {outcome}"
+                )
+            if best is None:
+                click.echo("✗ No candidate succeeded", err=True)
+                sys.exit(1)
+            saved = "" if no_save else "; cached for this host pair"
+            click.echo(f"✓ Fastest: {', '.join(best.tuning.ciphers)}{saved}")
+
+        except KVMCloneError as e:
+            click.echo(f"✗ Error: {e}", err=True)
+            sys.exit(e.error_code)
+        except Exception as e:
+            click.echo(f"✗ Unexpected error: {e}", err=True)
+            sys.exit(1)
+
+    asyncio.run(run_bench())
+
+
+@cli.group()
+def daemon() -> None:
+    """Manage the session daemon that keeps connections open between runs."""
+    pass
+
+
+@daemon.command("start")
+@click.option("--foreground", is_flag=True, help="Run in this process until stopped")
+@click.option(
+    "--idle-timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_DAEMON_IDLE_TIMEOUT,
+    show_default=True,
+    help="Seconds without requests before the daemon exits",
+)
+@click.pass_context
+def daemon_start(ctx: Any, foreground: bool, idle_timeout: float) -> None:
+    """Start the session daemon; later commands are forwarded to it."""
+    socket_path = ctx.obj["config"].get("daemon_socket") or default_socket_path()
+
+    if foreground:
+        server = SessionDaemon(socket_path, idle_timeout=idle_timeout)
+        try:
+            asyncio.run(server.serve())
+        except KVMCloneError as e:
+            click.echo(f"✗ Error: {e}", err=True)
+            sys.exit(e.error_code)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    try:
+        check_socket_directory(socket_path, create=True)
+    except KVMCloneError as e:
+        click.echo(f"✗ Error: {e}", err=True)
+        sys.exit(e.error_code)
+    if asyncio.run(ping(socket_path)) is not None:
+        click.echo(f"✓ Daemon already running on {socket_path}")
+        return
+
+    import subprocess
+
+    command = [sys.executable, "-m", "kvm_clone.cli"]
+    if ctx.obj.get("config_path"):
+        command += ["--config", ctx.obj["config_path"]]
+    command += ["daemon", "start", "--foreground", "--idle-timeout", str(idle_timeout)]
+    subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+    async def wait_for_daemon() -> Optional[Dict[str, Any]]:
+        for _ in range(100):
+            status = await ping(socket_path)
+            if status is not None:
+                return status
+            await asyncio.sleep(0.1)
+        return None
+
+    status = asyncio.run(wait_for_daemon())
+    if status is None:
+        click.echo("✗ Daemon did not start", err=True)
+        sys.exit(1)
+    click.echo(f"✓ Daemon started on {socket_path} (pid {status['pid']})")
+
+
+@daemon.command("stop")
+@click.pass_context
+def daemon_stop(ctx: Any) -> None:
+    """Stop the session daemon and close its connections."""
+    socket_path = ctx.obj["config"].get("daemon_socket") or default_socket_path()
+    if asyncio.run(ping(socket_path)) is None:
+        click.echo("Daemon is not running")
+        return
+    asyncio.run(request(socket_path, {"method": "stop"}))
+    click.echo("✓ Daemon stopped")
+
+
+@daemon.command("status")
+@click.pass_context
+def daemon_status(ctx: Any) -> None:
+    """Show whether the session daemon is running."""
+    socket_path = ctx.obj["config"].get("daemon_socket") or default_socket_path()
+    status = asyncio.run(ping(socket_path))
+    if status is None:
+        click.echo("Daemon is not running")
+        sys.exit(1)
+    if ctx.obj.get("output_format") == "json":
+        import json
+
+        click.echo(json.dumps(status, indent=2))
+        return
+    click.echo(
+        f"✓ Daemon running on {status['socket']} (pid {status['pid']}): "
+        f"{status['requests']} requests, {status['connections']} open SSH "
+        f"connections, up {status['uptime']:.0f}s"
+    )
+
+
 @cli.group()
 def config() -> None:
     """Manage configuration settings."""
@@ -404,6 +881,23 @@ def config_init(config_dir: str) -> None:
         "known_hosts_file": None,
         "default_parallel_transfers": 4,
         "default_bandwidth_limit": None,
+        "ssh_backend": "paramiko",
+        "ssh_max_connections": 4,
+        "ssh_max_channels": None,
+        "ssh_idle_timeout": 300.0,
+        "ssh_control_workers": 16,
+        "ssh_stream_workers": 64,
+        "ssh_max_queued_calls": 64,
+        "ssh_ciphers": None,
+        "ssh_macs": None,
+        "ssh_kex": None,
+        "ssh_window_size": None,
+        "ssh_max_packet_size": None,
+        "link_tuning_file": None,
+        "daemon_socket": None,
+        "libvirt_max_workers": 4,
+        "libvirt_call_timeout": 60.0,
+        "libvirt_cache_ttl": 60.0,
     }
 
     with open(config_file, "w") as f:
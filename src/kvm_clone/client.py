@@ -5,8 +5,10 @@ This module implements the primary interface for KVM virtual machine cloning
 and synchronization operations over SSH connections.
 """
 
+import asyncio
 import logging
-from typing import Optional, Dict, Any, List, Callable
+import time
+from typing import Optional, Dict, Any, AsyncIterator, List, Callable, Union
 
 from .models import (
     CloneOptions,
@@ -15,15 +17,44 @@ from .models import (
     SyncResult,
     OperationStatus,
     VMInfo,
+    HostListing,
     ProgressInfo,
     OperationStatusEnum,
     OperationType,
+    StoreGCResult,
+    SSHTuning,
+    LinkBenchmark,
 )
 from datetime import datetime
 from .cloner import VMCloner
 from .sync import VMSynchronizer
-from .transport import SSHTransport
+from .delta import DEFAULT_BLOCK_SIZE
+from .transport import (
+    SSHTransport,
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_IDLE_TIMEOUT,
+    DEFAULT_SSH_BACKEND,
+)
+from .transport_executor import (
+    DEFAULT_CONTROL_WORKERS,
+    DEFAULT_MAX_QUEUE,
+    DEFAULT_STREAM_WORKERS,
+)
 from .libvirt_wrapper import LibvirtWrapper
+from .libvirt_executor import DEFAULT_LIBVIRT_WORKERS, DEFAULT_LIBVIRT_CALL_TIMEOUT
+from .inventory import DEFAULT_INVENTORY_TTL
+from .store import DEFAULT_GC_GRACE_PERIOD, ImageStore
+from .link_tuning import (
+    DEFAULT_BENCH_BYTES,
+    LinkTuningCache,
+    benchmark_link,
+    candidate_tunings,
+    fastest,
+)
+from .exceptions import ConfigurationError, ValidationError
+
+DEFAULT_LIST_CONCURRENCY = 16  # hosts listed at once
+DEFAULT_LIST_HOST_TIMEOUT = 60.0  # seconds
 
 
 class KVMCloneClient:
@@ -59,14 +90,69 @@ class KVMCloneClient:
         self.logger = logging.getLogger(__name__)
 
         # Initialize components
-        self.transport = SSHTransport(key_path=self.ssh_key_path, timeout=timeout)
-        self.libvirt = LibvirtWrapper()
+        self.transport = self._create_transport(
+            SSHTuning(
+                ciphers=self.config.get("ssh_ciphers") or [],
+                macs=self.config.get("ssh_macs") or [],
+                kex=self.config.get("ssh_kex") or [],
+                window_size=self.config.get("ssh_window_size"),
+                max_packet_size=self.config.get("ssh_max_packet_size"),
+            )
+        )
+        self.link_tuning = LinkTuningCache(self.config.get("link_tuning_file"))
+        self.libvirt = LibvirtWrapper(
+            max_workers=self.config.get("libvirt_max_workers", DEFAULT_LIBVIRT_WORKERS),
+            call_timeout=self.config.get(
+                "libvirt_call_timeout", DEFAULT_LIBVIRT_CALL_TIMEOUT
+            ),
+            cache_ttl=self.config.get("libvirt_cache_ttl", DEFAULT_INVENTORY_TTL),
+        )
         self.cloner = VMCloner(self.transport, self.libvirt)
         self.synchronizer = VMSynchronizer(self.transport, self.libvirt)
 
         # Operation tracking
         self._operations: Dict[str, OperationStatus] = {}
 
+    def _create_transport(self, tuning: SSHTuning) -> SSHTransport:
+        """Create an SSH transport from the configuration with a tuning."""
+        return SSHTransport(
+            key_path=self.ssh_key_path,
+            timeout=self.timeout,
+            max_connections=self.config.get(
+                "ssh_max_connections", DEFAULT_MAX_CONNECTIONS
+            ),
+            max_channels=self.config.get("ssh_max_channels"),
+            idle_timeout=self.config.get("ssh_idle_timeout", DEFAULT_IDLE_TIMEOUT),
+            backend=self.config.get("ssh_backend", DEFAULT_SSH_BACKEND),
+            known_hosts=self.config.get("known_hosts_file"),
+            control_workers=self.config.get(
+                "ssh_control_workers", DEFAULT_CONTROL_WORKERS
+            ),
+            stream_workers=self.config.get(
+                "ssh_stream_workers", DEFAULT_STREAM_WORKERS
+            ),
+            max_queued_calls=self.config.get("ssh_max_queued_calls", DEFAULT_MAX_QUEUE),
+            tuning=tuning,
+        )
+
+    def _apply_link_tuning(self, source_host: str, dest_host: str) -> None:
+        """
+        Connect to both hosts with the tuning measured for the pair, if any.
+
+        The transport keeps one tuning per host. When this client runs
+        operations between different pairs sharing a host at the same time,
+        such as A to B and A to C, the operation started last decides the
+        tuning of A. That only affects throughput, never correctness.
+        """
+        tuning = self.link_tuning.get(source_host, dest_host)
+        if tuning is None:
+            return
+        try:
+            for host in (source_host, dest_host):
+                self.transport.set_host_tuning(host, tuning)
+        except ConfigurationError as e:
+            self.logger.warning(f"Ignoring cached link tuning: {e}")
+
     def _load_default_config(self) -> Dict[str, Any]:
         """Load default configuration."""
         return {
@@ -88,10 +174,14 @@ class KVMCloneClient:
         force: bool = False,
         dry_run: bool = False,
         parallel: int = 4,
-        compress: bool = False,
+        compress: Union[bool, str] = False,
         verify: bool = True,
         preserve_mac: bool = False,
         network_config: Optional[Dict[str, Any]] = None,
+        transfer_mode: str = "rsync",
+        stripe_size: int = 256 * 1024 * 1024,
+        resume: Optional[str] = None,
+        use_store: bool = False,
         progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
     ) -> CloneResult:
         """
@@ -105,10 +195,17 @@ class KVMCloneClient:
             force: Overwrite existing VM
             dry_run: Show what would be done without executing
             parallel: Number of parallel transfers
-            compress: Enable compression during transfer
+            compress: Wire compression: 'none', 'lz4', 'zstd', '<codec>:<level>'
+                or 'adaptive' (True)
             verify: Verify integrity after transfer
             preserve_mac: Preserve MAC addresses
             network_config: Custom network configuration
+            transfer_mode: Disk transfer backend ('rsync', 'striped', 'sparse'
+                or 'stream')
+            stripe_size: Stripe size in bytes for striped transfers
+            resume: Operation ID of an interrupted clone to continue
+            use_store: Keep the disks in the destination's image store and
+                create them from it, sending only images it does not hold
             progress_callback: Callback for progress updates
 
         Returns:
@@ -123,8 +220,13 @@ class KVMCloneClient:
             verify=verify,
             preserve_mac=preserve_mac,
             network_config=network_config,
+            transfer_mode=transfer_mode,
+            stripe_size=stripe_size,
+            resume=resume,
+            use_store=use_store,
         )
 
+        self._apply_link_tuning(source_host, dest_host)
         result = await self.cloner.clone(
             source_host=source_host,
             dest_host=dest_host,
@@ -155,6 +257,9 @@ class KVMCloneClient:
         checkpoint: bool = False,
         delta_only: bool = True,
         bandwidth_limit: Optional[str] = None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        changed_block_tracking: bool = False,
+        compress: Union[bool, str] = False,
         progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
     ) -> SyncResult:
         """
@@ -168,6 +273,9 @@ class KVMCloneClient:
             checkpoint: Create checkpoint before sync
             delta_only: Transfer only changed blocks
             bandwidth_limit: Bandwidth limit (e.g., '100M', '1G')
+            block_size: Block size for delta detection in bytes
+            changed_block_tracking: Use libvirt checkpoints to find changed blocks
+            compress: Wire compression, as for clone_vm
             progress_callback: Callback for progress updates
 
         Returns:
@@ -178,8 +286,12 @@ class KVMCloneClient:
             checkpoint=checkpoint,
             delta_only=delta_only,
             bandwidth_limit=bandwidth_limit,
+            block_size=block_size,
+            changed_block_tracking=changed_block_tracking,
+            compress=compress,
         )
 
+        self._apply_link_tuning(source_host, dest_host)
         result = await self.synchronizer.sync(
             source_host=source_host,
             dest_host=dest_host,
@@ -198,31 +310,186 @@ class KVMCloneClient:
         )
         return result
 
+    async def store_gc(
+        self,
+        host: str,
+        budget: int,
+        *,
+        dry_run: bool = False,
+        grace_period: float = DEFAULT_GC_GRACE_PERIOD,
+    ) -> StoreGCResult:
+        """
+        Evict unused images from the image store of a host.
+
+        Images are in use while a disk of any VM defined on the host, or a
+        backing file of one, refers to them; the least recently used of the
+        others are evicted until the store fits into the budget.
+
+        Args:
+            host: Host whose store is cleaned up
+            budget: Bytes the store may occupy
+            dry_run: Only report what would be evicted
+            grace_period: Seconds an image is kept after its last use
+
+        Returns:
+            StoreGCResult: Evicted images and freed bytes
+        """
+        async with self.transport.connect(host) as conn:
+            vms = await self.libvirt.list_vms(conn, detail="full")
+
+        store = ImageStore(self.transport, host)
+        referenced = await store.referenced(
+            disk.path for vm in vms for disk in vm.disks
+        )
+        return await store.gc(
+            budget, referenced, dry_run=dry_run, grace_period=grace_period
+        )
+
+    async def bench_link(
+        self,
+        source_host: str,
+        dest_host: str,
+        *,
+        candidates: Optional[List[SSHTuning]] = None,
+        size: int = DEFAULT_BENCH_BYTES,
+        save: bool = True,
+    ) -> List[LinkBenchmark]:
+        """
+        Measure SSH tunings between two hosts and keep the fastest.
+
+        The fastest tuning is stored in the link tuning cache unless ``save``
+        is False; later clones and syncs between the hosts use it.
+
+        Args:
+            source_host: Host sending the data
+            dest_host: Host receiving the data
+            candidates: Tunings to measure; defaults to ``candidate_tunings()``
+            size: Bytes sent per candidate
+            save: Cache the fastest tuning for the host pair
+
+        Returns:
+            List[LinkBenchmark]: One result per candidate
+        """
+        results = await benchmark_link(
+            self._create_transport,
+            source_host,
+            dest_host,
+            candidate_tunings() if candidates is None else candidates,
+            size=size,
+        )
+        best = fastest(results)
+        if best is not None and save:
+            self.link_tuning.put(best)
+            self._apply_link_tuning(source_host, dest_host)
+        return results
+
     async def list_vms(
-        self, hosts: List[str], *, status_filter: Optional[str] = None
+        self,
+        hosts: List[str],
+        *,
+        status_filter: Optional[str] = None,
+        detail: str = "summary",
+        max_concurrency: int = DEFAULT_LIST_CONCURRENCY,
+        host_timeout: Optional[float] = DEFAULT_LIST_HOST_TIMEOUT,
     ) -> Dict[str, List[VMInfo]]:
         """
         List virtual machines on specified hosts.
 
+        Hosts are listed concurrently; see ``iter_vms``. Hosts that fail or
+        time out map to an empty list.
+
         Args:
             hosts: List of hosts to query
             status_filter: Filter by status ('all', 'running', 'stopped', 'paused')
+            detail: 'summary' for state, memory, vCPUs and the capacities of
+                every block device, host devices included, from one bulk call
+                per host; 'full' to also parse each VM's XML for disk formats
+                and network interfaces, listing only file-backed disks
+            max_concurrency: Maximum hosts listed at once
+            host_timeout: Seconds to wait for each host, None to wait
+                indefinitely
 
         Returns:
             Dict mapping host names to lists of VM information
         """
-        results = {}
+        listings = {
+            listing.host: listing
+            async for listing in self.iter_vms(
+                hosts,
+                status_filter=status_filter,
+                detail=detail,
+                max_concurrency=max_concurrency,
+                host_timeout=host_timeout,
+            )
+        }
+        return {host: listings[host].vms for host in dict.fromkeys(hosts)}
 
-        for host in hosts:
-            try:
-                async with self.transport.connect(host) as conn:
-                    vms = await self.libvirt.list_vms(conn, status_filter)
-                    results[host] = vms
-            except Exception as e:
-                self.logger.error(f"Failed to list VMs on {host}: {e}")
-                results[host] = []
+    async def iter_vms(
+        self,
+        hosts: List[str],
+        *,
+        status_filter: Optional[str] = None,
+        detail: str = "summary",
+        max_concurrency: int = DEFAULT_LIST_CONCURRENCY,
+        host_timeout: Optional[float] = DEFAULT_LIST_HOST_TIMEOUT,
+    ) -> AsyncIterator[HostListing]:
+        """
+        List virtual machines on hosts, yielding each host as it answers.
 
-        return results
+        Up to ``max_concurrency`` hosts are listed at once. A host that fails
+        or does not answer within ``host_timeout`` seconds is yielded with an
+        error instead of holding up the others. Hosts still being listed are
+        cancelled when the iterator is closed early.
+
+        Args:
+            hosts: List of hosts to query
+            status_filter: Filter by status ('all', 'running', 'stopped', 'paused')
+            detail: Detail level, see ``list_vms``
+            max_concurrency: Maximum hosts listed at once
+            host_timeout: Seconds to wait for each host, None to wait
+                indefinitely
+
+        Yields:
+            HostListing: VMs of one host, in order of completion
+
+        Raises:
+            ValidationError: If the detail level or concurrency is invalid
+        """
+        LibvirtWrapper.validate_detail(detail)
+        if max_concurrency <= 0:
+            raise ValidationError("max_concurrency must be positive")
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def list_host(host: str) -> List[VMInfo]:
+            async with self.transport.connect(host) as conn:
+                return await self.libvirt.list_vms(conn, status_filter, detail)
+
+        async def listing(host: str) -> HostListing:
+            async with semaphore:
+                start = time.monotonic()
+                try:
+                    vms = await asyncio.wait_for(list_host(host), host_timeout)
+                    return HostListing(
+                        host=host, vms=vms, duration=time.monotonic() - start
+                    )
+                except asyncio.TimeoutError:
+                    error = f"No answer within {host_timeout}s"
+                except Exception as e:
+                    error = str(e)
+                self.logger.error(f"Failed to list VMs on {host}: {error}")
+                return HostListing(
+                    host=host, error=error, duration=time.monotonic() - start
+                )
+
+        tasks = [asyncio.ensure_future(listing(host)) for host in dict.fromkeys(hosts)]
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield await done
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
     def get_operation_status(self, operation_id: str) -> Optional[OperationStatus]:
         """
@@ -276,4 +543,5 @@ class KVMCloneClient:
 
     async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
         """Async context manager exit."""
+        self.libvirt.close_all_connections()
         await self.transport.close_all()
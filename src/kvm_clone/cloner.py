@@ -5,33 +5,59 @@ This module handles the actual VM cloning process including disk image transfer
 and VM definition creation.
 """
 
+import asyncio
 import uuid
-from typing import Optional, Callable
+from dataclasses import replace
+from typing import Optional, Callable, Dict, List, Set, Tuple
 from datetime import datetime
 from pathlib import Path
 
 from .logging import logger
 from .models import (
+    BackingLayer,
+    ByteRange,
     CloneOptions,
     CloneResult,
+    CompressionSpec,
+    DiskInfo,
     ProgressInfo,
     ValidationResult,
     OperationType,
-    OperationStatusEnum,
+    TransferStats,
 )
-from .exceptions import VMNotFoundError, TransferError, ValidationError, LibvirtError
-from .transport import SSHTransport
+from .exceptions import (
+    VMNotFoundError,
+    TransferError,
+    ValidationError,
+    LibvirtError,
+    DiskSpaceError,
+)
+from .transport import SSHConnection, SSHTransport
+from .transfer import StripedTransfer, SparseTransfer, StreamTransfer, TRANSFER_MODES
+from .progress import ProgressTracker, run_with_progress
+from .verify import DiskVerifier
+from .journal import JournalStore, TransferJournal
+from .chain import BackingChain
+from .store import PART_SUFFIX, ImageStore
 from .libvirt_wrapper import LibvirtWrapper
 from .security import SecurityValidator, CommandBuilder
 
+IMAGE_DIR = "/var/lib/libvirt/images"  # destination of cloned disk images
+
 
 class VMCloner:
     """Handles VM cloning operations."""
 
-    def __init__(self, transport: SSHTransport, libvirt_wrapper: LibvirtWrapper):
+    def __init__(
+        self,
+        transport: SSHTransport,
+        libvirt_wrapper: LibvirtWrapper,
+        journals: Optional[JournalStore] = None,
+    ):
         """Initialize VM cloner."""
         self.transport = transport
         self.libvirt = libvirt_wrapper
+        self.journals = journals if journals is not None else JournalStore()
 
     async def clone(
         self,
@@ -54,9 +80,10 @@ class VMCloner:
         Returns:
             CloneResult: Result of the clone operation
         """
-        operation_id = str(uuid.uuid4())
+        operation_id = clone_options.resume or str(uuid.uuid4())
         start_time = datetime.now()
         new_vm_name = clone_options.new_name or f"{vm_name}_clone"
+        journal: Optional[TransferJournal] = None
 
         logger.info(
             f"Starting clone operation {operation_id}: {vm_name} from {source_host} to {dest_host}",
@@ -67,6 +94,18 @@ class VMCloner:
         )
 
         try:
+            if clone_options.resume:
+                journal = self._open_journal(
+                    operation_id, source_host, dest_host, vm_name, new_vm_name
+                )
+                # Chunks recorded in the journal are only valid with the
+                # backend and stripe size they were copied with
+                clone_options = replace(
+                    clone_options,
+                    transfer_mode=journal.operation["transfer_mode"],
+                    stripe_size=journal.operation["stripe_size"],
+                )
+
             # Validate prerequisites
             validation = await self.validate_prerequisites(
                 source_host, dest_host, vm_name, clone_options
@@ -107,6 +146,19 @@ class VMCloner:
                     validation=validation,
                 )
 
+            if journal is None:
+                journal = self.journals.create(
+                    operation_id,
+                    {
+                        "source_host": source_host,
+                        "dest_host": dest_host,
+                        "vm_name": vm_name,
+                        "new_vm_name": new_vm_name,
+                        "transfer_mode": clone_options.transfer_mode,
+                        "stripe_size": clone_options.stripe_size,
+                    },
+                )
+
             # Get VM information from source
             async with self.transport.connect(source_host) as source_conn:
                 try:
@@ -119,41 +171,61 @@ class VMCloner:
                     source_conn, vm_name, new_vm_name, clone_options.preserve_mac
                 )
 
-                # Transfer disk images and collect path mappings
-                total_bytes = 0
-                transferred_bytes = 0
-                disk_path_mappings = {}  # old_path -> new_path mapping
+                # Ship the backing images the destination lacks first
+                chains, chain_bytes = await self._transfer_backing_chains(
+                    source_host,
+                    dest_host,
+                    vm_info.disks,
+                    new_vm_name,
+                    clone_options,
+                    operation_id,
+                    journal,
+                )
 
+                # Transfer disk images concurrently and collect path mappings
+                transfers = await self._transfer_disks(
+                    source_host,
+                    dest_host,
+                    vm_info.disks,
+                    new_vm_name,
+                    clone_options,
+                    progress_callback,
+                    operation_id,
+                    journal=journal,
+                    chains=chains,
+                )
+                disk_path_mappings = {
+                    path: dest_path for path, (dest_path, _) in transfers.items()
+                }
+                await self._rebase_disks(
+                    source_host, dest_host, vm_info.disks, transfers, chains
+                )
+                transferred_bytes = chain_bytes
+                reused_bytes = 0
                 for disk in vm_info.disks:
-                    if progress_callback:
-                        progress_callback(
-                            ProgressInfo(
-                                operation_id=operation_id,
-                                operation_type=OperationType.CLONE,
-                                progress_percent=0.0,
-                                bytes_transferred=transferred_bytes,
-                                total_bytes=total_bytes,
-                                speed=0.0,
-                                eta=None,
-                                status=OperationStatusEnum.RUNNING,
-                                message=f"Transferring disk {disk.target}",
-                                current_file=disk.path,
-                            )
-                        )
-
-                    # Transfer disk image
-                    dest_path = await self._transfer_disk_image(
-                        source_host,
-                        dest_host,
-                        disk.path,
-                        new_vm_name,
-                        progress_callback,
-                        operation_id,
-                    )
-
-                    # Store mapping for XML update
-                    disk_path_mappings[disk.path] = dest_path
-                    transferred_bytes += disk.size
+                    stats = transfers[disk.path][1]
+                    reused_bytes += stats.reused_bytes
+                    if not stats.reused_bytes:
+                        transferred_bytes += stats.bytes_transferred or disk.size
+                reused_bytes += sum(
+                    {
+                        layer.dest_path: layer.size
+                        for layers in chains.values()
+                        for layer in layers
+                        if layer.reused
+                    }.values()
+                )
+                allocated_bytes = sum(
+                    stats.bytes_transferred for _, stats in transfers.values()
+                )
+                virtual_bytes = sum(
+                    stats.virtual_bytes for _, stats in transfers.values()
+                )
+                verification = [
+                    stats.verification
+                    for _, stats in transfers.values()
+                    if stats.verification is not None
+                ]
 
                 # Update XML with new disk paths using ElementTree
                 import xml.etree.ElementTree as ET
@@ -165,6 +237,8 @@ class VMCloner:
                         old_path = source_elem.get("file", "")
                         if old_path in disk_path_mappings:
                             source_elem.set("file", disk_path_mappings[old_path])
+                        if old_path in chains:
+                            BackingChain.rewrite_xml(disk_elem, chains[old_path])
 
                 new_xml = ET.tostring(root, encoding="unicode")
 
@@ -172,6 +246,8 @@ class VMCloner:
                 async with self.transport.connect(dest_host) as dest_conn:
                     await self.libvirt.create_vm_from_xml(dest_conn, new_xml)
 
+            journal.close()
+            self.journals.remove(operation_id)
             duration = (datetime.now() - start_time).total_seconds()
 
             logger.info(
@@ -191,6 +267,10 @@ class VMCloner:
                 bytes_transferred=transferred_bytes,
                 validation=validation,
                 warnings=validation.warnings,
+                allocated_bytes=allocated_bytes,
+                virtual_bytes=virtual_bytes,
+                verification=verification,
+                reused_bytes=reused_bytes,
             )
 
         except Exception as e:
@@ -200,7 +280,6 @@ class VMCloner:
                 operation_id=operation_id,
                 exc_info=True,
             )
-
             return CloneResult(
                 operation_id=operation_id,
                 success=False,
@@ -211,8 +290,57 @@ class VMCloner:
                 duration=duration,
                 bytes_transferred=0,
                 error=str(e),
+                # Partial disks are kept for resuming with the journal
+                resumable=journal is not None,
             )
 
+        finally:
+            if journal is not None:
+                journal.close()
+
+    def _open_journal(
+        self,
+        operation_id: str,
+        source_host: str,
+        dest_host: str,
+        vm_name: str,
+        new_vm_name: str,
+    ) -> TransferJournal:
+        """
+        Open the journal of an interrupted clone to continue it.
+
+        Raises:
+            ValidationError: If there is no usable journal for the operation
+                or it belongs to a different clone
+        """
+        try:
+            journal = self.journals.open(operation_id)
+        except FileNotFoundError:
+            raise ValidationError(f"No transfer journal for operation {operation_id}")
+        except (OSError, ValueError) as e:
+            raise ValidationError(f"Cannot resume operation {operation_id}: {e}")
+
+        expected = {
+            "source_host": source_host,
+            "dest_host": dest_host,
+            "vm_name": vm_name,
+            "new_vm_name": new_vm_name,
+        }
+        for key, value in expected.items():
+            if journal.operation.get(key) != value:
+                journal.close()
+                raise ValidationError(
+                    f"Operation {operation_id} has {key} "
+                    f"'{journal.operation.get(key)}', not '{value}'"
+                )
+
+        logger.info(
+            f"Resuming clone operation {operation_id}",
+            operation_id=operation_id,
+            completed_disks=sum(disk.done for disk in journal.disks.values()),
+        )
+        return journal
+
     async def validate_prerequisites(
         self,
         source_host: str,
@@ -234,6 +362,13 @@ class VMCloner:
         """
         errors = []
         warnings = []
+        planned_bytes = 0
+
+        if clone_options.transfer_mode not in TRANSFER_MODES:
+            errors.append(
+                f"Unknown transfer mode '{clone_options.transfer_mode}' "
+                f"(expected one of: {', '.join(TRANSFER_MODES)})"
+            )
 
         try:
             # Verify source VM exists
@@ -243,8 +378,15 @@ class VMCloner:
                         f"VM '{vm_name}' not found on source host {source_host}"
                     )
                 else:
-                    # Get VM info for further validation
-                    vm_info = await self.libvirt.get_vm_info(source_conn, vm_name)
+                    # Get VM info for further validation; the clone reuses
+                    # this fresh read
+                    vm_info = await self.libvirt.get_vm_info(
+                        source_conn, vm_name, refresh=True
+                    )
+                    planned_bytes = sum(
+                        self.planned_bytes(disk, clone_options.transfer_mode)
+                        for disk in vm_info.disks
+                    )
 
                     # Check if VM is running
                     if vm_info.state.value == "running":
@@ -272,6 +414,24 @@ class VMCloner:
                 except Exception as e:
                     warnings.append(f"Could not check destination resources: {e}")
 
+                # A resumed clone already wrote part of its disks
+                if planned_bytes and not clone_options.resume:
+                    try:
+                        available = await self._free_space(dest_conn, IMAGE_DIR)
+                    except Exception as e:
+                        warnings.append(f"Could not check destination disk space: {e}")
+                    else:
+                        if planned_bytes > available:
+                            errors.append(
+                                str(
+                                    DiskSpaceError(
+                                        planned_bytes,
+                                        available,
+                                        f"{dest_host}:{IMAGE_DIR}",
+                                    )
+                                )
+                            )
+
         except Exception as e:
             errors.append(f"Validation error: {e}")
 
@@ -279,6 +439,369 @@ class VMCloner:
             valid=len(errors) == 0, errors=errors, warnings=warnings
         )
 
+    @staticmethod
+    def planned_bytes(disk: DiskInfo, transfer_mode: str) -> int:
+        """
+        Estimate the bytes a disk adds on the destination and on the wire.
+
+        The sparse backend only copies allocated extents; the others copy the
+        whole image file. Falls back to the virtual size when libvirt did not
+        report host sizes.
+
+        Args:
+            disk: Disk to transfer
+            transfer_mode: Transfer backend
+
+        Returns:
+            int: Planned bytes
+        """
+        if transfer_mode == "sparse" and disk.allocation:
+            return disk.allocation
+        return disk.physical or disk.size
+
+    @staticmethod
+    async def _free_space(conn: SSHConnection, path: str) -> int:
+        """Get the bytes available under a directory of a host."""
+        stdout, stderr, exit_code = await conn.execute_command(
+            CommandBuilder.build_free_space_command(path)
+        )
+        lines = stdout.split()
+        if exit_code != 0 or not lines or not lines[-1].isdigit():
+            raise ValueError(stderr.strip() or f"unexpected df output: {stdout!r}")
+        return int(lines[-1])
+
+    async def _transfer_disks(
+        self,
+        source_host: str,
+        dest_host: str,
+        disks: List[DiskInfo],
+        new_vm_name: str,
+        clone_options: CloneOptions,
+        progress_callback: Optional[Callable[[ProgressInfo], None]],
+        operation_id: str,
+        journal: Optional[TransferJournal] = None,
+        chains: Optional[Dict[str, List[BackingLayer]]] = None,
+    ) -> Dict[str, Tuple[str, TransferStats]]:
+        """
+        Transfer all disk images of a VM with bounded concurrency.
+
+        At most ``clone_options.parallel`` disks are transferred at the same
+        time; each transfer runs its command on its own SSH channel. Progress
+        of the individual disks is aggregated into a single ProgressInfo
+        stream. With ``clone_options.use_store`` the destination's image store
+        is asked for all disks at once and only the missing ones are sent.
+
+        Args:
+            source_host: Source host
+            dest_host: Destination host
+            disks: Disks to transfer
+            new_vm_name: New VM name for destination paths
+            clone_options: Clone options
+            progress_callback: Progress callback
+            operation_id: Operation ID for progress tracking
+            journal: Journal recording the progress of the operation
+            chains: Backing layers of the disks that have a backing chain
+
+        Returns:
+            Dict[str, Tuple[str, TransferStats]]: Mapping of source disk path
+            to its destination path and transfer statistics
+        """
+        chains = chains or {}
+        store: Optional[ImageStore] = None
+        digests: Dict[str, str] = {}
+        present: Set[str] = set()
+        if clone_options.use_store:
+            store = ImageStore(self.transport, dest_host)
+            digests = await self._source_digests(source_host, dest_host, disks)
+            present = await store.present(digests.values())
+            if not present.issuperset(digests.values()):
+                await store.prepare()
+            logger.info(
+                f"Image store on {dest_host} holds {len(present)} of "
+                f"{len(set(digests.values()))} disk images",
+                operation_id=operation_id,
+                dest_host=dest_host,
+            )
+        # Disks with identical content are transferred once
+        digest_locks = {digest: asyncio.Lock() for digest in digests.values()}
+
+        semaphore = asyncio.Semaphore(max(1, clone_options.parallel))
+        tracker = ProgressTracker(
+            progress_callback,
+            operation_id,
+            OperationType.CLONE,
+            total_bytes=sum(
+                self.planned_bytes(disk, clone_options.transfer_mode) for disk in disks
+            ),
+        )
+        completed_disks = 0
+
+        async def transfer(disk: DiskInfo) -> Tuple[str, TransferStats]:
+            nonlocal completed_disks
+            async with semaphore:
+                tracker.emit(
+                    f"Transferring disk {disk.target}",
+                    disk.path,
+                    force=True,
+                    percent=completed_disks / len(disks) * 100,
+                )
+
+                def on_bytes(transferred: int) -> None:
+                    tracker.update(disk.path, transferred, current_file=disk.path)
+
+                if store is not None:
+                    digest = digests[disk.path]
+                    async with digest_locks[digest]:
+                        result = await self._transfer_via_store(
+                            store,
+                            digest,
+                            present,
+                            source_host,
+                            dest_host,
+                            disk,
+                            new_vm_name,
+                            operation_id,
+                            clone_options,
+                            on_bytes,
+                            journal,
+                            overlay=disk.format == "qcow2" and disk.path not in chains,
+                        )
+                else:
+                    result = await self._transfer_disk_image(
+                        source_host,
+                        dest_host,
+                        disk.path,
+                        new_vm_name,
+                        progress_callback,
+                        operation_id,
+                        clone_options,
+                        bytes_callback=on_bytes,
+                        journal=journal,
+                    )
+            completed_disks += 1
+            tracker.update(
+                disk.path,
+                self.planned_bytes(disk, clone_options.transfer_mode)
+                or result[1].bytes_transferred,
+                message=f"Transferred disk {disk.target}",
+                current_file=disk.path,
+                force=True,
+            )
+            if tracker.total_bytes <= 0:
+                tracker.emit(force=True, percent=completed_disks / len(disks) * 100)
+            return result
+
+        tasks = [asyncio.ensure_future(transfer(disk)) for disk in disks]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # Stop the remaining transfers as soon as one disk fails
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        return {disk.path: result for disk, result in zip(disks, results)}
+
+    async def _source_digests(
+        self, source_host: str, dest_host: str, disks: List[DiskInfo]
+    ) -> Dict[str, str]:
+        """Get the SHA-256 digest of every disk image on the source host."""
+        async with self.transport.connect(source_host) as conn:
+            outputs = await asyncio.gather(
+                *(
+                    conn.execute_command(
+                        CommandBuilder.build_safe_command(
+                            "sha256sum {path}", path=disk.path
+                        )
+                    )
+                    for disk in disks
+                )
+            )
+
+        digests = {}
+        for disk, (stdout, stderr, exit_code) in zip(disks, outputs):
+            fields = stdout.split()
+            if exit_code != 0 or not fields or len(fields[0]) != 64:
+                raise TransferError(
+                    f"Cannot hash {disk.path}: {stderr.strip() or stdout!r}",
+                    source_host,
+                    dest_host,
+                )
+            digests[disk.path] = fields[0]
+        return digests
+
+    async def _transfer_via_store(
+        self,
+        store: ImageStore,
+        digest: str,
+        present: Set[str],
+        source_host: str,
+        dest_host: str,
+        disk: DiskInfo,
+        new_vm_name: str,
+        operation_id: str,
+        clone_options: CloneOptions,
+        bytes_callback: Optional[Callable[[int], None]],
+        journal: Optional[TransferJournal],
+        overlay: bool = False,
+    ) -> Tuple[str, TransferStats]:
+        """
+        Create a disk from the destination's image store, filling it if needed.
+
+        Args:
+            store: Image store of the destination host
+            digest: SHA-256 digest of the source disk image
+            present: Digests held by the store; updated when one is added
+            source_host: Source host
+            dest_host: Destination host
+            disk: Source disk
+            new_vm_name: New VM name for the destination path
+            operation_id: Operation ID for logging
+            clone_options: Clone options selecting the transfer backend
+            bytes_callback: Called with the cumulative bytes transferred
+            journal: Journal recording the progress of the operation
+            overlay: Whether the disk may become a qcow2 overlay of the object
+
+        Returns:
+            Tuple[str, TransferStats]: Destination path of the disk and
+            transfer statistics
+        """
+        dest_path = self._dest_path(new_vm_name, disk.path)
+        if digest in present:
+            stats = TransferStats(reused_bytes=disk.physical or disk.size)
+        else:
+            _, stats = await self._transfer_disk_image(
+                source_host,
+                dest_host,
+                disk.path,
+                new_vm_name,
+                None,
+                operation_id,
+                clone_options,
+                bytes_callback=bytes_callback,
+                journal=journal,
+                dest_path=store.part_path(digest),
+            )
+            if not await store.add(digest):
+                await store.restore_part(digest, dest_path)
+                return dest_path, stats
+            present.add(digest)
+
+        stats.materialized = await store.materialize(digest, dest_path, overlay)
+        logger.info(
+            f"Disk {disk.target} created from the image store by {stats.materialized}",
+            operation_id=operation_id,
+            dest_host=dest_host,
+            reused=stats.reused_bytes > 0,
+        )
+        return dest_path, stats
+
+    @staticmethod
+    def _dest_path(new_vm_name: str, source_path: str) -> str:
+        """Get the destination path of a cloned disk image."""
+        new_vm_name = SecurityValidator.validate_vm_name(new_vm_name)
+        dest_filename = f"{new_vm_name}_{Path(source_path).name}"
+        return SecurityValidator.sanitize_path(dest_filename, IMAGE_DIR)
+
+    async def _transfer_backing_chains(
+        self,
+        source_host: str,
+        dest_host: str,
+        disks: List[DiskInfo],
+        new_vm_name: str,
+        clone_options: CloneOptions,
+        operation_id: str,
+        journal: Optional[TransferJournal] = None,
+    ) -> Tuple[Dict[str, List[BackingLayer]], int]:
+        """
+        Transfer the backing images of qcow2 disks the destination lacks.
+
+        Layers found on the destination by content hash are reused; the others
+        are copied with the configured backend and committed once complete.
+
+        Args:
+            source_host: Source host
+            dest_host: Destination host
+            disks: Disks of the source VM
+            new_vm_name: New VM name
+            clone_options: Clone options
+            operation_id: Operation ID for logging
+            journal: Journal recording the progress of the operation
+
+        Returns:
+            Tuple[Dict[str, List[BackingLayer]], int]: Placed layers below
+            each source disk that has a backing chain, and the bytes
+            transferred
+        """
+        chain = BackingChain(self.transport, source_host, dest_host)
+        chains: Dict[str, List[BackingLayer]] = {}
+        for disk in disks:
+            if disk.format != "qcow2":
+                continue
+            layers = await chain.discover(disk)
+            if layers:
+                await chain.place(layers)
+                chains[disk.path] = layers
+
+        # Disks sharing a base image need it only once
+        missing: Dict[str, Tuple[BackingLayer, Optional[BackingLayer]]] = {}
+        for layers in chains.values():
+            for index, layer in enumerate(layers):
+                below = layers[index + 1] if index + 1 < len(layers) else None
+                if not layer.reused and layer.dest_path is not None:
+                    missing.setdefault(layer.dest_path, (layer, below))
+        if chains:
+            logger.info(
+                f"Backing chains need {len(missing)} of "
+                f"{sum(len(layers) for layers in chains.values())} images transferred",
+                operation_id=operation_id,
+                dest_host=dest_host,
+            )
+
+        semaphore = asyncio.Semaphore(max(1, clone_options.parallel))
+
+        async def transfer(layer: BackingLayer, below: Optional[BackingLayer]) -> int:
+            async with semaphore:
+                _, stats = await self._transfer_disk_image(
+                    source_host,
+                    dest_host,
+                    layer.path,
+                    new_vm_name,
+                    None,
+                    operation_id,
+                    clone_options,
+                    journal=journal,
+                    dest_path=f"{layer.dest_path}{PART_SUFFIX}",
+                )
+                await chain.commit(layer, below)
+            return stats.bytes_transferred or layer.size
+
+        transferred = await asyncio.gather(
+            *(transfer(layer, below) for layer, below in missing.values())
+        )
+        return chains, sum(transferred)
+
+    async def _rebase_disks(
+        self,
+        source_host: str,
+        dest_host: str,
+        disks: List[DiskInfo],
+        transfers: Dict[str, Tuple[str, TransferStats]],
+        chains: Dict[str, List[BackingLayer]],
+    ) -> None:
+        """Point copied overlay disks at their backing images on the destination."""
+        overlays = [disk for disk in disks if disk.path in chains]
+        if not overlays:
+            return
+
+        chain = BackingChain(self.transport, source_host, dest_host)
+        async with self.transport.connect(dest_host) as conn:
+            for disk in overlays:
+                await chain.rebase(
+                    conn, transfers[disk.path][0], disk.format, chains[disk.path][0]
+                )
+
     async def _transfer_disk_image(
         self,
         source_host: str,
@@ -287,7 +810,11 @@ class VMCloner:
         new_vm_name: str,
         progress_callback: Optional[Callable[[ProgressInfo], None]],
         operation_id: str,
-    ) -> str:
+        clone_options: Optional[CloneOptions] = None,
+        bytes_callback: Optional[Callable[[int], None]] = None,
+        journal: Optional[TransferJournal] = None,
+        dest_path: Optional[str] = None,
+    ) -> Tuple[str, TransferStats]:
         """
         Transfer a disk image from source to destination.
 
@@ -298,9 +825,16 @@ class VMCloner:
             new_vm_name: New VM name for destination path
             progress_callback: Progress callback
             operation_id: Operation ID for progress tracking
+            clone_options: Clone options selecting the transfer backend
+            bytes_callback: Called with the cumulative bytes transferred
+            journal: Journal recording the progress of the operation; a disk
+                it lists as done is not transferred again
+            dest_path: Destination path; derived from the new VM name and the
+                source file name if not given
 
         Returns:
-            str: Destination path of transferred disk
+            Tuple[str, TransferStats]: Destination path of transferred disk and
+            statistics reported by the transfer backend
         """
         try:
             # Validate inputs
@@ -309,36 +843,168 @@ class VMCloner:
             new_vm_name = SecurityValidator.validate_vm_name(new_vm_name)
 
             # Generate destination path with path traversal protection
-            source_file = Path(source_path)
-            base_dir = "/var/lib/libvirt/images"
-            dest_filename = f"{new_vm_name}_{source_file.name}"
-            dest_path = SecurityValidator.sanitize_path(dest_filename, base_dir)
-
-            # Build secure command
-            async with self.transport.connect(source_host) as source_conn:
-                if dest_host == source_host:
-                    # Local copy using secure command building
-                    command = CommandBuilder.build_safe_command(
-                        "cp {source} {dest}", source=source_path, dest=dest_path
+            if dest_path is None:
+                dest_path = self._dest_path(new_vm_name, source_path)
+
+            resumed = False
+            if journal is not None:
+                resumed = journal.disk(source_path) is not None
+                journaled = journal.record_disk(source_path, dest_path)
+                if journaled.done:
+                    logger.info(
+                        f"Disk {source_path} was transferred before, skipping",
+                        operation_id=operation_id,
                     )
-                else:
-                    # Remote copy using secure rsync command
-                    command = CommandBuilder.build_rsync_command(
-                        source_path=source_path,
-                        dest_path=dest_path,
-                        dest_host=dest_host,
+                    return dest_path, TransferStats(
+                        bytes_transferred=journaled.bytes_transferred,
+                        files_transferred=1,
                     )
 
-                stdout, stderr, exit_code = await source_conn.execute_command(command)
+            clone_options = clone_options or CloneOptions()
+            compression = SecurityValidator.validate_compression(clone_options.compress)
+            if clone_options.transfer_mode in ("striped", "sparse"):
+                backend = (
+                    SparseTransfer
+                    if clone_options.transfer_mode == "sparse"
+                    else StripedTransfer
+                )
+                striped = backend(
+                    self.transport,
+                    source_host,
+                    dest_host,
+                    stripe_size=clone_options.stripe_size,
+                    parallel=clone_options.parallel,
+                    progress=bytes_callback,
+                    compression=compression,
+                    journal=journal,
+                )
+                stats = await striped.transfer(source_path, dest_path)
+                stats = await self._verify_disk(
+                    source_host, dest_host, source_path, dest_path, stats, clone_options
+                )
 
-                if exit_code != 0:
-                    raise TransferError(
-                        f"Transfer failed: {stderr}", source_host, dest_host
-                    )
+            elif clone_options.transfer_mode == "stream":
+                # Verified inline while streaming
+                stream = StreamTransfer(
+                    self.transport,
+                    source_host,
+                    dest_host,
+                    progress=bytes_callback,
+                    compression=compression,
+                    verify=clone_options.verify,
+                )
+                stats = await stream.transfer(source_path, dest_path)
+
+            else:
+                stats = await self._copy_disk_image(
+                    source_host,
+                    dest_host,
+                    source_path,
+                    dest_path,
+                    compression,
+                    bytes_callback,
+                    resumed,
+                )
+                stats = await self._verify_disk(
+                    source_host, dest_host, source_path, dest_path, stats, clone_options
+                )
 
-            return dest_path
+            if journal is not None:
+                journal.record_disk_done(source_path, stats.bytes_transferred)
+            return dest_path, stats
 
         except ValidationError as e:
             raise TransferError(f"Validation error: {e}", source_host, dest_host)
+        except TransferError:
+            raise
         except Exception as e:
             raise TransferError(str(e), source_host, dest_host)
+
+    async def _copy_disk_image(
+        self,
+        source_host: str,
+        dest_host: str,
+        source_path: str,
+        dest_path: str,
+        compression: CompressionSpec,
+        bytes_callback: Optional[Callable[[int], None]],
+        resumed: bool = False,
+    ) -> TransferStats:
+        """
+        Copy a disk image with cp on the same host or rsync between hosts.
+
+        rsync keeps partially transferred files; when ``resumed`` it appends
+        to them and verifies the whole file afterwards.
+        """
+        async with self.transport.connect(source_host) as source_conn:
+            if dest_host == source_host:
+                # Local copy using secure command building
+                command = CommandBuilder.build_safe_command(
+                    "cp {source} {dest}", source=source_path, dest=dest_path
+                )
+            else:
+                # Remote copy using secure rsync command
+                options = ["--info=progress2", "--partial"]
+                if resumed:
+                    options.append("--append-verify")
+                command = CommandBuilder.build_rsync_command(
+                    source_path=source_path,
+                    dest_path=dest_path,
+                    dest_host=dest_host,
+                    additional_options=options,
+                    compression=compression,
+                )
+
+            transferred, stderr, exit_code = await run_with_progress(
+                source_conn, command, bytes_callback
+            )
+
+            if exit_code != 0:
+                raise TransferError(
+                    f"Transfer failed: {stderr}", source_host, dest_host
+                )
+
+        return TransferStats(bytes_transferred=transferred, files_transferred=1)
+
+    async def _verify_disk(
+        self,
+        source_host: str,
+        dest_host: str,
+        source_path: str,
+        dest_path: str,
+        stats: TransferStats,
+        clone_options: CloneOptions,
+    ) -> TransferStats:
+        """
+        Verify a copied disk image, re-sending only blocks that differ.
+
+        Args:
+            source_host: Source host
+            dest_host: Destination host
+            source_path: Source disk image path
+            dest_path: Destination disk image path
+            stats: Statistics of the transfer
+            clone_options: Clone options; nothing is done unless ``verify``
+
+        Returns:
+            TransferStats: ``stats`` with the verification result
+        """
+        if not clone_options.verify:
+            return stats
+
+        repairer = StripedTransfer(
+            self.transport,
+            source_host,
+            dest_host,
+            stripe_size=clone_options.stripe_size,
+            parallel=clone_options.parallel,
+            compression=SecurityValidator.validate_compression(clone_options.compress),
+        )
+
+        async def repair(extents: List[ByteRange], size: int) -> None:
+            await repairer.transfer_extents(source_path, dest_path, extents, size)
+
+        stats.verification = await DiskVerifier(self.transport).verify(
+            source_host, source_path, dest_host, dest_path, repair
+        )
+        return stats
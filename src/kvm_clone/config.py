@@ -6,7 +6,7 @@ This module handles loading and validating configuration from files and environm
 
 import os
 import yaml
-from typing import Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field, field_validator, ConfigDict
 
 from .exceptions import ConfigurationError
@@ -25,6 +25,73 @@ class AppConfig(BaseModel):
     log_level: str = Field(default="INFO", description="Logging level")
     known_hosts_file: Optional[str] = None
 
+    # SSH connection pool
+    ssh_backend: Literal["paramiko", "asyncssh"] = Field(
+        default="paramiko", description="SSH implementation used for connections"
+    )
+    ssh_max_connections: int = Field(
+        default=4, gt=0, description="Maximum SSH connections per host"
+    )
+    ssh_max_channels: Optional[int] = Field(
+        default=None,
+        gt=0,
+        description="Maximum concurrent operations per connection; "
+        "defaults to 8 for paramiko and 10 for asyncssh",
+    )
+    ssh_idle_timeout: float = Field(
+        default=300.0, gt=0, description="Seconds before idle connections close"
+    )
+    ssh_control_workers: int = Field(
+        default=16, gt=0, description="Threads for short blocking SSH calls"
+    )
+    ssh_stream_workers: int = Field(
+        default=64, gt=0, description="Threads for SSH pipes and transfers"
+    )
+    ssh_max_queued_calls: int = Field(
+        default=64,
+        ge=0,
+        description="Blocking SSH calls waiting per thread pool before new calls fail",
+    )
+
+    # SSH algorithms and flow control
+    ssh_ciphers: Optional[List[str]] = Field(
+        default=None, description="Allowed ciphers in order of preference"
+    )
+    ssh_macs: Optional[List[str]] = Field(
+        default=None, description="Allowed MACs in order of preference"
+    )
+    ssh_kex: Optional[List[str]] = Field(
+        default=None, description="Allowed key exchange methods in order of preference"
+    )
+    ssh_window_size: Optional[int] = Field(
+        default=None, gt=0, description="SSH channel window in bytes"
+    )
+    ssh_max_packet_size: Optional[int] = Field(
+        default=None, gt=0, description="Largest SSH channel data packet in bytes"
+    )
+    link_tuning_file: Optional[str] = Field(
+        default=None,
+        description="Cache of the fastest SSH tuning per host pair (bench-link)",
+    )
+
+    # Session daemon
+    daemon_socket: Optional[str] = Field(
+        default=None,
+        description="Unix socket of the session daemon; "
+        "defaults to $XDG_RUNTIME_DIR/kvm-clone/daemon.sock",
+    )
+
+    # Libvirt calls
+    libvirt_max_workers: int = Field(
+        default=4, gt=0, description="Maximum concurrent libvirt calls per host"
+    )
+    libvirt_call_timeout: float = Field(
+        default=60.0, gt=0, description="Seconds to wait for each libvirt call"
+    )
+    libvirt_cache_ttl: float = Field(
+        default=60.0, ge=0, description="Seconds domain details stay cached; 0 disables"
+    )
+
     # Default values for operations
     default_parallel_transfers: int = Field(
         default=4, gt=0, description="Number of parallel transfers"
@@ -0,0 +1,636 @@
+"""
+Local session daemon keeping SSH and libvirt connections warm across CLI runs.
+
+Each ``kvm-clone`` command normally builds a new ``KVMCloneClient`` and
+connects to every host again: an SSH handshake, key loading and
+``known_hosts`` parsing per connection, plus opening libvirt, for every
+invocation. Scripts calling the CLI in a loop pay this each time.
+
+``SessionDaemon`` serves ``KVMCloneClient`` methods on a Unix socket and keeps
+one client per configuration alive between requests, together with its SSH
+connection pools and libvirt connections. ``open_client`` returns a
+``DaemonClient`` that forwards calls to the daemon when one answers on the
+socket and a local ``KVMCloneClient`` otherwise, so callers work the same
+either way.
+
+The protocol is one JSON request line per connection, answered by JSON lines:
+``progress`` and ``item`` messages while the call runs, then ``result`` or
+``error``. Model dataclasses, enums and datetimes are tagged with their type
+and rebuilt on the other side. A call is cancelled when its caller
+disconnects, as it would be in-process.
+
+Requests carry the whole client configuration, so the socket must be private:
+the daemon and its clients both refuse a socket directory that is a symlink,
+belongs to another user or is accessible to anyone else.
+"""
+
+import asyncio
+import contextlib
+import dataclasses
+import json
+import os
+import stat
+import tempfile
+import time
+from datetime import datetime
+from enum import Enum
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from . import models
+from .client import KVMCloneClient
+from .exceptions import ConnectionError, KVMCloneError
+from .logging import logger
+from .models import (
+    CloneResult,
+    HostListing,
+    LinkBenchmark,
+    ProgressInfo,
+    StoreGCResult,
+    SyncResult,
+    VMInfo,
+)
+
+DEFAULT_DAEMON_IDLE_TIMEOUT = 1800.0  # seconds without requests before exiting
+DAEMON_HOST = "kvm-clone daemon"  # host name used in connection errors
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024  # bytes per JSON line
+
+# Client methods served by the daemon; True if they take a progress callback
+METHODS = {
+    "clone_vm": True,
+    "sync_vm": True,
+    "list_vms": False,
+    "iter_vms": False,
+    "store_gc": False,
+    "bench_link": False,
+}
+
+
+def default_socket_path() -> str:
+    """Get the daemon socket path in the user's runtime directory."""
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return os.path.join(runtime, "kvm-clone", "daemon.sock")
+    return os.path.join(
+        tempfile.gettempdir(), f"kvm-clone-{os.getuid()}", "daemon.sock"
+    )
+
+
+def check_socket_directory(socket_path: str, create: bool = False) -> None:
+    """
+    Check that only the current user can reach the directory of a socket.
+
+    Args:
+        socket_path: Daemon socket
+        create: Create the directory with mode 0700 if it is missing
+
+    Raises:
+        ConnectionError: If the directory is missing, a symlink, owned by
+            another user or accessible to other users
+    """
+    directory = os.path.dirname(socket_path) or "."
+    try:
+        if create:
+            # A dangling symlink counts as existing; lstat refuses it below
+            with contextlib.suppress(FileExistsError):
+                os.makedirs(directory, mode=0o700, exist_ok=True)
+        st = os.lstat(directory)
+    except OSError as e:
+        raise ConnectionError(str(e), DAEMON_HOST)
+
+    if (
+        not stat.S_ISDIR(st.st_mode)
+        or st.st_uid != os.getuid()
+        or stat.S_IMODE(st.st_mode) != 0o700
+    ):
+        raise ConnectionError(
+            f"Refusing socket directory {directory}: it must be a directory "
+            f"owned by uid {os.getuid()} with mode 0700, not a symlink",
+            DAEMON_HOST,
+        )
+
+
+def encode(value: Any) -> Any:
+    """
+    Convert a value to JSON-compatible data, tagging models, enums and dates.
+
+    Args:
+        value: Value built from model dataclasses, enums, datetimes,
+            lists, tuples, dicts and JSON scalars
+
+    Returns:
+        Any: Data accepted by ``json.dumps``; see ``decode``
+    """
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {
+            "__model__": type(value).__name__,
+            "fields": {
+                f.name: encode(getattr(value, f.name))
+                for f in dataclasses.fields(value)
+                if f.init
+            },
+        }
+    if isinstance(value, Enum):
+        return {"__enum__": type(value).__name__, "value": value.value}
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, (list, tuple)):
+        return [encode(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): encode(item) for key, item in value.items()}
+    return value
+
+
+def decode(data: Any) -> Any:
+    """
+    Rebuild a value converted by ``encode``.
+
+    Raises:
+        ValueError: If the data names a type that is not a model
+    """
+    if isinstance(data, list):
+        return [decode(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+    if "__model__" in data:
+        model: Callable[..., Any] = _model_type(data["__model__"])
+        if not dataclasses.is_dataclass(model):
+            raise ValueError(f"{data['__model__']} is not a model")
+        return model(**{key: decode(item) for key, item in data["fields"].items()})
+    if "__enum__" in data:
+        enum = _model_type(data["__enum__"])
+        if not (isinstance(enum, type) and issubclass(enum, Enum)):
+            raise ValueError(f"{data['__enum__']} is not an enum")
+        return enum(data["value"])
+    if "__datetime__" in data:
+        return datetime.fromisoformat(data["__datetime__"])
+    return {key: decode(item) for key, item in data.items()}
+
+
+def _model_type(name: str) -> Any:
+    """Look up a type defined in the models module."""
+    cls = getattr(models, name, None)
+    if not isinstance(cls, type) or cls.__module__ != models.__name__:
+        raise ValueError(f"Unknown model type {name!r}")
+    return cls
+
+
+def _write(writer: asyncio.StreamWriter, message: Dict[str, Any]) -> None:
+    """Queue one JSON message line without waiting for the reader."""
+    writer.write(json.dumps(encode(message), separators=(",", ":")).encode() + b"\n")
+
+
+async def _send(writer: asyncio.StreamWriter, message: Dict[str, Any]) -> None:
+    """Write one JSON message line."""
+    _write(writer, message)
+    await writer.drain()
+
+
+class SessionDaemon:
+    """Serves ``KVMCloneClient`` calls on a Unix socket with warm connections."""
+
+    def __init__(
+        self,
+        socket_path: Optional[str] = None,
+        idle_timeout: float = DEFAULT_DAEMON_IDLE_TIMEOUT,
+        client_factory: Callable[..., KVMCloneClient] = KVMCloneClient,
+    ) -> None:
+        """
+        Initialize session daemon.
+
+        Args:
+            socket_path: Unix socket to listen on; see ``default_socket_path``
+            idle_timeout: Seconds without requests before the daemon exits
+            client_factory: Creates a client from ``config`` and ``timeout``
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self.idle_timeout = idle_timeout
+        self.client_factory = client_factory
+        self.clients: Dict[Tuple[str, int], KVMCloneClient] = {}
+        self.started = time.time()
+        self.requests = 0
+        self._active = 0
+        self._last_request = time.monotonic()
+        self._stopping = asyncio.Event()
+
+    async def serve(self) -> None:
+        """
+        Listen until ``stop`` is requested or the daemon was idle too long.
+
+        Raises:
+            ConnectionError: If another daemon already serves the socket or
+                its directory is not private
+        """
+        check_socket_directory(self.socket_path, create=True)
+        if await ping(self.socket_path):
+            raise ConnectionError("A daemon is already running", DAEMON_HOST)
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.socket_path)
+
+        old_umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(
+                self._handle, self.socket_path, limit=MAX_MESSAGE_SIZE
+            )
+        finally:
+            os.umask(old_umask)
+
+        logger.info(
+            f"Session daemon listening on {self.socket_path}",
+            socket=self.socket_path,
+            pid=os.getpid(),
+        )
+        watcher = asyncio.create_task(self._exit_when_idle())
+        try:
+            async with server:
+                await self._stopping.wait()
+        finally:
+            watcher.cancel()
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.socket_path)
+            for client in self.clients.values():
+                await client.__aexit__(None, None, None)
+            self.clients.clear()
+            logger.info("Session daemon stopped", socket=self.socket_path)
+
+    def stop(self) -> None:
+        """Ask ``serve`` to return after the running requests."""
+        self._stopping.set()
+
+    def status(self) -> Dict[str, Any]:
+        """Get the daemon's pid, uptime, client calls served and open connections."""
+        return {
+            "pid": os.getpid(),
+            "socket": self.socket_path,
+            "uptime": time.time() - self.started,
+            "requests": self.requests,
+            "clients": len(self.clients),
+            "connections": sum(
+                len(client.transport.connections) for client in self.clients.values()
+            ),
+        }
+
+    def client_for(self, config: Dict[str, Any], timeout: int) -> KVMCloneClient:
+        """Get the warm client of a configuration, creating it on first use."""
+        key = (json.dumps(config, sort_keys=True, default=str), timeout)
+        client = self.clients.get(key)
+        if client is None:
+            client = self.client_factory(config=config, timeout=timeout)
+            self.clients[key] = client
+        return client
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve one request connection."""
+        self._active += 1
+        try:
+            line = await reader.readline()
+            if line:
+                await self._dispatch(json.loads(line), reader, writer)
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        except Exception as e:
+            logger.error(f"Invalid daemon request: {e}", exc_info=True)
+        finally:
+            self._active -= 1
+            self._last_request = time.monotonic()
+            writer.close()
+            with contextlib.suppress(ConnectionError, OSError):
+                await writer.wait_closed()
+
+    async def _dispatch(
+        self,
+        request: Dict[str, Any],
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        """Run a request, cancelling it if the caller disconnects."""
+        method = request.get("method")
+        if method == "ping":
+            await _send(writer, {"result": self.status()})
+            return
+        if method == "stop":
+            await _send(writer, {"result": self.status()})
+            self.stop()
+            return
+
+        self.requests += 1
+        call = asyncio.create_task(self._call(request, writer))
+        # Callers send nothing after the request, so reading returns at hangup
+        hangup = asyncio.create_task(reader.read())
+        try:
+            await asyncio.wait({call, hangup}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            hangup.cancel()
+            if not call.done():
+                logger.warning(
+                    f"Caller of {method} disconnected; cancelling the call",
+                    method=method,
+                )
+                call.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await call
+
+    async def _call(
+        self, request: Dict[str, Any], writer: asyncio.StreamWriter
+    ) -> None:
+        """Run a client method and write its messages."""
+        method = request.get("method")
+        try:
+            if method not in METHODS:
+                raise ValueError(f"Unknown method {method!r}")
+            client = self.client_for(request["config"], request.get("timeout", 3600))
+            kwargs = decode(request.get("kwargs", {}))
+            call = getattr(client, method)
+
+            if method == "iter_vms":
+                async for listing in call(**kwargs):
+                    await _send(writer, {"item": listing})
+                await _send(writer, {"result": None})
+                return
+
+            if METHODS[method] and request.get("progress"):
+                # Updates are rate limited by the progress tracker
+                kwargs["progress_callback"] = lambda info: _write(
+                    writer, {"progress": info}
+                )
+            result = await call(**kwargs)
+            await _send(writer, {"result": result})
+        except (ConnectionResetError, BrokenPipeError):
+            raise
+        except Exception as e:
+            await _send(
+                writer,
+                {
+                    "error": {
+                        "type": type(e).__name__,
+                        "message": str(e),
+                        "error_code": getattr(e, "error_code", None),
+                    }
+                },
+            )
+
+    async def _exit_when_idle(self) -> None:
+        """Stop the daemon once it had no requests for ``idle_timeout``."""
+        interval = min(max(self.idle_timeout / 10, 0.05), 30.0)
+        while True:
+            await asyncio.sleep(interval)
+            idle = time.monotonic() - self._last_request
+            if not self._active and idle >= self.idle_timeout:
+                logger.info(
+                    "Session daemon idle; exiting", idle_timeout=self.idle_timeout
+                )
+                self.stop()
+                return
+
+
+async def request(
+    socket_path: str,
+    message: Dict[str, Any],
+    on_message: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+) -> Any:
+    """
+    Send a request to the daemon and wait for its result.
+
+    Args:
+        socket_path: Daemon socket
+        message: Request with ``method`` and, for client methods, ``config``,
+            ``timeout``, ``kwargs`` and ``progress``
+        on_message: Called with each ``progress`` or ``item`` message
+
+    Returns:
+        Any: Decoded result
+
+    Raises:
+        ConnectionError: If the daemon is not running or hangs up, or its
+            socket directory is not private
+        KVMCloneError: If the call failed with an error code
+        RuntimeError: If the call failed otherwise
+    """
+    check_socket_directory(socket_path)
+    try:
+        reader, writer = await asyncio.open_unix_connection(
+            socket_path, limit=MAX_MESSAGE_SIZE
+        )
+    except OSError as e:
+        raise ConnectionError(str(e), DAEMON_HOST)
+
+    try:
+        writer.write(json.dumps(encode(message)).encode() + b"\n")
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("Daemon closed the connection", DAEMON_HOST)
+            reply = decode(json.loads(line))
+            if "result" in reply:
+                return reply["result"]
+            if "error" in reply:
+                error = reply["error"]
+                if error.get("error_code") is not None:
+                    raise KVMCloneError(error["message"], error["error_code"])
+                raise RuntimeError(f"{error['type']}: {error['message']}")
+            if on_message is not None:
+                await on_message(reply)
+    finally:
+        writer.close()
+        with contextlib.suppress(ConnectionError, OSError):
+            await writer.wait_closed()
+
+
+async def ping(socket_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Get the status of the running daemon, None if none answers."""
+    path = socket_path or default_socket_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        check_socket_directory(path)
+    except ConnectionError as e:
+        logger.warning(f"Not using the session daemon: {e}", socket=path)
+        return None
+    try:
+        status: Dict[str, Any] = await asyncio.wait_for(
+            request(path, {"method": "ping"}), 5.0
+        )
+    except (KVMCloneError, RuntimeError, asyncio.TimeoutError, ValueError):
+        return None
+    return status
+
+
+class DaemonClient:
+    """
+    Forwards ``KVMCloneClient`` calls to a running session daemon.
+
+    Has the methods of ``KVMCloneClient`` that the CLI uses, with the same
+    arguments; progress callbacks are called as the daemon reports progress.
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        timeout: int = 3600,
+        socket_path: Optional[str] = None,
+    ) -> None:
+        """Initialize daemon client for the given client configuration."""
+        self.config = config
+        self.timeout = timeout
+        self.socket_path = socket_path or default_socket_path()
+
+    async def clone_vm(
+        self,
+        source_host: str,
+        dest_host: str,
+        vm_name: str,
+        *,
+        progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+        **options: Any,
+    ) -> CloneResult:
+        """Clone a VM in the daemon; see ``KVMCloneClient.clone_vm``."""
+        result: CloneResult = await self._call(
+            "clone_vm",
+            dict(
+                source_host=source_host, dest_host=dest_host, vm_name=vm_name, **options
+            ),
+            progress_callback,
+        )
+        return result
+
+    async def sync_vm(
+        self,
+        source_host: str,
+        dest_host: str,
+        vm_name: str,
+        *,
+        progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+        **options: Any,
+    ) -> SyncResult:
+        """Sync a VM in the daemon; see ``KVMCloneClient.sync_vm``."""
+        result: SyncResult = await self._call(
+            "sync_vm",
+            dict(
+                source_host=source_host, dest_host=dest_host, vm_name=vm_name, **options
+            ),
+            progress_callback,
+        )
+        return result
+
+    async def list_vms(
+        self, hosts: List[str], **options: Any
+    ) -> Dict[str, List[VMInfo]]:
+        """List VMs in the daemon; see ``KVMCloneClient.list_vms``."""
+        result: Dict[str, List[VMInfo]] = await self._call(
+            "list_vms", dict(hosts=hosts, **options)
+        )
+        return result
+
+    async def iter_vms(
+        self, hosts: List[str], **options: Any
+    ) -> AsyncIterator[HostListing]:
+        """List VMs in the daemon per host; see ``KVMCloneClient.iter_vms``."""
+        listings: "asyncio.Queue[Optional[HostListing]]" = asyncio.Queue()
+
+        async def on_message(message: Dict[str, Any]) -> None:
+            listings.put_nowait(message["item"])
+
+        async def run() -> None:
+            try:
+                await self._call(
+                    "iter_vms", dict(hosts=hosts, **options), None, on_message
+                )
+            finally:
+                listings.put_nowait(None)
+
+        task = asyncio.create_task(run())
+        try:
+            while (listing := await listings.get()) is not None:
+                yield listing
+            await task
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def store_gc(self, host: str, budget: int, **options: Any) -> StoreGCResult:
+        """Clean up an image store in the daemon; see ``KVMCloneClient.store_gc``."""
+        result: StoreGCResult = await self._call(
+            "store_gc", dict(host=host, budget=budget, **options)
+        )
+        return result
+
+    async def bench_link(
+        self, source_host: str, dest_host: str, **options: Any
+    ) -> List[LinkBenchmark]:
+        """Benchmark a link in the daemon; see ``KVMCloneClient.bench_link``."""
+        result: List[LinkBenchmark] = await self._call(
+            "bench_link", dict(source_host=source_host, dest_host=dest_host, **options)
+        )
+        return result
+
+    async def _call(
+        self,
+        method: str,
+        kwargs: Dict[str, Any],
+        progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+        on_message: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    ) -> Any:
+        """Run a client method in the daemon."""
+
+        async def report(message: Dict[str, Any]) -> None:
+            if progress_callback is not None and "progress" in message:
+                progress_callback(message["progress"])
+
+        return await request(
+            self.socket_path,
+            {
+                "method": method,
+                "config": self.config,
+                "timeout": self.timeout,
+                "kwargs": kwargs,
+                "progress": progress_callback is not None,
+            },
+            on_message or report,
+        )
+
+    async def __aenter__(self) -> "DaemonClient":
+        """Async context manager entry; the daemon owns the connections."""
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        """Async context manager exit; connections stay open in the daemon."""
+
+
+@contextlib.asynccontextmanager
+async def open_client(
+    config: Dict[str, Any],
+    timeout: int = 3600,
+    use_daemon: bool = True,
+    socket_path: Optional[str] = None,
+) -> AsyncIterator[Union[KVMCloneClient, DaemonClient]]:
+    """
+    Open a client that uses the session daemon when it is running.
+
+    Args:
+        config: Client configuration
+        timeout: Operation timeout in seconds
+        use_daemon: Forward calls to a running daemon
+        socket_path: Daemon socket; see ``default_socket_path``
+
+    Yields:
+        Union[KVMCloneClient, DaemonClient]: Client for the operation
+    """
+    path = socket_path or default_socket_path()
+    if use_daemon and await ping(path) is not None:
+        yield DaemonClient(config, timeout, path)
+        return
+    async with KVMCloneClient(config=config, timeout=timeout) as client:
+        yield client
@@ -0,0 +1,204 @@
+"""
+Block-level delta calculation for VM synchronization.
+
+This module hashes fixed-size blocks of disk images on the hosts that store
+them and compares the digests on the controller, so only hashes cross the
+wire and the result describes exactly which extents differ.
+"""
+
+import asyncio
+from typing import List, Optional
+
+from .models import BlockHashes, ByteRange, FileIdentity
+from .manifest import ManifestStore
+from .exceptions import TransferError
+from .transport import SSHTransport
+from .security import CommandBuilder
+from .logging import logger
+
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024  # bytes
+
+# Runs on the remote host: prints the file identity (size, mtime in ns and
+# inode) on one line. Block devices report their size through seek, not stat,
+# and have no meaningful mtime, so they report -1 and are never reused.
+STAT_SCRIPT = """
+import os, stat, sys
+with open(sys.argv[1], "rb", buffering=0) as f:
+    st = os.fstat(f.fileno())
+    regular = stat.S_ISREG(st.st_mode)
+    print(f.seek(0, 2), st.st_mtime_ns if regular else -1, st.st_ino)
+"""
+
+# Runs on the remote host: prints the file identity like STAT_SCRIPT followed
+# by one hex digest per block. The identity is taken before reading so that
+# writes during hashing are detected on the next run.
+BLOCK_HASH_SCRIPT = """
+import hashlib, os, stat, sys
+path, block_size = sys.argv[1], int(sys.argv[2])
+out = sys.stdout
+with open(path, "rb", buffering=0) as f:
+    st = os.fstat(f.fileno())
+    regular = stat.S_ISREG(st.st_mode)
+    out.write("%d %d %d\\n" % (f.seek(0, 2), st.st_mtime_ns if regular else -1, st.st_ino))
+    f.seek(0)
+    while True:
+        block = f.read(block_size)
+        if not block:
+            break
+        out.write(hashlib.blake2b(block, digest_size=16).hexdigest() + "\\n")
+"""
+
+
+class DeltaEngine:
+    """Computes changed extents between two copies of a disk image."""
+
+    def __init__(
+        self,
+        transport: SSHTransport,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        manifests: Optional[ManifestStore] = None,
+    ):
+        """Initialize delta engine."""
+        if block_size <= 0:
+            raise ValueError("block_size must be positive")
+
+        self.transport = transport
+        self.block_size = block_size
+        self.manifests = manifests
+
+    async def stat(self, host: str, path: str) -> FileIdentity:
+        """Get the identity of a file on a remote host."""
+        command = CommandBuilder.build_python_command(STAT_SCRIPT, path)
+        async with self.transport.connect(host) as conn:
+            stdout, stderr, exit_code = await conn.execute_command(command)
+
+        if exit_code != 0:
+            raise TransferError(f"Cannot stat {path}: {stderr}", host, host)
+
+        return self._parse_identity(stdout.split("\n", 1)[0])
+
+    async def hash_disk(
+        self, host: str, path: str, vm_uuid: str, target: str
+    ) -> BlockHashes:
+        """
+        Get the block digests of a VM disk, reusing a stored manifest if valid.
+
+        The stored manifest is used without reading the disk when the file
+        identity on the host still matches the one it was computed from.
+
+        Args:
+            host: Host storing the disk
+            path: Disk image path
+            vm_uuid: UUID of the VM owning the disk on that host
+            target: Disk target device (e.g. vda)
+
+        Returns:
+            BlockHashes: File size and per-block digests
+        """
+        if self.manifests is not None:
+            stored = self.manifests.load(host, vm_uuid, target)
+            if (
+                stored is not None
+                and stored.identity is not None
+                and stored.identity.mtime_ns >= 0
+                and stored.block_size == self.block_size
+                and await self.stat(host, path) == stored.identity
+            ):
+                logger.debug(
+                    f"Reusing block manifest for {path} on {host}",
+                    host=host,
+                    path=path,
+                )
+                return stored
+
+        return await self.hash_blocks(host, path)
+
+    async def hash_blocks(self, host: str, path: str) -> BlockHashes:
+        """
+        Hash the blocks of a file on a remote host.
+
+        Args:
+            host: Host storing the file
+            path: File path
+
+        Returns:
+            BlockHashes: File size and per-block digests
+        """
+        command = CommandBuilder.build_python_command(
+            BLOCK_HASH_SCRIPT, path, self.block_size
+        )
+        async with self.transport.connect(host) as conn:
+            stdout, stderr, exit_code = await conn.execute_command(command)
+
+        if exit_code != 0:
+            raise TransferError(f"Block hashing failed: {stderr}", host, host)
+
+        lines = stdout.splitlines()
+        if not lines:
+            raise TransferError(f"No block hashes returned for {path}", host, host)
+
+        identity = self._parse_identity(lines[0])
+        return BlockHashes(
+            size=identity.size,
+            block_size=self.block_size,
+            digests=[line for line in lines[1:] if line],
+            identity=identity,
+        )
+
+    async def diff(
+        self, source_host: str, source_path: str, dest_host: str, dest_path: str
+    ) -> List[ByteRange]:
+        """
+        Find the extents of the source file that differ on the destination.
+
+        Both files are hashed concurrently on their own hosts.
+
+        Args:
+            source_host: Source host
+            source_path: Source file path
+            dest_host: Destination host
+            dest_path: Destination file path
+
+        Returns:
+            List[ByteRange]: Changed extents of the source file, merged
+        """
+        source, dest = await asyncio.gather(
+            self.hash_blocks(source_host, source_path),
+            self.hash_blocks(dest_host, dest_path),
+        )
+        return self.compare(source, dest)
+
+    @staticmethod
+    def compare(source: BlockHashes, dest: BlockHashes) -> List[ByteRange]:
+        """
+        Compare block digests and return merged changed extents of the source.
+
+        Blocks missing on the destination count as changed. Extents never
+        extend past the end of the source file.
+        """
+        if source.block_size != dest.block_size:
+            raise ValueError("Block hashes were computed with different block sizes")
+
+        block_size = source.block_size
+        extents: List[ByteRange] = []
+        for index, digest in enumerate(source.digests):
+            if index < len(dest.digests) and dest.digests[index] == digest:
+                continue
+            offset = index * block_size
+            length = min(block_size, source.size - offset)
+            if extents and extents[-1].offset + extents[-1].length == offset:
+                extents[-1].length += length
+            else:
+                extents.append(ByteRange(offset=offset, length=length))
+        return extents
+
+    @staticmethod
+    def _parse_identity(line: str) -> FileIdentity:
+        """Parse a ``size mtime_ns inode`` line printed by the remote scripts."""
+        size, mtime_ns, inode = (int(field) for field in line.split())
+        return FileIdentity(size=size, mtime_ns=mtime_ns, inode=inode)
+
+    @staticmethod
+    def count_blocks(extents: List[ByteRange], block_size: int) -> int:
+        """Count the blocks covered by merged extents."""
+        return sum(-(-extent.length // block_size) for extent in extents)
@@ -126,7 +126,7 @@ class PermissionError(KVMCloneError):
 class TimeoutError(KVMCloneError):
     """Timeout errors."""
 
-    def __init__(self, message: str, operation: str, timeout: int) -> None:
+    def __init__(self, message: str, operation: str, timeout: float) -> None:
         super().__init__(
             f"Timeout during {operation} after {timeout}s: {message}", error_code=1012
         )
@@ -0,0 +1,119 @@
+"""
+Inventory cache of libvirt domains.
+
+Looking up a domain costs several round trips to libvirtd, and a clone looks
+up the same domain many times. The cache keeps the XML and parsed ``VMInfo``
+of each domain per host. Entries are dropped when libvirt reports a
+lifecycle event for their domain and expire after ``ttl`` seconds in case an
+event was missed.
+
+Events arrive on libvirt's event loop thread while lookups run on the
+asyncio loop and in the libvirt thread pools, so all state is guarded by a
+lock. Every invalidation bumps the generation of its host; a lookup that
+started before an invalidation is not cached when it finishes.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from .models import CacheStats, InventoryEntry
+
+DEFAULT_INVENTORY_TTL = 60.0  # seconds
+
+
+class InventoryCache:
+    """Per-host cache of domain XML and VM information."""
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_INVENTORY_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize inventory cache.
+
+        Args:
+            ttl: Seconds an entry stays valid; 0 disables the cache
+            clock: Monotonic clock, replaceable in tests
+        """
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: Dict[str, Dict[str, InventoryEntry]] = {}
+        self._generations: Dict[str, int] = {}
+        self._stats = CacheStats()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether entries are cached at all."""
+        return self.ttl > 0
+
+    def generation(self, host: str) -> int:
+        """Get the generation of a host; take it before fetching an entry."""
+        with self._lock:
+            return self._generations.get(host, 0)
+
+    def get(self, host: str, name: str) -> Optional[InventoryEntry]:
+        """Get the cached entry of a domain, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(host, {}).get(name)
+            if entry is not None and self._clock() - entry.fetched_at >= self.ttl:
+                del self._entries[host][name]
+                self._stats.invalidations += 1
+                entry = None
+            if entry is None:
+                self._stats.misses += 1
+            else:
+                self._stats.hits += 1
+            return entry
+
+    def put(self, host: str, name: str, entry: InventoryEntry, generation: int) -> bool:
+        """
+        Cache the entry of a domain.
+
+        Args:
+            host: Host of the domain
+            name: Domain name
+            entry: Entry to cache
+            generation: Generation of the host when fetching started
+
+        Returns:
+            bool: False if the host was invalidated since and nothing was cached
+        """
+        if not self.enabled:
+            return False
+        with self._lock:
+            if self._generations.get(host, 0) != generation:
+                return False
+            entry.fetched_at = self._clock()
+            self._entries.setdefault(host, {})[name] = entry
+            return True
+
+    def invalidate(self, host: str, name: Optional[str] = None) -> None:
+        """Drop the entry of a domain, or of all domains of a host."""
+        with self._lock:
+            self._generations[host] = self._generations.get(host, 0) + 1
+            entries = self._entries.get(host, {})
+            if name is None:
+                self._stats.invalidations += len(entries)
+                entries.clear()
+            elif entries.pop(name, None) is not None:
+                self._stats.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            for host in self._entries:
+                self._generations[host] = self._generations.get(host, 0) + 1
+            self._entries.clear()
+
+    def stats(self) -> CacheStats:
+        """Get cache statistics."""
+        with self._lock:
+            return CacheStats(
+                entries=sum(len(entries) for entries in self._entries.values()),
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                invalidations=self._stats.invalidations,
+            )
@@ -0,0 +1,261 @@
+"""
+Transfer journals for resumable clone operations.
+
+A journal records the progress of one clone operation on the controller: the
+operation itself, every disk being transferred, each byte range that was
+copied and verified, and every disk that completed. An interrupted clone
+started again with the same operation id skips whatever the journal lists
+as done.
+
+Journals are append-only JSON lines. Records are written with a single
+``write`` to a file opened with ``O_APPEND`` and synced in groups (at most
+every ``sync_interval`` seconds or ``sync_records`` records), so journaling
+costs a few small writes per chunk instead of an ``fsync`` each. A crash can
+only lose the last unsynced records, whose ranges are then copied again; a
+torn final line is dropped when the journal is opened again.
+"""
+
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from .models import ByteRange, DiskProgress
+from .logging import logger
+
+JOURNAL_VERSION = 1
+DEFAULT_SYNC_INTERVAL = 1.0  # seconds
+DEFAULT_SYNC_RECORDS = 256
+
+
+class TransferJournal:
+    """Append-only journal of one clone operation."""
+
+    def __init__(
+        self,
+        path: Path,
+        operation: Dict[str, Any],
+        disks: Optional[Dict[str, DiskProgress]] = None,
+        sync_interval: float = DEFAULT_SYNC_INTERVAL,
+        sync_records: int = DEFAULT_SYNC_RECORDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize transfer journal.
+
+        Use ``JournalStore.create`` or ``JournalStore.open`` instead of
+        constructing journals directly.
+        """
+        self.path = path
+        self.operation = operation
+        self.disks: Dict[str, DiskProgress] = disks or {}
+        self.sync_interval = sync_interval
+        self.sync_records = max(1, sync_records)
+        self._clock = clock
+        self._fd: Optional[int] = os.open(
+            path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600
+        )
+        self._unsynced = 0
+        self._last_sync = clock()
+
+    def disk(self, source_path: str) -> Optional[DiskProgress]:
+        """Get the journaled progress of a disk."""
+        return self.disks.get(source_path)
+
+    def record_disk(self, source_path: str, dest_path: str) -> DiskProgress:
+        """
+        Record that a disk is being transferred.
+
+        A disk that is already journaled with the same destination keeps its
+        progress.
+        """
+        progress = self.disks.get(source_path)
+        if progress is not None and progress.dest_path == dest_path:
+            return progress
+        progress = DiskProgress(dest_path=dest_path)
+        self.disks[source_path] = progress
+        self._append(
+            {"type": "disk", "source": source_path, "dest": dest_path}, sync=True
+        )
+        return progress
+
+    def record_range(
+        self, source_path: str, byte_range: ByteRange, checksum: str
+    ) -> None:
+        """Record a byte range of a disk that was copied and verified."""
+        progress = self.disks.get(source_path)
+        if progress is None:
+            raise KeyError(f"Disk {source_path} is not journaled")
+        progress.ranges[byte_range.offset] = (byte_range.length, checksum)
+        self._append(
+            {
+                "type": "range",
+                "source": source_path,
+                "offset": byte_range.offset,
+                "length": byte_range.length,
+                "checksum": checksum,
+            }
+        )
+
+    def record_disk_done(self, source_path: str, bytes_transferred: int) -> None:
+        """Record that a disk was transferred completely."""
+        progress = self.disks.get(source_path)
+        if progress is None:
+            raise KeyError(f"Disk {source_path} is not journaled")
+        progress.done = True
+        progress.bytes_transferred = bytes_transferred
+        self._append(
+            {"type": "done", "source": source_path, "bytes": bytes_transferred},
+            sync=True,
+        )
+
+    def sync(self) -> None:
+        """Flush journaled records to stable storage."""
+        if self._fd is None or not self._unsynced:
+            return
+        getattr(os, "fdatasync", os.fsync)(self._fd)
+        self._unsynced = 0
+        self._last_sync = self._clock()
+
+    def close(self) -> None:
+        """Sync and close the journal file."""
+        if self._fd is None:
+            return
+        self.sync()
+        os.close(self._fd)
+        self._fd = None
+
+    def _append(self, record: Dict[str, Any], sync: bool = False) -> None:
+        """Append one record, syncing when the group commit is due."""
+        if self._fd is None:
+            raise ValueError("Journal is closed")
+        os.write(self._fd, (json.dumps(record, separators=(",", ":")) + "\n").encode())
+        self._unsynced += 1
+        if (
+            sync
+            or self._unsynced >= self.sync_records
+            or self._clock() - self._last_sync >= self.sync_interval
+        ):
+            self.sync()
+
+
+class JournalStore:
+    """Stores transfer journals per operation id."""
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        sync_interval: float = DEFAULT_SYNC_INTERVAL,
+        sync_records: int = DEFAULT_SYNC_RECORDS,
+    ) -> None:
+        """Initialize journal store."""
+        if directory is None:
+            state_home = os.environ.get("XDG_STATE_HOME") or os.path.expanduser(
+                "~/.local/state"
+            )
+            directory = os.path.join(state_home, "kvm-clone", "journals")
+        self.directory = Path(directory)
+        self.sync_interval = sync_interval
+        self.sync_records = sync_records
+
+    def path_for(self, operation_id: str) -> Path:
+        """Get the journal file path of an operation."""
+        safe = re.sub(r"[^A-Za-z0-9._-]", "_", operation_id)
+        return self.directory / f"{safe}.journal"
+
+    def exists(self, operation_id: str) -> bool:
+        """Whether a journal exists for an operation."""
+        return self.path_for(operation_id).exists()
+
+    def create(self, operation_id: str, operation: Dict[str, Any]) -> TransferJournal:
+        """
+        Start the journal of a new operation.
+
+        Args:
+            operation_id: Operation ID
+            operation: Parameters needed to resume the operation
+
+        Returns:
+            TransferJournal: Open, empty journal
+        """
+        path = self.path_for(operation_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.unlink(missing_ok=True)
+        journal = self._journal(path, operation)
+        journal._append(
+            {"type": "operation", "version": JOURNAL_VERSION, **operation}, sync=True
+        )
+        return journal
+
+    def open(self, operation_id: str) -> TransferJournal:
+        """
+        Open the journal of an interrupted operation to continue it.
+
+        Args:
+            operation_id: Operation ID
+
+        Returns:
+            TransferJournal: Journal with the recorded progress
+
+        Raises:
+            FileNotFoundError: If there is no journal for the operation
+            ValueError: If the journal is not a valid transfer journal
+        """
+        path = self.path_for(operation_id)
+        operation: Optional[Dict[str, Any]] = None
+        disks: Dict[str, DiskProgress] = {}
+
+        with open(path, "rb") as f:
+            data = f.read()
+        if data and not data.endswith(b"\n"):
+            # A crash can tear the last record; drop it so that new records
+            # start on a line of their own
+            logger.warning(f"Dropping torn last record of {path}", path=str(path))
+            data = data[: data.rfind(b"\n") + 1]
+            os.truncate(path, len(data))
+
+        for number, line in enumerate(data.splitlines(), 1):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise ValueError(f"Corrupt record on line {number} of {path}")
+
+            kind = record.pop("type", None)
+            if kind == "operation":
+                if record.pop("version", None) != JOURNAL_VERSION:
+                    raise ValueError(f"Unsupported journal version in {path}")
+                operation = record
+            elif kind == "disk":
+                disks[record["source"]] = DiskProgress(dest_path=record["dest"])
+            elif kind == "range" and record["source"] in disks:
+                disks[record["source"]].ranges[record["offset"]] = (
+                    record["length"],
+                    record["checksum"],
+                )
+            elif kind == "done" and record["source"] in disks:
+                disks[record["source"]].done = True
+                disks[record["source"]].bytes_transferred = record["bytes"]
+
+        if operation is None:
+            raise ValueError(f"{path} is not a transfer journal")
+        return self._journal(path, operation, disks)
+
+    def remove(self, operation_id: str) -> None:
+        """Delete the journal of an operation."""
+        self.path_for(operation_id).unlink(missing_ok=True)
+
+    def _journal(
+        self,
+        path: Path,
+        operation: Dict[str, Any],
+        disks: Optional[Dict[str, DiskProgress]] = None,
+    ) -> TransferJournal:
+        return TransferJournal(
+            path,
+            operation,
+            disks,
+            sync_interval=self.sync_interval,
+            sync_records=self.sync_records,
+        )
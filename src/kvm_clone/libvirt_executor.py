@@ -0,0 +1,125 @@
+"""
+Execution of blocking libvirt calls off the event loop.
+
+The libvirt Python bindings are synchronous: every call on a remote
+connection waits for a round trip to libvirtd. Running them on the event loop
+lets one slow host stall every other operation of the process, so all calls
+go through a ``LibvirtExecutor`` instead.
+
+Each host gets its own bounded thread pool. A connection is only ever used by
+the threads of its host's pool, calls to one host cannot starve the workers
+of another, and at most ``max_workers`` calls are in flight per host. Every
+call has a timeout; a call that is cancelled before a worker picked it up is
+never run.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from .exceptions import TimeoutError
+from .logging import logger
+
+DEFAULT_LIBVIRT_WORKERS = 4  # per host
+DEFAULT_LIBVIRT_CALL_TIMEOUT = 60.0  # seconds
+
+T = TypeVar("T")
+
+
+class LibvirtExecutor:
+    """Runs blocking libvirt calls in bounded thread pools, one per host."""
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_LIBVIRT_WORKERS,
+        call_timeout: Optional[float] = DEFAULT_LIBVIRT_CALL_TIMEOUT,
+    ):
+        """
+        Initialize libvirt executor.
+
+        Args:
+            max_workers: Maximum concurrent calls per host
+            call_timeout: Default seconds to wait for a call, None to wait
+                indefinitely
+        """
+        if max_workers <= 0:
+            raise ValueError("max_workers must be positive")
+
+        self.max_workers = max_workers
+        self.call_timeout = call_timeout
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+
+    @property
+    def hosts(self) -> List[str]:
+        """Hosts that have a thread pool."""
+        return list(self._pools)
+
+    async def run(
+        self,
+        host: str,
+        operation: str,
+        func: Callable[..., T],
+        *args: Any,
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> T:
+        """
+        Run a blocking call in the thread pool of a host.
+
+        Cancelling the awaiting task withdraws a call that is still queued. A
+        call that already started cannot be interrupted; after a timeout it
+        finishes in the background while its worker stays occupied.
+
+        Args:
+            host: Host whose libvirt connection the call uses
+            operation: Operation name for errors and logs
+            func: Blocking callable
+            *args: Positional arguments of ``func``
+            timeout: Seconds to wait, overriding the default call timeout
+            **kwargs: Keyword arguments of ``func``
+
+        Returns:
+            The result of ``func``
+
+        Raises:
+            TimeoutError: If the call did not return in time
+        """
+        timeout = self.call_timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._pool(host), functools.partial(func, *args, **kwargs)
+        )
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Libvirt call {operation} on {host} timed out",
+                host=host,
+                operation=operation,
+                timeout=timeout,
+            )
+            raise TimeoutError(
+                f"libvirt on {host} did not respond", operation, timeout or 0
+            )
+
+    def shutdown(self, wait: bool = False) -> None:
+        """
+        Stop all thread pools.
+
+        Queued calls are cancelled; calls that are running finish first if
+        ``wait`` is set.
+        """
+        pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _pool(self, host: str) -> ThreadPoolExecutor:
+        """Get the thread pool of a host, creating it on first use."""
+        pool = self._pools.get(host)
+        if pool is None:
+            pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix=f"libvirt-{host}"
+            )
+            self._pools[host] = pool
+        return pool
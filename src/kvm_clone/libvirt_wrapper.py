@@ -2,14 +2,21 @@
 Libvirt API wrapper for KVM operations.
 
 This module provides a high-level interface to libvirt for VM management operations.
+All blocking libvirt calls run in the per-host thread pools of a
+``LibvirtExecutor``, never on the event loop. Domain XML and VM information
+are cached per host in an ``InventoryCache`` that libvirt domain lifecycle
+events keep coherent.
 """
 
 from __future__ import annotations
 
+import asyncio
+import copy
 import random
+import threading
 import uuid
 import xml.etree.ElementTree as ET
-from typing import List, Optional, Dict, Any, TYPE_CHECKING
+from typing import Callable, List, Optional, Dict, Any, Tuple, TypeVar, TYPE_CHECKING
 from datetime import datetime
 
 if TYPE_CHECKING:
@@ -20,45 +27,143 @@ else:
     except ImportError:
         libvirt = None  # type: ignore[assignment]
 
-from .models import VMInfo, DiskInfo, NetworkInfo, VMState, ResourceInfo
-from .exceptions import LibvirtError, VMNotFoundError, ConnectionError
+from .models import (
+    VMInfo,
+    DiskInfo,
+    NetworkInfo,
+    VMState,
+    ResourceInfo,
+    CacheStats,
+    InventoryEntry,
+)
+from .exceptions import (
+    LibvirtError,
+    VMNotFoundError,
+    ConnectionError,
+    TimeoutError,
+    ValidationError,
+)
+from .libvirt_executor import (
+    LibvirtExecutor,
+    DEFAULT_LIBVIRT_WORKERS,
+    DEFAULT_LIBVIRT_CALL_TIMEOUT,
+)
+from .inventory import InventoryCache, DEFAULT_INVENTORY_TTL
 from .transport import SSHConnection
 from .logging import logger
 
+T = TypeVar("T")
+
+# Detail levels of VM listings
+LIST_DETAILS = ("summary", "full")
+# Domain events that change what the inventory cache holds
+DOMAIN_CHANGE_EVENTS = (
+    "VIR_DOMAIN_EVENT_ID_LIFECYCLE",
+    "VIR_DOMAIN_EVENT_ID_BLOCK_JOB_2",
+    "VIR_DOMAIN_EVENT_ID_DEVICE_ADDED",
+    "VIR_DOMAIN_EVENT_ID_DEVICE_REMOVED",
+)
+
+_event_loop_lock = threading.Lock()
+_event_loop_module: Any = None
+
+
+def _start_event_loop() -> None:
+    """
+    Run libvirt's default event loop in a daemon thread.
+
+    Domain events are only delivered on connections opened after an event
+    loop was registered, so this runs before the first connection is opened.
+    It starts one loop per process.
+    """
+    global _event_loop_module
+    with _event_loop_lock:
+        if _event_loop_module is libvirt:
+            return
+        module = _event_loop_module = libvirt
+        module.virEventRegisterDefaultImpl()
+
+    def run() -> None:
+        while True:
+            module.virEventRunDefaultImpl()
+
+    threading.Thread(target=run, name="libvirt-events", daemon=True).start()
+
 
 class LibvirtWrapper:
     """Wrapper for libvirt operations."""
 
-    def __init__(self) -> None:
-        """Initialize libvirt wrapper."""
+    def __init__(
+        self,
+        executor: Optional[LibvirtExecutor] = None,
+        max_workers: int = DEFAULT_LIBVIRT_WORKERS,
+        call_timeout: Optional[float] = DEFAULT_LIBVIRT_CALL_TIMEOUT,
+        cache_ttl: float = DEFAULT_INVENTORY_TTL,
+    ) -> None:
+        """
+        Initialize libvirt wrapper.
+
+        Args:
+            executor: Executor running the blocking libvirt calls; one with
+                ``max_workers`` threads per host and ``call_timeout`` is
+                created if omitted
+            max_workers: Maximum concurrent libvirt calls per host
+            call_timeout: Seconds to wait for each libvirt call
+            cache_ttl: Seconds domain XML and VM information stay cached;
+                0 disables the inventory cache
+        """
         self._connections: Dict[str, Any] = {}
+        self._connect_locks: Dict[str, asyncio.Lock] = {}
+        self._executor = executor or LibvirtExecutor(max_workers, call_timeout)
+        self._inventory = InventoryCache(cache_ttl)
+        # Event callbacks of each connection: uri -> (host, callback ids)
+        self._subscriptions: Dict[str, Tuple[str, List[int]]] = {}
+
+    async def _call(
+        self, host: str, operation: str, func: Callable[..., T], *args: Any
+    ) -> T:
+        """Run a blocking libvirt call in the thread pool of a host."""
+        return await self._executor.run(host, operation, func, *args)
 
     async def connect_to_host(self, ssh_conn: SSHConnection) -> Any:
         """Connect to libvirt on a remote host via SSH."""
+        host = ssh_conn.host
         try:
             # Build libvirt URI for SSH connection
-            uri = f"qemu+ssh://{ssh_conn.username or 'root'}@{ssh_conn.host}/system"
-
-            # Check if we already have a connection
-            if uri in self._connections:
-                conn = self._connections[uri]
-                if conn.isAlive():
-                    return conn
-                else:
-                    # Connection is dead, remove it
-                    del self._connections[uri]
-
-            # Create new connection
-            conn = libvirt.open(uri)
-            if not conn:
-                raise LibvirtError(
-                    f"Failed to connect to libvirt on {ssh_conn.host}", "connection"
-                )
+            uri = f"qemu+ssh://{ssh_conn.username or 'root'}@{host}/system"
+
+            # Concurrent callers share the connection opened by the first one
+            lock = self._connect_locks.setdefault(uri, asyncio.Lock())
+            async with lock:
+                # Check if we already have a connection
+                if uri in self._connections:
+                    conn = self._connections[uri]
+                    if await self._call(host, "connection", conn.isAlive):
+                        return conn
+                    else:
+                        # Connection is dead, remove it; events may have
+                        # been missed since it died
+                        del self._connections[uri]
+                        self._subscriptions.pop(uri, None)
+                        self._inventory.invalidate(host)
+
+                # Create new connection
+                if self._inventory.enabled:
+                    _start_event_loop()
+                conn = await self._call(host, "connection", libvirt.open, uri)
+                if not conn:
+                    raise LibvirtError(
+                        f"Failed to connect to libvirt on {host}", "connection"
+                    )
 
-            self._connections[uri] = conn
-            logger.info(f"Connected to libvirt on {ssh_conn.host}", host=ssh_conn.host)
+                self._connections[uri] = conn
+                if self._inventory.enabled:
+                    await self._subscribe(host, uri, conn)
+            logger.info(f"Connected to libvirt on {host}", host=host)
             return conn
 
+        except (LibvirtError, TimeoutError):
+            raise
         except libvirt.libvirtError as e:
             logger.error(
                 f"Libvirt connection failed on {ssh_conn.host}: {e}",
@@ -74,141 +179,303 @@ class LibvirtWrapper:
             )
             raise ConnectionError(str(e), ssh_conn.host)
 
+    async def _subscribe(self, host: str, uri: str, conn: Any) -> None:
+        """
+        Invalidate cached domains of a host on events that change them.
+
+        Besides lifecycle events, block job events (pivots, commits) and
+        device hotplug events change a domain's disks and backing chains.
+        Without all of these events the host's domains are not cached at
+        all, since changes made by others could not be noticed.
+        """
+
+        def on_change(conn: Any, domain: Any, *details: Any) -> None:
+            self._inventory.invalidate(host, domain.name())
+
+        callback_ids: List[int] = []
+        try:
+            for event in DOMAIN_CHANGE_EVENTS:
+                callback_ids.append(
+                    await self._call(
+                        host,
+                        "connection",
+                        conn.domainEventRegisterAny,
+                        None,
+                        getattr(libvirt, event),
+                        on_change,
+                        None,
+                    )
+                )
+        except (libvirt.libvirtError, AttributeError) as e:
+            logger.warning(
+                f"Domain events unavailable on {host}, not caching its domains: {e}",
+                host=host,
+            )
+            for callback_id in callback_ids:
+                try:
+                    await self._call(
+                        host, "connection", conn.domainEventDeregisterAny, callback_id
+                    )
+                except libvirt.libvirtError:
+                    pass
+            return
+        self._subscriptions[uri] = (host, callback_ids)
+        self._inventory.invalidate(host)
+
+    def _cached(self, host: str, name: str) -> Optional[InventoryEntry]:
+        """Get the cache entry of a domain on a host with event subscription."""
+        if not any(watched == host for watched, _ in self._subscriptions.values()):
+            return None
+        return self._inventory.get(host, name)
+
+    def _cache(
+        self, host: str, name: str, entry: InventoryEntry, generation: int
+    ) -> None:
+        """Cache a domain of a host with event subscription."""
+        if any(watched == host for watched, _ in self._subscriptions.values()):
+            self._inventory.put(host, name, entry, generation)
+
+    def cache_stats(self) -> CacheStats:
+        """Get inventory cache statistics."""
+        return self._inventory.stats()
+
+    @staticmethod
+    def validate_detail(detail: str) -> str:
+        """
+        Validate a VM listing detail level.
+
+        Raises:
+            ValidationError: If the detail level is not one of ``LIST_DETAILS``
+        """
+        if detail not in LIST_DETAILS:
+            raise ValidationError(
+                f"Unknown detail level '{detail}', expected one of "
+                f"{', '.join(LIST_DETAILS)}"
+            )
+        return detail
+
     async def list_vms(
-        self, ssh_conn: SSHConnection, status_filter: Optional[str] = None
+        self,
+        ssh_conn: SSHConnection,
+        status_filter: Optional[str] = None,
+        detail: str = "summary",
     ) -> List[VMInfo]:
-        """List VMs on a host."""
+        """
+        List VMs on a host.
+
+        All domains are fetched with a single ``getAllDomainStats`` call. The
+        ``summary`` detail level stops there and reports state, memory, vCPUs
+        and the disks' paths and capacities; ``full`` also fetches and parses
+        each domain's XML for disk formats and network interfaces.
+
+        Domain stats do not say how a disk is backed, so a summary lists
+        every block device with a path, with format ``unknown``, including
+        host devices such as ``/dev/sr0`` or LVM volumes; ``full`` lists only
+        the file-backed disks that are cloned.
+
+        Args:
+            ssh_conn: Connection to the host
+            status_filter: Filter by status ('all', 'running', 'stopped', 'paused')
+            detail: Detail level, one of ``LIST_DETAILS``
+
+        Returns:
+            List[VMInfo]: VMs on the host
+
+        Raises:
+            ValidationError: If the detail level is unknown
+        """
+        self.validate_detail(detail)
         try:
             conn = await self.connect_to_host(ssh_conn)
+            return await self._call(
+                ssh_conn.host,
+                "list_vms",
+                self._list_vms,
+                conn,
+                ssh_conn.host,
+                status_filter,
+                detail,
+            )
 
-            # Get all domains based on filter
-            if status_filter == "running":
-                domains = conn.listAllDomains(libvirt.VIR_CONNECT_LIST_DOMAINS_ACTIVE)
-            elif status_filter == "stopped":
-                domains = conn.listAllDomains(libvirt.VIR_CONNECT_LIST_DOMAINS_INACTIVE)
-            elif status_filter == "paused":
-                try:
-                    domains = conn.listAllDomains(
-                        libvirt.VIR_CONNECT_LIST_DOMAINS_PAUSED
+        except libvirt.libvirtError as e:
+            raise LibvirtError(str(e), "list_vms")
+
+    def _list_vms(
+        self, conn: Any, host: str, status_filter: Optional[str], detail: str
+    ) -> List[VMInfo]:
+        """List VMs on a connection; runs in the host's thread pool."""
+        if not hasattr(conn, "getAllDomainStats"):
+            # libvirt before 1.2.8 has no bulk stats API
+            return [
+                self._vm_info(domain, host)
+                for domain in self._list_domains(conn, status_filter)
+            ]
+
+        stats = (
+            libvirt.VIR_DOMAIN_STATS_STATE
+            | libvirt.VIR_DOMAIN_STATS_BALLOON
+            | libvirt.VIR_DOMAIN_STATS_VCPU
+            | libvirt.VIR_DOMAIN_STATS_BLOCK
+        )
+        paused = getattr(libvirt, "VIR_CONNECT_GET_ALL_DOMAINS_STATS_PAUSED", None)
+        flags = {
+            "running": libvirt.VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE,
+            "stopped": libvirt.VIR_CONNECT_GET_ALL_DOMAINS_STATS_INACTIVE,
+            "paused": paused or 0,
+        }.get(status_filter or "all", 0)
+
+        vms = []
+        for domain, record in conn.getAllDomainStats(stats, flags):
+            code = record.get("state.state")
+            if (
+                status_filter == "paused"
+                and paused is None
+                and code != libvirt.VIR_DOMAIN_PAUSED
+            ):
+                continue
+            vms.append(self._vm_info_from_stats(domain, record, host, detail))
+        return vms
+
+    def _list_domains(self, conn: Any, status_filter: Optional[str]) -> List[Any]:
+        """List the domains of a connection matching a status filter."""
+        if status_filter == "running":
+            return list(conn.listAllDomains(libvirt.VIR_CONNECT_LIST_DOMAINS_ACTIVE))
+        elif status_filter == "stopped":
+            return list(conn.listAllDomains(libvirt.VIR_CONNECT_LIST_DOMAINS_INACTIVE))
+        elif status_filter == "paused":
+            try:
+                return list(
+                    conn.listAllDomains(libvirt.VIR_CONNECT_LIST_DOMAINS_PAUSED)
+                )
+            except AttributeError:
+                # Fallback: filter paused manually
+                return [
+                    d
+                    for d in conn.listAllDomains()
+                    if d.info()[0] == libvirt.VIR_DOMAIN_PAUSED
+                ]
+        return list(conn.listAllDomains())
+
+    def _vm_info_from_stats(
+        self,
+        domain: "libvirt.virDomain",
+        record: Dict[str, Any],
+        host: str,
+        detail: str,
+    ) -> VMInfo:
+        """
+        Build VM information from a ``getAllDomainStats`` record.
+
+        ``name`` and ``UUIDString`` are answered from the domain object
+        without a round trip; only the ``full`` detail level calls libvirt
+        again, for the domain XML, and narrows the disks to file-backed ones.
+        """
+        try:
+            # Inactive domains only report their maximum memory and vCPUs
+            memory = record.get("balloon.current", record.get("balloon.maximum", 0))
+            vcpus = record.get("vcpu.current", record.get("vcpu.maximum", 0))
+            sizes = {}
+            disks = []
+            for index in range(record.get("block.count", 0)):
+                prefix = f"block.{index}."
+                target = record.get(prefix + "name", "")
+                sizes[target] = [
+                    record.get(prefix + field, 0)
+                    for field in ("capacity", "allocation", "physical")
+                ]
+                path = record.get(prefix + "path")
+                if path:
+                    disks.append(
+                        DiskInfo(path=path, size=0, format="unknown", target=target)
                     )
-                except AttributeError:
-                    # Fallback: filter paused manually
-                    all_domains = conn.listAllDomains()
-                    domains = [
-                        d
-                        for d in all_domains
-                        if d.info()[0] == libvirt.VIR_DOMAIN_PAUSED
-                    ]
-            else:
-                domains = conn.listAllDomains()
 
-            vms = []
-            for domain in domains:
-                vm_info = await self._get_vm_info(domain, ssh_conn.host)
-                vms.append(vm_info)
+            networks: List[NetworkInfo] = []
+            if detail == "full":
+                disks, networks = self._parse_devices(domain.XMLDesc(0))
+            for disk in disks:
+                if disk.target in sizes:
+                    disk.size, disk.allocation, disk.physical = sizes[disk.target]
 
-            return vms
+            return VMInfo(
+                name=domain.name(),
+                uuid=domain.UUIDString(),
+                state=self._vm_state(record.get("state.state")),
+                memory=memory // 1024,  # Convert KB to MB
+                vcpus=vcpus,
+                disks=disks,
+                networks=networks,
+                host=host,
+                created=datetime.now(),  # Placeholder
+                last_modified=datetime.now(),  # Placeholder
+            )
 
-        except libvirt.libvirtError as e:
-            raise LibvirtError(str(e), "list_vms")
+        except Exception as e:
+            raise LibvirtError(str(e), "parse_vm_info")
 
-    async def get_vm_info(self, ssh_conn: SSHConnection, vm_name: str) -> VMInfo:
-        """Get detailed information about a specific VM."""
+    async def get_vm_info(
+        self, ssh_conn: SSHConnection, vm_name: str, refresh: bool = False
+    ) -> VMInfo:
+        """
+        Get detailed information about a specific VM.
+
+        With ``refresh`` the domain is read from libvirt even if it is cached
+        and the cache is updated. Operations that act on a domain's disks
+        refresh it once at their start: not every change emits an event, so
+        a disk-only snapshot, for one, may not invalidate the cache.
+        """
+        host = ssh_conn.host
         try:
             conn = await self.connect_to_host(ssh_conn)
+            entry = None if refresh else self._cached(host, vm_name)
+            if entry is not None and entry.vm_info is not None:
+                # Callers may modify the result; the cached copy stays intact
+                return copy.deepcopy(entry.vm_info)
 
-            try:
-                domain = conn.lookupByName(vm_name)
-            except libvirt.libvirtError:
-                raise VMNotFoundError(vm_name, ssh_conn.host)
-
-            return await self._get_vm_info(domain, ssh_conn.host)
+            def lookup() -> Tuple[VMInfo, str]:
+                try:
+                    domain = conn.lookupByName(vm_name)
+                except libvirt.libvirtError:
+                    raise VMNotFoundError(vm_name, host)
+                xml_desc = domain.XMLDesc(0)
+                return self._vm_info(domain, host, xml_desc), xml_desc
+
+            generation = self._inventory.generation(host)
+            vm_info, xml_desc = await self._call(host, "get_vm_info", lookup)
+            self._cache(
+                host,
+                vm_name,
+                InventoryEntry(xml=xml_desc, vm_info=copy.deepcopy(vm_info)),
+                generation,
+            )
+            return vm_info
 
         except libvirt.libvirtError as e:
             raise LibvirtError(str(e), "get_vm_info")
 
-    async def _get_vm_info(self, domain: "libvirt.virDomain", host: str) -> VMInfo:
-        """Extract VM information from libvirt domain."""
+    def _vm_info(
+        self,
+        domain: "libvirt.virDomain",
+        host: str,
+        xml_desc: Optional[str] = None,
+    ) -> VMInfo:
+        """
+        Extract VM information from libvirt domain.
+
+        Makes blocking libvirt calls; runs in the host's thread pool.
+        """
         try:
             # Get basic info
             info = domain.info()
-            name = domain.name()
-            uuid = domain.UUIDString()
-
-            # Map libvirt state to our enum
-            state_map = {
-                libvirt.VIR_DOMAIN_RUNNING: VMState.RUNNING,
-                libvirt.VIR_DOMAIN_BLOCKED: VMState.RUNNING,
-                libvirt.VIR_DOMAIN_PAUSED: VMState.PAUSED,
-                libvirt.VIR_DOMAIN_SHUTDOWN: VMState.STOPPED,
-                libvirt.VIR_DOMAIN_SHUTOFF: VMState.STOPPED,
-                libvirt.VIR_DOMAIN_CRASHED: VMState.STOPPED,
-                libvirt.VIR_DOMAIN_PMSUSPENDED: VMState.SUSPENDED,
-            }
-            state = state_map.get(info[0], VMState.UNKNOWN)
-
-            # Get XML configuration
-            xml_desc = domain.XMLDesc(0)
-            root = ET.fromstring(xml_desc)
-
-            # Parse disk information
-            disks = []
-            for disk_elem in root.findall(".//disk[@type='file']"):
-                source = disk_elem.find("source")
-                target = disk_elem.find("target")
-                driver = disk_elem.find("driver")
-
-                if source is not None and target is not None:
-                    disk_path = source.get("file", "")
-                    disk_target = target.get("dev", "")
-                    disk_format = (
-                        driver.get("type", "raw") if driver is not None else "raw"
-                    )
-
-                    # Get disk size (this would need additional libvirt calls)
-                    disk_size = 0  # Placeholder
-
-                    disks.append(
-                        DiskInfo(
-                            path=disk_path,
-                            size=disk_size,
-                            format=disk_format,
-                            target=disk_target,
-                        )
-                    )
-
-            # Parse network information
-            networks = []
-            for interface_elem in root.findall(".//interface"):
-                mac_elem = interface_elem.find("mac")
-                source_elem = interface_elem.find("source")
-                target_elem = interface_elem.find("target")
-
-                if mac_elem is not None:
-                    mac_address = mac_elem.get("address", "")
-                    network_name = ""
-                    interface_name = ""
-
-                    if source_elem is not None:
-                        network_name = source_elem.get(
-                            "network", source_elem.get("bridge", "")
-                        )
-
-                    if target_elem is not None:
-                        interface_name = target_elem.get("dev", "")
-
-                    networks.append(
-                        NetworkInfo(
-                            interface=interface_name,
-                            mac_address=mac_address,
-                            network=network_name,
-                        )
-                    )
+            if xml_desc is None:
+                xml_desc = domain.XMLDesc(0)
+            disks, networks = self._parse_devices(xml_desc)
+            for disk in disks:
+                self._read_block_info(domain, disk)
 
             return VMInfo(
-                name=name,
-                uuid=uuid,
-                state=state,
+                name=domain.name(),
+                uuid=domain.UUIDString(),
+                state=self._vm_state(info[0]),
                 memory=info[1] // 1024,  # Convert KB to MB
                 vcpus=info[3],
                 disks=disks,
@@ -221,6 +488,104 @@ class LibvirtWrapper:
         except Exception as e:
             raise LibvirtError(str(e), "parse_vm_info")
 
+    @staticmethod
+    def _vm_state(code: Optional[int]) -> VMState:
+        """Map a libvirt domain state to our enum."""
+        state_map = {
+            libvirt.VIR_DOMAIN_RUNNING: VMState.RUNNING,
+            libvirt.VIR_DOMAIN_BLOCKED: VMState.RUNNING,
+            libvirt.VIR_DOMAIN_PAUSED: VMState.PAUSED,
+            libvirt.VIR_DOMAIN_SHUTDOWN: VMState.STOPPED,
+            libvirt.VIR_DOMAIN_SHUTOFF: VMState.STOPPED,
+            libvirt.VIR_DOMAIN_CRASHED: VMState.STOPPED,
+            libvirt.VIR_DOMAIN_PMSUSPENDED: VMState.SUSPENDED,
+        }
+        return state_map.get(code, VMState.UNKNOWN)
+
+    @staticmethod
+    def _read_block_info(domain: "libvirt.virDomain", disk: DiskInfo) -> None:
+        """
+        Fill in the capacity, allocation and physical size of a disk.
+
+        One ``blockInfo`` call returns all three sizes. A disk whose image
+        cannot be inspected, such as a missing file of an inactive domain,
+        keeps zero sizes.
+        """
+        try:
+            disk.size, disk.allocation, disk.physical = domain.blockInfo(disk.path)
+        except libvirt.libvirtError as e:
+            logger.warning(
+                f"Could not read sizes of {disk.path}: {e}", disk_path=disk.path
+            )
+
+    @staticmethod
+    def _parse_devices(xml_desc: str) -> Tuple[List[DiskInfo], List[NetworkInfo]]:
+        """Parse file disks and network interfaces from domain XML."""
+        root = ET.fromstring(xml_desc)
+
+        # Parse disk information
+        disks = []
+        for disk_elem in root.findall(".//disk[@type='file']"):
+            source = disk_elem.find("source")
+            target = disk_elem.find("target")
+            driver = disk_elem.find("driver")
+
+            if source is not None and target is not None:
+                disk_path = source.get("file", "")
+                disk_target = target.get("dev", "")
+                disk_format = driver.get("type", "raw") if driver is not None else "raw"
+
+                # Follow the backing chain; sizes are read from libvirt
+                backing_files = []
+                backing = disk_elem.find("backingStore")
+                while backing is not None:
+                    backing_source = backing.find("source")
+                    if backing_source is None:
+                        break
+                    backing_files.append(backing_source.get("file", ""))
+                    backing = backing.find("backingStore")
+
+                disks.append(
+                    DiskInfo(
+                        path=disk_path,
+                        size=0,
+                        format=disk_format,
+                        target=disk_target,
+                        backing_file=backing_files[0] if backing_files else None,
+                        backing_depth=len(backing_files),
+                    )
+                )
+
+        # Parse network information
+        networks = []
+        for interface_elem in root.findall(".//interface"):
+            mac_elem = interface_elem.find("mac")
+            source_elem = interface_elem.find("source")
+            target_elem = interface_elem.find("target")
+
+            if mac_elem is not None:
+                mac_address = mac_elem.get("address", "")
+                network_name = ""
+                interface_name = ""
+
+                if source_elem is not None:
+                    network_name = source_elem.get(
+                        "network", source_elem.get("bridge", "")
+                    )
+
+                if target_elem is not None:
+                    interface_name = target_elem.get("dev", "")
+
+                networks.append(
+                    NetworkInfo(
+                        interface=interface_name,
+                        mac_address=mac_address,
+                        network=network_name,
+                    )
+                )
+
+        return disks, networks
+
     async def clone_vm_definition(
         self,
         ssh_conn: SSHConnection,
@@ -232,14 +597,25 @@ class LibvirtWrapper:
         try:
             conn = await self.connect_to_host(ssh_conn)
 
-            # Get source domain
-            try:
-                source_domain = conn.lookupByName(source_vm)
-            except libvirt.libvirtError:
-                raise VMNotFoundError(source_vm, ssh_conn.host)
+            def source_xml() -> str:
+                try:
+                    source_domain = conn.lookupByName(source_vm)
+                except libvirt.libvirtError:
+                    raise VMNotFoundError(source_vm, ssh_conn.host)
+                return str(source_domain.XMLDesc(0))
 
             # Get XML and modify it
-            xml_desc = source_domain.XMLDesc(0)
+            entry = self._cached(ssh_conn.host, source_vm)
+            if entry is not None:
+                xml_desc = entry.xml
+            else:
+                generation = self._inventory.generation(ssh_conn.host)
+                xml_desc = await self._call(
+                    ssh_conn.host, "clone_vm_definition", source_xml
+                )
+                self._cache(
+                    ssh_conn.host, source_vm, InventoryEntry(xml=xml_desc), generation
+                )
             root = ET.fromstring(xml_desc)
 
             # Change name
@@ -276,13 +652,18 @@ class LibvirtWrapper:
             conn = await self.connect_to_host(ssh_conn)
 
             # Define the domain
-            domain = conn.defineXML(xml_config)
+            domain = await self._call(
+                ssh_conn.host, "create_vm", conn.defineXML, xml_config
+            )
             if not domain:
                 raise LibvirtError("Failed to define VM", "create_vm")
 
+            name = await self._call(ssh_conn.host, "create_vm", domain.name)
+            # Do not wait for the event to drop a redefined domain
+            self._inventory.invalidate(ssh_conn.host, name)
             logger.info(
-                f"VM {domain.name()} created on {ssh_conn.host}",
-                vm_name=domain.name(),
+                f"VM {name} created on {ssh_conn.host}",
+                vm_name=name,
                 host=ssh_conn.host,
             )
 
@@ -300,10 +681,17 @@ class LibvirtWrapper:
             conn = await self.connect_to_host(ssh_conn)
 
             # Get node info
-            node_info = conn.getInfo()
+            node_info = await self._call(
+                ssh_conn.host, "get_host_resources", conn.getInfo
+            )
 
             # Get memory info
-            mem_stats = conn.getMemoryStats(libvirt.VIR_NODE_MEMORY_STATS_ALL_CELLS)
+            mem_stats = await self._call(
+                ssh_conn.host,
+                "get_host_resources",
+                conn.getMemoryStats,
+                libvirt.VIR_NODE_MEMORY_STATS_ALL_CELLS,
+            )
 
             total_memory = mem_stats.get("total", 0) // 1024  # Convert KB to MB
             free_memory = mem_stats.get("free", 0) // 1024
@@ -325,8 +713,10 @@ class LibvirtWrapper:
         try:
             conn = await self.connect_to_host(ssh_conn)
 
+            if self._cached(ssh_conn.host, vm_name) is not None:
+                return True
             try:
-                conn.lookupByName(vm_name)
+                await self._call(ssh_conn.host, "vm_exists", conn.lookupByName, vm_name)
                 return True
             except libvirt.libvirtError:
                 return False
@@ -334,12 +724,149 @@ class LibvirtWrapper:
         except libvirt.libvirtError as e:
             raise LibvirtError(str(e), "vm_exists")
 
+    async def is_active(self, ssh_conn: SSHConnection, vm_name: str) -> bool:
+        """Check if a VM is running."""
+        try:
+            conn = await self.connect_to_host(ssh_conn)
+            return await self._call(
+                ssh_conn.host,
+                "is_active",
+                lambda: bool(conn.lookupByName(vm_name).isActive()),
+            )
+        except libvirt.libvirtError as e:
+            raise LibvirtError(str(e), "is_active")
+
+    async def list_checkpoints(
+        self, ssh_conn: SSHConnection, vm_name: str
+    ) -> List[str]:
+        """List the names of a VM's checkpoints."""
+        try:
+            conn = await self.connect_to_host(ssh_conn)
+            return await self._call(
+                ssh_conn.host,
+                "list_checkpoints",
+                lambda: [
+                    checkpoint.getName()
+                    for checkpoint in conn.lookupByName(vm_name).listAllCheckpoints()
+                ],
+            )
+        except libvirt.libvirtError as e:
+            raise LibvirtError(str(e), "list_checkpoints")
+
+    async def create_checkpoint(
+        self,
+        ssh_conn: SSHConnection,
+        vm_name: str,
+        checkpoint_name: str,
+        disk_targets: List[str],
+    ) -> None:
+        """Create a checkpoint tracking changed blocks of the given disks."""
+        root = ET.Element("domaincheckpoint")
+        ET.SubElement(root, "name").text = checkpoint_name
+        disks_elem = ET.SubElement(root, "disks")
+        for target in disk_targets:
+            ET.SubElement(disks_elem, "disk", name=target, checkpoint="bitmap")
+
+        try:
+            conn = await self.connect_to_host(ssh_conn)
+            await self._call(
+                ssh_conn.host,
+                "create_checkpoint",
+                lambda: conn.lookupByName(vm_name).checkpointCreateXML(
+                    ET.tostring(root, encoding="unicode"), 0
+                ),
+            )
+            logger.info(
+                f"Created checkpoint {checkpoint_name} for {vm_name}",
+                host=ssh_conn.host,
+                vm_name=vm_name,
+            )
+        except libvirt.libvirtError as e:
+            raise LibvirtError(str(e), "create_checkpoint")
+
+    async def delete_checkpoint(
+        self, ssh_conn: SSHConnection, vm_name: str, checkpoint_name: str
+    ) -> None:
+        """Delete a checkpoint, merging its changed blocks into its parent."""
+        try:
+            conn = await self.connect_to_host(ssh_conn)
+            await self._call(
+                ssh_conn.host,
+                "delete_checkpoint",
+                lambda: (
+                    conn.lookupByName(vm_name)
+                    .checkpointLookupByName(checkpoint_name)
+                    .delete(0)
+                ),
+            )
+        except libvirt.libvirtError as e:
+            raise LibvirtError(str(e), "delete_checkpoint")
+
+    async def begin_incremental_backup(
+        self,
+        ssh_conn: SSHConnection,
+        vm_name: str,
+        since_checkpoint: str,
+        socket_path: str,
+        disk_targets: List[str],
+    ) -> None:
+        """
+        Start a pull-mode backup exporting blocks changed since a checkpoint.
+
+        Each disk is exported over NBD on ``socket_path`` under its target
+        name, together with a dirty bitmap named ``kvm-clone-<target>``.
+        """
+        root = ET.Element("domainbackup", mode="pull")
+        ET.SubElement(root, "incremental").text = since_checkpoint
+        ET.SubElement(root, "server", transport="unix", socket=socket_path)
+        disks_elem = ET.SubElement(root, "disks")
+        for target in disk_targets:
+            ET.SubElement(
+                disks_elem,
+                "disk",
+                name=target,
+                backup="yes",
+                exportname=target,
+                exportbitmap=f"kvm-clone-{target}",
+            )
+
+        try:
+            conn = await self.connect_to_host(ssh_conn)
+            await self._call(
+                ssh_conn.host,
+                "begin_backup",
+                lambda: conn.lookupByName(vm_name).backupBegin(
+                    ET.tostring(root, encoding="unicode"), None, 0
+                ),
+            )
+        except libvirt.libvirtError as e:
+            raise LibvirtError(str(e), "begin_backup")
+
+    async def abort_backup(self, ssh_conn: SSHConnection, vm_name: str) -> None:
+        """Stop a running backup job of a VM."""
+        try:
+            conn = await self.connect_to_host(ssh_conn)
+            await self._call(
+                ssh_conn.host,
+                "abort_backup",
+                lambda: conn.lookupByName(vm_name).abortJob(),
+            )
+        except libvirt.libvirtError as e:
+            raise LibvirtError(str(e), "abort_backup")
+
     def close_all_connections(self) -> None:
-        """Close all libvirt connections."""
+        """Close all libvirt connections and stop their thread pools."""
+        # Queued calls are dropped so that they never see a closed connection
+        self._executor.shutdown()
         for uri, conn in self._connections.items():
             try:
+                for callback_id in self._subscriptions.get(uri, ("", []))[1]:
+                    conn.domainEventDeregisterAny(callback_id)
                 conn.close()
             except Exception:
                 pass
         self._connections.clear()
+        self._connect_locks.clear()
+        self._subscriptions.clear()
+        self._inventory.clear()
         logger.info("All libvirt connections closed")
@@ -0,0 +1,217 @@
+"""
+SSH link benchmarks and the per host pair tuning cache.
+
+The throughput of one SSH stream is bounded by the CPU cost of its cipher and
+MAC and by the channel window: a sender stops after a window of unacknowledged
+bytes, so a window smaller than the link's bandwidth-delay product leaves the
+link idle for part of every round trip. Which combination is fastest depends
+on the CPUs of both hosts (AES-NI favours AES-GCM, hosts without it favour
+ChaCha20-Poly1305) and on the latency between them.
+
+``benchmark_link`` streams data from one host to another through the
+controller once per candidate ``SSHTuning`` and measures the throughput.
+``LinkTuningCache`` keeps the fastest tuning per host pair so later clones
+and syncs between the same hosts connect with it.
+"""
+
+import json
+import os
+import time
+from dataclasses import asdict
+from itertools import product
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .exceptions import KVMCloneError, TransferError
+from .logging import logger
+from .models import LinkBenchmark, SSHTuning
+from .transport import SSHTransport
+
+DEFAULT_BENCH_BYTES = 64 * 1024 * 1024
+DEFAULT_CIPHERS = (
+    "aes128-gcm@openssh.com",
+    "aes256-gcm@openssh.com",
+    "chacha20-poly1305@openssh.com",
+    "aes128-ctr",
+)
+DEFAULT_WINDOW_SIZES = (2 * 1024 * 1024, 16 * 1024 * 1024)  # bytes
+BENCH_READER = "head -c {size} /dev/zero"
+BENCH_WRITER = "cat > /dev/null"
+
+
+def candidate_tunings(
+    ciphers: Sequence[str] = DEFAULT_CIPHERS,
+    window_sizes: Sequence[Optional[int]] = DEFAULT_WINDOW_SIZES,
+    macs: Sequence[str] = (),
+    max_packet_size: Optional[int] = None,
+) -> List[SSHTuning]:
+    """
+    Build the candidates of a benchmark: every cipher with every window size.
+
+    Args:
+        ciphers: Ciphers to try, one per candidate
+        window_sizes: Channel windows to try; None keeps the backend default
+        macs: MACs allowed in every candidate; AEAD ciphers ignore them
+        max_packet_size: Packet size of every candidate
+
+    Returns:
+        List[SSHTuning]: One tuning per combination
+    """
+    return [
+        SSHTuning(
+            ciphers=[cipher],
+            macs=list(macs),
+            window_size=window_size,
+            max_packet_size=max_packet_size,
+        )
+        for cipher, window_size in product(ciphers, window_sizes)
+    ]
+
+
+async def benchmark_link(
+    transport_factory: Callable[[SSHTuning], SSHTransport],
+    source_host: str,
+    dest_host: str,
+    candidates: Sequence[SSHTuning],
+    size: int = DEFAULT_BENCH_BYTES,
+    port: int = 22,
+    reader_command: str = BENCH_READER,
+    writer_command: str = BENCH_WRITER,
+) -> List[LinkBenchmark]:
+    """
+    Measure the throughput between two hosts for each tuning.
+
+    Each candidate gets its own transport, so its connections to both hosts
+    are opened with the tuning. The data flows from a reader on the source
+    host through the controller into a writer on the destination host, the
+    path of stream transfers. Candidates that fail, for example because a
+    host does not offer the cipher, are reported with their error.
+
+    Args:
+        transport_factory: Creates a transport using the given tuning
+        source_host: Host sending the data
+        dest_host: Host receiving the data
+        candidates: Tunings to measure, one after another
+        size: Bytes sent per candidate
+        port: SSH port of both hosts
+        reader_command: Command printing ``{size}`` bytes on the source host
+        writer_command: Command discarding its input on the destination host
+
+    Returns:
+        List[LinkBenchmark]: One result per candidate, in the given order
+    """
+    results = []
+    for tuning in candidates:
+        result = LinkBenchmark(source_host, dest_host, tuning)
+        transport: Optional[SSHTransport] = None
+        try:
+            transport = transport_factory(tuning)
+            async with transport.connect(source_host, port) as source:
+                async with transport.connect(dest_host, port) as dest:
+                    start = time.monotonic()
+                    piped = await source.pipe_to(
+                        reader_command.format(size=size), dest, writer_command
+                    )
+                    result.duration = time.monotonic() - start
+            if piped.reader_exit_code or piped.writer_exit_code:
+                raise TransferError(
+                    f"Benchmark commands failed: {piped.reader_stderr.strip()} "
+                    f"{piped.writer_stderr.strip()}".strip(),
+                    source_host,
+                    dest_host,
+                )
+            result.bytes_transferred = piped.bytes_transferred
+            if result.duration > 0:
+                result.bytes_per_second = piped.bytes_transferred / result.duration
+        except KVMCloneError as e:
+            result.error = str(e)
+        finally:
+            if transport is not None:
+                await transport.close_all()
+
+        logger.info(
+            f"Link {source_host} -> {dest_host}: "
+            f"{result.bytes_per_second / 1024**2:.1f} MiB/s",
+            source_host=source_host,
+            dest_host=dest_host,
+            ciphers=tuning.ciphers,
+            window_size=tuning.window_size,
+            error=result.error,
+        )
+        results.append(result)
+    return results
+
+
+def fastest(results: Sequence[LinkBenchmark]) -> Optional[LinkBenchmark]:
+    """Get the fastest successful benchmark result, None if all failed."""
+    succeeded = [result for result in results if result.error is None]
+    return max(succeeded, key=lambda r: r.bytes_per_second, default=None)
+
+
+class LinkTuningCache:
+    """Fastest measured SSH tuning per host pair, stored as JSON."""
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        """
+        Initialize link tuning cache.
+
+        Args:
+            path: Cache file; defaults to ``link-tuning.json`` in the
+                kvm-clone state directory
+        """
+        if path is None:
+            state_home = os.environ.get("XDG_STATE_HOME") or os.path.expanduser(
+                "~/.local/state"
+            )
+            path = os.path.join(state_home, "kvm-clone", "link-tuning.json")
+        self.path = Path(path)
+
+    def get(self, source_host: str, dest_host: str) -> Optional[SSHTuning]:
+        """Get the cached tuning of a host pair, None if it was not measured."""
+        entry = self._load().get(self._key(source_host, dest_host))
+        if entry is None:
+            return None
+        try:
+            return SSHTuning(**entry["tuning"])
+        except (KeyError, TypeError) as e:
+            logger.warning(
+                f"Ignoring invalid link tuning of {source_host} -> {dest_host}: {e}",
+                path=str(self.path),
+            )
+            return None
+
+    def put(self, result: LinkBenchmark) -> None:
+        """
+        Store the tuning of a benchmark result for its host pair.
+
+        The file is replaced atomically, so readers never see a partial cache.
+        """
+        entries = self._load()
+        entries[self._key(result.source_host, result.dest_host)] = {
+            "tuning": asdict(result.tuning),
+            "bytes_per_second": result.bytes_per_second,
+            "measured_at": time.time(),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(entries, indent=2, sort_keys=True))
+        os.replace(temporary, self.path)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Read all entries; a missing or unreadable cache is empty."""
+        try:
+            entries = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(
+                f"Ignoring unreadable link tuning cache {self.path}: {e}",
+                path=str(self.path),
+            )
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    @staticmethod
+    def _key(source_host: str, dest_host: str) -> str:
+        """Cache key of a host pair; the direction matters."""
+        return f"{source_host} -> {dest_host}"
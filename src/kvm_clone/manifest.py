@@ -0,0 +1,150 @@
+"""
+Persistent block hash manifests for incremental synchronization.
+
+A manifest records the per-block digests of one disk image on one host
+together with the identity (size, mtime, inode) of the file they were computed
+from. As long as the file identity is unchanged the digests can be reused
+instead of reading the whole image again.
+
+Manifests use a compact binary format: a fixed header followed by fixed-width
+raw digests, loaded through ``mmap`` so even multi-terabyte disks load
+without parsing.
+"""
+
+import mmap
+import os
+import re
+import struct
+import tempfile
+from pathlib import Path
+from typing import Iterator, Optional, Sequence, overload
+
+from .models import BlockHashes, FileIdentity
+from .logging import logger
+
+MANIFEST_MAGIC = b"KVMCMAN1"
+# magic, block size, file size, mtime (ns), inode, digest size, digest count
+_HEADER = struct.Struct("<8sQQqQIQ")
+
+
+class DigestView(Sequence[str]):
+    """Read-only sequence of hex digests backed by a memory-mapped manifest."""
+
+    def __init__(self, buffer: mmap.mmap, offset: int, digest_size: int, count: int):
+        self._buffer = buffer
+        self._offset = offset
+        self._digest_size = digest_size
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[str]: ...
+
+    def __getitem__(self, index: "int | slice") -> "str | Sequence[str]":
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("digest index out of range")
+        start = self._offset + index * self._digest_size
+        return self._buffer[start : start + self._digest_size].hex()
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(self._count):
+            yield self[index]
+
+
+class ManifestStore:
+    """Stores block hash manifests per host, VM UUID and disk target."""
+
+    def __init__(self, directory: Optional[str] = None) -> None:
+        """Initialize manifest store."""
+        if directory is None:
+            cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(
+                "~/.cache"
+            )
+            directory = os.path.join(cache_home, "kvm-clone", "manifests")
+        self.directory = Path(directory)
+
+    def path_for(self, host: str, vm_uuid: str, target: str) -> Path:
+        """Get the manifest file path for a disk on a host."""
+        parts = [host, vm_uuid, target]
+        safe = [re.sub(r"[^A-Za-z0-9._-]", "_", part) for part in parts]
+        return self.directory / safe[0] / f"{safe[1]}-{safe[2]}.manifest"
+
+    def load(self, host: str, vm_uuid: str, target: str) -> Optional[BlockHashes]:
+        """
+        Load a manifest.
+
+        Returns:
+            Optional[BlockHashes]: Stored digests, or None if there is no
+            usable manifest
+        """
+        path = self.path_for(host, vm_uuid, target)
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size < _HEADER.size:
+                    raise ValueError("truncated header")
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {path}: {e}", path=str(path))
+            return None
+
+        magic, block_size, size, mtime_ns, inode, digest_size, count = (
+            _HEADER.unpack_from(buffer)
+        )
+        if magic != MANIFEST_MAGIC or len(buffer) != _HEADER.size + digest_size * count:
+            logger.warning(f"Ignoring corrupt manifest {path}", path=str(path))
+            buffer.close()
+            return None
+
+        return BlockHashes(
+            size=size,
+            block_size=block_size,
+            digests=DigestView(buffer, _HEADER.size, digest_size, count),
+            identity=FileIdentity(size=size, mtime_ns=mtime_ns, inode=inode),
+        )
+
+    def save(self, host: str, vm_uuid: str, target: str, hashes: BlockHashes) -> None:
+        """
+        Persist a manifest atomically.
+
+        The digests must carry the identity of the file they describe.
+        """
+        if hashes.identity is None:
+            raise ValueError("Cannot save a manifest without file identity")
+
+        digests = [bytes.fromhex(digest) for digest in hashes.digests]
+        digest_size = len(digests[0]) if digests else 0
+        if any(len(digest) != digest_size for digest in digests):
+            raise ValueError("Manifest digests must have a fixed width")
+
+        path = self.path_for(host, vm_uuid, target)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        header = _HEADER.pack(
+            MANIFEST_MAGIC,
+            hashes.block_size,
+            hashes.identity.size,
+            hashes.identity.mtime_ns,
+            hashes.identity.inode,
+            digest_size,
+            len(digests),
+        )
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header)
+                f.write(b"".join(digests))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
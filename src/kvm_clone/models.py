@@ -5,7 +5,7 @@ This module defines the data structures used throughout the KVM cloning system.
 """
 
 from dataclasses import dataclass, field
-from typing import Optional, List, Dict, Any, Union
+from typing import Optional, List, Dict, Any, Sequence, Tuple, Union
 from datetime import datetime
 from enum import Enum
 
@@ -43,10 +43,66 @@ class DiskInfo:
     """Disk information."""
 
     path: str
-    size: int  # bytes
+    size: int  # bytes; virtual capacity seen by the guest
     format: str
     target: str
     backing_file: Optional[str] = None
+    allocation: int = 0  # bytes allocated on the host
+    physical: int = 0  # bytes of the image file on the host
+    backing_depth: int = 0  # images below this one in its backing chain
+
+
+@dataclass
+class BackingLayer:
+    """Image below a qcow2 overlay in its backing chain."""
+
+    path: str  # path on the source host
+    format: str
+    size: int = 0  # apparent size of the image file in bytes
+    digest: str = ""  # SHA-256 of the image file
+    dest_path: Optional[str] = None  # where the layer lives on the destination
+    reused: bool = False  # already present on the destination
+
+
+@dataclass
+class ByteRange:
+    """Contiguous byte range of a file."""
+
+    offset: int
+    length: int
+
+
+@dataclass
+class FileIdentity:
+    """Identity of a file version, used to detect modifications."""
+
+    size: int  # bytes
+    mtime_ns: int
+    inode: int
+
+
+@dataclass
+class BlockHashes:
+    """Per-block digests of a file."""
+
+    size: int  # bytes
+    block_size: int  # bytes
+    digests: Sequence[str] = field(default_factory=list)
+    identity: Optional[FileIdentity] = None  # file version the digests describe
+
+
+@dataclass
+class ChangedBlockSession:
+    """Changed-block tracking state of one sync operation."""
+
+    host: str
+    vm_name: str
+    checkpoint: str  # checkpoint created for this sync
+    previous: Optional[str] = None  # checkpoint the changes are relative to
+    backup_socket: Optional[str] = None  # NBD socket of the running backup job
+    extents: Optional[Dict[str, List[ByteRange]]] = (
+        None  # disk path -> changed guest extents
+    )
 
 
 @dataclass
@@ -77,6 +133,21 @@ class VMInfo:
     config_path: Optional[str] = None
 
 
+@dataclass
+class HostListing:
+    """VMs listed on one host, or the reason the host could not be listed."""
+
+    host: str
+    vms: List[VMInfo] = field(default_factory=list)
+    error: Optional[str] = None
+    duration: float = 0.0  # seconds
+
+    @property
+    def success(self) -> bool:
+        """Whether the host was listed."""
+        return self.error is None
+
+
 @dataclass
 class CloneOptions:
     """Options for cloning operations."""
@@ -85,10 +156,29 @@ class CloneOptions:
     force: bool = False
     dry_run: bool = False
     parallel: int = 4
-    compress: bool = False
+    # False/"none", True/"adaptive", "lz4", "zstd" or "<codec>:<level>"
+    compress: Union[bool, str] = False
     verify: bool = True
     preserve_mac: bool = False
     network_config: Optional[Dict[str, Any]] = None
+    transfer_mode: str = "rsync"  # rsync | striped | sparse | stream
+    stripe_size: int = 256 * 1024 * 1024  # bytes
+    resume: Optional[str] = None  # operation id of an interrupted clone
+    use_store: bool = False  # keep disks in the destination image store
+
+
+@dataclass
+class CompressionSpec:
+    """Compression applied to disk data on the wire."""
+
+    codec: str = "none"  # none | lz4 | zstd
+    level: Optional[int] = None  # codec default if None
+    adaptive: bool = False  # zstd picks the level from link and CPU throughput
+
+    @property
+    def enabled(self) -> bool:
+        """Whether data is compressed at all."""
+        return self.codec != "none"
 
 
 @dataclass
@@ -99,6 +189,9 @@ class SyncOptions:
     checkpoint: bool = False
     delta_only: bool = True
     bandwidth_limit: Optional[str] = None
+    block_size: int = 4 * 1024 * 1024  # bytes, granularity of delta detection
+    changed_block_tracking: bool = False
+    compress: Union[bool, str] = False  # same values as CloneOptions.compress
 
 
 @dataclass
@@ -115,6 +208,7 @@ class ProgressInfo:
     status: OperationStatusEnum
     message: Optional[str] = None
     current_file: Optional[str] = None
+    instant_speed: float = 0.0  # bytes/sec since the previous update; speed is smoothed
 
 
 @dataclass
@@ -141,6 +235,11 @@ class CloneResult:
     error: Optional[str] = None
     warnings: List[str] = field(default_factory=list)
     validation: Optional[ValidationResult] = None
+    allocated_bytes: int = 0  # bytes holding data in the transferred disks
+    virtual_bytes: int = 0  # apparent size of the transferred disks
+    verification: List["DiskVerification"] = field(default_factory=list)
+    resumable: bool = False  # failed clone can continue with its operation id
+    reused_bytes: int = 0  # backing images found on the destination
 
 
 @dataclass
@@ -168,6 +267,10 @@ class DeltaInfo:
     changed_blocks: int
     files_changed: List[str]
     estimated_transfer_time: float
+    # source disk path -> changed extents / size of the source disk
+    extents: Dict[str, List[ByteRange]] = field(default_factory=dict)
+    disk_sizes: Dict[str, int] = field(default_factory=dict)
+    source_hashes: Dict[str, BlockHashes] = field(default_factory=dict)
 
 
 @dataclass
@@ -185,6 +288,91 @@ class OperationStatus:
     error: Optional[str] = None
 
 
+@dataclass
+class PoolStats:
+    """Statistics of the SSH connection pool for one host."""
+
+    connections: int = 0  # open connections
+    idle_connections: int = 0  # open connections without active channels
+    active_channels: int = 0
+    waiting: int = 0  # callers waiting for a free channel
+    max_connections: int = 0
+    max_channels: int = 0  # per connection
+    opened: int = 0  # connections opened over the pool's lifetime
+    evicted: int = 0  # connections closed as dead or idle
+
+
+@dataclass
+class ExecutorStats:
+    """Statistics of a thread pool running blocking SSH transport calls."""
+
+    name: str
+    max_workers: int = 0
+    busy_workers: int = 0
+    queued: int = 0  # calls waiting for a worker
+    max_queue: int = 0
+    completed: int = 0
+    rejected: int = 0  # calls refused because the queue was full
+    total_wait: float = 0.0  # seconds calls spent waiting for a worker
+    max_wait: float = 0.0  # seconds
+
+
+@dataclass
+class SSHTuning:
+    """SSH algorithms and channel flow control of a connection."""
+
+    # Allowed algorithms in order of preference; empty keeps the defaults
+    ciphers: List[str] = field(default_factory=list)
+    macs: List[str] = field(default_factory=list)
+    kex: List[str] = field(default_factory=list)
+    window_size: Optional[int] = None  # bytes the peer may send unacknowledged
+    max_packet_size: Optional[int] = None  # bytes per channel data packet
+
+
+@dataclass
+class LinkBenchmark:
+    """Throughput of one SSH tuning between two hosts."""
+
+    source_host: str
+    dest_host: str
+    tuning: SSHTuning
+    bytes_transferred: int = 0
+    duration: float = 0.0  # seconds
+    bytes_per_second: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class InventoryEntry:
+    """Cached libvirt state of one domain."""
+
+    xml: str
+    vm_info: Optional[VMInfo] = None  # None until the VM info was requested
+    fetched_at: float = 0.0  # monotonic seconds
+
+
+@dataclass
+class StoreGCResult:
+    """Result of evicting files from the image store of a host."""
+
+    host: str
+    total_bytes: int  # bytes in the store before eviction
+    budget: int  # bytes the store may occupy
+    evicted: List[str] = field(default_factory=list)
+    freed_bytes: int = 0
+    dry_run: bool = False
+
+
+@dataclass
+class CacheStats:
+    """Inventory cache statistics."""
+
+    entries: int = 0
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0  # domains or hosts dropped by events or expiry
+
+
 @dataclass
 class SSHConnectionInfo:
     """SSH connection information."""
@@ -194,6 +382,8 @@ class SSHConnectionInfo:
     username: Optional[str] = None
     key_path: Optional[str] = None
     timeout: int = 30
+    pool: Optional[PoolStats] = None
+    executors: List[ExecutorStats] = field(default_factory=list)
 
 
 @dataclass
@@ -206,6 +396,59 @@ class TransferStats:
     end_time: Optional[datetime] = None
     average_speed: float = 0.0  # bytes/sec
     peak_speed: float = 0.0  # bytes/sec
+    virtual_bytes: int = 0  # apparent size of the transferred files
+    verification: Optional["DiskVerification"] = None
+    reused_bytes: int = 0  # bytes taken from the destination image store
+    materialized: Optional[str] = None  # reflink | overlay | copy from the store
+
+
+@dataclass
+class DiskProgress:
+    """Progress of one disk recorded in a transfer journal."""
+
+    dest_path: str
+    done: bool = False
+    bytes_transferred: int = 0  # recorded when the disk completed
+    # offset -> (length, checksum) of ranges copied and verified
+    ranges: Dict[int, Tuple[int, str]] = field(default_factory=dict)
+
+    def is_range_done(self, byte_range: ByteRange) -> bool:
+        """Whether exactly this range was copied and verified."""
+        entry = self.ranges.get(byte_range.offset)
+        return entry is not None and entry[0] == byte_range.length
+
+
+@dataclass
+class DiskVerification:
+    """Integrity verification of one transferred disk."""
+
+    source_path: str
+    dest_path: str
+    block_size: int  # bytes per hashed block
+    blocks: int = 0
+    source_root: str = ""  # Merkle root of the source block digests
+    dest_root: str = ""  # Merkle root of the destination block digests
+    mismatched_blocks: int = 0  # blocks that differed after the first copy
+    resent_bytes: int = 0
+    inline: bool = False  # hashed while streaming instead of read again
+
+    @property
+    def verified(self) -> bool:
+        """Whether both copies have the same content."""
+        return bool(self.source_root) and self.source_root == self.dest_root
+
+
+@dataclass
+class PipeResult:
+    """Result of streaming a command's output into another command."""
+
+    bytes_transferred: int = 0
+    reader_exit_code: int = 0
+    writer_exit_code: int = 0
+    reader_stderr: str = ""
+    writer_stdout: str = ""
+    writer_stderr: str = ""
+    duration: float = 0.0  # seconds
 
 
 @dataclass
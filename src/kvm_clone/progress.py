@@ -0,0 +1,219 @@
+"""
+Progress tracking for transfer operations.
+
+This module turns byte counts reported by the transfer layer (parsed rsync
+output or bytes counted by the native backends) into rate-limited
+ProgressInfo updates with throughput and ETA.
+"""
+
+import re
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .models import ProgressInfo, OperationType, OperationStatusEnum
+from .transport import SSHConnection
+
+DEFAULT_MAX_UPDATES_PER_SECOND = 4.0
+DEFAULT_SPEED_SMOOTHING = 0.3  # weight of the newest sample in the moving average
+
+# Progress lines of rsync --info=progress2 (and --progress), e.g.
+# "  1,234,567  45%  123.45MB/s    0:00:12 (xfr#1, to-chk=0/1)"
+_RSYNC_PROGRESS = re.compile(r"^\s*([\d,.]+)\s+\d+%\s+\S+/s\b")
+
+
+def parse_rsync_progress(line: str) -> Optional[int]:
+    """
+    Parse the byte count of an rsync progress line.
+
+    Returns:
+        Optional[int]: Bytes transferred so far, or None for other lines
+    """
+    match = _RSYNC_PROGRESS.match(line)
+    if not match:
+        return None
+    digits = re.sub(r"[,.]", "", match.group(1))
+    return int(digits) if digits else None
+
+
+async def run_with_progress(
+    conn: SSHConnection,
+    command: str,
+    callback: Optional[Callable[[int], None]] = None,
+) -> Tuple[int, str, int]:
+    """
+    Run a command, reporting rsync progress lines as they arrive.
+
+    Args:
+        conn: Connection to run the command on
+        command: Command to run
+        callback: Called with the cumulative bytes of each progress line
+
+    Returns:
+        Tuple[int, str, int]: Bytes transferred according to the last
+        progress line, stderr output and exit code
+    """
+    transferred = 0
+    errors: List[str] = []
+    async with conn.stream_command(command) as stream:
+        async for name, line in stream:
+            if name == "stderr":
+                errors.append(line)
+                continue
+            value = parse_rsync_progress(line)
+            if value is not None:
+                transferred = value
+                if callback:
+                    callback(value)
+        exit_code = await stream.wait()
+
+    return transferred, "\n".join(errors), exit_code
+
+
+class ProgressTracker:
+    """
+    Aggregates byte progress of concurrent transfers into ProgressInfo updates.
+
+    Each transfer reports its own cumulative byte count under a key (e.g. a
+    disk path). Updates are forwarded to the callback at most
+    ``max_updates_per_second`` times per second, so frequent reports from
+    fast links never make the callback a bottleneck; start and end of a step
+    can force an update.
+    """
+
+    def __init__(
+        self,
+        callback: Optional[Callable[[ProgressInfo], None]],
+        operation_id: str,
+        operation_type: OperationType,
+        total_bytes: int = 0,
+        max_updates_per_second: float = DEFAULT_MAX_UPDATES_PER_SECOND,
+        smoothing: float = DEFAULT_SPEED_SMOOTHING,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize progress tracker."""
+        if not 0 < smoothing <= 1:
+            raise ValueError("smoothing must be in (0, 1]")
+
+        self.callback = callback
+        self.operation_id = operation_id
+        self.operation_type = operation_type
+        self.total_bytes = total_bytes
+        self.min_interval = (
+            1.0 / max_updates_per_second if max_updates_per_second > 0 else 0.0
+        )
+        self.smoothing = smoothing
+        self.speed = 0.0  # bytes/sec, moving average
+        self.instant_speed = 0.0  # bytes/sec, since the previous update
+        self._clock = clock
+        self._progress: Dict[str, int] = {}
+        self._last_emit: Optional[float] = None
+        self._last_sample: Optional[float] = None
+        self._last_bytes = 0
+        self._message: Optional[str] = None
+        self._current_file: Optional[str] = None
+
+    @property
+    def bytes_transferred(self) -> int:
+        """Bytes transferred across all keys."""
+        return sum(self._progress.values())
+
+    def update(
+        self,
+        key: str,
+        transferred: int,
+        message: Optional[str] = None,
+        current_file: Optional[str] = None,
+        force: bool = False,
+    ) -> None:
+        """
+        Record the cumulative bytes transferred for one key.
+
+        Args:
+            key: Transfer the count belongs to
+            transferred: Bytes transferred so far by that transfer
+            message: Status message
+            current_file: File being transferred
+            force: Emit even if the rate limit would suppress the update
+        """
+        self._progress[key] = max(transferred, 0)
+        self.emit(message, current_file, force=force)
+
+    def emit(
+        self,
+        message: Optional[str] = None,
+        current_file: Optional[str] = None,
+        force: bool = False,
+        percent: Optional[float] = None,
+    ) -> None:
+        """
+        Send a ProgressInfo update unless rate limited.
+
+        Args:
+            message: Status message; the previous one is kept if None
+            current_file: File being transferred; kept if None
+            force: Ignore the rate limit
+            percent: Progress percentage to report when it cannot be derived
+                from ``total_bytes``
+        """
+        if message is not None:
+            self._message = message
+        if current_file is not None:
+            self._current_file = current_file
+
+        now = self._clock()
+        if (
+            not force
+            and self._last_emit is not None
+            and now - self._last_emit < self.min_interval
+        ):
+            return
+
+        transferred = self.bytes_transferred
+        self._last_emit = now
+        self._sample(now, transferred)
+
+        if not self.callback:
+            return
+
+        if self.total_bytes > 0:
+            percent = min(transferred / self.total_bytes * 100, 100.0)
+        eta = None
+        if self.total_bytes > 0 and self.speed > 0:
+            eta = int(max(self.total_bytes - transferred, 0) / self.speed)
+
+        self.callback(
+            ProgressInfo(
+                operation_id=self.operation_id,
+                operation_type=self.operation_type,
+                progress_percent=percent or 0.0,
+                bytes_transferred=transferred,
+                total_bytes=self.total_bytes,
+                speed=self.speed,
+                eta=eta,
+                status=OperationStatusEnum.RUNNING,
+                message=self._message,
+                current_file=self._current_file,
+                instant_speed=self.instant_speed,
+            )
+        )
+
+    def _sample(self, now: float, transferred: int) -> None:
+        """Update throughput, sampling no more often than the update rate."""
+        if self._last_sample is None:
+            self._last_sample, self._last_bytes = now, transferred
+            return
+
+        # Forced updates can follow each other closely; such short intervals
+        # would give meaningless rates
+        elapsed = now - self._last_sample
+        if elapsed <= 0 or elapsed < self.min_interval:
+            return
+
+        self.instant_speed = max(transferred - self._last_bytes, 0) / elapsed
+        if self.speed:
+            self.speed = (
+                self.smoothing * self.instant_speed + (1 - self.smoothing) * self.speed
+            )
+        else:
+            self.speed = self.instant_speed
+        self._last_sample, self._last_bytes = now, transferred
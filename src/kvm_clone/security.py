@@ -8,9 +8,10 @@ functions to prevent common security vulnerabilities.
 import re
 import shlex
 from pathlib import Path
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Union
 
 from .exceptions import ValidationError
+from .models import CompressionSpec
 
 
 class SecurityValidator:
@@ -20,6 +21,7 @@ class SecurityValidator:
     VM_NAME_PATTERN = re.compile(r"^[a-zA-Z0-9_-]+$")
     HOSTNAME_PATTERN = re.compile(r"^[a-zA-Z0-9.-]+$")
     SNAPSHOT_NAME_PATTERN = re.compile(r"^[a-zA-Z0-9_-]+$")
+    COMPRESSION_LEVELS = {"lz4": (1, 12), "zstd": (1, 19)}
 
     @staticmethod
     def validate_vm_name(name: str) -> str:
@@ -102,6 +104,53 @@ class SecurityValidator:
 
         return name
 
+    @staticmethod
+    def validate_compression(value: Union[bool, str, None]) -> CompressionSpec:
+        """
+        Validate a compression setting.
+
+        Accepted values are ``none``, ``lz4``, ``zstd``, ``<codec>:<level>``
+        and ``adaptive`` (zstd adjusting its level to the link). ``True``
+        means adaptive and ``False`` or ``None`` no compression.
+
+        Args:
+            value: Compression setting to validate
+
+        Returns:
+            CompressionSpec: Parsed compression setting
+
+        Raises:
+            ValidationError: If the codec or level is invalid
+        """
+        if value is None or value is False:
+            return CompressionSpec()
+        if value is True:
+            return CompressionSpec(codec="zstd", adaptive=True)
+        if not isinstance(value, str):
+            raise ValidationError(f"Invalid compression setting: {value!r}")
+
+        codec, _, level = value.strip().lower().partition(":")
+        if codec in ("", "none", "off") and not level:
+            return CompressionSpec()
+        if codec in ("adaptive", "auto") and not level:
+            return CompressionSpec(codec="zstd", adaptive=True)
+        if codec not in SecurityValidator.COMPRESSION_LEVELS:
+            raise ValidationError(
+                f"Unknown compression codec: {codec} (expected none, lz4, zstd "
+                "or adaptive)"
+            )
+        if not level:
+            return CompressionSpec(codec=codec)
+        if codec == "zstd" and level in ("adaptive", "auto"):
+            return CompressionSpec(codec=codec, adaptive=True)
+
+        low, high = SecurityValidator.COMPRESSION_LEVELS[codec]
+        if not level.isdigit() or not low <= int(level) <= high:
+            raise ValidationError(
+                f"Compression level for {codec} must be between {low} and {high}"
+            )
+        return CompressionSpec(codec=codec, level=int(level))
+
     @staticmethod
     def sanitize_path(path: str, base_dir: Optional[str] = None) -> str:
         """
@@ -183,6 +232,7 @@ class CommandBuilder:
         dest_host: Optional[str] = None,
         bandwidth_limit: Optional[str] = None,
         additional_options: Optional[List[str]] = None,
+        compression: Optional[CompressionSpec] = None,
     ) -> str:
         """
         Build a safe rsync command.
@@ -193,11 +243,22 @@ class CommandBuilder:
             dest_host: Destination host (for remote sync)
             bandwidth_limit: Bandwidth limit (e.g., "100M")
             additional_options: Additional rsync options
+            compression: Wire compression; rsync's zlib compression if None.
+                lz4 and zstd need rsync 3.2 or newer, and rsync has no
+                adaptive level, so adaptive uses zstd's default level.
 
         Returns:
             str: Safe rsync command
         """
-        cmd_parts = ["rsync", "-avz", "--progress"]
+        if compression is None:
+            cmd_parts = ["rsync", "-avz", "--progress"]
+        elif not compression.enabled:
+            cmd_parts = ["rsync", "-av", "--progress"]
+        else:
+            cmd_parts = ["rsync", "-av", "--progress", "--compress"]
+            cmd_parts.append(f"--compress-choice={compression.codec}")
+            if compression.level is not None and not compression.adaptive:
+                cmd_parts.append(f"--compress-level={compression.level}")
 
         # Add bandwidth limit if specified
         if bandwidth_limit:
@@ -228,6 +289,263 @@ class CommandBuilder:
 
         return " ".join(cmd_parts)
 
+    @staticmethod
+    def build_range_copy_command(
+        source_path: str,
+        dest_path: str,
+        offset: int,
+        length: int,
+        dest_host: Optional[str] = None,
+        compression: Optional[CompressionSpec] = None,
+    ) -> str:
+        """
+        Build a command copying one byte range of a file with positional writes.
+
+        The range is read with ``dd`` on the host executing the command and
+        written at the same offset into the destination file, which is not
+        truncated. For remote copies the writer runs on ``dest_host`` over ssh.
+
+        Args:
+            source_path: Source file path
+            dest_path: Destination file path
+            offset: Byte offset of the range
+            length: Length of the range in bytes
+            dest_host: Destination host (for remote copy)
+            compression: Compression of the range between the hosts; ignored
+                for local copies
+
+        Returns:
+            str: Safe range copy command
+        """
+        if offset < 0 or length <= 0:
+            raise ValidationError(
+                f"Invalid byte range: offset={offset}, length={length}"
+            )
+
+        reader = (
+            f"dd if={shlex.quote(source_path)} bs=4M skip={offset} count={length} "
+            "iflag=skip_bytes,count_bytes status=none"
+        )
+        writer = (
+            f"dd of={shlex.quote(dest_path)} bs=4M seek={offset} "
+            "oflag=seek_bytes conv=notrunc status=none"
+        )
+
+        if dest_host:
+            dest_host = SecurityValidator.validate_hostname(dest_host)
+            if compression is not None and compression.enabled:
+                reader = (
+                    f"{reader} | {CommandBuilder.build_compress_command(compression)}"
+                )
+                writer = (
+                    f"{CommandBuilder.build_decompress_command(compression)} | {writer}"
+                )
+            writer = f"ssh {shlex.quote(dest_host)} {shlex.quote(writer)}"
+
+        return f"{reader} | {writer}"
+
+    @staticmethod
+    def build_compress_command(compression: CompressionSpec) -> str:
+        """
+        Build a filter compressing stdin to stdout.
+
+        Both codecs store blocks that do not shrink, such as clusters of
+        compressed qcow2 images, uncompressed, so such data costs little CPU
+        and no extra bytes on the wire. In adaptive mode zstd continuously
+        raises its level while the link is the bottleneck and lowers it while
+        compression is.
+
+        Args:
+            compression: Codec and level
+
+        Returns:
+            str: Safe compression command
+        """
+        if compression.codec == "zstd":
+            if compression.adaptive:
+                return "zstd -q -c -T0 --adapt"
+            level = compression.level or 3
+            return f"zstd -q -c -T0 -{level}"
+        if compression.codec == "lz4":
+            return f"lz4 -q -c -{compression.level or 1}"
+        raise ValidationError(f"Unknown compression codec: {compression.codec}")
+
+    @staticmethod
+    def build_decompress_command(compression: CompressionSpec) -> str:
+        """
+        Build a filter decompressing stdin to stdout.
+
+        Args:
+            compression: Codec the data was compressed with
+
+        Returns:
+            str: Safe decompression command
+        """
+        if compression.codec in ("zstd", "lz4"):
+            return f"{compression.codec} -q -d -c"
+        raise ValidationError(f"Unknown compression codec: {compression.codec}")
+
+    @staticmethod
+    def build_stream_read_command(
+        path: str, compression: Optional[CompressionSpec] = None
+    ) -> str:
+        """
+        Build a command writing a whole file to stdout.
+
+        Args:
+            path: File path
+            compression: Compression applied to the output
+
+        Returns:
+            str: Safe read command
+        """
+        command = f"dd if={shlex.quote(path)} bs=4M status=none"
+        if compression is not None and compression.enabled:
+            command += f" | {CommandBuilder.build_compress_command(compression)}"
+        return command
+
+    @staticmethod
+    def build_stream_write_command(
+        path: str, compression: Optional[CompressionSpec] = None
+    ) -> str:
+        """
+        Build a command storing stdin in a file, flushed to disk before exiting.
+
+        Args:
+            path: File path
+            compression: Compression of the input
+
+        Returns:
+            str: Safe write command
+        """
+        command = f"dd of={shlex.quote(path)} bs=4M conv=fsync status=none"
+        if compression is not None and compression.enabled:
+            command = (
+                f"{CommandBuilder.build_decompress_command(compression)} | {command}"
+            )
+        return command
+
+    @staticmethod
+    def build_free_space_command(path: str) -> str:
+        """
+        Build a command printing the bytes available to files under a directory.
+
+        Args:
+            path: Directory path
+
+        Returns:
+            str: Safe command printing a header line and the free bytes
+        """
+        return f"df -B1 --output=avail {shlex.quote(path)}"
+
+    @staticmethod
+    def build_range_checksum_command(path: str, offset: int, length: int) -> str:
+        """
+        Build a command printing the SHA-256 checksum of one byte range of a file.
+
+        Args:
+            path: File path
+            offset: Byte offset of the range
+            length: Length of the range in bytes
+
+        Returns:
+            str: Safe checksum command
+        """
+        if offset < 0 or length <= 0:
+            raise ValidationError(
+                f"Invalid byte range: offset={offset}, length={length}"
+            )
+
+        return (
+            f"dd if={shlex.quote(path)} bs=4M skip={offset} count={length} "
+            "iflag=skip_bytes,count_bytes status=none | sha256sum"
+        )
+
+    @staticmethod
+    def build_guest_write_command(
+        dest_path: str,
+        dest_format: str,
+        guest_offset: int,
+        length: int,
+        reader: Optional[str] = None,
+        dest_host: Optional[str] = None,
+    ) -> str:
+        """
+        Build a command writing one guest-visible range of a disk image.
+
+        The range is written through ``qemu-io`` so it lands at the right
+        place in any image format. Its data is the output of ``reader``;
+        without a reader the range is written as zeroes. The reader's output
+        is staged in a temporary file on the writing host and written only if
+        exactly ``length`` bytes arrived, and the pipeline runs under
+        ``pipefail`` so a failing reader fails the command.
+
+        Args:
+            dest_path: Destination image path
+            dest_format: Destination image format (e.g. qcow2)
+            guest_offset: Guest-visible byte offset of the range
+            length: Length of the range in bytes
+            reader: Safe command printing exactly ``length`` bytes, if any
+            dest_host: Destination host (for remote write)
+
+        Returns:
+            str: Safe guest write command
+        """
+        if guest_offset < 0 or length <= 0:
+            raise ValidationError(
+                f"Invalid byte range: offset={guest_offset}, length={length}"
+            )
+        if not re.match(r"^[a-z0-9]+$", dest_format):
+            raise ValidationError(f"Invalid image format: {dest_format}")
+
+        if reader:
+            io_command = f"write -s /dev/stdin {guest_offset} {length}"
+        else:
+            io_command = f"write -z {guest_offset} {length}"
+        writer = (
+            f"qemu-io -f {dest_format} -c {shlex.quote(io_command)} "
+            f"{shlex.quote(dest_path)}"
+        )
+        if reader:
+            # qemu-io repeats a short input to fill the range; count it first
+            writer = (
+                "tmp=$(mktemp) || exit 1; trap 'rm -f \"$tmp\"' EXIT; "
+                f'head -c {length} > "$tmp"; '
+                f'if [ "$(stat -c %s "$tmp")" -ne {length} ]; then '
+                f"echo 'Expected {length} bytes of data' >&2; exit 1; fi; "
+                f'{writer} < "$tmp"'
+            )
+
+        if dest_host:
+            dest_host = SecurityValidator.validate_hostname(dest_host)
+            writer = f"ssh {shlex.quote(dest_host)} {shlex.quote(writer)}"
+        elif reader:
+            writer = f"sh -c {shlex.quote(writer)}"
+
+        if not reader:
+            return writer
+        return f"bash -o pipefail -c {shlex.quote(f'{reader} | {writer}')}"
+
+    @staticmethod
+    def build_python_command(script: str, *args: Any) -> str:
+        """
+        Build a command running an inline Python script with ``python3 -c``.
+
+        Args:
+            script: Python source of the script
+            *args: Script arguments
+
+        Returns:
+            str: Safe python command
+        """
+        cmd_parts = ["python3", "-c", shlex.quote(script)]
+
+        for arg in args:
+            if arg is not None:
+                cmd_parts.append(shlex.quote(str(arg)))
+
+        return " ".join(cmd_parts)
+
     @staticmethod
     def build_virsh_command(action: str, vm_name: str, *args: Any) -> str:
         """
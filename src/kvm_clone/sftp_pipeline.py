@@ -0,0 +1,268 @@
+"""
+Pipelined SFTP transfers.
+
+SFTP reads and writes are individual requests, each answered by the server.
+Waiting for every answer before sending the next request caps a transfer at
+one request per round trip, far below link speed on high-latency links. An
+``SFTPPipeline`` keeps up to ``window`` requests of ``request_size`` bytes in
+flight instead, so throughput is bounded by the window rather than by the
+round trip time.
+
+Transfers work on byte ranges given by an offset and a length, in either
+direction. Ranges let callers resume an interrupted transfer or split one
+file into stripes copied concurrently. Files are accessed through adapters
+with positional ``read``/``write`` coroutines: ``LocalFile`` for the local
+side and ``AsyncSSHRemoteFile`` (see :mod:`kvm_clone.asyncssh_transport`)
+for asyncssh SFTP sessions. paramiko cannot have requests of several
+threads in flight, so ``paramiko_copy`` drives paramiko's own pipelining
+instead.
+"""
+
+import asyncio
+import os
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Optional, Set, Tuple
+
+from .transport_executor import BlockingPool
+
+DEFAULT_REQUEST_SIZE = 128 * 1024  # bytes; OpenSSH accepts up to 256 KiB
+DEFAULT_WINDOW = 64  # requests in flight per transfer
+
+ReadAt = Callable[[int, int], Awaitable[bytes]]
+WriteAt = Callable[[int, bytes], Awaitable[None]]
+
+
+class SFTPPipeline:
+    """Copies byte ranges with a window of requests in flight."""
+
+    def __init__(
+        self,
+        request_size: int = DEFAULT_REQUEST_SIZE,
+        window: int = DEFAULT_WINDOW,
+        progress: Optional[Callable[[int], None]] = None,
+    ):
+        """
+        Initialize SFTP pipeline.
+
+        Args:
+            request_size: Bytes per read or write request
+            window: Maximum requests in flight
+            progress: Called with the cumulative bytes copied
+        """
+        if request_size <= 0 or window <= 0:
+            raise ValueError("request_size and window must be positive")
+
+        self.request_size = request_size
+        self.window = window
+        self.progress = progress
+
+    async def copy(
+        self, read_at: ReadAt, write_at: WriteAt, offset: int, length: int
+    ) -> int:
+        """
+        Copy a byte range from one file to another at the same offsets.
+
+        Requests complete in any order. A short read is continued by a
+        further request; an empty read marks the end of the source, and no
+        request beyond it is issued.
+
+        Args:
+            read_at: Reads up to ``size`` bytes at ``offset`` of the source
+            write_at: Writes data at ``offset`` of the destination
+            offset: First byte of the range
+            length: Bytes in the range
+
+        Returns:
+            int: Bytes copied; less than ``length`` if the source ended early
+        """
+
+        async def request(start: int, size: int) -> Tuple[int, int, int]:
+            data = await read_at(start, size)
+            if data:
+                await write_at(start, data)
+            return start, size, len(data)
+
+        end = offset + length
+        next_offset = offset
+        retries: Deque[Tuple[int, int]] = deque()
+        tasks: Set["asyncio.Task[Tuple[int, int, int]]"] = set()
+        copied = 0
+        try:
+            while True:
+                while len(tasks) < self.window:
+                    if retries:
+                        start, size = retries.popleft()
+                        if start >= end:
+                            continue
+                    elif next_offset < end:
+                        start = next_offset
+                        size = min(self.request_size, end - start)
+                        next_offset += size
+                    else:
+                        break
+                    tasks.add(asyncio.create_task(request(start, size)))
+                if not tasks:
+                    break
+
+                done, tasks = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    start, size, received = task.result()
+                    copied += received
+                    if not received:
+                        end = min(end, start)
+                    elif received < size:
+                        retries.append((start + received, size - received))
+                if self.progress:
+                    self.progress(copied)
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        return copied
+
+
+class LocalFile:
+    """Local file accessed with positional reads and writes in a thread pool."""
+
+    def __init__(self, fd: int, pool: BlockingPool):
+        """Initialize local file around an open file descriptor."""
+        self.fd = fd
+        self.pool = pool
+
+    @classmethod
+    async def open(
+        cls, path: str, pool: BlockingPool, write: bool = False, truncate: bool = False
+    ) -> "LocalFile":
+        """
+        Open a local file.
+
+        Args:
+            path: Path of the file
+            pool: Pool running the blocking file calls
+            write: Open for writing, creating the file if it is missing
+            truncate: Empty the file first when opening it for writing
+        """
+        flags = os.O_RDONLY
+        if write:
+            flags = os.O_WRONLY | os.O_CREAT | (os.O_TRUNC if truncate else 0)
+        fd = await pool.run(os.open, path, flags, 0o600)
+        return cls(fd, pool)
+
+    @property
+    def max_request_size(self) -> Optional[int]:
+        """Largest request the file accepts, None if unlimited."""
+        return None
+
+    async def read(self, offset: int, size: int) -> bytes:
+        """Read up to ``size`` bytes at ``offset``."""
+        data: bytes = await self.pool.run_admitted(os.pread, self.fd, size, offset)
+        return data
+
+    async def write(self, offset: int, data: bytes) -> None:
+        """Write data at ``offset``."""
+        view = memoryview(data)
+        while view:
+            written: int = await self.pool.run_admitted(
+                os.pwrite, self.fd, view, offset
+            )
+            view = view[written:]
+            offset += written
+
+    async def size(self) -> int:
+        """Get the size of the file."""
+        return os.fstat(self.fd).st_size
+
+    async def close(self) -> None:
+        """Close the file."""
+        os.close(self.fd)
+
+
+def paramiko_copy(
+    sftp: Any,
+    local_path: str,
+    remote_path: str,
+    upload: bool,
+    offset: int,
+    length: Optional[int],
+    request_size: int = DEFAULT_REQUEST_SIZE,
+    window: int = DEFAULT_WINDOW,
+    progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    Copy a byte range over a paramiko SFTP session; blocks the calling thread.
+
+    paramiko's SFTP client cannot serve synchronous requests from several
+    threads, so its own pipelining is used: uploads send pipelined writes,
+    whose acknowledgements paramiko collects in batches of about 100, and
+    downloads prefetch with ``window`` reads in flight. paramiko splits every
+    request into reads and writes of at most 32 KiB.
+
+    Args:
+        sftp: SFTP session (``paramiko.SFTPClient``)
+        local_path: Local file
+        remote_path: Remote file
+        upload: Copy from the local to the remote file, else the reverse
+        offset: First byte of the range
+        length: Bytes in the range; up to the end of the source if None
+        request_size: Bytes handed to paramiko per read or write
+        window: Reads in flight for downloads
+        progress: Called from the calling thread with the bytes copied
+
+    Returns:
+        int: Bytes copied
+    """
+    truncate = offset == 0 and length is None
+    if upload:
+        source_size = os.stat(local_path).st_size
+    else:
+        source_size = int(sftp.stat(remote_path).st_size or 0)
+    end = source_size if length is None else min(offset + length, source_size)
+    chunks = [
+        (start, min(request_size, end - start))
+        for start in range(offset, end, request_size)
+    ]
+
+    copied = 0
+    if upload:
+        with open(local_path, "rb") as local:
+            remote = _open_paramiko_for_write(sftp, remote_path, truncate)
+            with remote:
+                remote.set_pipelined(True)
+                remote.seek(offset)
+                for start, size in chunks:
+                    data = os.pread(local.fileno(), size, start)
+                    if not data:
+                        break
+                    remote.write(data)
+                    copied += len(data)
+                    if progress:
+                        progress(copied)
+    else:
+        flags = os.O_WRONLY | os.O_CREAT | (os.O_TRUNC if truncate else 0)
+        fd = os.open(local_path, flags, 0o600)
+        try:
+            with sftp.open(remote_path, "r") as remote:
+                blocks = remote.readv(chunks, max_concurrent_prefetch_requests=window)
+                for (start, _), data in zip(chunks, blocks):
+                    if not data:
+                        break
+                    os.pwrite(fd, data, start)
+                    copied += len(data)
+                    if progress:
+                        progress(copied)
+        finally:
+            os.close(fd)
+    return copied
+
+
+def _open_paramiko_for_write(sftp: Any, path: str, truncate: bool) -> Any:
+    """Open a remote file for writing, keeping its content unless truncating."""
+    if not truncate:
+        try:
+            return sftp.open(path, "r+")
+        except FileNotFoundError:
+            pass
+    return sftp.open(path, "w")
@@ -0,0 +1,326 @@
+"""
+Content-addressed image store on destination hosts.
+
+Golden templates are cloned onto the same hypervisors over and over. With the
+store enabled, every source disk is identified by the SHA-256 of its content
+and kept on the destination as ``objects/<digest>`` below ``STORE_DIR``. A
+clone first asks the destination which digests it already holds, ships only
+the missing images into the store and then materialises the new disk from the
+store object: as a reflink copy where the filesystem supports it, otherwise
+as a qcow2 overlay backed by the object, or as a plain copy.
+
+Objects never change once stored; their modification time records their last
+use. Backing images placed by :mod:`kvm_clone.chain` live in the same store.
+``gc`` evicts the least recently used files no image on the host refers to
+until the store fits into a size budget.
+"""
+
+import json
+import re
+import shlex
+from typing import Iterable, List, Set, Tuple
+
+from .models import StoreGCResult
+from .exceptions import TransferError, ValidationError
+from .transport import SSHConnection, SSHTransport
+from .security import CommandBuilder
+from .logging import logger
+
+STORE_DIR = "/var/lib/libvirt/images/store"
+PART_SUFFIX = ".part"  # files are renamed into place once complete
+DEFAULT_GC_GRACE_PERIOD = 3600.0  # seconds a file is kept after its last use
+MATERIALIZE_METHODS = ("reflink", "overlay", "copy")
+
+_DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ImageStore:
+    """Content-addressed store of disk images on one host."""
+
+    def __init__(self, transport: SSHTransport, host: str, root: str = STORE_DIR):
+        """Initialize the image store of a host."""
+        self.transport = transport
+        self.host = host
+        self.root = root
+
+    @property
+    def object_dir(self) -> str:
+        """Directory holding the store objects."""
+        return f"{self.root}/objects"
+
+    def object_path(self, digest: str) -> str:
+        """
+        Get the path of the object holding content with a digest.
+
+        Raises:
+            ValidationError: If the digest is not a SHA-256 hex digest
+        """
+        if not _DIGEST_PATTERN.match(digest):
+            raise ValidationError(f"Invalid SHA-256 digest: {digest!r}")
+        return f"{self.object_dir}/{digest}"
+
+    def part_path(self, digest: str) -> str:
+        """Get the path an object is transferred to before it is added."""
+        return self.object_path(digest) + PART_SUFFIX
+
+    async def present(self, digests: Iterable[str]) -> Set[str]:
+        """
+        Ask the host which of the digests it holds, in one round trip.
+
+        Args:
+            digests: SHA-256 digests of the wanted images
+
+        Returns:
+            Set[str]: Digests with an object in the store
+        """
+        wanted = sorted(set(digests))
+        for digest in wanted:
+            self.object_path(digest)
+        if not wanted:
+            return set()
+        # ls prints the names that exist and complains about the others
+        command = (
+            f"cd {shlex.quote(self.object_dir)} 2>/dev/null && "
+            f"ls -1 -- {' '.join(wanted)} 2>/dev/null"
+        )
+        async with self.transport.connect(self.host) as conn:
+            stdout, _, _ = await conn.execute_command(command)
+        return set(stdout.split()) & set(wanted)
+
+    async def prepare(self) -> None:
+        """Create the object directory."""
+        async with self.transport.connect(self.host) as conn:
+            await self._run(
+                conn,
+                CommandBuilder.build_safe_command(
+                    "mkdir -p {path}", path=self.object_dir
+                ),
+            )
+
+    async def add(self, digest: str) -> bool:
+        """
+        Add a transferred image to the store once its content is confirmed.
+
+        The image is hashed again on the host, so content that changed on the
+        source while it was hashed and copied never enters the store.
+
+        Args:
+            digest: Digest the image was transferred under
+
+        Returns:
+            bool: Whether the object was added; if not, the transferred file
+            is left at ``part_path(digest)``
+        """
+        command = CommandBuilder.build_safe_command(
+            '[ "$(sha256sum < {part} | cut -d " " -f 1)" = {digest} ] && '
+            "mv -f {part} {path}",
+            part=self.part_path(digest),
+            digest=digest,
+            path=self.object_path(digest),
+        )
+        async with self.transport.connect(self.host) as conn:
+            _, _, exit_code = await conn.execute_command(command)
+        if exit_code != 0:
+            logger.warning(
+                f"Image {digest[:16]} changed while it was copied; not stored",
+                host=self.host,
+            )
+        return exit_code == 0
+
+    async def materialize(
+        self, digest: str, dest_path: str, overlay: bool = False
+    ) -> str:
+        """
+        Create a disk image from a store object.
+
+        A reflink copy shares all blocks with the object and is tried first.
+        Without reflink support a qcow2 overlay backed by the object is
+        created when ``overlay`` is allowed, otherwise the object is copied.
+
+        Args:
+            digest: Digest of the object
+            dest_path: Path of the new disk image
+            overlay: Whether the object is a qcow2 image without a backing
+                file, so an overlay of it can stand in for a copy
+
+        Returns:
+            str: Method used, one of ``MATERIALIZE_METHODS``
+        """
+        path = self.object_path(digest)
+        async with self.transport.connect(self.host) as conn:
+            await self._run(
+                conn, CommandBuilder.build_safe_command("touch -c {path}", path=path)
+            )
+            _, _, exit_code = await conn.execute_command(
+                CommandBuilder.build_safe_command(
+                    "cp --reflink=always {path} {dest}", path=path, dest=dest_path
+                )
+            )
+            if exit_code == 0:
+                method = "reflink"
+            elif overlay:
+                await self._run(
+                    conn,
+                    CommandBuilder.build_safe_command(
+                        "qemu-img create -q -f qcow2 -F qcow2 -b {path} {dest}",
+                        path=path,
+                        dest=dest_path,
+                    ),
+                )
+                method = "overlay"
+            else:
+                await self._run(
+                    conn,
+                    CommandBuilder.build_safe_command(
+                        "cp --sparse=always {path} {dest}", path=path, dest=dest_path
+                    ),
+                )
+                method = "copy"
+
+        logger.debug(
+            f"Materialised {dest_path} from image {digest[:16]} by {method}",
+            host=self.host,
+        )
+        return method
+
+    async def restore_part(self, digest: str, dest_path: str) -> None:
+        """Move a transferred image that was not stored to its disk path."""
+        async with self.transport.connect(self.host) as conn:
+            await self._run(
+                conn,
+                CommandBuilder.build_safe_command(
+                    "mv -f {part} {dest}", part=self.part_path(digest), dest=dest_path
+                ),
+            )
+
+    async def referenced(self, paths: Iterable[str]) -> Set[str]:
+        """
+        Collect the files the backing chains of disk images refer to.
+
+        Args:
+            paths: Disk images in use on the host
+
+        Returns:
+            Set[str]: Paths of the images and of all their backing files
+
+        Raises:
+            TransferError: If the backing chain of an image cannot be read;
+                its backing files would otherwise look unused to ``gc``
+        """
+        referenced: Set[str] = set()
+        async with self.transport.connect(self.host) as conn:
+            for path in paths:
+                referenced.add(path)
+                stdout, stderr, exit_code = await conn.execute_command(
+                    CommandBuilder.build_safe_command(
+                        "qemu-img info --backing-chain --output=json -U {path}",
+                        path=path,
+                    )
+                )
+                try:
+                    if exit_code != 0:
+                        raise ValueError(stderr.strip())
+                    images = json.loads(stdout)
+                    if isinstance(images, dict):
+                        images = [images]
+                    referenced.update(image["filename"] for image in images)
+                except (ValueError, KeyError, TypeError) as e:
+                    raise TransferError(
+                        f"Cannot read backing chain of {path}: {e}",
+                        self.host,
+                        self.host,
+                    )
+        return referenced
+
+    async def gc(
+        self,
+        budget: int,
+        referenced: Set[str],
+        dry_run: bool = False,
+        grace_period: float = DEFAULT_GC_GRACE_PERIOD,
+    ) -> StoreGCResult:
+        """
+        Evict least recently used files until the store fits into a budget.
+
+        Files referenced by an image in use and files used within the grace
+        period, such as those of a clone still running, are never evicted.
+
+        Args:
+            budget: Bytes the store may occupy
+            referenced: Paths in use on the host, see ``referenced``
+            dry_run: Only report what would be evicted
+            grace_period: Seconds a file is kept after its last use
+
+        Returns:
+            StoreGCResult: Files evicted and bytes freed
+        """
+        if budget < 0:
+            raise ValidationError(f"Store budget must not be negative: {budget}")
+
+        command = CommandBuilder.build_safe_command(
+            "date +%s && find {root} -type f -printf '%T@ %s %p\\n'", root=self.root
+        )
+        async with self.transport.connect(self.host) as conn:
+            stdout = await self._run(conn, command)
+            now, files = self.parse_listing(stdout)
+
+            result = StoreGCResult(
+                host=self.host,
+                total_bytes=sum(size for _, size, _ in files),
+                budget=budget,
+                dry_run=dry_run,
+            )
+            remaining = result.total_bytes
+            for mtime, size, path in sorted(files):
+                if remaining <= budget:
+                    break
+                if path in referenced or now - mtime < grace_period:
+                    continue
+                result.evicted.append(path)
+                result.freed_bytes += size
+                remaining -= size
+
+            if result.evicted and not dry_run:
+                await self._run(
+                    conn,
+                    "rm -f -- " + " ".join(shlex.quote(p) for p in result.evicted),
+                )
+
+        logger.info(
+            f"Store on {self.host}: evicted {len(result.evicted)} files, "
+            f"freed {result.freed_bytes} of {result.total_bytes} bytes",
+            host=self.host,
+            budget=budget,
+            dry_run=dry_run,
+        )
+        return result
+
+    @staticmethod
+    def parse_listing(output: str) -> Tuple[float, List[Tuple[float, int, str]]]:
+        """
+        Parse the current time and the ``find -printf '%T@ %s %p'`` listing.
+
+        Args:
+            output: Output of the listing command
+
+        Returns:
+            Tuple[float, List[Tuple[float, int, str]]]: Host time and the
+            modification time, size and path of every file
+        """
+        lines = output.splitlines()
+        if not lines:
+            raise ValueError("empty store listing")
+        files = []
+        for line in lines[1:]:
+            mtime, size, path = line.split(" ", 2)
+            files.append((float(mtime), int(size), path))
+        return float(lines[0]), files
+
+    async def _run(self, conn: SSHConnection, command: str) -> str:
+        """Run a command and return its output, raising on failure."""
+        stdout, stderr, exit_code = await conn.execute_command(command)
+        if exit_code != 0:
+            raise TransferError(
+                f"Command failed: {command}: {stderr.strip()}", self.host, self.host
+            )
+        return stdout
@@ -4,8 +4,10 @@ VM synchronization operations.
 This module handles VM synchronization (incremental updates) between hosts.
 """
 
+import asyncio
 import uuid
-from typing import Optional, Callable
+from dataclasses import replace
+from typing import Optional, Callable, List
 from datetime import datetime
 
 from .models import (
@@ -13,11 +15,18 @@ from .models import (
     SyncResult,
     ProgressInfo,
     DeltaInfo,
+    ByteRange,
+    ChangedBlockSession,
+    VMInfo,
     OperationType,
-    OperationStatusEnum,
 )
 from .exceptions import VMNotFoundError, TransferError, ValidationError
 from .transport import SSHTransport
+from .transfer import StripedTransfer
+from .delta import DeltaEngine, DEFAULT_BLOCK_SIZE
+from .manifest import ManifestStore
+from .cbt import ChangedBlockTracker
+from .progress import ProgressTracker, run_with_progress
 from .libvirt_wrapper import LibvirtWrapper
 from .security import SecurityValidator, CommandBuilder
 from .logging import logger
@@ -26,10 +35,17 @@ from .logging import logger
 class VMSynchronizer:
     """Handles VM synchronization operations."""
 
-    def __init__(self, transport: SSHTransport, libvirt_wrapper: LibvirtWrapper):
+    def __init__(
+        self,
+        transport: SSHTransport,
+        libvirt_wrapper: LibvirtWrapper,
+        manifests: Optional[ManifestStore] = None,
+    ):
         """Initialize VM synchronizer."""
         self.transport = transport
         self.libvirt = libvirt_wrapper
+        self.manifests = manifests if manifests is not None else ManifestStore()
+        self.tracker = ChangedBlockTracker(transport, libvirt_wrapper)
 
     async def sync(
         self,
@@ -55,6 +71,7 @@ class VMSynchronizer:
         operation_id = str(uuid.uuid4())
         start_time = datetime.now()
         target_vm_name = sync_options.target_name or vm_name
+        tracking: Optional[ChangedBlockSession] = None
 
         logger.info(
             f"Starting sync operation {operation_id}: {vm_name} from {source_host} to {dest_host}",
@@ -70,19 +87,38 @@ class VMSynchronizer:
                 if not await self.libvirt.vm_exists(source_conn, vm_name):
                     raise VMNotFoundError(vm_name, source_host)
 
-                source_vm_info = await self.libvirt.get_vm_info(source_conn, vm_name)
+                source_vm_info = await self.libvirt.get_vm_info(
+                    source_conn, vm_name, refresh=True
+                )
 
             async with self.transport.connect(dest_host) as dest_conn:
                 if not await self.libvirt.vm_exists(dest_conn, target_vm_name):
                     raise VMNotFoundError(target_vm_name, dest_host)
 
-                dest_vm_info = await self.libvirt.get_vm_info(dest_conn, target_vm_name)
+                dest_vm_info = await self.libvirt.get_vm_info(
+                    dest_conn, target_vm_name, refresh=True
+                )
+
+            # Read changed blocks from the VM's dirty bitmaps if requested
+            if sync_options.changed_block_tracking:
+                if all(disk.format == "qcow2" for disk in dest_vm_info.disks):
+                    tracking = await self.tracker.begin(source_host, source_vm_info)
+                else:
+                    logger.info(
+                        "Changed-block tracking needs qcow2 destination disks",
+                        operation_id=operation_id,
+                    )
+            changed_extents = tracking.extents if tracking else None
 
             # Calculate delta if requested
-            _delta_info = None
-            if sync_options.delta_only:
-                _delta_info = await self.calculate_delta(
-                    source_host, dest_host, vm_name, target_vm_name
+            delta_info = None
+            if changed_extents is None and sync_options.delta_only:
+                delta_info = await self.calculate_delta(
+                    source_host,
+                    dest_host,
+                    vm_name,
+                    target_vm_name,
+                    block_size=sync_options.block_size,
                 )
 
             # Create checkpoint if requested
@@ -90,9 +126,27 @@ class VMSynchronizer:
                 await self._create_checkpoint(dest_host, target_vm_name)
 
             # Perform synchronization
-            total_bytes = 0
             transferred_bytes = 0
             blocks_synchronized = 0
+            known_extents = (
+                changed_extents
+                if changed_extents is not None
+                else (delta_info.extents if delta_info else {})
+            )
+            disk_pairs = list(zip(source_vm_info.disks, dest_vm_info.disks))
+            progress = ProgressTracker(
+                progress_callback,
+                operation_id,
+                OperationType.SYNC,
+                total_bytes=sum(
+                    sum(extent.length for extent in known_extents[disk.path])
+                    if disk.path in known_extents
+                    else 0
+                    if changed_extents is not None
+                    else disk.size
+                    for disk, _ in disk_pairs
+                ),
+            )
 
             # Warn if disk counts differ
             if len(source_vm_info.disks) != len(dest_vm_info.disks):
@@ -103,27 +157,40 @@ class VMSynchronizer:
                     operation_id=operation_id,
                 )
 
-            for i, source_disk in enumerate(source_vm_info.disks):
-                if i < len(dest_vm_info.disks):
-                    dest_disk = dest_vm_info.disks[i]
-
-                    if progress_callback:
-                        progress_callback(
-                            ProgressInfo(
-                                operation_id=operation_id,
-                                operation_type=OperationType.SYNC,
-                                progress_percent=(i / len(source_vm_info.disks)) * 100,
-                                bytes_transferred=transferred_bytes,
-                                total_bytes=total_bytes,
-                                speed=0.0,
-                                eta=None,
-                                status=OperationStatusEnum.RUNNING,
-                                message=f"Synchronizing disk {source_disk.target}",
-                                current_file=source_disk.path,
-                            )
-                        )
-
-                    # Sync disk
+            for i, (source_disk, dest_disk) in enumerate(disk_pairs):
+                progress.emit(
+                    f"Synchronizing disk {source_disk.target}",
+                    source_disk.path,
+                    force=True,
+                    percent=i / len(source_vm_info.disks) * 100,
+                )
+
+                def report(transferred: int, path: str = source_disk.path) -> None:
+                    progress.update(path, transferred, current_file=path)
+
+                if tracking and changed_extents is not None:
+                    # Write the blocks reported by changed-block tracking
+                    extents = changed_extents.get(source_disk.path, [])
+                    written = await self.tracker.transfer(
+                        tracking,
+                        dest_host,
+                        source_disk,
+                        dest_disk.path,
+                        extents,
+                        progress=report,
+                    )
+                    sync_stats = {
+                        "bytes_transferred": written,
+                        "blocks_synchronized": DeltaEngine.count_blocks(
+                            extents, sync_options.block_size
+                        ),
+                    }
+                else:
+                    # Sync disk, limited to the changed extents when known
+                    extents = None
+                    if delta_info and source_disk.path in delta_info.extents:
+                        extents = delta_info.extents[source_disk.path]
+
                     sync_stats = await self._sync_disk(
                         source_host,
                         dest_host,
@@ -132,10 +199,30 @@ class VMSynchronizer:
                         sync_options,
                         progress_callback,
                         operation_id,
+                        extents=extents,
+                        disk_size=delta_info.disk_sizes.get(source_disk.path, 0)
+                        if delta_info
+                        else 0,
+                        bytes_callback=report,
                     )
 
-                    transferred_bytes += sync_stats["bytes_transferred"]
-                    blocks_synchronized += sync_stats["blocks_synchronized"]
+                transferred_bytes += sync_stats["bytes_transferred"]
+                blocks_synchronized += sync_stats["blocks_synchronized"]
+                progress.update(
+                    source_disk.path,
+                    sync_stats["bytes_transferred"],
+                    message=f"Synchronized disk {source_disk.target}",
+                    force=True,
+                )
+
+            # The destination now holds this sync's checkpoint state
+            if tracking:
+                await self.tracker.finish(tracking)
+
+            if delta_info:
+                await self._save_manifests(
+                    source_host, dest_host, source_vm_info, dest_vm_info, delta_info
+                )
 
             duration = (datetime.now() - start_time).total_seconds()
 
@@ -161,6 +248,11 @@ class VMSynchronizer:
                 warnings=warnings,
             )
 
+        except asyncio.CancelledError:
+            if tracking:
+                await asyncio.shield(self.tracker.discard(tracking))
+            raise
+
         except Exception as e:
             duration = (datetime.now() - start_time).total_seconds()
             logger.error(
@@ -169,6 +261,10 @@ class VMSynchronizer:
                 exc_info=True,
             )
 
+            # Keep the blocks of this attempt tracked for the next sync
+            if tracking:
+                await self.tracker.discard(tracking)
+
             return SyncResult(
                 operation_id=operation_id,
                 success=False,
@@ -187,15 +283,20 @@ class VMSynchronizer:
         dest_host: str,
         source_vm_name: str,
         dest_vm_name: Optional[str] = None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
     ) -> DeltaInfo:
         """
         Calculate differences between source and destination VMs.
 
+        Fixed-size blocks of each disk pair are hashed on their own hosts and
+        the digests compared, so only hashes cross the wire.
+
         Args:
             source_host: Source host
             dest_host: Destination host
             source_vm_name: Source VM name
             dest_vm_name: Destination VM name (defaults to source_vm_name)
+            block_size: Block size in bytes used for comparison
 
         Returns:
             DeltaInfo: Information about differences
@@ -206,30 +307,59 @@ class VMSynchronizer:
             # Get VM information from both hosts
             async with self.transport.connect(source_host) as source_conn:
                 source_vm_info = await self.libvirt.get_vm_info(
-                    source_conn, source_vm_name
+                    source_conn, source_vm_name, refresh=True
                 )
 
             async with self.transport.connect(dest_host) as dest_conn:
-                dest_vm_info = await self.libvirt.get_vm_info(dest_conn, dest_vm_name)
+                dest_vm_info = await self.libvirt.get_vm_info(
+                    dest_conn, dest_vm_name, refresh=True
+                )
+
+            # Hash both sides of each disk pair concurrently, reusing stored
+            # manifests for disks that have not changed since the last sync
+            engine = DeltaEngine(self.transport, block_size, self.manifests)
+            disk_pairs = list(zip(source_vm_info.disks, dest_vm_info.disks))
+            hashes = await asyncio.gather(
+                *(
+                    asyncio.gather(
+                        engine.hash_disk(
+                            source_host,
+                            source_disk.path,
+                            source_vm_info.uuid,
+                            source_disk.target,
+                        ),
+                        engine.hash_disk(
+                            dest_host,
+                            dest_disk.path,
+                            dest_vm_info.uuid,
+                            dest_disk.target,
+                        ),
+                    )
+                    for source_disk, dest_disk in disk_pairs
+                )
+            )
 
-            # Calculate differences (simplified implementation)
-            total_size = sum(disk.size for disk in source_vm_info.disks)
+            total_size = 0
             changed_size = 0
             changed_blocks = 0
             files_changed = []
-
-            # In a real implementation, this would use tools like rsync --dry-run
-            # or qemu-img compare to calculate actual differences
-            for i, source_disk in enumerate(source_vm_info.disks):
-                if i < len(dest_vm_info.disks):
-                    _dest_disk = dest_vm_info.disks[i]
-
-                    # Simplified: assume some percentage has changed
-                    # Real implementation would compare checksums, modification times, etc.
-                    estimated_change = source_disk.size * 0.1  # Assume 10% changed
-                    changed_size += int(estimated_change)
-                    changed_blocks += int(estimated_change / 4096)  # Assume 4KB blocks
+            extents = {}
+            disk_sizes = {}
+            hashes_by_disk = {}
+
+            for (source_disk, _), (source_hashes, dest_hashes) in zip(
+                disk_pairs, hashes
+            ):
+                disk_extents = engine.compare(source_hashes, dest_hashes)
+                total_size += source_hashes.size
+                disk_sizes[source_disk.path] = source_hashes.size
+                extents[source_disk.path] = disk_extents
+                hashes_by_disk[source_disk.path] = source_hashes
+
+                if disk_extents or source_hashes.size != dest_hashes.size:
                     files_changed.append(source_disk.path)
+                changed_size += sum(extent.length for extent in disk_extents)
+                changed_blocks += engine.count_blocks(disk_extents, block_size)
 
             # Estimate transfer time based on changed size and typical network speed
             estimated_speed = 100 * 1024 * 1024  # 100 MB/s
@@ -243,12 +373,67 @@ class VMSynchronizer:
                 changed_blocks=changed_blocks,
                 files_changed=files_changed,
                 estimated_transfer_time=estimated_transfer_time,
+                extents=extents,
+                disk_sizes=disk_sizes,
+                source_hashes=hashes_by_disk,
             )
 
         except Exception as e:
             logger.error(f"Failed to calculate delta: {e}", exc_info=True)
             raise TransferError(str(e), source_host, dest_host)
 
+    async def _save_manifests(
+        self,
+        source_host: str,
+        dest_host: str,
+        source_vm_info: VMInfo,
+        dest_vm_info: VMInfo,
+        delta_info: DeltaInfo,
+    ) -> None:
+        """
+        Persist block manifests for both hosts after a successful sync.
+
+        After the sync both disks hold the data described by the source
+        digests. A manifest is only stored when the source file is unchanged
+        since it was hashed; otherwise the destination may hold newer data
+        than the digests describe and the next sync hashes both sides again.
+        """
+        engine = DeltaEngine(self.transport, manifests=self.manifests)
+
+        for source_disk, dest_disk in zip(source_vm_info.disks, dest_vm_info.disks):
+            hashes = delta_info.source_hashes.get(source_disk.path)
+            if hashes is None or hashes.identity is None:
+                continue
+
+            try:
+                source_identity, dest_identity = await asyncio.gather(
+                    engine.stat(source_host, source_disk.path),
+                    engine.stat(dest_host, dest_disk.path),
+                )
+                if source_identity != hashes.identity:
+                    logger.info(
+                        f"Source disk {source_disk.path} changed during sync; "
+                        "not storing block manifest",
+                        host=source_host,
+                    )
+                    continue
+
+                self.manifests.save(
+                    source_host, source_vm_info.uuid, source_disk.target, hashes
+                )
+                self.manifests.save(
+                    dest_host,
+                    dest_vm_info.uuid,
+                    dest_disk.target,
+                    replace(hashes, identity=dest_identity),
+                )
+            except Exception as e:
+                # Manifests only speed up the next sync; never fail this one
+                logger.warning(
+                    f"Failed to store block manifest for {source_disk.path}: {e}",
+                    host=source_host,
+                )
+
     async def _create_checkpoint(self, host: str, vm_name: str) -> None:
         """Create a checkpoint/snapshot before synchronization."""
         try:
@@ -305,10 +490,16 @@ class VMSynchronizer:
         sync_options: SyncOptions,
         progress_callback: Optional[Callable[[ProgressInfo], None]],
         operation_id: str,
+        extents: Optional[List[ByteRange]] = None,
+        disk_size: int = 0,
+        bytes_callback: Optional[Callable[[int], None]] = None,
     ) -> dict:
         """
         Synchronize a single disk image.
 
+        When the changed extents are known only those are copied; otherwise
+        the whole image is synchronized with rsync.
+
         Args:
             source_host: Source host
             dest_host: Destination host
@@ -317,6 +508,9 @@ class VMSynchronizer:
             sync_options: Sync options
             progress_callback: Progress callback
             operation_id: Operation ID
+            extents: Changed extents of the source disk, if known
+            disk_size: Size of the source disk in bytes (with ``extents``)
+            bytes_callback: Called with the cumulative bytes transferred
 
         Returns:
             dict: Sync statistics
@@ -325,9 +519,28 @@ class VMSynchronizer:
             # Validate inputs
             source_host = SecurityValidator.validate_hostname(source_host)
             dest_host = SecurityValidator.validate_hostname(dest_host)
+            compression = SecurityValidator.validate_compression(sync_options.compress)
+
+            if extents is not None:
+                striped = StripedTransfer(
+                    self.transport,
+                    source_host,
+                    dest_host,
+                    progress=bytes_callback,
+                    compression=compression,
+                )
+                await striped.transfer_extents(
+                    source_path, dest_path, extents, disk_size
+                )
+                return {
+                    "bytes_transferred": sum(extent.length for extent in extents),
+                    "blocks_synchronized": DeltaEngine.count_blocks(
+                        extents, sync_options.block_size
+                    ),
+                }
 
-            # Build secure rsync command
-            additional_options: list[str] = []
+            # Build secure rsync command, reporting overall progress
+            additional_options: list[str] = ["--info=progress2"]
 
             # Add bandwidth limit if specified
             if sync_options.bandwidth_limit:
@@ -341,10 +554,9 @@ class VMSynchronizer:
                     dest_path=dest_path,
                     bandwidth_limit=sync_options.bandwidth_limit,
                     additional_options=additional_options,
+                    compression=compression,
                 )
 
-                async with self.transport.connect(source_host) as conn:
-                    stdout, stderr, exit_code = await conn.execute_command(command)
             else:
                 # Remote sync
                 command = CommandBuilder.build_rsync_command(
@@ -353,26 +565,26 @@ class VMSynchronizer:
                     dest_host=dest_host,
                     bandwidth_limit=sync_options.bandwidth_limit,
                     additional_options=additional_options,
+                    compression=compression,
                 )
 
-                async with self.transport.connect(source_host) as conn:
-                    stdout, stderr, exit_code = await conn.execute_command(command)
+            async with self.transport.connect(source_host) as conn:
+                bytes_transferred, stderr, exit_code = await run_with_progress(
+                    conn, command, bytes_callback
+                )
 
             if exit_code != 0:
                 raise TransferError(f"Rsync failed: {stderr}", source_host, dest_host)
 
-            # Parse rsync output for statistics (simplified)
-            bytes_transferred = 0
-            blocks_synchronized = 0
-
-            # In a real implementation, parse rsync output to get actual statistics
-            # For now, return placeholder values
+            # rsync compares whole files; it does not report changed blocks
             return {
                 "bytes_transferred": bytes_transferred,
-                "blocks_synchronized": blocks_synchronized,
+                "blocks_synchronized": 0,
             }
 
         except ValidationError as e:
             raise TransferError(f"Validation error: {e}", source_host, dest_host)
+        except TransferError:
+            raise
         except Exception as e:
             raise TransferError(str(e), source_host, dest_host)
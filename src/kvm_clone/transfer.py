@@ -0,0 +1,670 @@
+"""
+Disk image transfer backends.
+
+This module implements transfer strategies used by the cloner as alternatives
+to copying a whole disk image with a single rsync or cp process.
+"""
+
+import asyncio
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .logging import logger
+from .models import (
+    ByteRange,
+    CompressionSpec,
+    DiskVerification,
+    PipeResult,
+    TransferStats,
+)
+from .exceptions import TransferError
+from .transport import SSHTransport, DEFAULT_PIPE_CHUNK_SIZE, DEFAULT_PIPE_BUFFERS
+from .security import CommandBuilder
+from .journal import TransferJournal
+from .verify import (
+    DEFAULT_REPAIR_ATTEMPTS,
+    DEFAULT_VERIFY_BLOCK_SIZE,
+    blocks_to_extents,
+    build_verified_read_command,
+    build_verified_write_command,
+    merkle_root,
+    mismatched_blocks,
+    parse_digests,
+    parse_reader_output,
+)
+
+TRANSFER_MODES = ("rsync", "striped", "sparse", "stream")
+DEFAULT_STRIPE_SIZE = 256 * 1024 * 1024  # bytes
+DEFAULT_STRIPE_RETRIES = 3
+
+
+class StripedTransfer:
+    """
+    Transfers a single disk image as concurrently copied byte ranges.
+
+    The image is split into fixed-size stripes. Up to ``parallel`` stripes are
+    copied at the same time, each over its own SSH channel, and written with
+    positional writes into a pre-sized destination file. Every stripe is
+    verified by comparing checksums on both hosts, and a stripe that fails is
+    retried on its own.
+    """
+
+    def __init__(
+        self,
+        transport: SSHTransport,
+        source_host: str,
+        dest_host: str,
+        stripe_size: int = DEFAULT_STRIPE_SIZE,
+        parallel: int = 4,
+        max_retries: int = DEFAULT_STRIPE_RETRIES,
+        progress: Optional[Callable[[int], None]] = None,
+        compression: Optional[CompressionSpec] = None,
+        journal: Optional[TransferJournal] = None,
+    ):
+        """
+        Initialize striped transfer.
+
+        ``progress`` is called with the cumulative bytes copied and verified
+        each time a stripe completes. ``compression`` is applied to every
+        stripe sent between the hosts. With a ``journal``, every verified
+        stripe is recorded and stripes it lists as done are not copied again;
+        the disk must already be recorded in the journal.
+        """
+        if stripe_size <= 0:
+            raise ValueError("stripe_size must be positive")
+
+        self.transport = transport
+        self.source_host = source_host
+        self.dest_host = dest_host
+        self.stripe_size = stripe_size
+        self.parallel = max(1, parallel)
+        self.max_retries = max(1, max_retries)
+        self.progress = progress
+        self.compression = compression
+        self.journal = journal
+
+    @staticmethod
+    def plan_ranges(size: int, stripe_size: int) -> List[ByteRange]:
+        """Split a file of ``size`` bytes into stripes of ``stripe_size`` bytes."""
+        return [
+            ByteRange(offset=offset, length=min(stripe_size, size - offset))
+            for offset in range(0, size, stripe_size)
+        ]
+
+    async def transfer(self, source_path: str, dest_path: str) -> TransferStats:
+        """
+        Transfer a file from the source host to the destination host.
+
+        Args:
+            source_path: Source file path
+            dest_path: Destination file path
+
+        Returns:
+            TransferStats: Statistics of the transfer
+        """
+        start_time = datetime.now()
+        stats = TransferStats(start_time=start_time)
+
+        size = await self._file_size(self.source_host, source_path)
+        await self.transfer_extents(
+            source_path,
+            dest_path,
+            [ByteRange(0, size)],
+            size,
+            discard=not self._resuming(source_path),
+        )
+
+        stats.end_time = datetime.now()
+        stats.bytes_transferred = size
+        stats.virtual_bytes = size
+        stats.files_transferred = 1
+        duration = (stats.end_time - start_time).total_seconds()
+        if duration > 0:
+            stats.average_speed = size / duration
+
+        return stats
+
+    async def transfer_extents(
+        self,
+        source_path: str,
+        dest_path: str,
+        extents: List[ByteRange],
+        size: int,
+        discard: bool = False,
+    ) -> None:
+        """
+        Copy extents of a file into a destination file of ``size`` bytes.
+
+        The destination file is resized to ``size`` first; bytes outside the
+        extents are left untouched unless ``discard`` is set, which empties
+        the file first so they read as zeroes. Extents are split into stripes
+        that are copied concurrently and verified individually.
+
+        Args:
+            source_path: Source file path
+            dest_path: Destination file path
+            extents: Byte ranges to copy
+            size: Final size of the destination file
+            discard: Drop the existing contents of the destination file
+        """
+        await self._preallocate(dest_path, size, discard)
+        await self._transfer_ranges(
+            source_path, dest_path, self.split_ranges(extents, self.stripe_size)
+        )
+
+    @staticmethod
+    def split_ranges(extents: List[ByteRange], stripe_size: int) -> List[ByteRange]:
+        """Split extents into ranges no larger than ``stripe_size`` bytes."""
+        ranges = []
+        for extent in extents:
+            for byte_range in StripedTransfer.plan_ranges(extent.length, stripe_size):
+                ranges.append(
+                    ByteRange(
+                        offset=extent.offset + byte_range.offset,
+                        length=byte_range.length,
+                    )
+                )
+        return ranges
+
+    async def _transfer_ranges(
+        self, source_path: str, dest_path: str, ranges: List[ByteRange]
+    ) -> None:
+        """Copy byte ranges with at most ``parallel`` ranges in flight."""
+        semaphore = asyncio.Semaphore(self.parallel)
+        journaled = self.journal.disk(source_path) if self.journal else None
+        copied = 0
+
+        async def run(byte_range: ByteRange) -> None:
+            nonlocal copied
+            if journaled is None or not journaled.is_range_done(byte_range):
+                async with semaphore:
+                    checksum = await self._transfer_range(
+                        source_path, dest_path, byte_range
+                    )
+                if self.journal:
+                    self.journal.record_range(source_path, byte_range, checksum)
+            copied += byte_range.length
+            if self.progress:
+                self.progress(copied)
+
+        tasks = [asyncio.ensure_future(run(byte_range)) for byte_range in ranges]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _transfer_range(
+        self, source_path: str, dest_path: str, byte_range: ByteRange
+    ) -> str:
+        """
+        Copy one stripe and verify it, retrying the stripe on failure.
+
+        Returns:
+            str: Checksum of the stripe on both hosts
+        """
+        last_error = ""
+        for attempt in range(1, self.max_retries + 1):
+            command = CommandBuilder.build_range_copy_command(
+                source_path,
+                dest_path,
+                byte_range.offset,
+                byte_range.length,
+                dest_host=None
+                if self.dest_host == self.source_host
+                else self.dest_host,
+                compression=self.compression,
+            )
+            async with self.transport.connect(self.source_host) as conn:
+                _, stderr, exit_code = await conn.execute_command(command)
+
+            if exit_code != 0:
+                last_error = stderr.strip()
+            else:
+                source_sum, dest_sum = await asyncio.gather(
+                    self._range_checksum(self.source_host, source_path, byte_range),
+                    self._range_checksum(self.dest_host, dest_path, byte_range),
+                )
+                if source_sum == dest_sum:
+                    return source_sum
+                last_error = "checksum mismatch"
+
+            logger.warning(
+                f"Stripe at offset {byte_range.offset} failed: {last_error}",
+                source_host=self.source_host,
+                dest_host=self.dest_host,
+                offset=byte_range.offset,
+                length=byte_range.length,
+                attempt=attempt,
+            )
+
+        raise TransferError(
+            f"Stripe at offset {byte_range.offset} failed after "
+            f"{self.max_retries} attempts: {last_error}",
+            self.source_host,
+            self.dest_host,
+        )
+
+    async def _range_checksum(self, host: str, path: str, byte_range: ByteRange) -> str:
+        """Compute the checksum of one stripe on a host."""
+        command = CommandBuilder.build_range_checksum_command(
+            path, byte_range.offset, byte_range.length
+        )
+        async with self.transport.connect(host) as conn:
+            stdout, stderr, exit_code = await conn.execute_command(command)
+
+        if exit_code != 0:
+            raise TransferError(
+                f"Checksum failed on {host}: {stderr}", self.source_host, self.dest_host
+            )
+        return stdout.split()[0] if stdout.strip() else ""
+
+    async def _file_size(self, host: str, path: str) -> int:
+        """Get the size of a file on a host."""
+        command = CommandBuilder.build_safe_command("stat -c %s {path}", path=path)
+        async with self.transport.connect(host) as conn:
+            stdout, stderr, exit_code = await conn.execute_command(command)
+
+        if exit_code != 0:
+            raise TransferError(
+                f"Cannot stat {path}: {stderr}", self.source_host, self.dest_host
+            )
+        return int(stdout.strip())
+
+    def _resuming(self, source_path: str) -> bool:
+        """Whether the journal holds verified stripes of a disk to keep."""
+        journaled = self.journal.disk(source_path) if self.journal else None
+        return journaled is not None and bool(journaled.ranges)
+
+    async def _preallocate(self, dest_path: str, size: int, discard: bool) -> None:
+        """Create the destination file with its final size."""
+        template = "truncate -s {size} {path}"
+        if discard:
+            # Stale data would otherwise show through every skipped hole
+            template = "truncate -s 0 {path} && " + template
+        command = CommandBuilder.build_safe_command(template, size=size, path=dest_path)
+        async with self.transport.connect(self.dest_host) as conn:
+            _, stderr, exit_code = await conn.execute_command(command)
+
+        if exit_code != 0:
+            raise TransferError(
+                f"Cannot create {dest_path}: {stderr}",
+                self.source_host,
+                self.dest_host,
+            )
+
+
+class SparseTransfer(StripedTransfer):
+    """
+    Transfers only the allocated extents of a disk image.
+
+    Allocated extents of the source file are discovered with
+    ``qemu-img map -f raw``, which reports host file allocation (SEEK_DATA /
+    SEEK_HOLE) for any image format. The destination file is created sparse
+    with its full size and only the allocated extents are copied into it, so
+    holes are neither read nor sent and the clone stays thin-provisioned.
+    """
+
+    async def transfer(self, source_path: str, dest_path: str) -> TransferStats:
+        """
+        Transfer the allocated extents of a file to the destination host.
+
+        Args:
+            source_path: Source file path
+            dest_path: Destination file path
+
+        Returns:
+            TransferStats: Statistics of the transfer; ``bytes_transferred``
+            holds the allocated bytes and ``virtual_bytes`` the file size
+        """
+        start_time = datetime.now()
+        stats = TransferStats(start_time=start_time)
+
+        size = await self._file_size(self.source_host, source_path)
+        extents = await self._allocated_extents(source_path)
+        allocated = sum(extent.length for extent in extents)
+
+        await self.transfer_extents(
+            source_path,
+            dest_path,
+            extents,
+            size,
+            discard=not self._resuming(source_path),
+        )
+
+        logger.info(
+            f"Sparse transfer of {source_path}: {allocated} of {size} bytes allocated",
+            source_host=self.source_host,
+            dest_host=self.dest_host,
+            allocated_bytes=allocated,
+            virtual_bytes=size,
+        )
+
+        stats.end_time = datetime.now()
+        stats.bytes_transferred = allocated
+        stats.virtual_bytes = size
+        stats.files_transferred = 1
+        duration = (stats.end_time - start_time).total_seconds()
+        if duration > 0:
+            stats.average_speed = allocated / duration
+
+        return stats
+
+    @staticmethod
+    def parse_extent_map(output: str) -> List[ByteRange]:
+        """
+        Parse ``qemu-img map --output=json`` output into allocated extents.
+
+        Extents that hold data and are not known to read as zeroes are
+        returned in order, with adjacent extents merged.
+        """
+        extents: List[ByteRange] = []
+        for entry in json.loads(output or "[]"):
+            SparseTransfer.add_map_entry(extents, entry)
+        return extents
+
+    @staticmethod
+    def parse_map_line(line: str) -> Optional[Dict[str, Any]]:
+        """
+        Parse one line of ``qemu-img map --output=json`` output.
+
+        qemu-img prints one map entry per line inside the JSON array, so the
+        map can be parsed while it streams in instead of after buffering it.
+
+        Returns:
+            Optional[Dict[str, Any]]: Map entry, or None for lines without one
+        """
+        text = line.strip().lstrip("[").rstrip(",]").strip()
+        if not text:
+            return None
+        entry = json.loads(text)
+        if not isinstance(entry, dict):
+            raise TypeError(f"Unexpected extent map line: {line}")
+        return entry
+
+    @staticmethod
+    def add_map_entry(extents: List[ByteRange], entry: Dict[str, Any]) -> None:
+        """Append an allocated map entry to extents, merging adjacent ones."""
+        if not entry.get("data") or entry.get("zero"):
+            return
+        start, length = int(entry["start"]), int(entry["length"])
+        if length <= 0:
+            return
+        if extents and extents[-1].offset + extents[-1].length == start:
+            extents[-1].length += length
+        else:
+            extents.append(ByteRange(offset=start, length=length))
+
+    async def _allocated_extents(self, path: str) -> List[ByteRange]:
+        """Discover the allocated extents of a file on the source host."""
+        command = CommandBuilder.build_safe_command(
+            "qemu-img map --output=json -f raw {path}", path=path
+        )
+        extents: List[ByteRange] = []
+        errors: List[str] = []
+
+        # Fragmented images map to millions of entries; parse them as they
+        # arrive rather than holding the whole JSON document
+        async with self.transport.connect(self.source_host) as conn:
+            async with conn.stream_command(command) as stream:
+                try:
+                    async for name, line in stream:
+                        if name == "stderr":
+                            errors.append(line)
+                            continue
+                        entry = self.parse_map_line(line)
+                        if entry is not None:
+                            self.add_map_entry(extents, entry)
+                except (ValueError, KeyError, TypeError) as e:
+                    raise TransferError(
+                        f"Invalid extent map for {path}: {e}",
+                        self.source_host,
+                        self.dest_host,
+                    )
+                exit_code = await stream.wait()
+
+        if exit_code != 0:
+            raise TransferError(
+                f"Cannot map extents of {path}: {' '.join(errors)}",
+                self.source_host,
+                self.dest_host,
+            )
+
+        return extents
+
+
+class StreamTransfer:
+    """
+    Streams a disk image from the source host to the destination through
+    the controller.
+
+    A reader on the source host writes the image to stdout and a writer on
+    the destination host stores its stdin. The controller pumps the bytes
+    between both SSH channels with ``SSHTransport.pipe``, so the hosts need
+    no SSH access to each other.
+
+    With ``verify`` both ends hash every block as it passes. Blocks whose
+    digests differ are streamed again on their own, the same way.
+    """
+
+    def __init__(
+        self,
+        transport: SSHTransport,
+        source_host: str,
+        dest_host: str,
+        chunk_size: int = DEFAULT_PIPE_CHUNK_SIZE,
+        buffers: int = DEFAULT_PIPE_BUFFERS,
+        progress: Optional[Callable[[int], None]] = None,
+        compression: Optional[CompressionSpec] = None,
+        verify: bool = False,
+        block_size: int = DEFAULT_VERIFY_BLOCK_SIZE,
+        max_repairs: int = DEFAULT_REPAIR_ATTEMPTS,
+    ):
+        """
+        Initialize stream transfer.
+
+        With ``compression`` the reader compresses the image and the writer
+        decompresses it, so the controller only relays compressed bytes;
+        ``progress`` then counts bytes on the wire.
+        """
+        if block_size <= 0:
+            raise ValueError("block_size must be positive")
+
+        self.transport = transport
+        self.source_host = source_host
+        self.dest_host = dest_host
+        self.chunk_size = chunk_size
+        self.buffers = buffers
+        self.progress = progress
+        self.compression = compression
+        self.verify = verify
+        self.block_size = block_size
+        self.max_repairs = max(0, max_repairs)
+
+    async def transfer(self, source_path: str, dest_path: str) -> TransferStats:
+        """
+        Stream a file from the source host to the destination host.
+
+        Args:
+            source_path: Source file path
+            dest_path: Destination file path
+
+        Returns:
+            TransferStats: Statistics of the transfer
+
+        Raises:
+            TransferError: If either command fails or blocks still differ
+                after all repairs
+        """
+        start_time = datetime.now()
+        if self.verify:
+            reader = build_verified_read_command(
+                source_path, self.block_size, compression=self.compression
+            )
+            writer = build_verified_write_command(
+                dest_path, self.block_size, compression=self.compression
+            )
+        else:
+            reader = CommandBuilder.build_stream_read_command(
+                source_path, self.compression
+            )
+            writer = CommandBuilder.build_stream_write_command(
+                dest_path, self.compression
+            )
+        result = await self._pipe(source_path, dest_path, reader, writer, self.progress)
+
+        virtual_bytes = result.bytes_transferred
+        verification = None
+        if self.verify:
+            verification, virtual_bytes = await self._verify(
+                source_path, dest_path, result
+            )
+        elif self.compression is not None and self.compression.enabled:
+            virtual_bytes = await self._file_size(source_path)
+
+        stats = TransferStats(
+            start_time=start_time,
+            end_time=datetime.now(),
+            bytes_transferred=result.bytes_transferred,
+            virtual_bytes=virtual_bytes,
+            files_transferred=1,
+            verification=verification,
+        )
+        if result.duration > 0:
+            stats.average_speed = result.bytes_transferred / result.duration
+        return stats
+
+    async def _pipe(
+        self,
+        source_path: str,
+        dest_path: str,
+        reader: str,
+        writer: str,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> PipeResult:
+        """Run reader and writer through the controller, checking both exit codes."""
+        result = await self.transport.pipe(
+            self.source_host,
+            reader,
+            self.dest_host,
+            writer,
+            chunk_size=self.chunk_size,
+            buffers=self.buffers,
+            progress=progress,
+        )
+
+        if result.reader_exit_code != 0:
+            raise TransferError(
+                f"Reading {source_path} failed: {result.reader_stderr.strip()}",
+                self.source_host,
+                self.dest_host,
+            )
+        if result.writer_exit_code != 0:
+            raise TransferError(
+                f"Writing {dest_path} failed: {result.writer_stderr.strip()}",
+                self.source_host,
+                self.dest_host,
+            )
+        return result
+
+    async def _verify(
+        self, source_path: str, dest_path: str, result: PipeResult
+    ) -> Tuple[DiskVerification, int]:
+        """Compare the inline digests of both ends and re-stream bad blocks."""
+        try:
+            size, source_digests = parse_reader_output(result.reader_stderr)
+        except ValueError as e:
+            raise TransferError(str(e), self.source_host, self.dest_host)
+        dest_digests = parse_digests(result.writer_stdout)
+
+        # A reader failing mid-file is not always visible in the exit code of
+        # a compressing pipeline, but it leaves the digest list short
+        if len(source_digests) != -(-size // self.block_size):
+            raise TransferError(
+                f"Reading {source_path} stopped after {len(source_digests)} blocks",
+                self.source_host,
+                self.dest_host,
+            )
+
+        bad = mismatched_blocks(source_digests, dest_digests)
+        dest_digests = list(dest_digests[: len(source_digests)])
+        dest_digests += [""] * (len(source_digests) - len(dest_digests))
+        verification = DiskVerification(
+            source_path=source_path,
+            dest_path=dest_path,
+            block_size=self.block_size,
+            blocks=len(source_digests),
+            source_root=merkle_root(source_digests),
+            mismatched_blocks=len(bad),
+            inline=True,
+        )
+
+        attempts = 0
+        while bad:
+            if attempts >= self.max_repairs:
+                raise TransferError(
+                    f"{dest_path} differs from {source_path} in {len(bad)} blocks "
+                    f"after {attempts} repairs",
+                    self.source_host,
+                    self.dest_host,
+                )
+            logger.warning(
+                f"Re-sending {len(bad)} blocks of {dest_path} that failed verification",
+                source_host=self.source_host,
+                dest_host=self.dest_host,
+                attempt=attempts + 1,
+            )
+            for extent in blocks_to_extents(bad, self.block_size, size):
+                await self._resend(source_path, dest_path, extent, dest_digests)
+                verification.resent_bytes += extent.length
+            attempts += 1
+            bad = mismatched_blocks(source_digests, dest_digests)
+
+        verification.dest_root = merkle_root(dest_digests)
+        return verification, size
+
+    async def _resend(
+        self,
+        source_path: str,
+        dest_path: str,
+        extent: ByteRange,
+        dest_digests: List[str],
+    ) -> None:
+        """Stream one extent again, recording the digests of the new copy."""
+        result = await self._pipe(
+            source_path,
+            dest_path,
+            build_verified_read_command(
+                source_path,
+                self.block_size,
+                extent.offset,
+                extent.length,
+                compression=self.compression,
+            ),
+            build_verified_write_command(
+                dest_path,
+                self.block_size,
+                extent.offset,
+                truncate=False,
+                compression=self.compression,
+            ),
+        )
+        first = extent.offset // self.block_size
+        for index, digest in enumerate(parse_digests(result.writer_stdout)):
+            if first + index < len(dest_digests):
+                dest_digests[first + index] = digest
+
+    async def _file_size(self, path: str) -> int:
+        """Get the size of a file on the source host."""
+        command = CommandBuilder.build_safe_command("stat -c %s {path}", path=path)
+        async with self.transport.connect(self.source_host) as conn:
+            stdout, stderr, exit_code = await conn.execute_command(command)
+
+        if exit_code != 0:
+            raise TransferError(
+                f"Cannot stat {path}: {stderr}", self.source_host, self.dest_host
+            )
+        return int(stdout.strip())
@@ -2,24 +2,414 @@
 SSH transport layer for KVM cloning operations.
 
 This module handles SSH connections and secure data transfer between hosts.
+By default connections use paramiko, whose blocking calls run in the bounded
+thread pools of :mod:`kvm_clone.transport_executor`. The ``asyncssh`` backend
+in :mod:`kvm_clone.asyncssh_transport` offers the same interface on native
+asyncio.
 """
 
 import asyncio
-from typing import Optional, Dict, Callable, AsyncIterator
+import functools
+import queue
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import (
+    Any,
+    Awaitable,
+    Optional,
+    Dict,
+    Callable,
+    AsyncIterator,
+    Deque,
+    List,
+    Tuple,
+    Type,
+    Union,
+)
 from pathlib import Path
 import paramiko
 from contextlib import asynccontextmanager
 
 from .logging import logger
 
-from .models import SSHConnectionInfo, TransferStats
-from .exceptions import SSHError, AuthenticationError, ConnectionError, TimeoutError
+from .models import (
+    SSHConnectionInfo,
+    TransferStats,
+    PoolStats,
+    PipeResult,
+    ExecutorStats,
+    SSHTuning,
+)
+from .exceptions import (
+    SSHError,
+    AuthenticationError,
+    ConfigurationError,
+    ConnectionError,
+    TimeoutError,
+)
 from .security import SSHSecurity
+from .sftp_pipeline import (
+    DEFAULT_REQUEST_SIZE,
+    DEFAULT_WINDOW,
+    paramiko_copy,
+)
+from .transport_executor import (
+    BlockingPool,
+    DEFAULT_CONTROL_WORKERS,
+    DEFAULT_MAX_QUEUE,
+    DEFAULT_STREAM_WORKERS,
+)
+
+SSH_BACKENDS = ("paramiko", "asyncssh")
+DEFAULT_SSH_BACKEND = "paramiko"
+DEFAULT_MAX_CONNECTIONS = 4  # per host
+DEFAULT_MAX_CHANNELS = 8  # concurrent operations per connection
+# Channels cost no threads with asyncssh; OpenSSH allows 10 per connection
+# (MaxSessions), so raise ssh_max_channels together with MaxSessions
+BACKEND_MAX_CHANNELS = {"paramiko": DEFAULT_MAX_CHANNELS, "asyncssh": 10}
+DEFAULT_IDLE_TIMEOUT = 300.0  # seconds
+DEFAULT_KEEPALIVE_INTERVAL = 30  # seconds
+DEFAULT_STREAM_BUFFER = 64  # chunks queued per command before reading pauses
+DEFAULT_CHUNK_SIZE = 32 * 1024  # bytes
+MIN_POLL_INTERVAL = 0.001  # seconds between checks of a channel for output
+MAX_POLL_INTERVAL = 0.05  # seconds; an idle channel is checked less often
+MAX_LINE_LENGTH = 1024 * 1024  # bytes; longer lines are split
+DEFAULT_PIPE_CHUNK_SIZE = 4 * 1024 * 1024  # bytes
+DEFAULT_PIPE_BUFFERS = 8  # chunks in flight between reader and writer
+
+
+class CommandStream:
+    """
+    Output of a remote command, delivered as it arrives.
+
+    stdout and stderr are drained concurrently by reader tasks into a
+    bounded queue. Neither stream can stall the other, and a slow consumer
+    throttles the remote command through the SSH window instead of having
+    its output buffered in memory. The channel is polled and only read when
+    data or end of file is waiting, so a running command holds no worker
+    thread and stderr is drained however many commands run at once.
+    """
+
+    def __init__(
+        self,
+        channel: Any,
+        host: str,
+        timeout: Optional[int] = None,
+        max_buffer: int = DEFAULT_STREAM_BUFFER,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        """
+        Initialize command stream.
+
+        Args:
+            channel: Channel the command runs on (``paramiko.Channel``)
+            host: Host running the command
+            timeout: Seconds without any output before giving up
+            max_buffer: Maximum number of chunks held in memory
+            chunk_size: Maximum size of one chunk in bytes
+        """
+        self.channel = channel
+        self.host = host
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.exit_code: Optional[int] = None
+        self._queue: "asyncio.Queue[Tuple[str, Union[bytes, Exception]]]" = (
+            asyncio.Queue(maxsize=max_buffer)
+        )
+        self._readers: List["asyncio.Task[None]"] = []
+        self._started = False
+
+    async def chunks(self) -> AsyncIterator[Tuple[str, bytes]]:
+        """
+        Yield ``(stream, data)`` chunks until the command exits.
+
+        ``stream`` is ``"stdout"`` or ``"stderr"``. ``exit_code`` is set once
+        both streams are exhausted.
+        """
+        if self._started:
+            raise SSHError("Command output already consumed", self.host, "stream")
+        self._started = True
+        self._start_readers()
+
+        open_streams = 2
+        while open_streams:
+            try:
+                name, data = await asyncio.wait_for(self._queue.get(), self.timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(
+                    "Command produced no output",
+                    "command_execution",
+                    self.timeout or 0,
+                )
+            if isinstance(data, Exception):
+                raise SSHError(f"Reading {name} failed: {data}", self.host, "stream")
+            if not data:
+                open_streams -= 1
+                continue
+            yield name, data
+
+        self.exit_code = await self._exit_status()
+
+    def _start_readers(self) -> None:
+        """Start tasks moving stdout and stderr of the channel into the queue."""
+        for name, ready, recv in (
+            ("stdout", self.channel.recv_ready, self.channel.recv),
+            ("stderr", self.channel.recv_stderr_ready, self.channel.recv_stderr),
+        ):
+            reader = functools.partial(self._poll, ready, recv)
+            self._readers.append(asyncio.create_task(self._read(name, reader)))
+
+    async def _read(self, name: str, recv: Callable[[], Awaitable[bytes]]) -> None:
+        """Reader task: move one stream's data, or its read error, into the queue."""
+        while True:
+            try:
+                data = await recv()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self._queue.put((name, e))
+                return
+            await self._queue.put((name, data))
+            if not data:
+                return
+
+    async def _poll(
+        self, ready: Callable[[], bool], recv: Callable[[int], bytes]
+    ) -> bytes:
+        """Read one chunk of a stream once the read cannot block."""
+        # Buffered data or end of file (after the remaining data) never block
+        await self._wait_until(
+            lambda: ready() or self.channel.eof_received or self.channel.closed
+        )
+        return recv(self.chunk_size)
+
+    async def _exit_status(self) -> int:
+        """Wait for the exit code of the command."""
+        await self._wait_until(self.channel.exit_status_ready)
+        exit_code: int = self.channel.recv_exit_status()
+        return exit_code
+
+    @staticmethod
+    async def _wait_until(condition: Callable[[], bool]) -> None:
+        """Poll a channel condition, backing off while the channel is idle."""
+        delay = MIN_POLL_INTERVAL
+        while not condition():
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_POLL_INTERVAL)
+
+    async def lines(self) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Yield ``(stream, line)`` for each non-empty output line.
+
+        Both ``\\n`` and ``\\r`` end a line, so progress meters that
+        redraw with carriage returns are seen on every update.
+        """
+        partial = {"stdout": b"", "stderr": b""}
+        async for name, data in self.chunks():
+            parts = re.split(rb"[\r\n]", partial[name] + data)
+            partial[name] = parts.pop()
+            if len(partial[name]) > MAX_LINE_LENGTH:
+                parts.append(partial[name])
+                partial[name] = b""
+            for part in parts:
+                if part:
+                    yield name, part.decode("utf-8", errors="replace")
+
+        for name, rest in partial.items():
+            if rest:
+                yield name, rest.decode("utf-8", errors="replace")
+
+    def __aiter__(self) -> AsyncIterator[Tuple[str, str]]:
+        return self.lines()
+
+    async def wait(self) -> int:
+        """Discard remaining output and return the exit code."""
+        if not self._started:
+            async for _ in self.chunks():
+                pass
+        if self.exit_code is None:
+            raise SSHError("Command output was not fully read", self.host, "stream")
+        return self.exit_code
+
+    def close(self) -> None:
+        """Stop reading and close the channel, terminating the command."""
+        for reader in self._readers:
+            reader.cancel()
+        self.channel.close()
+
+
+class ChannelPipe:
+    """
+    Pumps the output of a command on one channel into another command's input.
+
+    A reader thread fills chunks from the source channel into a bounded ring
+    of ``buffers`` slots and the calling thread sends them to the destination
+    channel. When the writer falls behind the ring fills up and the reader
+    stops reading, which in turn stops the remote reader through the SSH
+    window. Chunks are handed from reader to writer by reference, never
+    copied. The stderr of both commands and the writer's stdout are drained
+    concurrently so they cannot stall the transfer.
+    """
+
+    def __init__(
+        self,
+        reader: Any,
+        writer: Any,
+        chunk_size: int = DEFAULT_PIPE_CHUNK_SIZE,
+        buffers: int = DEFAULT_PIPE_BUFFERS,
+        progress: Optional[Callable[[int], None]] = None,
+    ):
+        """
+        Initialize channel pipe.
+
+        Args:
+            reader: Channel running the reading command (``paramiko.Channel``)
+            writer: Channel running the writing command
+            chunk_size: Bytes per chunk
+            buffers: Number of chunks buffered between reader and writer
+            progress: Called from the writer thread with cumulative bytes sent
+        """
+        if chunk_size <= 0 or buffers <= 0:
+            raise ValueError("chunk_size and buffers must be positive")
+
+        self.reader = reader
+        self.writer = writer
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self._ring: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=buffers)
+        self._aborted = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def run(self) -> PipeResult:
+        """Run the transfer to completion; blocks the calling thread."""
+        start = time.monotonic()
+        outputs: Dict[str, List[bytes]] = {
+            "reader_stderr": [],
+            "writer_stdout": [],
+            "writer_stderr": [],
+        }
+        threads = [
+            threading.Thread(target=self._read, daemon=True),
+            threading.Thread(
+                target=self._drain,
+                args=(self.reader.recv_stderr, outputs["reader_stderr"]),
+                daemon=True,
+            ),
+            threading.Thread(
+                target=self._drain,
+                args=(self.writer.recv, outputs["writer_stdout"]),
+                daemon=True,
+            ),
+            threading.Thread(
+                target=self._drain,
+                args=(self.writer.recv_stderr, outputs["writer_stderr"]),
+                daemon=True,
+            ),
+        ]
+        for thread in threads:
+            thread.start()
+
+        sent = 0
+        try:
+            while True:
+                chunk = self._ring.get()
+                if chunk is None:
+                    break
+                self.writer.sendall(chunk)
+                sent += len(chunk)
+                if self.progress:
+                    self.progress(sent)
+            self.writer.shutdown_write()
+        except BaseException as e:
+            self._error = self._error or e
+            self._abort()
+
+        for thread in threads:
+            thread.join()
+        if self._error is not None:
+            raise self._error
+
+        return PipeResult(
+            bytes_transferred=sent,
+            reader_exit_code=self.reader.recv_exit_status(),
+            writer_exit_code=self.writer.recv_exit_status(),
+            reader_stderr=b"".join(outputs["reader_stderr"]).decode(
+                "utf-8", errors="replace"
+            ),
+            writer_stdout=b"".join(outputs["writer_stdout"]).decode(
+                "utf-8", errors="replace"
+            ),
+            writer_stderr=b"".join(outputs["writer_stderr"]).decode(
+                "utf-8", errors="replace"
+            ),
+            duration=time.monotonic() - start,
+        )
+
+    def _read(self) -> None:
+        """Reader thread: fill chunks from the source channel into the ring."""
+        try:
+            while not self._aborted.is_set():
+                pieces: List[bytes] = []
+                size = 0
+                while size < self.chunk_size:
+                    data = self.reader.recv(self.chunk_size - size)
+                    if not data:
+                        break
+                    pieces.append(data)
+                    size += len(data)
+                if size:
+                    self._put(pieces[0] if len(pieces) == 1 else b"".join(pieces))
+                if size < self.chunk_size:
+                    break
+        except BaseException as e:
+            self._error = self._error or e
+            self._abort()
+        finally:
+            self._put(None)
+
+    def _put(self, chunk: Optional[bytes]) -> None:
+        """Queue a chunk, waiting for a free slot unless the pipe is aborted."""
+        while not self._aborted.is_set():
+            try:
+                self._ring.put(chunk, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _drain(self, recv: Callable[[int], bytes], sink: List[bytes]) -> None:
+        """Drain a side stream so a full window cannot block its command."""
+        try:
+            while True:
+                data = recv(DEFAULT_CHUNK_SIZE)
+                if not data:
+                    return
+                sink.append(data)
+        except Exception:
+            return
+
+    def _abort(self) -> None:
+        """Stop both commands after a failure."""
+        self._aborted.set()
+        for channel in (self.reader, self.writer):
+            try:
+                channel.close()
+            except Exception:
+                pass
+        # Unblock the writer loop if it is waiting for a chunk
+        try:
+            self._ring.put_nowait(None)
+        except queue.Full:
+            pass
 
 
 class SSHConnection:
     """Represents a single SSH connection."""
 
+    stream_class = CommandStream
+
     def __init__(
         self,
         host: str,
@@ -27,16 +417,40 @@ class SSHConnection:
         username: Optional[str] = None,
         key_path: Optional[str] = None,
         timeout: int = 30,
+        keepalive_interval: int = 0,
+        known_hosts: Optional[str] = None,
+        control_pool: Optional[BlockingPool] = None,
+        stream_pool: Optional[BlockingPool] = None,
+        tuning: Optional[SSHTuning] = None,
     ):
-        """Initialize SSH connection."""
+        """
+        Initialize SSH connection.
+
+        Blocking calls run in ``control_pool`` when they take about one round
+        trip and in ``stream_pool`` when they last as long as a command or
+        transfer. Connections of an ``SSHTransport`` share its pools.
+        ``tuning`` restricts the algorithms offered to the server and sets
+        the channel window and packet size.
+        """
         self.host = host
         self.port = port
         self.username = username
         self.key_path = key_path
         self.timeout = timeout
+        self.keepalive_interval = keepalive_interval
+        self.known_hosts = known_hosts
+        self.control_pool = control_pool or BlockingPool(
+            "control", DEFAULT_CONTROL_WORKERS
+        )
+        self.stream_pool = stream_pool or BlockingPool("stream", DEFAULT_STREAM_WORKERS)
+        self.tuning = tuning or SSHTuning()
         self.client: Optional[paramiko.SSHClient] = None
         self.sftp: Optional[paramiko.SFTPClient] = None
 
+        # Bookkeeping of SSHConnectionPool
+        self.active_channels = 0
+        self.last_used = time.monotonic()
+
     async def connect(self) -> None:
         """Establish SSH connection."""
         try:
@@ -45,6 +459,8 @@ class SSHConnection:
             self.client.set_missing_host_key_policy(
                 SSHSecurity.get_known_hosts_policy()
             )
+            if self.known_hosts:
+                self.client.load_host_keys(str(Path(self.known_hosts).expanduser()))
 
             # Prepare connection parameters - type as Any to handle dynamic kwargs
             from typing import Any
@@ -64,15 +480,18 @@ class SSHConnection:
             if self.username:
                 connect_kwargs["username"] = self.username
 
-            # Connect in executor to avoid blocking
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                lambda: self.client.connect(**connect_kwargs),  # type: ignore[union-attr]
-            )
+            connect_kwargs["transport_factory"] = self._make_transport
 
-            # Initialize SFTP
-            self.sftp = self.client.open_sftp()
+            # Connect in a worker thread to avoid blocking
+            await self.control_pool.run(self.client.connect, **connect_kwargs)
+
+            # Keepalives let paramiko notice dead sessions between operations
+            transport = self.client.get_transport()
+            if transport is not None and self.keepalive_interval > 0:
+                transport.set_keepalive(self.keepalive_interval)
+
+            # Initialize SFTP; opening it waits for the server
+            self.sftp = await self.control_pool.run(self.client.open_sftp)
 
             logger.info(
                 f"SSH connection established to {self.host}:{self.port}",
@@ -100,34 +519,126 @@ class SSHConnection:
             )
             raise ConnectionError(str(e), self.host)
 
+    def _make_transport(self, sock: Any, **kwargs: Any) -> paramiko.Transport:
+        """Create the paramiko transport of ``connect`` with ``tuning`` applied."""
+        if self.tuning.window_size:
+            kwargs["default_window_size"] = self.tuning.window_size
+        if self.tuning.max_packet_size:
+            kwargs["default_max_packet_size"] = self.tuning.max_packet_size
+        transport = paramiko.Transport(sock, **kwargs)
+
+        options = transport.get_security_options()
+        if self.tuning.ciphers:
+            options.ciphers = tuple(self.tuning.ciphers)
+        if self.tuning.macs:
+            options.digests = tuple(self.tuning.macs)
+        if self.tuning.kex:
+            options.kex = tuple(self.tuning.kex)
+        return transport
+
+    @classmethod
+    def supported_algorithms(cls) -> Dict[str, List[str]]:
+        """
+        Get the algorithms the backend can negotiate.
+
+        Returns:
+            Dict[str, List[str]]: Names by kind: ``ciphers``, ``macs``, ``kex``
+        """
+        # The preference lists of paramiko's Transport name all it implements
+        transport: Any = paramiko.Transport
+        return {
+            "ciphers": list(transport._preferred_ciphers),
+            "macs": list(transport._preferred_macs),
+            "kex": list(transport._preferred_kex),
+        }
+
+    @property
+    def connected(self) -> bool:
+        """Whether ``connect`` succeeded and ``close`` was not called."""
+        return self.client is not None
+
+    def is_alive(self) -> bool:
+        """Check that the SSH session is still usable."""
+        if not self.client:
+            return False
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+
+    async def open_channel(self, command: str) -> Any:
+        """
+        Start a command on a new channel of this connection.
+
+        Returns:
+            Any: Channel running the command (``paramiko.Channel``); the
+            caller must close it
+
+        Raises:
+            InsufficientResourcesError: If the control pool refuses new work
+        """
+        if not self.client:
+            raise SSHError("Not connected", self.host, "command_execution")
+
+        transport = self.client.get_transport()
+        if transport is None:
+            raise SSHError("Not connected", self.host, "command_execution")
+
+        try:
+            channel = await self.control_pool.run(transport.open_session)
+            await self.control_pool.run_admitted(channel.exec_command, command)
+        except Exception as e:
+            raise SSHError(str(e), self.host, "command_execution")
+        return channel
+
+    @asynccontextmanager
+    async def stream_command(
+        self, command: str, timeout: Optional[int] = None
+    ) -> AsyncIterator[CommandStream]:
+        """
+        Run a command and stream its output.
+
+        Leaving the context closes the channel, which terminates the command
+        if it is still running.
+
+        Args:
+            command: Command to execute
+            timeout: Seconds without any output before giving up
+
+        Yields:
+            CommandStream: Output of the running command
+        """
+        channel = await self.open_channel(command)
+        stream = self.stream_class(channel, self.host, timeout=timeout)
+        try:
+            yield stream
+        finally:
+            stream.close()
+
     async def execute_command(
         self, command: str, timeout: Optional[int] = None
     ) -> tuple[str, str, int]:
         """Execute a command over SSH."""
-        if not self.client:
+        if not self.connected:
             raise SSHError("Not connected", self.host, "command_execution")
 
+        cmd_timeout = timeout or self.timeout
         try:
-            loop = asyncio.get_event_loop()
-            stdin, stdout, stderr = await loop.run_in_executor(
-                None, self.client.exec_command, command
-            )
+            stdout_data: List[bytes] = []
+            stderr_data: List[bytes] = []
+            async with self.stream_command(command) as stream:
 
-            # Wait for command completion with timeout
-            cmd_timeout = timeout or self.timeout
-            stdout_data = await asyncio.wait_for(
-                loop.run_in_executor(None, stdout.read), timeout=cmd_timeout
-            )
-            stderr_data = await asyncio.wait_for(
-                loop.run_in_executor(None, stderr.read), timeout=cmd_timeout
-            )
+                async def collect() -> None:
+                    async for name, data in stream.chunks():
+                        (stdout_data if name == "stdout" else stderr_data).append(data)
 
-            # Retrieve exit status without blocking event loop
-            exit_code = await loop.run_in_executor(
-                None, stdout.channel.recv_exit_status
-            )
+                # Wait for command completion with timeout
+                await asyncio.wait_for(collect(), timeout=cmd_timeout)
+                exit_code = await stream.wait()
 
-            return (stdout_data.decode("utf-8"), stderr_data.decode("utf-8"), exit_code)
+            return (
+                b"".join(stdout_data).decode("utf-8"),
+                b"".join(stderr_data).decode("utf-8"),
+                exit_code,
+            )
 
         except asyncio.TimeoutError:
             logger.error(
@@ -154,54 +665,117 @@ class SSHConnection:
         remote_path: str,
         progress_callback: Optional[Callable[[int, int], None]] = None,
     ) -> TransferStats:
-        """Transfer a file to the remote host."""
-        if not self.sftp:
-            raise SSHError("SFTP not available", self.host, "file_transfer")
-
-        try:
-            loop = asyncio.get_event_loop()
+        """Transfer a file to the remote host; see ``upload``."""
+        local_file = Path(local_path)
+        if not local_file.exists():
+            raise SSHError(
+                f"Local file not found: {local_path}", self.host, "file_transfer"
+            )
+        file_size = local_file.stat().st_size
 
-            # Get file size for progress tracking
-            local_file = Path(local_path)
-            if not local_file.exists():
-                raise SSHError(
-                    f"Local file not found: {local_path}", self.host, "file_transfer"
-                )
+        def progress(sent: int) -> None:
+            if progress_callback:
+                progress_callback(sent, file_size)
 
-            file_size = local_file.stat().st_size
+        return await self.upload(local_path, remote_path, progress=progress)
 
-            # Transfer file
-            from datetime import datetime
+    async def upload(
+        self,
+        local_path: str,
+        remote_path: str,
+        offset: int = 0,
+        length: Optional[int] = None,
+        request_size: int = DEFAULT_REQUEST_SIZE,
+        window: int = DEFAULT_WINDOW,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> TransferStats:
+        """
+        Copy a local file, or a byte range of it, to the remote host.
 
-            stats = TransferStats()
-            stats.start_time = datetime.now()
+        Copying the whole file replaces the remote file. Copying a range
+        leaves the rest of an existing remote file untouched, so ranges can
+        resume a transfer or be copied concurrently as stripes.
 
-            def progress_wrapper(transferred: int, total: int) -> None:
-                if progress_callback:
-                    progress_callback(transferred, total)
+        Args:
+            local_path: File to read
+            remote_path: File to write on the remote host
+            offset: First byte of the range
+            length: Bytes in the range; up to the end of the file if None
+            request_size: Bytes per SFTP request
+            window: SFTP requests in flight
+            progress: Called with the cumulative bytes copied
 
-            await loop.run_in_executor(
-                None,
-                self.sftp.put,
-                local_path,
-                remote_path,
-                progress_wrapper if progress_callback else None,
-            )
+        Returns:
+            TransferStats: Bytes copied and transfer speed
+        """
+        return await self._transfer(
+            local_path,
+            remote_path,
+            True,
+            offset,
+            length,
+            request_size,
+            window,
+            progress,
+        )
 
-            stats.end_time = datetime.now()
-            stats.bytes_transferred = file_size
-            stats.files_transferred = 1
+    async def download(
+        self,
+        remote_path: str,
+        local_path: str,
+        offset: int = 0,
+        length: Optional[int] = None,
+        request_size: int = DEFAULT_REQUEST_SIZE,
+        window: int = DEFAULT_WINDOW,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> TransferStats:
+        """
+        Copy a remote file, or a byte range of it, to the local host.
 
-            if stats.end_time and stats.start_time:
-                duration = (stats.end_time - stats.start_time).total_seconds()
-                if duration > 0:
-                    stats.average_speed = file_size / duration
+        The counterpart of ``upload``, with the same arguments.
 
-            return stats
+        Returns:
+            TransferStats: Bytes copied and transfer speed
+        """
+        return await self._transfer(
+            local_path,
+            remote_path,
+            False,
+            offset,
+            length,
+            request_size,
+            window,
+            progress,
+        )
 
+    async def _transfer(
+        self,
+        local_path: str,
+        remote_path: str,
+        upload: bool,
+        offset: int,
+        length: Optional[int],
+        request_size: int,
+        window: int,
+        progress: Optional[Callable[[int], None]],
+    ) -> TransferStats:
+        """Copy a byte range between a local and a remote file, with statistics."""
+        start_time = datetime.now()
+        try:
+            copied = await self._copy_range(
+                local_path,
+                remote_path,
+                upload,
+                offset,
+                length,
+                request_size,
+                window,
+                progress,
+            )
         except Exception as e:
+            direction = "to" if upload else "from"
             logger.error(
-                f"File transfer failed to {self.host}: {e}",
+                f"File transfer failed {direction} {self.host}: {e}",
                 host=self.host,
                 local_path=local_path,
                 remote_path=remote_path,
@@ -209,6 +783,105 @@ class SSHConnection:
             )
             raise SSHError(str(e), self.host, "file_transfer")
 
+        end_time = datetime.now()
+        duration = (end_time - start_time).total_seconds()
+        return TransferStats(
+            bytes_transferred=copied,
+            files_transferred=1,
+            start_time=start_time,
+            end_time=end_time,
+            average_speed=copied / duration if duration > 0 else 0.0,
+        )
+
+    async def _copy_range(
+        self,
+        local_path: str,
+        remote_path: str,
+        upload: bool,
+        offset: int,
+        length: Optional[int],
+        request_size: int,
+        window: int,
+        progress: Optional[Callable[[int], None]],
+    ) -> int:
+        """
+        Copy a byte range with paramiko's pipelining; see ``paramiko_copy``.
+
+        Returns:
+            int: Bytes copied
+        """
+        if not self.sftp:
+            raise SSHError("SFTP not available", self.host, "file_transfer")
+
+        report = None
+        if progress:
+            loop = asyncio.get_running_loop()
+            callback = progress
+
+            def report(copied: int) -> None:
+                loop.call_soon_threadsafe(callback, copied)
+
+        copied: int = await self.stream_pool.run(
+            paramiko_copy,
+            self.sftp,
+            local_path,
+            remote_path,
+            upload,
+            offset,
+            length,
+            request_size,
+            window,
+            report,
+        )
+        return copied
+
+    async def pipe_to(
+        self,
+        reader_command: str,
+        dest: "SSHConnection",
+        writer_command: str,
+        chunk_size: int = DEFAULT_PIPE_CHUNK_SIZE,
+        buffers: int = DEFAULT_PIPE_BUFFERS,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> PipeResult:
+        """
+        Stream the output of a command on this host into a command on another.
+
+        Args:
+            reader_command: Command writing the data to stdout
+            dest: Connection to the host running the writer
+            writer_command: Command reading the data from stdin
+            chunk_size: Bytes per chunk
+            buffers: Number of chunks buffered between reader and writer
+            progress: Called with the cumulative bytes sent
+
+        Returns:
+            PipeResult: Bytes sent, exit codes and side output of both commands
+        """
+        loop = asyncio.get_running_loop()
+
+        def report(sent: int) -> None:
+            if progress:
+                loop.call_soon_threadsafe(progress, sent)
+
+        # Admission control; the pipe then waits for a worker
+        self.stream_pool.admit()
+        reader = await self.open_channel(reader_command)
+        try:
+            writer = await dest.open_channel(writer_command)
+        except BaseException:
+            reader.close()
+            raise
+
+        pipe = ChannelPipe(reader, writer, chunk_size, buffers, report)
+        try:
+            return await self.stream_pool.run_admitted(pipe.run)
+        except Exception as e:
+            raise SSHError(str(e), self.host, "pipe")
+        finally:
+            reader.close()
+            writer.close()
+
     async def close(self) -> None:
         """Close SSH connection."""
         if self.sftp:
@@ -222,43 +895,288 @@ class SSHConnection:
         logger.info(f"SSH connection closed to {self.host}", host=self.host)
 
 
+class SSHConnectionPool:
+    """
+    Pool of SSH connections to one host.
+
+    Each connection serves up to ``max_channels`` concurrent operations and
+    at most ``max_connections`` connections are opened. Idle connections are
+    preferred; a new connection is opened before channels are shared, and
+    once the pool is saturated callers wait in FIFO order. Connections are
+    health-checked before reuse and closed after ``idle_timeout`` seconds
+    without use, or once idle if they were opened with a tuning other than
+    the one new connections get.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], SSHConnection],
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_channels: int = DEFAULT_MAX_CHANNELS,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        tuning: Optional[Callable[[], SSHTuning]] = None,
+    ):
+        """
+        Initialize connection pool.
+
+        Args:
+            factory: Creates an unconnected connection
+            max_connections: Maximum open connections
+            max_channels: Maximum concurrent operations per connection
+            idle_timeout: Seconds an unused connection stays open
+            tuning: Returns the tuning ``factory`` currently applies; None
+                if connections are never retuned
+        """
+        if max_connections <= 0 or max_channels <= 0:
+            raise ValueError("max_connections and max_channels must be positive")
+
+        self.max_connections = max_connections
+        self.max_channels = max_channels
+        self.idle_timeout = idle_timeout
+        self._factory = factory
+        self._tuning = tuning
+        self._connections: List[SSHConnection] = []
+        self._waiters: Deque[asyncio.Event] = deque()
+        self._opening = 0
+        self._opened = 0
+        self._evicted = 0
+
+    @property
+    def connections(self) -> List[SSHConnection]:
+        """Open connections of the pool."""
+        return list(self._connections)
+
+    async def acquire(self) -> SSHConnection:
+        """
+        Get a connection with a free channel, waiting if the pool is saturated.
+
+        Every acquired connection must be returned with ``release``.
+        """
+        ready = asyncio.Event()
+        self._waiters.append(ready)
+        try:
+            while True:
+                # Only the longest-waiting caller may take a channel
+                if self._waiters[0] is ready:
+                    await self._evict()
+                    connection = self._checkout()
+                    if connection is not None:
+                        return connection
+                    if len(self._connections) + self._opening < self.max_connections:
+                        self._opening += 1
+                        break
+                ready.clear()
+                await ready.wait()
+        finally:
+            self._waiters.remove(ready)
+            self._wake()
+
+        try:
+            connection = self._factory()
+            await connection.connect()
+        except BaseException:
+            self._opening -= 1
+            self._wake()
+            raise
+
+        self._opening -= 1
+        self._opened += 1
+        connection.active_channels = 1
+        self._connections.append(connection)
+        return connection
+
+    async def release(self, connection: SSHConnection) -> None:
+        """Return a connection acquired from the pool."""
+        connection.active_channels -= 1
+        connection.last_used = time.monotonic()
+
+        if (
+            connection.active_channels == 0
+            and connection in self._connections
+            and not connection.is_alive()
+        ):
+            self._connections.remove(connection)
+            self._evicted += 1
+            await connection.close()
+
+        self._wake()
+
+    async def close(self) -> None:
+        """Close all connections of the pool."""
+        connections, self._connections = self._connections, []
+        for connection in connections:
+            await connection.close()
+
+    def stats(self) -> PoolStats:
+        """Get pool statistics."""
+        return PoolStats(
+            connections=len(self._connections),
+            idle_connections=sum(
+                1 for connection in self._connections if not connection.active_channels
+            ),
+            active_channels=sum(
+                connection.active_channels for connection in self._connections
+            ),
+            waiting=len(self._waiters),
+            max_connections=self.max_connections,
+            max_channels=self.max_channels,
+            opened=self._opened,
+            evicted=self._evicted,
+        )
+
+    def _checkout(self) -> Optional[SSHConnection]:
+        """Take a channel on the best usable connection, if any."""
+        usable = [
+            connection
+            for connection in self._connections
+            if connection.active_channels < self.max_channels
+            and connection.is_alive()
+            and self._current(connection)
+        ]
+        idle = [connection for connection in usable if not connection.active_channels]
+        can_open = len(self._connections) + self._opening < self.max_connections
+
+        if idle:
+            connection = idle[0]
+        elif usable and not can_open:
+            connection = min(usable, key=lambda c: c.active_channels)
+        else:
+            return None
+
+        connection.active_channels += 1
+        return connection
+
+    async def _evict(self) -> None:
+        """Close idle connections that are dead, unused for too long or retuned."""
+        now = time.monotonic()
+        stale = [
+            connection
+            for connection in self._connections
+            if not connection.active_channels
+            and (
+                not connection.is_alive()
+                or now - connection.last_used > self.idle_timeout
+                or not self._current(connection)
+            )
+        ]
+        for connection in stale:
+            self._connections.remove(connection)
+            self._evicted += 1
+        for connection in stale:
+            logger.debug(
+                f"Evicting SSH connection to {connection.host}", host=connection.host
+            )
+            await connection.close()
+
+    def _current(self, connection: SSHConnection) -> bool:
+        """Check if a connection uses the tuning of new connections."""
+        return self._tuning is None or connection.tuning == self._tuning()
+
+    def _wake(self) -> None:
+        """Let the longest-waiting caller retry."""
+        if self._waiters:
+            self._waiters[0].set()
+
+
 class SSHTransport:
-    """SSH transport manager for multiple connections."""
+    """
+    SSH transport manager with a connection pool per host.
+
+    ``backend`` selects the SSH implementation: ``"paramiko"`` runs blocking
+    paramiko calls in threads, ``"asyncssh"`` multiplexes channels on the
+    event loop without a thread per command. ``max_channels`` defaults to
+    the backend's entry in ``BACKEND_MAX_CHANNELS``.
+
+    The transport owns the thread pools of all its connections: one of
+    ``control_workers`` for short calls and one of ``stream_workers`` for
+    transfers and pipes; command output is polled on the event loop. Each
+    pool lets ``max_queued_calls`` calls wait for a worker and refuses
+    further calls; see ``executor_stats``.
+
+    New connections use ``tuning``, or the tuning set for their host with
+    ``set_host_tuning``. Idle pooled connections opened with another tuning
+    are replaced, so a new tuning also reaches warm pools.
+    """
 
-    def __init__(self, key_path: Optional[str] = None, timeout: int = 30):
+    def __init__(
+        self,
+        key_path: Optional[str] = None,
+        timeout: int = 30,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_channels: Optional[int] = None,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        keepalive_interval: int = DEFAULT_KEEPALIVE_INTERVAL,
+        backend: str = DEFAULT_SSH_BACKEND,
+        known_hosts: Optional[str] = None,
+        control_workers: int = DEFAULT_CONTROL_WORKERS,
+        stream_workers: int = DEFAULT_STREAM_WORKERS,
+        max_queued_calls: int = DEFAULT_MAX_QUEUE,
+        tuning: Optional[SSHTuning] = None,
+    ):
         """Initialize SSH transport."""
+        if backend not in SSH_BACKENDS:
+            raise ConfigurationError(
+                f"Unknown SSH backend {backend!r}; expected one of {SSH_BACKENDS}"
+            )
         self.key_path = key_path
         self.timeout = timeout
-        self.connections: Dict[str, SSHConnection] = {}
+        self.max_connections = max_connections
+        self.max_channels = max_channels or BACKEND_MAX_CHANNELS[backend]
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.backend = backend
+        self.known_hosts = known_hosts
+        self.control_pool = BlockingPool("control", control_workers, max_queued_calls)
+        self.stream_pool = BlockingPool("stream", stream_workers, max_queued_calls)
+        self.pools: Dict[str, SSHConnectionPool] = {}
+        self.tuning = tuning or SSHTuning()
+        self.host_tuning: Dict[str, SSHTuning] = {}
+        self._check_tuning(self.tuning)
+
+    @property
+    def connections(self) -> List[SSHConnection]:
+        """Open connections of all pools."""
+        return [
+            connection
+            for pool in self.pools.values()
+            for connection in pool.connections
+        ]
 
     @asynccontextmanager
     async def connect(
         self, host: str, port: int = 22, username: Optional[str] = None
     ) -> AsyncIterator[SSHConnection]:
-        """Create a managed SSH connection."""
+        """Borrow a pooled SSH connection for the duration of the context."""
         connection_key = f"{host}:{port}"
 
-        # Reuse existing connection if available
-        if connection_key in self.connections:
-            yield self.connections[connection_key]
-            return
-
-        # Create new connection
-        connection = SSHConnection(
-            host=host,
-            port=port,
-            username=username,
-            key_path=self.key_path,
-            timeout=self.timeout,
-        )
+        pool = self.pools.get(connection_key)
+        if pool is None:
+            connection_class = self._connection_class()
+            pool = SSHConnectionPool(
+                lambda: connection_class(
+                    host=host,
+                    port=port,
+                    username=username,
+                    key_path=self.key_path,
+                    timeout=self.timeout,
+                    keepalive_interval=self.keepalive_interval,
+                    known_hosts=self.known_hosts,
+                    control_pool=self.control_pool,
+                    stream_pool=self.stream_pool,
+                    tuning=self.tuning_for(host),
+                ),
+                max_connections=self.max_connections,
+                max_channels=self.max_channels,
+                idle_timeout=self.idle_timeout,
+                tuning=lambda: self.tuning_for(host),
+            )
+            self.pools[connection_key] = pool
 
+        connection = await pool.acquire()
         try:
-            await connection.connect()
-            self.connections[connection_key] = connection
             yield connection
         finally:
-            # Keep connection for reuse
-            pass
+            await pool.release(connection)
 
     async def execute_on_host(
         self,
@@ -285,25 +1203,150 @@ class SSHTransport:
         async with self.connect(host, port, username) as conn:
             return await conn.transfer_file(local_path, remote_path, progress_callback)
 
+    async def transfer_from_host(
+        self,
+        host: str,
+        remote_path: str,
+        local_path: str,
+        port: int = 22,
+        username: Optional[str] = None,
+        offset: int = 0,
+        length: Optional[int] = None,
+        request_size: int = DEFAULT_REQUEST_SIZE,
+        window: int = DEFAULT_WINDOW,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> TransferStats:
+        """Transfer a file, or a byte range of it, from a remote host."""
+        async with self.connect(host, port, username) as conn:
+            return await conn.download(
+                remote_path,
+                local_path,
+                offset=offset,
+                length=length,
+                request_size=request_size,
+                window=window,
+                progress=progress,
+            )
+
+    async def pipe(
+        self,
+        source_host: str,
+        reader_command: str,
+        dest_host: str,
+        writer_command: str,
+        chunk_size: int = DEFAULT_PIPE_CHUNK_SIZE,
+        buffers: int = DEFAULT_PIPE_BUFFERS,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> PipeResult:
+        """
+        Stream the output of a command on one host into a command on another.
+
+        Bytes flow through this process over one SSH channel per host, so the
+        hosts need no SSH trust between each other.
+
+        Args:
+            source_host: Host running the reader
+            reader_command: Command writing the data to stdout
+            dest_host: Host running the writer
+            writer_command: Command reading the data from stdin
+            chunk_size: Bytes per chunk
+            buffers: Number of chunks buffered between reader and writer
+            progress: Called with the cumulative bytes sent
+
+        Returns:
+            PipeResult: Bytes sent, exit codes and side output of both commands
+        """
+        async with self.connect(source_host) as source_conn:
+            async with self.connect(dest_host) as dest_conn:
+                return await source_conn.pipe_to(
+                    reader_command,
+                    dest_conn,
+                    writer_command,
+                    chunk_size=chunk_size,
+                    buffers=buffers,
+                    progress=progress,
+                )
+
+    def set_host_tuning(self, host: str, tuning: Optional[SSHTuning]) -> None:
+        """
+        Set the tuning of connections to a host, replacing ``tuning`` for it.
+
+        Operations that hold a connection keep it; idle connections with
+        other settings are closed when the host's pool is next used. The
+        tuning belongs to the host, not to a host pair: operations to
+        different peers of a host that run at the same time share one
+        tuning, the one set last.
+
+        Args:
+            host: Host name
+            tuning: Tuning of new connections; None restores ``tuning``
+
+        Raises:
+            ConfigurationError: If the backend does not support an algorithm
+        """
+        if tuning is None:
+            self.host_tuning.pop(host, None)
+            return
+        self._check_tuning(tuning)
+        self.host_tuning[host] = tuning
+
+    def tuning_for(self, host: str) -> SSHTuning:
+        """Get the tuning of new connections to a host."""
+        return self.host_tuning.get(host, self.tuning)
+
+    def _check_tuning(self, tuning: SSHTuning) -> None:
+        """Reject algorithms the backend cannot negotiate."""
+        if not (tuning.ciphers or tuning.macs or tuning.kex):
+            return
+        supported = self._connection_class().supported_algorithms()
+        for kind, names in (
+            ("ciphers", tuning.ciphers),
+            ("macs", tuning.macs),
+            ("kex", tuning.kex),
+        ):
+            unknown = [name for name in names if name not in supported[kind]]
+            if unknown:
+                raise ConfigurationError(
+                    f"The {self.backend} backend does not support {kind} "
+                    f"{', '.join(unknown)}"
+                )
+
+    def _connection_class(self) -> Type[SSHConnection]:
+        """Get the connection class of the selected backend."""
+        if self.backend == "asyncssh":
+            from .asyncssh_transport import AsyncSSHConnection
+
+            return AsyncSSHConnection
+        return SSHConnection
+
     async def close_all(self) -> None:
         """Close all SSH connections."""
-        for connection in self.connections.values():
-            await connection.close()
-        self.connections.clear()
+        for pool in self.pools.values():
+            await pool.close()
+        self.pools.clear()
+        self.control_pool.shutdown()
+        self.stream_pool.shutdown()
         logger.info("All SSH connections closed")
 
     def get_connection_info(
         self, host: str, port: int = 22
     ) -> Optional[SSHConnectionInfo]:
-        """Get connection information for a host."""
-        connection_key = f"{host}:{port}"
-        if connection_key in self.connections:
-            conn = self.connections[connection_key]
-            return SSHConnectionInfo(
-                host=conn.host,
-                port=conn.port,
-                username=conn.username,
-                key_path=conn.key_path,
-                timeout=conn.timeout,
-            )
-        return None
+        """Get connection and pool information for a host."""
+        pool = self.pools.get(f"{host}:{port}")
+        if pool is None:
+            return None
+
+        connections = pool.connections
+        return SSHConnectionInfo(
+            host=host,
+            port=port,
+            username=connections[0].username if connections else None,
+            key_path=self.key_path,
+            timeout=self.timeout,
+            pool=pool.stats(),
+            executors=self.executor_stats(),
+        )
+
+    def executor_stats(self) -> List[ExecutorStats]:
+        """Get statistics of the control and stream thread pools."""
+        return [self.control_pool.stats(), self.stream_pool.stats()]
@@ -0,0 +1,218 @@
+"""
+Bounded thread pools for the blocking calls of the SSH transport.
+
+paramiko is synchronous, so the transport moves its calls to threads. Calls
+differ wildly in duration: opening a channel takes one round trip, while a
+pipe or file transfer runs for hours. Sharing one executor lets a few long
+transfers occupy every worker and stall unrelated short calls, so
+``SSHTransport`` owns two ``BlockingPool`` instances: ``control`` for short
+calls and ``stream`` for pipes and transfers. Command output is polled on
+the event loop and needs no worker.
+
+A pool accepts at most ``max_workers`` calls at a time. Further calls wait
+their turn. Admission control applies to new work only: once ``max_queue``
+calls wait, starting a command, pipe or transfer fails at once instead of
+piling up. The calls of work already admitted, such as the next chunk of a
+running transfer, always wait for a worker; refusing them would break a
+transfer halfway through. ``stats`` reports busy workers, queue depth and the
+time calls spent waiting, which shows when a pool is saturated.
+"""
+
+import asyncio
+import functools
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Optional, TypeVar
+
+from .models import ExecutorStats
+from .exceptions import InsufficientResourcesError
+from .logging import logger
+
+DEFAULT_CONTROL_WORKERS = 16  # opening sessions, starting commands, exit codes
+DEFAULT_STREAM_WORKERS = 64  # file transfers and pipes
+DEFAULT_MAX_QUEUE = 64  # calls waiting per pool before new calls are refused
+
+T = TypeVar("T")
+
+
+class BlockingPool:
+    """Bounded thread pool with a bounded wait queue and saturation metrics."""
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+    ):
+        """
+        Initialize blocking call pool.
+
+        Args:
+            name: Pool name used in thread names, errors and statistics
+            max_workers: Maximum calls running at once
+            max_queue: Maximum calls waiting for a worker
+        """
+        if max_workers <= 0 or max_queue < 0:
+            raise ValueError("max_workers must be positive and max_queue not negative")
+
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._busy = 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Start new work with a blocking call on a worker of the pool.
+
+        Waits for a free worker first. A worker stays busy until the call
+        returns, even if the awaiting task is cancelled; a call cancelled
+        while it still waits is never run.
+
+        Args:
+            func: Blocking callable
+            *args: Positional arguments of ``func``
+            **kwargs: Keyword arguments of ``func``
+
+        Returns:
+            The result of ``func``
+
+        Raises:
+            InsufficientResourcesError: If ``max_queue`` calls already wait
+        """
+        return await self._run(False, functools.partial(func, *args, **kwargs))
+
+    async def run_admitted(
+        self, func: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        """
+        Run a blocking call of admitted work; waits however long the queue is.
+
+        Args:
+            func: Blocking callable
+            *args: Positional arguments of ``func``
+            **kwargs: Keyword arguments of ``func``
+
+        Returns:
+            The result of ``func``
+        """
+        return await self._run(True, functools.partial(func, *args, **kwargs))
+
+    def admit(self) -> None:
+        """
+        Check that the pool accepts new work.
+
+        Raises:
+            InsufficientResourcesError: If all workers are busy and
+                ``max_queue`` calls already wait
+        """
+        if self._busy < self.max_workers or len(self._waiters) < self.max_queue:
+            return
+
+        self._rejected += 1
+        logger.warning(
+            f"SSH {self.name} pool saturated; refusing call",
+            pool=self.name,
+            busy=self._busy,
+            queued=len(self._waiters),
+        )
+        raise InsufficientResourcesError(
+            f"{self._busy} calls running and {len(self._waiters)} waiting",
+            f"SSH {self.name} workers",
+        )
+
+    def stats(self) -> ExecutorStats:
+        """Get pool statistics."""
+        return ExecutorStats(
+            name=self.name,
+            max_workers=self.max_workers,
+            busy_workers=self._busy,
+            queued=len(self._waiters),
+            max_queue=self.max_queue,
+            completed=self._completed,
+            rejected=self._rejected,
+            total_wait=self._total_wait,
+            max_wait=self._max_wait,
+        )
+
+    def shutdown(self, wait: bool = False) -> None:
+        """
+        Stop the worker threads.
+
+        Running calls finish first if ``wait`` is set. The pool starts new
+        threads when used again.
+        """
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    async def _run(self, admitted: bool, call: Callable[[], T]) -> T:
+        """Run a call on a worker once it holds a slot."""
+        await self._acquire(admitted)
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._pool().submit(call)
+        except BaseException:
+            self._release(finished=False)
+            raise
+
+        def done(_: "Future[T]") -> None:
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                # The loop is gone; nobody is left to wait for the slot
+                pass
+
+        future.add_done_callback(done)
+        return await asyncio.wrap_future(future)
+
+    async def _acquire(self, admitted: bool = False) -> None:
+        """Take a worker slot, waiting in FIFO order if all are busy."""
+        if self._busy < self.max_workers and not self._waiters:
+            self._busy += 1
+            return
+
+        if not admitted:
+            self.admit()
+
+        start = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except BaseException:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif not waiter.cancelled():
+                # The slot was handed over just as the caller gave up
+                self._release(finished=False)
+            raise
+
+        waited = time.monotonic() - start
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+
+    def _release(self, finished: bool = True) -> None:
+        """Hand a worker slot to the next waiting call or free it."""
+        if finished:
+            self._completed += 1
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._busy -= 1
+
+    def _pool(self) -> ThreadPoolExecutor:
+        """Get the thread pool, creating it on first use."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix=f"ssh-{self.name}"
+            )
+        return self._executor
@@ -0,0 +1,299 @@
+"""
+Integrity verification of transferred disk images.
+
+Disks are verified block by block with BLAKE2b digests computed on the hosts,
+so only digests reach the controller. The digests of a disk are folded into a
+Merkle root that identifies its content, and blocks whose digests differ are
+copied again on their own instead of re-sending the whole image.
+
+Backends that stream through the controller hash every block inline while
+reading and writing it (see ``build_verified_read_command``); the other
+backends have their disks hashed on both hosts after the copy.
+"""
+
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple
+
+from .models import ByteRange, CompressionSpec, DiskVerification
+from .delta import DeltaEngine, DEFAULT_BLOCK_SIZE
+from .exceptions import TransferError
+from .transport import SSHTransport
+from .security import CommandBuilder
+from .logging import logger
+
+DEFAULT_VERIFY_BLOCK_SIZE = DEFAULT_BLOCK_SIZE
+DEFAULT_REPAIR_ATTEMPTS = 3
+DIGEST_SIZE = 16  # bytes, as in the delta engine's block hashes
+
+# Runs on the source host: copies ``length`` bytes (all if negative) starting
+# at ``offset`` to stdout. stderr gets the file size on the first line and
+# then one hex digest per block read, so hashing needs no second read pass.
+HASHING_READER_SCRIPT = """
+import hashlib, sys
+path, block_size = sys.argv[1], int(sys.argv[2])
+offset, length = int(sys.argv[3]), int(sys.argv[4])
+out, log = sys.stdout.buffer, sys.stderr
+with open(path, "rb") as f:
+    log.write("size %d\\n" % f.seek(0, 2))
+    f.seek(offset)
+    while length != 0:
+        block = f.read(block_size if length < 0 else min(block_size, length))
+        if not block:
+            break
+        out.write(block)
+        log.write(hashlib.blake2b(block, digest_size=16).hexdigest() + "\\n")
+        length -= len(block)
+out.flush()
+"""
+
+# Runs on the destination host: writes stdin into the file starting at
+# ``offset`` (truncating the file first if asked to), syncs it and prints one
+# hex digest per block written.
+HASHING_WRITER_SCRIPT = """
+import hashlib, os, sys
+path, block_size = sys.argv[1], int(sys.argv[2])
+offset, truncate = int(sys.argv[3]), sys.argv[4] == "1"
+src, out = sys.stdin.buffer, sys.stdout
+fd = os.open(path, os.O_WRONLY | os.O_CREAT | (os.O_TRUNC if truncate else 0), 0o666)
+with os.fdopen(fd, "wb") as f:
+    f.seek(offset)
+    while True:
+        block = src.read(block_size)
+        if not block:
+            break
+        f.write(block)
+        out.write(hashlib.blake2b(block, digest_size=16).hexdigest() + "\\n")
+    f.flush()
+    os.fsync(f.fileno())
+"""
+
+
+def merkle_root(digests: Sequence[str]) -> str:
+    """
+    Fold block digests into a Merkle root.
+
+    Pairs of nodes are hashed level by level; an unpaired last node moves up
+    unchanged. Leaves and inner nodes use different prefixes so that a list
+    of digests cannot collide with a shorter list of inner nodes.
+
+    Args:
+        digests: Hex digests of consecutive blocks
+
+    Returns:
+        str: Hex digest of the root
+    """
+    nodes = [
+        hashlib.blake2b(
+            b"\x00" + bytes.fromhex(digest), digest_size=DIGEST_SIZE
+        ).digest()
+        for digest in digests
+    ]
+    if not nodes:
+        return hashlib.blake2b(b"", digest_size=DIGEST_SIZE).hexdigest()
+
+    while len(nodes) > 1:
+        paired = [
+            hashlib.blake2b(
+                b"\x01" + nodes[i] + nodes[i + 1], digest_size=DIGEST_SIZE
+            ).digest()
+            for i in range(0, len(nodes) - 1, 2)
+        ]
+        if len(nodes) % 2:
+            paired.append(nodes[-1])
+        nodes = paired
+    return nodes[0].hex()
+
+
+def parse_reader_output(output: str) -> Tuple[int, List[str]]:
+    """
+    Parse the stderr of the hashing reader.
+
+    Returns:
+        Tuple[int, List[str]]: Size of the source file and block digests
+
+    Raises:
+        ValueError: If the output does not start with the file size
+    """
+    lines = [line for line in output.splitlines() if line]
+    if not lines or not lines[0].startswith("size "):
+        raise ValueError(f"Unexpected reader output: {output.strip()[:200]}")
+    return int(lines[0].split()[1]), parse_digests("\n".join(lines[1:]))
+
+
+def parse_digests(output: str) -> List[str]:
+    """Parse one hex digest per line, ignoring anything else."""
+    digests = []
+    for line in output.splitlines():
+        line = line.strip()
+        if len(line) == DIGEST_SIZE * 2 and all(c in "0123456789abcdef" for c in line):
+            digests.append(line)
+    return digests
+
+
+def mismatched_blocks(source: Sequence[str], dest: Sequence[str]) -> List[int]:
+    """Indexes of source blocks that are missing or differ on the destination."""
+    return [
+        index
+        for index, digest in enumerate(source)
+        if index >= len(dest) or dest[index] != digest
+    ]
+
+
+def blocks_to_extents(
+    indexes: Sequence[int], block_size: int, size: int
+) -> List[ByteRange]:
+    """Turn sorted block indexes into merged extents within a file of ``size``."""
+    extents: List[ByteRange] = []
+    for index in indexes:
+        offset = index * block_size
+        length = min(block_size, size - offset)
+        if length <= 0:
+            continue
+        if extents and extents[-1].offset + extents[-1].length == offset:
+            extents[-1].length += length
+        else:
+            extents.append(ByteRange(offset=offset, length=length))
+    return extents
+
+
+def build_verified_read_command(
+    path: str,
+    block_size: int,
+    offset: int = 0,
+    length: int = -1,
+    compression: Optional[CompressionSpec] = None,
+) -> str:
+    """
+    Build a command streaming (part of) a file to stdout while hashing it.
+
+    Args:
+        path: File path
+        block_size: Bytes per hashed block
+        offset: Offset to start reading at, a multiple of ``block_size``
+        length: Bytes to read; the rest of the file if negative
+        compression: Compression applied to the output
+
+    Returns:
+        str: Safe read command
+    """
+    command = CommandBuilder.build_python_command(
+        HASHING_READER_SCRIPT, path, block_size, offset, length
+    )
+    if compression is not None and compression.enabled:
+        command += f" | {CommandBuilder.build_compress_command(compression)}"
+    return command
+
+
+def build_verified_write_command(
+    path: str,
+    block_size: int,
+    offset: int = 0,
+    truncate: bool = True,
+    compression: Optional[CompressionSpec] = None,
+) -> str:
+    """
+    Build a command storing stdin in a file while hashing it.
+
+    Args:
+        path: File path
+        block_size: Bytes per hashed block
+        offset: Offset to start writing at, a multiple of ``block_size``
+        truncate: Truncate the file before writing
+        compression: Compression of the input
+
+    Returns:
+        str: Safe write command
+    """
+    command = CommandBuilder.build_python_command(
+        HASHING_WRITER_SCRIPT, path, block_size, offset, 1 if truncate else 0
+    )
+    if compression is not None and compression.enabled:
+        command = f"{CommandBuilder.build_decompress_command(compression)} | {command}"
+    return command
+
+
+class DiskVerifier:
+    """
+    Verifies a copied disk by hashing it on both hosts.
+
+    Used for backends whose data never passes through the controller. Both
+    copies are hashed concurrently; blocks that differ are handed to a repair
+    callback and the destination is hashed again until it matches.
+    """
+
+    def __init__(
+        self,
+        transport: SSHTransport,
+        block_size: int = DEFAULT_VERIFY_BLOCK_SIZE,
+        max_repairs: int = DEFAULT_REPAIR_ATTEMPTS,
+    ):
+        """Initialize disk verifier."""
+        self.engine = DeltaEngine(transport, block_size)
+        self.block_size = block_size
+        self.max_repairs = max(0, max_repairs)
+
+    async def verify(
+        self,
+        source_host: str,
+        source_path: str,
+        dest_host: str,
+        dest_path: str,
+        repair: Optional[Callable[[List[ByteRange], int], Awaitable[None]]] = None,
+    ) -> DiskVerification:
+        """
+        Compare a disk with its copy, repairing differing blocks.
+
+        Args:
+            source_host: Source host
+            source_path: Source disk path
+            dest_host: Destination host
+            dest_path: Destination disk path
+            repair: Called with the differing extents and the source size to
+                copy them again
+
+        Returns:
+            DiskVerification: Digests and repair statistics of the disk
+
+        Raises:
+            TransferError: If the copy still differs after all repairs
+        """
+        source, dest = await asyncio.gather(
+            self.engine.hash_blocks(source_host, source_path),
+            self.engine.hash_blocks(dest_host, dest_path),
+        )
+        extents = DeltaEngine.compare(source, dest)
+        verification = DiskVerification(
+            source_path=source_path,
+            dest_path=dest_path,
+            block_size=self.block_size,
+            blocks=len(source.digests),
+            source_root=merkle_root(source.digests),
+            mismatched_blocks=DeltaEngine.count_blocks(extents, self.block_size),
+        )
+
+        attempts = 0
+        while extents or dest.size != source.size:
+            if repair is None or attempts >= self.max_repairs:
+                raise TransferError(
+                    f"{dest_path} differs from {source_path} in "
+                    f"{DeltaEngine.count_blocks(extents, self.block_size)} blocks "
+                    f"after {attempts} repairs",
+                    source_host,
+                    dest_host,
+                )
+            logger.warning(
+                f"Re-sending {len(extents)} extents of {dest_path} that failed "
+                "verification",
+                source_host=source_host,
+                dest_host=dest_host,
+                attempt=attempts + 1,
+            )
+            await repair(extents, source.size)
+            verification.resent_bytes += sum(extent.length for extent in extents)
+            attempts += 1
+            dest = await self.engine.hash_blocks(dest_host, dest_path)
+            extents = DeltaEngine.compare(source, dest)
+
+        verification.dest_root = merkle_root(dest.digests)
+        return verification
@@ -1,7 +1,9 @@
 """Test configuration and fixtures for kvm-clone."""
 
+import asyncio
 import pytest
 import sys
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 # Add src to path for imports
@@ -46,3 +48,389 @@ def temp_clone_config():
         "target_host": "remote-host",
         "ssh_key": "/path/to/key",
     }
+
+
+class FakeChannel:
+    """SSH channel stand-in serving fixed output in small chunks."""
+
+    def __init__(self, stdout=b"", stderr=b"", exit_code=0, chunk_size=7):
+        self._data = {"stdout": stdout, "stderr": stderr}
+        self._chunk_size = chunk_size
+        self.exit_code = exit_code
+        self.command = None
+        self.closed = False
+
+    def exec_command(self, command):
+        self.command = command
+
+    def _read(self, name, size):
+        size = min(size, self._chunk_size)
+        data, self._data[name] = self._data[name][:size], self._data[name][size:]
+        return data
+
+    def recv(self, size):
+        return self._read("stdout", size)
+
+    def recv_stderr(self, size):
+        return self._read("stderr", size)
+
+    # All output has arrived; reads return it without blocking
+    eof_received = True
+
+    def recv_ready(self):
+        return bool(self._data["stdout"])
+
+    def recv_stderr_ready(self):
+        return bool(self._data["stderr"])
+
+    def exit_status_ready(self):
+        return True
+
+    def recv_exit_status(self):
+        return self.exit_code
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    """SSH connection stand-in that answers commands through a handler."""
+
+    def __init__(self, host, handler):
+        self.host = host
+        self.username = None
+        self.handler = handler
+
+    async def execute_command(self, command, timeout=None):
+        return self.handler(self.host, command)
+
+    @asynccontextmanager
+    async def stream_command(self, command, timeout=None):
+        from kvm_clone.transport import CommandStream
+
+        stdout, stderr, exit_code = self.handler(self.host, command)
+        channel = FakeChannel(stdout.encode(), stderr.encode(), exit_code)
+        yield CommandStream(channel, self.host, timeout=timeout)
+
+
+class FakeTransport:
+    """SSH transport stand-in recording every command run on each host.
+
+    ``handler(host, command)`` returns the ``(stdout, stderr, exit_code)``
+    tuple for a command; by default every command succeeds silently.
+    """
+
+    def __init__(self, handler=None):
+        self.commands = []
+        self._handler = handler or (lambda host, command: ("", "", 0))
+
+    def _record(self, host, command):
+        self.commands.append((host, command))
+        return self._handler(host, command)
+
+    @asynccontextmanager
+    async def connect(self, host, port=22, username=None):
+        yield FakeConnection(host, self._record)
+
+
+@asynccontextmanager
+async def local_ssh_server(directory, delay=0.0):
+    """Run an SSH server on 127.0.0.1 for transport tests.
+
+    Any client key is accepted. Commands understood by the server:
+    ``echo TEXT``, ``fail CODE`` (writes to stderr and exits with CODE),
+    ``produce BYTES`` and ``consume`` (prints the number of bytes read
+    from stdin). Each command first sleeps ``delay`` seconds, like a
+    remote round trip. SFTP serves the local filesystem.
+
+    Yields ``(port, key_path, known_hosts_path)``.
+    """
+    asyncssh = pytest.importorskip("asyncssh")
+
+    host_key = asyncssh.generate_private_key("ssh-ed25519")
+    client_key = asyncssh.generate_private_key("ssh-ed25519")
+    key_path = Path(directory) / "id_ed25519"
+    client_key.write_private_key(str(key_path))
+    key_path.chmod(0o600)
+
+    class Server(asyncssh.SSHServer):
+        def begin_auth(self, username):
+            return True
+
+        def public_key_auth_supported(self):
+            return True
+
+        def validate_public_key(self, username, key):
+            return True
+
+    async def handle(process):
+        name, _, argument = process.command.partition(" ")
+        await asyncio.sleep(delay)
+        code = 0
+        if name == "echo":
+            process.stdout.write(argument.encode() + b"\n")
+        elif name == "fail":
+            process.stderr.write(b"boom\n")
+            code = int(argument)
+        elif name == "produce":
+            remaining = int(argument)
+            while remaining:
+                size = min(remaining, 65536)
+                process.stdout.write(b"x" * size)
+                await process.stdout.drain()
+                remaining -= size
+        elif name == "consume":
+            received = 0
+            while True:
+                data = await process.stdin.read(65536)
+                if not data:
+                    break
+                received += len(data)
+            process.stdout.write(f"{received}\n".encode())
+        process.exit(code)
+
+    server = await asyncssh.create_server(
+        Server,
+        "127.0.0.1",
+        0,
+        server_host_keys=[host_key],
+        process_factory=handle,
+        sftp_factory=True,
+        encoding=None,
+    )
+    port = server.sockets[0].getsockname()[1]
+    known_hosts = Path(directory) / "known_hosts"
+    public_key = host_key.export_public_key().decode().strip()
+    known_hosts.write_text(f"[127.0.0.1]:{port} {public_key}\n")
+    try:
+        yield port, str(key_path), str(known_hosts)
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+FAKE_DOMAIN_XML = """<domain type='kvm'>
+  <name>{name}</name>
+  <devices>
+    <disk type='file' device='disk'>
+      <driver name='qemu' type='qcow2'/>
+      <source file='/var/lib/libvirt/images/{name}.qcow2'/>
+      <target dev='vda' bus='virtio'/>
+    </disk>
+    <disk type='block' device='cdrom'>
+      <driver name='qemu' type='raw'/>
+      <source dev='/dev/sr0'/>
+      <target dev='hdc' bus='ide'/>
+      <readonly/>
+    </disk>
+    <interface type='network'>
+      <mac address='52:54:00:00:00:01'/>
+      <source network='default'/>
+    </interface>
+  </devices>
+</domain>"""
+
+
+class FakeLibvirt:
+    """Stand-in for the libvirt module whose calls block for ``latency`` seconds.
+
+    ``domains`` maps each host to the names of its running domains and
+    ``latencies`` overrides the latency of single hosts. Every call records
+    its name, the thread it ran in and the number of calls in flight.
+    """
+
+    VIR_CONNECT_LIST_DOMAINS_ACTIVE = 1
+    VIR_CONNECT_LIST_DOMAINS_INACTIVE = 2
+    VIR_CONNECT_LIST_DOMAINS_PAUSED = 32
+    VIR_DOMAIN_RUNNING = 1
+    VIR_DOMAIN_BLOCKED = 2
+    VIR_DOMAIN_PAUSED = 3
+    VIR_DOMAIN_SHUTDOWN = 4
+    VIR_DOMAIN_SHUTOFF = 5
+    VIR_DOMAIN_CRASHED = 6
+    VIR_DOMAIN_PMSUSPENDED = 7
+    VIR_NODE_MEMORY_STATS_ALL_CELLS = -1
+    VIR_DOMAIN_STATS_STATE = 1
+    VIR_DOMAIN_STATS_BALLOON = 4
+    VIR_DOMAIN_STATS_VCPU = 8
+    VIR_DOMAIN_STATS_BLOCK = 32
+    VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE = 1
+    VIR_CONNECT_GET_ALL_DOMAINS_STATS_INACTIVE = 2
+    VIR_CONNECT_GET_ALL_DOMAINS_STATS_PAUSED = 32
+    VIR_DOMAIN_EVENT_ID_LIFECYCLE = 0
+    VIR_DOMAIN_EVENT_ID_DEVICE_REMOVED = 15
+    VIR_DOMAIN_EVENT_ID_BLOCK_JOB_2 = 16
+    VIR_DOMAIN_EVENT_ID_DEVICE_ADDED = 19
+
+    class libvirtError(Exception):
+        pass
+
+    def __init__(self, domains, latency=0.0):
+        import threading
+
+        self.domains = domains
+        self.latency = latency
+        self.latencies = {}
+        self.opened = []
+        self.connections = []
+        self.calls = []
+        self.threads = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def call(self, host, name, result=None):
+        """Block like a libvirt round trip to ``host``."""
+        import threading
+        import time
+
+        with self._lock:
+            self.calls.append(name)
+            self.threads.setdefault(host, set()).add(threading.current_thread().name)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latencies.get(host, self.latency))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        return result
+
+    def open(self, uri):
+        host = uri.split("@", 1)[1].split("/", 1)[0]
+        self.opened.append(host)
+        conn = FakeLibvirtConnection(self, host)
+        self.connections.append(conn)
+        return self.call(host, "open", conn)
+
+    def virEventRegisterDefaultImpl(self):
+        pass
+
+    def virEventRunDefaultImpl(self):
+        import time
+
+        time.sleep(0.05)
+
+    def emit(self, host, name, event_id=0):
+        """Deliver an event of a domain to every subscriber of its kind."""
+        details = {
+            self.VIR_DOMAIN_EVENT_ID_LIFECYCLE: (0, 0),
+            self.VIR_DOMAIN_EVENT_ID_BLOCK_JOB_2: ("vda", 0, 0),
+        }.get(event_id, ("virtio-disk1",))
+        for conn in self.connections:
+            if conn.host == host:
+                for subscribed, callback in list(conn.callbacks.values()):
+                    if subscribed == event_id:
+                        domain = FakeLibvirtDomain(self, host, name)
+                        callback(conn, domain, *details, None)
+
+
+class FakeLibvirtConnection:
+    """Connection of a ``FakeLibvirt`` module."""
+
+    def __init__(self, module, host):
+        self.module = module
+        self.host = host
+        self.callbacks = {}
+
+    def isAlive(self):
+        return self.module.call(self.host, "isAlive", True)
+
+    def _domains(self):
+        names = self.module.domains.get(self.host, [])
+        return [FakeLibvirtDomain(self.module, self.host, name) for name in names]
+
+    def listAllDomains(self, flags=0):
+        return self.module.call(self.host, "listAllDomains", self._domains())
+
+    def getAllDomainStats(self, stats=0, flags=0):
+        records = [
+            (
+                domain,
+                {
+                    "state.state": self.module.VIR_DOMAIN_RUNNING,
+                    "balloon.current": 2097152,
+                    "balloon.maximum": 4194304,
+                    "vcpu.current": 2,
+                    "vcpu.maximum": 4,
+                    "block.count": 2,
+                    "block.0.name": "vda",
+                    "block.0.path": f"/var/lib/libvirt/images/{domain.name()}.qcow2",
+                    "block.0.capacity": 10737418240,
+                    "block.0.allocation": 1073741824,
+                    "block.0.physical": 1075838976,
+                    "block.1.name": "hdc",
+                    "block.1.path": "/dev/sr0",
+                    "block.1.capacity": 4697620480,
+                    "block.1.allocation": 0,
+                    "block.1.physical": 4697620480,
+                },
+            )
+            for domain in self._domains()
+        ]
+        return self.module.call(self.host, "getAllDomainStats", records)
+
+    def lookupByName(self, name):
+        self.module.call(self.host, "lookupByName")
+        if name not in self.module.domains.get(self.host, []):
+            raise self.module.libvirtError(f"Domain not found: {name}")
+        return FakeLibvirtDomain(self.module, self.host, name)
+
+    def domainEventRegisterAny(self, domain, event_id, callback, opaque):
+        self.module.call(self.host, "domainEventRegisterAny")
+        callback_id = len(self.callbacks) + 1
+        self.callbacks[callback_id] = (event_id, callback)
+        return callback_id
+
+    def domainEventDeregisterAny(self, callback_id):
+        del self.callbacks[callback_id]
+
+    def close(self):
+        pass
+
+
+class FakeLibvirtDomain:
+    """Running domain of a ``FakeLibvirtConnection``."""
+
+    def __init__(self, module, host, name):
+        self.module = module
+        self.host = host
+        self._name = name
+
+    def info(self):
+        return self.module.call(
+            self.host, "info", [self.module.VIR_DOMAIN_RUNNING, 2097152, 2097152, 2, 0]
+        )
+
+    def name(self):
+        return self._name
+
+    def UUIDString(self):
+        # Answered from the domain object without a round trip
+        return f"uuid-{self._name}"
+
+    def XMLDesc(self, flags=0):
+        return self.module.call(
+            self.host, "XMLDesc", FAKE_DOMAIN_XML.format(name=self._name)
+        )
+
+    def isActive(self):
+        return self.module.call(self.host, "isActive", 1)
+
+    def blockInfo(self, path, flags=0):
+        # capacity, allocation, physical
+        return self.module.call(
+            self.host, "blockInfo", [10737418240, 1073741824, 1075838976]
+        )
+
+
+@pytest.fixture
+def fake_libvirt(monkeypatch):
+    """Install a ``FakeLibvirt`` module with two VMs on each of four hosts."""
+    from kvm_clone import libvirt_wrapper
+
+    module = FakeLibvirt(
+        {f"host{i}": [f"vm{i}a", f"vm{i}b"] for i in range(4)}, latency=0.01
+    )
+    monkeypatch.setattr(libvirt_wrapper, "libvirt", module)
+    return module
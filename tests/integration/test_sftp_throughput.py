@@ -0,0 +1,124 @@
+"""Benchmark of pipelined SFTP transfers over links with added latency."""
+
+import asyncio
+import contextlib
+import os
+import time
+
+import pytest
+
+from kvm_clone.transport import SSH_BACKENDS, SSHTransport
+from tests.conftest import local_ssh_server
+
+FILE_SIZE = 4 * 1024 * 1024
+ROUND_TRIPS = (0.0, 0.01, 0.04)  # seconds
+
+
+@contextlib.asynccontextmanager
+async def latency_proxy(port, rtt):
+    """TCP proxy to ``port`` delaying each direction by half of ``rtt``."""
+
+    async def forward(reader, writer):
+        queue = asyncio.Queue()
+
+        async def receive():
+            while data := await reader.read(65536):
+                queue.put_nowait((time.monotonic() + rtt / 2, data))
+            queue.put_nowait((0.0, b""))
+
+        receiver = asyncio.create_task(receive())
+        try:
+            while True:
+                due, data = await queue.get()
+                if not data:
+                    break
+                await asyncio.sleep(max(due - time.monotonic(), 0))
+                writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            receiver.cancel()
+            writer.close()
+
+    async def handle(client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection("127.0.0.1", port)
+        await asyncio.gather(
+            forward(client_reader, server_writer),
+            forward(server_reader, client_writer),
+            return_exceptions=True,
+        )
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    try:
+        yield server.sockets[0].getsockname()[1]
+    finally:
+        server.close()
+
+
+def trust_proxy(known_hosts, port, proxy_port):
+    """Accept the server's host key when reached through the proxy."""
+    with open(known_hosts) as f:
+        entry = f.readline().replace(f":{port} ", f":{proxy_port} ")
+    with open(known_hosts, "a") as f:
+        f.write(entry)
+
+
+async def timed(coro):
+    """Await ``coro``; return MiB/s for ``FILE_SIZE`` bytes."""
+    start = time.monotonic()
+    await coro
+    return FILE_SIZE / (time.monotonic() - start) / 2**20
+
+
+class TestSFTPPipelineBenchmark:
+    """Compare unpipelined, paramiko and pipelined transfers."""
+
+    @pytest.mark.integration
+    @pytest.mark.slow
+    @pytest.mark.asyncio
+    async def test_transfer_throughput(self, tmp_path):
+        """All methods copy the file intact at every round trip time."""
+        data = os.urandom(FILE_SIZE)
+        local = tmp_path / "local.img"
+        local.write_bytes(data)
+        remote = tmp_path / "remote.img"
+        copy = tmp_path / "copy.img"
+        results = []
+
+        async with local_ssh_server(tmp_path) as (port, key, known):
+            for rtt in ROUND_TRIPS:
+                async with latency_proxy(port, rtt) as proxy_port:
+                    trust_proxy(known, port, proxy_port)
+                    for backend in SSH_BACKENDS:
+                        transport = SSHTransport(
+                            key_path=key, backend=backend, known_hosts=known
+                        )
+                        async with transport.connect("127.0.0.1", proxy_port) as conn:
+                            if backend == "paramiko":
+                                pool = conn.stream_pool
+                                rate = await timed(
+                                    pool.run(conn.sftp.put, str(local), str(remote))
+                                )
+                                results.append((rtt, "paramiko put", rate))
+                                rate = await timed(
+                                    pool.run(conn.sftp.get, str(remote), str(copy))
+                                )
+                                results.append((rtt, "paramiko get", rate))
+                            else:
+                                rate = await timed(
+                                    conn.upload(str(local), str(remote), window=1)
+                                )
+                                results.append((rtt, "asyncssh upload, window 1", rate))
+
+                            rate = await timed(conn.upload(str(local), str(remote)))
+                            results.append((rtt, f"{backend} upload", rate))
+                            assert remote.read_bytes() == data
+
+                            rate = await timed(conn.download(str(remote), str(copy)))
+                            results.append((rtt, f"{backend} download", rate))
+                            assert copy.read_bytes() == data
+                        await transport.close_all()
+
+        for rtt, method, rate in results:
+            print(f"rtt {rtt * 1000:>3.0f} ms  {method:<26} {rate:7.1f} MiB/s")
@@ -0,0 +1,68 @@
+"""Benchmark of the SSH backends against an in-process SSH server."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from kvm_clone.transport import SSH_BACKENDS, SSHTransport
+from tests.conftest import local_ssh_server
+
+COMMANDS = 60
+ROUND_TRIP = 0.02  # seconds the server takes per command
+
+
+async def run_commands(transport, port):
+    """Run ``COMMANDS`` concurrent commands; return rate and extra threads."""
+    done = asyncio.Event()
+
+    async def sample():
+        nonlocal peak
+        while not done.is_set():
+            peak = max(peak, threading.active_count())
+            await asyncio.sleep(0.002)
+
+    async def run(i):
+        async with transport.connect("127.0.0.1", port) as conn:
+            stdout, _, _ = await conn.execute_command(f"echo {i}")
+            assert stdout == f"{i}\n"
+
+    # Connect first so only command execution is measured; connecting may
+    # start resolver threads of the event loop
+    await asyncio.gather(*(run(i) for i in range(transport.max_connections)))
+    baseline = peak = threading.active_count()
+
+    sampler = asyncio.create_task(sample())
+    start = time.monotonic()
+    await asyncio.gather(*(run(i) for i in range(COMMANDS)))
+    elapsed = time.monotonic() - start
+    done.set()
+    await sampler
+    return COMMANDS / elapsed, peak - baseline
+
+
+class TestSSHBackendBenchmark:
+    """Compare command throughput and thread usage of the backends."""
+
+    @pytest.mark.integration
+    @pytest.mark.slow
+    @pytest.mark.asyncio
+    async def test_backends_on_loopback(self, tmp_path):
+        """Both backends run the workload; asyncssh needs no extra threads."""
+        results = {}
+        async with local_ssh_server(tmp_path, delay=ROUND_TRIP) as (port, key, known):
+            for backend in SSH_BACKENDS:
+                transport = SSHTransport(
+                    key_path=key, backend=backend, known_hosts=known, max_connections=2
+                )
+                try:
+                    results[backend] = await run_commands(transport, port)
+                finally:
+                    await transport.close_all()
+
+        for backend, (rate, threads) in results.items():
+            print(f"{backend}: {rate:.0f} commands/s, {threads} extra threads")
+
+        assert results["asyncssh"][1] == 0
+        assert results["paramiko"][1] > 0
@@ -0,0 +1,108 @@
+"""Unit tests for the asyncssh transport backend."""
+
+import asyncio
+import threading
+
+import pytest
+
+from kvm_clone.exceptions import ConfigurationError, SSHError
+from kvm_clone.transport import SSHConnection, SSHTransport
+from tests.conftest import local_ssh_server
+
+pytest.importorskip("asyncssh")
+
+from kvm_clone.asyncssh_transport import AsyncSSHConnection
+
+
+def make_transport(key_path, known_hosts, backend="asyncssh"):
+    return SSHTransport(key_path=key_path, backend=backend, known_hosts=known_hosts)
+
+
+class TestBackendSelection:
+    """Test choosing the SSH implementation."""
+
+    @pytest.mark.unit
+    def test_backend_sets_connection_class_and_channel_default(self):
+        """Each backend has its own connection class and channel limit."""
+        paramiko = SSHTransport()
+        native = SSHTransport(backend="asyncssh")
+        tuned = SSHTransport(backend="asyncssh", max_channels=32)
+
+        assert paramiko._connection_class() is SSHConnection
+        assert native._connection_class() is AsyncSSHConnection
+        assert (paramiko.max_channels, native.max_channels) == (8, 10)
+        assert tuned.max_channels == 32
+        with pytest.raises(ConfigurationError, match="Unknown SSH backend"):
+            SSHTransport(backend="libssh")
+
+
+class TestAsyncSSHConnection:
+    """Test commands, pipes and transfers against a local SSH server."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_commands_run_without_threads(self, tmp_path):
+        """Concurrent commands are multiplexed on the event loop."""
+        async with local_ssh_server(tmp_path, delay=0.05) as (port, key, known):
+            transport = make_transport(key, known)
+            async with transport.connect("127.0.0.1", port) as conn:
+                threads = threading.active_count()
+                results = await asyncio.gather(
+                    *(conn.execute_command(f"echo {i}") for i in range(10))
+                )
+                assert threading.active_count() == threads
+
+                assert [stdout for stdout, _, _ in results] == [
+                    f"{i}\n" for i in range(10)
+                ]
+                assert await conn.execute_command("fail 3") == ("", "boom\n", 3)
+
+                async with conn.stream_command("produce 100000") as stream:
+                    received = sum([len(data) async for _, data in stream.chunks()])
+                assert (received, stream.exit_code) == (100000, 0)
+            await transport.close_all()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_pipe_and_file_transfer(self, tmp_path):
+        """Pipes stream between commands and files go over SFTP."""
+        source = tmp_path / "disk.img"
+        source.write_bytes(b"disk" * 1000)
+        async with local_ssh_server(tmp_path) as (port, key, known):
+            transport = make_transport(key, known)
+            async with transport.connect("127.0.0.1", port) as conn:
+                stats = await conn.transfer_file(str(source), str(tmp_path / "copy"))
+            await transport.close_all()
+            sent = []
+
+            async with transport.connect("127.0.0.1", port) as reader:
+                async with transport.connect("127.0.0.1", port) as writer:
+                    result = await reader.pipe_to(
+                        "produce 1000000",
+                        writer,
+                        "consume",
+                        chunk_size=65536,
+                        buffers=2,
+                        progress=sent.append,
+                    )
+            await transport.close_all()
+
+        assert stats.bytes_transferred == 4000
+        assert (tmp_path / "copy").read_bytes() == source.read_bytes()
+        assert result.bytes_transferred == 1000000
+        assert (result.reader_exit_code, result.writer_exit_code) == (0, 0)
+        assert result.writer_stdout == "1000000\n"
+        assert sent[-1] == 1000000
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_unknown_host_key_is_rejected(self, tmp_path):
+        """Hosts missing from known_hosts are refused."""
+        empty = tmp_path / "empty_known_hosts"
+        empty.write_text("")
+        async with local_ssh_server(tmp_path) as (port, key, _):
+            transport = make_transport(key, str(empty))
+            with pytest.raises(SSHError):
+                async with transport.connect("127.0.0.1", port):
+                    pass
+            await transport.close_all()
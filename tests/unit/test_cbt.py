@@ -0,0 +1,387 @@
+"""Unit tests for changed-block tracking."""
+
+import json
+import os
+import shlex
+import socket
+import struct
+import subprocess
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from kvm_clone.cbt import ChangedBlockTracker, MAX_WRITE_SIZE, NBD_READ_SCRIPT
+from kvm_clone.exceptions import TransferError
+from kvm_clone.libvirt_wrapper import LibvirtWrapper
+from kvm_clone.manifest import ManifestStore
+from kvm_clone.models import (
+    ByteRange,
+    ChangedBlockSession,
+    DiskInfo,
+    SyncOptions,
+    VMInfo,
+    VMState,
+)
+from kvm_clone.sync import VMSynchronizer
+from tests.conftest import FakeTransport
+from tests.unit.test_delta import run_locally
+
+# Dirty bitmap of vda as reported by qemu-img map over NBD: 64 KiB and the
+# 128 KiB following it changed
+DIRTY_MAP = json.dumps(
+    [
+        {"start": 0, "length": 65536, "data": True, "zero": False},
+        {"start": 65536, "length": 65536, "data": False, "zero": False},
+        {"start": 131072, "length": 131072, "data": False, "zero": False},
+        {"start": 262144, "length": 1048576, "data": True, "zero": False},
+    ]
+)
+
+
+def make_vm(name, disk_format="qcow2", state=VMState.RUNNING):
+    """Build a VMInfo with a single disk."""
+    return VMInfo(
+        name=name,
+        uuid="12345678-1234-1234-1234-123456789012",
+        state=state,
+        memory=1024,
+        vcpus=1,
+        disks=[
+            DiskInfo(
+                path=f"/images/{name}.{disk_format}",
+                size=0,
+                format=disk_format,
+                target="vda",
+            )
+        ],
+        networks=[],
+        host="localhost",
+        created=datetime.now(),
+        last_modified=datetime.now(),
+    )
+
+
+def handler(host, command):
+    """Answer qemu-img map with canned dirty bitmaps."""
+    if "x-dirty-bitmap" in command:
+        return DIRTY_MAP, "", 0
+    return "", "", 0
+
+
+def serve_nbd(path, export, image, replies=None):
+    """
+    Serve one NBD client on a Unix socket in a thread; returns the thread.
+
+    With ``replies`` the connection is dropped after that many read replies.
+    """
+    server = socket.socket(socket.AF_UNIX)
+    server.bind(path)
+    server.listen(1)
+
+    def recv(conn, size):
+        data = b""
+        while len(data) < size:
+            data += conn.recv(size - len(data))
+        return data
+
+    def run():
+        conn, _ = server.accept()
+        conn.sendall(b"NBDMAGICIHAVEOPT" + struct.pack(">H", 3))
+        recv(conn, 4)
+        _, option, size = struct.unpack(">QII", recv(conn, 16))
+        name = recv(conn, size)[4:-2]
+        reply = 1 if option == 7 and name == export else 0x80000006
+        conn.sendall(struct.pack(">QIII", 0x3E889045565A9, option, reply, 0))
+        remaining = replies
+        while reply == 1 and remaining != 0:
+            _, _, kind, handle, offset, size = struct.unpack(">IHHQQI", recv(conn, 28))
+            if kind != 0:
+                break
+            if remaining is not None:
+                remaining -= 1
+            data = image[offset : offset + size]
+            conn.sendall(struct.pack(">IIQ", 0x67446698, 0, handle) + data)
+        conn.close()
+        server.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def make_libvirt(checkpoints, active=True):
+    """Build a LibvirtWrapper with mocked checkpoint and backup calls."""
+    libvirt = LibvirtWrapper()
+    libvirt.is_active = AsyncMock(return_value=active)
+    libvirt.list_checkpoints = AsyncMock(return_value=checkpoints)
+    libvirt.create_checkpoint = AsyncMock()
+    libvirt.delete_checkpoint = AsyncMock()
+    libvirt.begin_incremental_backup = AsyncMock()
+    libvirt.abort_backup = AsyncMock()
+    return libvirt
+
+
+class TestChangedBlockTracker:
+    """Test dirty bitmap parsing and write planning."""
+
+    @pytest.mark.unit
+    def test_parse_dirty_map_merges_dirty_entries(self):
+        """Adjacent dirty areas form one extent."""
+        assert ChangedBlockTracker.parse_dirty_map(DIRTY_MAP) == [
+            ByteRange(65536, 196608)
+        ]
+
+    @pytest.mark.unit
+    def test_latest_checkpoint_ignores_foreign_names(self):
+        """Only kvm-clone checkpoints are considered, newest first."""
+        names = ["kvm-clone-900", "backup-1", "kvm-clone-1000"]
+        assert ChangedBlockTracker.latest_checkpoint(names) == "kvm-clone-1000"
+        assert ChangedBlockTracker.latest_checkpoint(["backup-1"]) is None
+
+    @pytest.mark.unit
+    def test_split_extents_limits_write_size(self):
+        """Writes never exceed MAX_WRITE_SIZE."""
+        writes = ChangedBlockTracker.split_extents(
+            [ByteRange(0, 2 * MAX_WRITE_SIZE + 1), ByteRange(5 * MAX_WRITE_SIZE, 1)]
+        )
+
+        assert writes == [
+            ByteRange(0, MAX_WRITE_SIZE),
+            ByteRange(MAX_WRITE_SIZE, MAX_WRITE_SIZE),
+            ByteRange(2 * MAX_WRITE_SIZE, 1),
+            ByteRange(5 * MAX_WRITE_SIZE, 1),
+        ]
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize(
+        "export, returncode", [("vda", 0), ("vdb", 1)], ids=["read", "missing"]
+    )
+    def test_nbd_reader_prints_guest_range(self, tmp_path, export, returncode):
+        """The reader script fetches a range of the export in 4 MiB requests."""
+        image = bytes(range(256)) * (6 * 4096)
+        path = str(tmp_path / "nbd.sock")
+        server = serve_nbd(path, b"vda", image)
+
+        result = subprocess.run(
+            ["python3", "-c", NBD_READ_SCRIPT, path, export, "1000", str(5 << 20)],
+            capture_output=True,
+            timeout=10,
+            check=False,
+        )
+        server.join(5)
+
+        assert result.returncode == returncode
+        if returncode == 0:
+            assert result.stdout == image[1000 : 1000 + (5 << 20)]
+        else:
+            assert b"not available" in result.stderr
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_begin_reads_bitmaps_since_previous_checkpoint(self):
+        """The new checkpoint is created before the bitmaps are read."""
+        libvirt = make_libvirt(["kvm-clone-1000"])
+        tracker = ChangedBlockTracker(FakeTransport(handler), libvirt)
+
+        session = await tracker.begin("src", make_vm("vm"))
+
+        assert session.extents == {"/images/vm.qcow2": [ByteRange(65536, 196608)]}
+        assert session.previous == "kvm-clone-1000"
+        libvirt.create_checkpoint.assert_awaited_once()
+        since = libvirt.begin_incremental_backup.await_args.args[2]
+        assert since == "kvm-clone-1000"
+        # The export stays available for reading the changed blocks
+        assert (
+            session.backup_socket == libvirt.begin_incremental_backup.await_args.args[3]
+        )
+        libvirt.abort_backup.assert_not_awaited()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_unreadable_bitmaps_end_the_backup(self):
+        """Without extents the backup job is not left running."""
+        libvirt = make_libvirt(["kvm-clone-1000"])
+        transport = FakeTransport(lambda host, command: ("", "no bitmap", 1))
+        tracker = ChangedBlockTracker(transport, libvirt)
+
+        session = await tracker.begin("src", make_vm("vm"))
+
+        assert session.extents is None
+        assert session.backup_socket is None
+        libvirt.abort_backup.assert_awaited_once()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_transfer_reads_the_backup_export(self):
+        """Changed blocks come from the NBD export, not the live image file."""
+        transport = FakeTransport()
+        tracker = ChangedBlockTracker(transport, make_libvirt([]))
+        session = ChangedBlockSession(
+            host="src",
+            vm_name="vm",
+            checkpoint="kvm-clone-2000",
+            previous="kvm-clone-1000",
+            backup_socket="/run/kvm-clone-vm.sock",
+        )
+        disk = make_vm("vm").disks[0]
+
+        written = await tracker.transfer(
+            session, "dst", disk, "/dst/vm.qcow2", [ByteRange(65536, 196608)]
+        )
+
+        assert written == 196608
+        [(host, command)] = transport.commands
+        reader, writer = shlex.split(command)[-1].split(" | ", 1)
+        assert host == "src"
+        assert shlex.split(reader)[3:] == [
+            "/run/kvm-clone-vm.sock",
+            "vda",
+            "65536",
+            "196608",
+        ]
+        assert "write -s /dev/stdin 65536 196608" in writer
+        assert disk.path not in command
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("replies", [None, 1], ids=["complete", "reader-died"])
+    async def test_transfer_writes_only_complete_extents(
+        self, tmp_path, monkeypatch, replies
+    ):
+        """An extent is written only if the reader delivered all of it."""
+        image = bytes(range(256)) * (6 * 4096)
+        path = str(tmp_path / "nbd.sock")
+        server = serve_nbd(path, b"vda", image, replies=replies)
+        # Record what reaches qemu-io instead of writing an image
+        written = tmp_path / "written"
+        qemu_io = tmp_path / "qemu-io"
+        qemu_io.write_text(f"#!/bin/sh\ncat > {written}\n")
+        qemu_io.chmod(0o755)
+        monkeypatch.setenv("PATH", f"{tmp_path}:{os.environ['PATH']}")
+        tracker = ChangedBlockTracker(FakeTransport(run_locally), make_libvirt([]))
+        session = ChangedBlockSession(
+            host="src", vm_name="vm", checkpoint="kvm-clone-2000", backup_socket=path
+        )
+        extent = ByteRange(1000, 5 << 20)
+
+        if replies is None:
+            await tracker.transfer(
+                session, "src", make_vm("vm").disks[0], "/dst/vm.qcow2", [extent]
+            )
+            assert written.read_bytes() == image[1000 : 1000 + (5 << 20)]
+        else:
+            with pytest.raises(TransferError, match="Expected 5242880 bytes"):
+                await tracker.transfer(
+                    session, "src", make_vm("vm").disks[0], "/dst/vm.qcow2", [extent]
+                )
+            assert not written.exists()
+        server.join(5)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_begin_without_history_starts_tracking(self):
+        """Without a previous checkpoint only a new one is created."""
+        libvirt = make_libvirt([])
+        tracker = ChangedBlockTracker(FakeTransport(handler), libvirt)
+
+        session = await tracker.begin("src", make_vm("vm"))
+
+        assert session.extents is None
+        assert session.checkpoint.startswith("kvm-clone-")
+        libvirt.begin_incremental_backup.assert_not_awaited()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_begin_skips_unsupported_vms(self):
+        """Raw disks and stopped VMs cannot use changed-block tracking."""
+        libvirt = make_libvirt(["kvm-clone-1000"], active=False)
+        tracker = ChangedBlockTracker(FakeTransport(handler), libvirt)
+
+        assert await tracker.begin("src", make_vm("vm", disk_format="raw")) is None
+        assert await tracker.begin("src", make_vm("vm")) is None
+        libvirt.create_checkpoint.assert_not_awaited()
+
+
+class TestSynchronizerChangedBlocks:
+    """Test synchronization driven by changed-block tracking."""
+
+    def make_synchronizer(self, transport, libvirt, tmp_path):
+        libvirt.vm_exists = AsyncMock(return_value=True)
+        libvirt.get_vm_info = AsyncMock(
+            side_effect=[make_vm("vm"), make_vm("vm", state=VMState.STOPPED)]
+        )
+        return VMSynchronizer(transport, libvirt, ManifestStore(str(tmp_path)))
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_sync_writes_only_dirty_blocks(self, tmp_path):
+        """Dirty blocks are written with qemu-io and disks are not hashed."""
+        transport = FakeTransport(handler)
+
+        libvirt = make_libvirt(["kvm-clone-1000"])
+        synchronizer = self.make_synchronizer(transport, libvirt, tmp_path)
+
+        result = await synchronizer.sync(
+            "src", "dst", "vm", SyncOptions(changed_block_tracking=True)
+        )
+
+        assert result.success
+        assert result.bytes_transferred == 196608
+        commands = [command for _, command in transport.commands]
+        assert not any("hashlib" in command for command in commands)
+        assert not any(command.startswith("rsync") for command in commands)
+        assert sum("qemu-io" in command for command in commands) == 1
+        # Only the checkpoint of this sync is kept
+        libvirt.abort_backup.assert_awaited_once()
+        assert libvirt.delete_checkpoint.await_args.args[2] == "kvm-clone-1000"
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_failed_sync_discards_checkpoint(self, tmp_path):
+        """A failed sync drops its checkpoint so no changes are lost."""
+
+        def failing(host, command):
+            if "qemu-io" in command:
+                return "", "write failed", 1
+            return handler(host, command)
+
+        libvirt = make_libvirt(["kvm-clone-1000"])
+        synchronizer = self.make_synchronizer(FakeTransport(failing), libvirt, tmp_path)
+
+        result = await synchronizer.sync(
+            "src", "dst", "vm", SyncOptions(changed_block_tracking=True)
+        )
+
+        assert not result.success
+        checkpoint = libvirt.create_checkpoint.await_args.args[2]
+        libvirt.abort_backup.assert_awaited_once()
+        libvirt.delete_checkpoint.assert_awaited_once()
+        assert libvirt.delete_checkpoint.await_args.args[2] == checkpoint
+
+
+class TestLibvirtCheckpoints:
+    """Test checkpoint and backup XML sent to libvirt."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_incremental_backup_exports_bitmaps(self):
+        """Each disk is exported with a dirty bitmap named after its target."""
+        domain = MagicMock()
+        conn = MagicMock()
+        conn.lookupByName.return_value = domain
+        libvirt = LibvirtWrapper()
+        libvirt.connect_to_host = AsyncMock(return_value=conn)
+
+        await libvirt.begin_incremental_backup(
+            MagicMock(), "vm", "kvm-clone-1000", "/run/x.sock", ["vda", "vdb"]
+        )
+
+        root = ET.fromstring(domain.backupBegin.call_args.args[0])
+        assert root.get("mode") == "pull"
+        assert root.findtext("incremental") == "kvm-clone-1000"
+        assert root.find("server").get("socket") == "/run/x.sock"
+        bitmaps = [disk.get("exportbitmap") for disk in root.iter("disk")]
+        assert bitmaps == ["kvm-clone-vda", "kvm-clone-vdb"]
@@ -0,0 +1,192 @@
+"""Unit tests for cloning qcow2 overlays with their backing chains."""
+
+import json
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from kvm_clone.chain import BASE_DIR, BackingChain
+from kvm_clone.cloner import VMCloner
+from kvm_clone.libvirt_wrapper import LibvirtWrapper
+from kvm_clone.models import BackingLayer, CloneOptions, DiskInfo, TransferStats
+from tests.conftest import FakeTransport
+
+GOLDEN = "/var/lib/libvirt/images/golden.qcow2"
+MIDDLE = "/var/lib/libvirt/images/golden-patched.qcow2"
+DIGESTS = {GOLDEN: "a" * 64, MIDDLE: "b" * 64}
+# Apparent sizes; qemu-img reports the smaller allocated sizes below
+SIZES = {GOLDEN: 10737418240, MIDDLE: 1073741824}
+
+CHAIN_JSON = json.dumps(
+    [
+        {"filename": "{top}", "format": "qcow2", "actual-size": 1000},
+        {"filename": MIDDLE, "format": "qcow2", "actual-size": 2000},
+        {"filename": GOLDEN, "format": "qcow2", "actual-size": 40000},
+    ]
+)
+
+
+def chain_hosts(dest_files):
+    """Handler for a source holding the chain and a destination holding ``dest_files``."""
+
+    def handler(host, command):
+        if command.startswith("qemu-img info"):
+            return CHAIN_JSON, "", 0
+        if command.startswith("stat -c %s"):
+            path = command.split()[-1]
+            return f"{SIZES[path]}\n{DIGESTS[path]}  {path}\n", "", 0
+        if command.startswith("if"):
+            path = next(path for path in DIGESTS if path in command)
+            if path in dest_files and f" = {SIZES[path]} ]" in command:
+                return f"{DIGESTS[path]}  {path}\n", "", 0
+            return "", "", 0
+        if command.startswith("test -f"):
+            return "", "", 0 if command.split()[-1] in dest_files else 1
+        return "", "", 0
+
+    return handler
+
+
+def overlay(name):
+    return DiskInfo(
+        path=f"/var/lib/libvirt/images/{name}.qcow2",
+        size=10737418240,
+        format="qcow2",
+        target="vda",
+    )
+
+
+class TestBackingChain:
+    """Test discovering and placing backing images."""
+
+    @pytest.mark.unit
+    def test_chain_is_parsed_nearest_first(self):
+        """The image itself is skipped and its backing files follow in order."""
+        layers = BackingChain.parse_chain(CHAIN_JSON)
+
+        assert [(layer.path, layer.format) for layer in layers] == [
+            (MIDDLE, "qcow2"),
+            (GOLDEN, "qcow2"),
+        ]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_identical_base_on_destination_is_reused(self):
+        """A base with the same content at the same path is not transferred."""
+        transport = FakeTransport(chain_hosts({GOLDEN}))
+        chain = BackingChain(transport, "src", "dst")
+
+        layers = await chain.discover(overlay("vm"))
+        await chain.place(layers)
+
+        middle, golden = layers
+        assert (golden.size, golden.digest) == (SIZES[GOLDEN], DIGESTS[GOLDEN])
+        assert (golden.dest_path, golden.reused) == (GOLDEN, True)
+        assert not middle.reused
+        assert middle.dest_path.startswith(f"{BASE_DIR}/")
+        assert middle.dest_path.endswith("-golden-patched.qcow2")
+        assert ("dst", f"mkdir -p {BASE_DIR}") in transport.commands
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_shared_copy_is_found_by_content(self):
+        """A layer committed by an earlier clone is reused from the base dir."""
+        shared = BackingChain.base_path(
+            BackingLayer(path=MIDDLE, format="qcow2", digest=DIGESTS[MIDDLE]),
+            BackingLayer(path=GOLDEN, format="qcow2", dest_path=GOLDEN),
+        )
+        chain = BackingChain(FakeTransport(chain_hosts({GOLDEN, shared})), "src", "dst")
+
+        layers = await chain.discover(overlay("vm"))
+        await chain.place(layers)
+
+        assert [(layer.dest_path, layer.reused) for layer in layers] == [
+            (shared, True),
+            (GOLDEN, True),
+        ]
+
+    @pytest.mark.unit
+    def test_domain_xml_gets_the_new_chain(self):
+        """The backingStore elements describe the destination chain."""
+        disk = ET.fromstring(
+            "<disk type='file'><source file='/new.qcow2'/>"
+            "<backingStore type='file'><source file='/old.qcow2'/></backingStore>"
+            "<target dev='vda'/></disk>"
+        )
+        layers = [
+            BackingLayer(path=MIDDLE, format="qcow2", dest_path="/bases/mid.qcow2"),
+            BackingLayer(path=GOLDEN, format="raw", dest_path=GOLDEN),
+        ]
+
+        BackingChain.rewrite_xml(disk, layers)
+
+        assert [child.tag for child in disk] == ["source", "backingStore", "target"]
+        sources = [elem.get("file") for elem in disk.iter("source")]
+        assert sources == ["/new.qcow2", "/bases/mid.qcow2", GOLDEN]
+        assert disk.find("backingStore/backingStore/format").get("type") == "raw"
+        assert list(disk.find("backingStore/backingStore/backingStore")) == []
+
+
+class TestChainTransfer:
+    """Test that the cloner only ships missing backing images."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_only_missing_layers_are_transferred(self, monkeypatch):
+        """Overlays sharing a base transfer the missing layer once."""
+        transport = FakeTransport(chain_hosts({GOLDEN}))
+        cloner = VMCloner(transport, LibvirtWrapper())
+        transferred = []
+
+        async def fake_transfer(source_host, dest_host, source_path, *args, **kwargs):
+            transferred.append((source_path, kwargs["dest_path"]))
+            return kwargs["dest_path"], TransferStats(bytes_transferred=2000)
+
+        monkeypatch.setattr(cloner, "_transfer_disk_image", fake_transfer)
+        disks = [overlay("vm-a"), overlay("vm-b")]
+
+        chains, sent = await cloner._transfer_backing_chains(
+            "src", "dst", disks, "clone", CloneOptions(), "op"
+        )
+
+        middle = chains[disks[0].path][0]
+        assert transferred == [(MIDDLE, f"{middle.dest_path}.part")]
+        assert sent == 2000
+        dest_commands = [
+            command for host, command in transport.commands if host == "dst"
+        ]
+        assert (
+            f"qemu-img rebase -u -f qcow2 -F qcow2 -b {GOLDEN} {middle.dest_path}.part"
+            in dest_commands
+        )
+        assert f"mv -f {middle.dest_path}.part {middle.dest_path}" in dest_commands
+
+        await cloner._rebase_disks(
+            "src",
+            "dst",
+            disks[:1],
+            {disks[0].path: ("/var/lib/libvirt/images/clone_vm-a.qcow2", None)},
+            chains,
+        )
+        rebase = (
+            f"qemu-img rebase -u -f qcow2 -F qcow2 -b {middle.dest_path} "
+            "/var/lib/libvirt/images/clone_vm-a.qcow2"
+        )
+        assert transport.commands[-1] == ("dst", rebase)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_disks_without_backing_file_are_left_alone(self):
+        """Raw disks are not inspected and flat qcow2 disks have no chain."""
+        transport = FakeTransport(
+            lambda host, command: (json.dumps([{"filename": "x"}]), "", 0)
+        )
+        cloner = VMCloner(transport, LibvirtWrapper())
+        raw = DiskInfo(path="/images/raw.img", size=1, format="raw", target="vdb")
+
+        chains, sent = await cloner._transfer_backing_chains(
+            "src", "dst", [overlay("vm"), raw], "clone", CloneOptions(), "op"
+        )
+
+        assert (chains, sent) == ({}, 0)
+        assert len(transport.commands) == 1
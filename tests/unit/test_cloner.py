@@ -0,0 +1,158 @@
+"""Unit tests for VM cloning operations."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from kvm_clone.cloner import VMCloner
+from kvm_clone.exceptions import TransferError
+from kvm_clone.libvirt_wrapper import LibvirtWrapper
+from kvm_clone.models import CloneOptions, DiskInfo, TransferStats, VMState
+from kvm_clone.transport import SSHTransport
+from tests.conftest import FakeTransport
+
+
+def make_disks(count, size=1024):
+    """Build a list of disks for a test VM."""
+    return [
+        DiskInfo(
+            path=f"/var/lib/libvirt/images/vm-disk{i}.qcow2",
+            size=size,
+            format="qcow2",
+            target=f"vd{chr(ord('a') + i)}",
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def cloner():
+    """VM cloner with unconnected transport and libvirt wrapper."""
+    return VMCloner(SSHTransport(), LibvirtWrapper())
+
+
+class TestParallelDiskTransfer:
+    """Test bounded-concurrency transfer of multiple disks."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_transfers_respect_parallel_limit(self, cloner, monkeypatch):
+        """No more than CloneOptions.parallel disks are in flight at once."""
+        in_flight = 0
+        max_in_flight = 0
+
+        async def fake_transfer(source_host, dest_host, source_path, *args, **kwargs):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return source_path + ".new", TransferStats()
+
+        monkeypatch.setattr(cloner, "_transfer_disk_image", fake_transfer)
+        disks = make_disks(8)
+
+        mappings = await cloner._transfer_disks(
+            "src", "dst", disks, "vm-clone", CloneOptions(parallel=3), None, "op"
+        )
+
+        assert max_in_flight == 3
+        assert {path: dest for path, (dest, _) in mappings.items()} == {
+            disk.path: disk.path + ".new" for disk in disks
+        }
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_progress_is_aggregated(self, cloner, monkeypatch):
+        """Progress updates report the total across all disks."""
+
+        async def fake_transfer(source_host, dest_host, source_path, *args, **kwargs):
+            return source_path, TransferStats()
+
+        monkeypatch.setattr(cloner, "_transfer_disk_image", fake_transfer)
+        updates = []
+
+        await cloner._transfer_disks(
+            "src",
+            "dst",
+            make_disks(4, size=100),
+            "vm-clone",
+            CloneOptions(parallel=2),
+            updates.append,
+            "op",
+        )
+
+        assert all(update.total_bytes == 400 for update in updates)
+        assert updates[-1].bytes_transferred == 400
+        assert updates[-1].progress_percent == 100.0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_failure_cancels_remaining_transfers(self, cloner, monkeypatch):
+        """A failing disk cancels the transfers still in flight."""
+        cancelled = []
+
+        async def fake_transfer(source_host, dest_host, source_path, *args, **kwargs):
+            if source_path.endswith("disk0.qcow2"):
+                raise TransferError("boom", source_host, dest_host)
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(source_path)
+                raise
+            return source_path, TransferStats()
+
+        monkeypatch.setattr(cloner, "_transfer_disk_image", fake_transfer)
+
+        with pytest.raises(TransferError):
+            await cloner._transfer_disks(
+                "src", "dst", make_disks(3), "vm-clone", CloneOptions(), None, "op"
+            )
+
+        assert len(cancelled) == 2
+
+
+class TestTransferPlanning:
+    """Test planning transfers from the disks' host sizes."""
+
+    @pytest.mark.unit
+    def test_planned_bytes_follow_the_backend(self):
+        """Sparse transfers plan allocated bytes, the others the file size."""
+        disk = DiskInfo(
+            path="/images/vm.qcow2",
+            size=10 * 2**30,
+            format="qcow2",
+            target="vda",
+            allocation=2**30,
+            physical=2**31,
+        )
+        unknown = DiskInfo(path="/images/b.raw", size=4096, format="raw", target="vdb")
+
+        assert VMCloner.planned_bytes(disk, "sparse") == 2**30
+        assert VMCloner.planned_bytes(disk, "rsync") == 2**31
+        assert VMCloner.planned_bytes(unknown, "sparse") == 4096
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_insufficient_destination_space_fails_validation(self):
+        """A clone that does not fit on the destination is rejected up front."""
+        disks = make_disks(2)
+        for disk in disks:
+            disk.physical = 3 * 2**30
+        vm_info = MagicMock(disks=disks, state=VMState.STOPPED)
+        libvirt = LibvirtWrapper()
+        libvirt.vm_exists = AsyncMock(side_effect=[True, False])
+        libvirt.get_vm_info = AsyncMock(return_value=vm_info)
+        libvirt.get_host_resources = AsyncMock()
+
+        def handler(host, command):
+            assert command == "df -B1 --output=avail /var/lib/libvirt/images"
+            return f"   Avail\n{5 * 2**30}\n", "", 0
+
+        cloner = VMCloner(FakeTransport(handler), libvirt)
+
+        result = await cloner.validate_prerequisites("src", "dst", "vm", CloneOptions())
+
+        assert not result.valid
+        assert f"Required {6 * 2**30} bytes" in result.errors[0]
@@ -0,0 +1,278 @@
+"""Unit tests for the session daemon."""
+
+import asyncio
+import contextlib
+import os
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from kvm_clone.client import KVMCloneClient
+from kvm_clone.daemon import (
+    DaemonClient,
+    SessionDaemon,
+    check_socket_directory,
+    decode,
+    encode,
+    open_client,
+    ping,
+    request,
+)
+from kvm_clone.exceptions import ConnectionError, KVMCloneError, VMNotFoundError
+from kvm_clone.models import (
+    CloneResult,
+    DiskInfo,
+    DiskVerification,
+    HostListing,
+    OperationStatusEnum,
+    OperationType,
+    ProgressInfo,
+    VMInfo,
+    VMState,
+)
+
+
+def make_vm(state=VMState.RUNNING):
+    """VM with one disk."""
+    return VMInfo(
+        name="web",
+        uuid="1234",
+        state=state,
+        memory=1024,
+        vcpus=2,
+        disks=[DiskInfo(path="/web.qcow2", size=10, format="qcow2", target="vda")],
+        networks=[],
+        host="h1",
+        created=datetime(2026, 1, 2, 3, 4, 5),
+        last_modified=datetime(2026, 1, 2, 3, 4, 6),
+    )
+
+
+class FakeClient:
+    """KVMCloneClient stand-in recording its calls."""
+
+    instances = []
+
+    def __init__(self, config, timeout):
+        self.config = config
+        self.timeout = timeout
+        self.calls = []
+        self.closed = False
+        self.transport = SimpleNamespace(connections=["conn"])
+        FakeClient.instances.append(self)
+
+    async def clone_vm(self, source_host, dest_host, vm_name, progress_callback=None):
+        self.calls.append(("clone_vm", source_host, dest_host, vm_name))
+        if progress_callback:
+            for done in (50, 100):
+                progress_callback(
+                    ProgressInfo(
+                        operation_id="op",
+                        operation_type=OperationType.CLONE,
+                        progress_percent=done,
+                        bytes_transferred=done,
+                        total_bytes=100,
+                        speed=10.0,
+                        eta=None,
+                        status=OperationStatusEnum.RUNNING,
+                    )
+                )
+        return CloneResult(
+            operation_id="op",
+            success=True,
+            source_host=source_host,
+            dest_host=dest_host,
+            vm_name=vm_name,
+            new_vm_name=f"{vm_name}_clone",
+            duration=1.5,
+            bytes_transferred=100,
+        )
+
+    async def sync_vm(self, source_host, dest_host, vm_name, progress_callback=None):
+        self.calls.append(("sync_vm", source_host, dest_host, vm_name))
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.calls.append(("cancelled", vm_name))
+            raise
+
+    async def iter_vms(self, hosts, status_filter=None):
+        for host in reversed(hosts):
+            yield HostListing(host=host, vms=[make_vm()])
+
+    async def store_gc(self, host, budget):
+        raise VMNotFoundError("web", host)
+
+    async def __aexit__(self, *exc_info):
+        self.closed = True
+
+
+@contextlib.asynccontextmanager
+async def running_daemon(directory, **kwargs):
+    """Run a daemon serving fake clients; yields the daemon."""
+    FakeClient.instances = []
+    server = SessionDaemon(
+        str(directory / "d.sock"), client_factory=FakeClient, **kwargs
+    )
+    serving = asyncio.create_task(server.serve())
+    while await ping(server.socket_path) is None:
+        await asyncio.sleep(0.01)
+    try:
+        yield server
+    finally:
+        server.stop()
+        await serving
+
+
+class TestCodec:
+    """Test converting models to JSON data and back."""
+
+    @pytest.mark.unit
+    def test_models_enums_and_dates_round_trip(self):
+        """Nested models keep their types."""
+        value = {
+            "result": CloneResult(
+                operation_id="op",
+                success=True,
+                source_host="a",
+                dest_host="b",
+                vm_name="web",
+                new_vm_name="web2",
+                duration=2.0,
+                bytes_transferred=5,
+                verification=[
+                    DiskVerification(
+                        source_path="/s.img", dest_path="/d.img", block_size=4096
+                    )
+                ],
+            ),
+            "vm": make_vm(VMState.PAUSED),
+            "when": datetime(2026, 1, 2, 3, 4, 5),
+        }
+
+        assert decode(encode(value)) == value
+
+    @pytest.mark.unit
+    def test_only_model_types_are_built(self):
+        """Type tags cannot name arbitrary classes."""
+        with pytest.raises(ValueError, match="Unknown model type"):
+            decode({"__model__": "KVMCloneClient", "fields": {}})
+        with pytest.raises(ValueError, match="not an enum"):
+            decode({"__enum__": "VMInfo", "value": 1})
+
+
+class TestSessionDaemon:
+    """Test forwarding client calls to the daemon."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_calls_reuse_the_client_of_their_config(self, tmp_path):
+        """Results, progress and listings arrive; clients stay warm."""
+        async with running_daemon(tmp_path) as daemon:
+            client = DaemonClient({"ssh_key_path": "k"}, 60, daemon.socket_path)
+            progress = []
+
+            result = await client.clone_vm(
+                "a", "b", "web", progress_callback=progress.append
+            )
+            listings = [listing async for listing in client.iter_vms(["h1", "h2"])]
+            await DaemonClient({"ssh_key_path": "k"}, 60, daemon.socket_path).clone_vm(
+                "a", "c", "db"
+            )
+            await DaemonClient({}, 60, daemon.socket_path).clone_vm("a", "b", "web")
+
+            assert isinstance(result, CloneResult)
+            assert result.new_vm_name == "web_clone"
+            assert [p.progress_percent for p in progress] == [50, 100]
+            assert [listing.host for listing in listings] == ["h2", "h1"]
+            assert listings[0].vms[0].state is VMState.RUNNING
+            assert len(FakeClient.instances) == 2
+            assert len(FakeClient.instances[0].calls) == 2
+            assert FakeClient.instances[0].timeout == 60
+            status = await ping(daemon.socket_path)
+            assert (status["requests"], status["connections"]) == (4, 2)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_errors_keep_their_code(self, tmp_path):
+        """Failures are raised in the caller with the original error code."""
+        async with running_daemon(tmp_path) as daemon:
+            client = DaemonClient({}, socket_path=daemon.socket_path)
+
+            with pytest.raises(KVMCloneError, match="VM 'web' not found") as error:
+                await client.store_gc("host", 10)
+            assert error.value.error_code == VMNotFoundError("web", "host").error_code
+            with pytest.raises(RuntimeError, match="Unknown method"):
+                await request(daemon.socket_path, {"method": "__init__", "config": {}})
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_the_call(self, tmp_path):
+        """A caller interrupted while waiting cancels its call in the daemon."""
+        async with running_daemon(tmp_path) as daemon:
+            client = DaemonClient({}, socket_path=daemon.socket_path)
+            forwarded = asyncio.create_task(client.sync_vm("a", "b", "web"))
+            while not FakeClient.instances or not FakeClient.instances[0].calls:
+                await asyncio.sleep(0.01)
+
+            forwarded.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await forwarded
+            for _ in range(100):
+                if ("cancelled", "web") in FakeClient.instances[0].calls:
+                    break
+                await asyncio.sleep(0.01)
+
+            assert FakeClient.instances[0].calls[-1] == ("cancelled", "web")
+            assert await ping(daemon.socket_path) is not None
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_socket_directory_must_be_private(self, tmp_path):
+        """Shared, foreign or symlinked socket directories are refused."""
+        shared = tmp_path / "shared"
+        shared.mkdir(mode=0o755)
+        shared.chmod(0o755)
+        link = tmp_path / "link"
+        link.symlink_to(tmp_path / "private")
+
+        for directory in (shared, link):
+            path = str(directory / "d.sock")
+            with pytest.raises(ConnectionError, match="Refusing socket directory"):
+                await SessionDaemon(path, client_factory=FakeClient).serve()
+            with pytest.raises(ConnectionError, match="Refusing socket directory"):
+                await request(path, {"method": "ping"})
+
+        check_socket_directory(str(tmp_path / "private" / "d.sock"), create=True)
+        assert os.stat(tmp_path / "private").st_mode & 0o777 == 0o700
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stop_closes_clients_and_socket(self, tmp_path):
+        """Stopping and idling out both shut the daemon down cleanly."""
+        async with running_daemon(tmp_path) as server:
+            path = server.socket_path
+            await DaemonClient({}, socket_path=path).clone_vm("a", "b", "web")
+            await request(path, {"method": "stop"})
+            await asyncio.sleep(0.05)
+
+            assert await ping(path) is None
+            assert server.clients == {}
+            assert FakeClient.instances[-1].closed
+
+        idle = SessionDaemon(path, idle_timeout=0.1, client_factory=FakeClient)
+        await asyncio.wait_for(idle.serve(), 5)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_open_client_uses_daemon_only_when_running(self, tmp_path):
+        """Without a daemon, or when told not to, calls run locally."""
+        async with running_daemon(tmp_path) as daemon:
+            path = daemon.socket_path
+            async with open_client({}, socket_path=path) as client:
+                assert isinstance(client, DaemonClient)
+            async with open_client({}, use_daemon=False, socket_path=path) as client:
+                assert isinstance(client, KVMCloneClient)
+        async with open_client({}, socket_path=str(tmp_path / "none.sock")) as client:
+            assert isinstance(client, KVMCloneClient)
@@ -0,0 +1,149 @@
+"""Unit tests for block-level delta calculation."""
+
+import subprocess
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+import pytest
+
+from kvm_clone.delta import DeltaEngine
+from kvm_clone.libvirt_wrapper import LibvirtWrapper
+from kvm_clone.manifest import ManifestStore
+from kvm_clone.models import (
+    BlockHashes,
+    ByteRange,
+    DiskInfo,
+    SyncOptions,
+    VMInfo,
+    VMState,
+)
+from kvm_clone.sync import VMSynchronizer
+from tests.conftest import FakeTransport
+
+
+def run_locally(host, command):
+    """Execute a command on the local machine, ignoring the host."""
+    result = subprocess.run(
+        command, shell=True, capture_output=True, text=True, check=False
+    )
+    return result.stdout, result.stderr, result.returncode
+
+
+def make_vm(name, disk_path):
+    """Build a VMInfo with a single disk."""
+    return VMInfo(
+        name=name,
+        uuid="12345678-1234-1234-1234-123456789012",
+        state=VMState.STOPPED,
+        memory=1024,
+        vcpus=1,
+        disks=[DiskInfo(path=disk_path, size=0, format="raw", target="vda")],
+        networks=[],
+        host="localhost",
+        created=datetime.now(),
+        last_modified=datetime.now(),
+    )
+
+
+class TestDeltaEngine:
+    """Test block hashing and comparison."""
+
+    @pytest.mark.unit
+    def test_compare_merges_changed_blocks(self):
+        """Adjacent changed blocks are merged into one extent."""
+        source = BlockHashes(size=18, block_size=4, digests=list("abcde"))
+        dest = BlockHashes(size=16, block_size=4, digests=list("aXYd"))
+
+        extents = DeltaEngine.compare(source, dest)
+
+        assert extents == [ByteRange(4, 8), ByteRange(16, 2)]
+        assert DeltaEngine.count_blocks(extents, 4) == 3
+
+    @pytest.mark.unit
+    def test_compare_identical_files(self):
+        """Identical digests produce no extents."""
+        hashes = BlockHashes(size=8, block_size=4, digests=["a", "b"])
+        assert DeltaEngine.compare(hashes, hashes) == []
+
+    @pytest.mark.unit
+    def test_compare_rejects_mismatched_block_size(self):
+        """Digests of different block sizes cannot be compared."""
+        with pytest.raises(ValueError):
+            DeltaEngine.compare(BlockHashes(4, 4, ["a"]), BlockHashes(4, 2, ["a"]))
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_remote_hashing_finds_changed_blocks(self, tmp_path):
+        """The remote hashing script reports changed blocks of real files."""
+        source = tmp_path / "source.raw"
+        dest = tmp_path / "dest.raw"
+        data = bytearray(b"x" * 4096 * 4)
+        source.write_bytes(bytes(data))
+        data[4096 * 2 + 10] = ord("y")
+        dest.write_bytes(bytes(data))
+
+        engine = DeltaEngine(FakeTransport(run_locally), block_size=4096)
+        extents = await engine.diff("src", str(source), "dst", str(dest))
+
+        assert extents == [ByteRange(8192, 4096)]
+
+
+class TestSynchronizerDelta:
+    """Test delta-driven synchronization."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_calculate_delta_reports_real_changes(self, tmp_path):
+        """DeltaInfo is derived from block hashes, not estimates."""
+        source = tmp_path / "source.raw"
+        dest = tmp_path / "dest.raw"
+        source.write_bytes(b"a" * 8192 + b"b" * 4096)
+        dest.write_bytes(b"a" * 8192)
+
+        libvirt = LibvirtWrapper()
+        libvirt.get_vm_info = AsyncMock(
+            side_effect=[make_vm("vm", str(source)), make_vm("vm", str(dest))]
+        )
+        synchronizer = VMSynchronizer(
+            FakeTransport(run_locally), libvirt, ManifestStore(str(tmp_path / "m"))
+        )
+
+        delta = await synchronizer.calculate_delta("src", "dst", "vm", block_size=4096)
+
+        assert delta.total_size == 12288
+        assert delta.changed_size == 4096
+        assert delta.changed_blocks == 1
+        assert delta.files_changed == [str(source)]
+        assert delta.extents == {str(source): [ByteRange(8192, 4096)]}
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_sync_disk_copies_only_changed_extents(self, tmp_path):
+        """With known extents the disk is synced without rsync."""
+
+        def handler(host, command):
+            if "sha256sum" in command:
+                return "same  -\n", "", 0
+            return "", "", 0
+
+        transport = FakeTransport(handler)
+        synchronizer = VMSynchronizer(
+            transport, LibvirtWrapper(), ManifestStore(str(tmp_path))
+        )
+
+        stats = await synchronizer._sync_disk(
+            "src",
+            "dst",
+            "/images/vm.raw",
+            "/images/vm.raw",
+            SyncOptions(block_size=4096),
+            None,
+            "op",
+            extents=[ByteRange(8192, 8192)],
+            disk_size=65536,
+        )
+
+        commands = [command for _, command in transport.commands]
+        assert not any(command.startswith("rsync") for command in commands)
+        assert sum("conv=notrunc" in command for command in commands) == 1
+        assert stats == {"bytes_transferred": 8192, "blocks_synchronized": 2}
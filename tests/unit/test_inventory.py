@@ -0,0 +1,181 @@
+"""Unit tests for the libvirt inventory cache."""
+
+import pytest
+
+from kvm_clone.inventory import InventoryCache
+from kvm_clone.libvirt_wrapper import LibvirtWrapper
+from kvm_clone.models import InventoryEntry
+from kvm_clone.transport import SSHConnection
+from tests.conftest import FakeLibvirtConnection
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestInventoryCache:
+    """Test expiry and invalidation of cached domains."""
+
+    @pytest.mark.unit
+    def test_entries_expire_after_ttl(self):
+        """An entry is served until its TTL has passed."""
+        clock = FakeClock()
+        cache = InventoryCache(ttl=10, clock=clock)
+        cache.put("a", "vm", InventoryEntry(xml="<domain/>"), cache.generation("a"))
+
+        clock.now = 9.9
+        assert cache.get("a", "vm").xml == "<domain/>"
+        clock.now = 10
+        assert cache.get("a", "vm") is None
+
+        stats = cache.stats()
+        assert (stats.hits, stats.misses, stats.invalidations) == (1, 1, 1)
+        assert stats.entries == 0
+
+    @pytest.mark.unit
+    def test_lookup_racing_an_invalidation_is_not_cached(self):
+        """A result fetched before an event may be stale and is dropped."""
+        cache = InventoryCache()
+        generation = cache.generation("a")
+        cache.invalidate("a", "vm")
+
+        assert not cache.put("a", "vm", InventoryEntry(xml="old"), generation)
+        assert cache.get("a", "vm") is None
+
+    @pytest.mark.unit
+    def test_zero_ttl_disables_caching(self):
+        """Nothing is cached without a TTL."""
+        cache = InventoryCache(ttl=0)
+
+        assert not cache.enabled
+        assert not cache.put("a", "vm", InventoryEntry(xml="x"), 0)
+
+
+class TestCachedLookups:
+    """Test that repeated lookups of a domain cost no round trips."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_clone_lookups_fetch_the_xml_once(self, fake_libvirt):
+        """Prerequisites, VM info and definition share one XML fetch."""
+        wrapper = LibvirtWrapper()
+        conn = SSHConnection("host0")
+
+        assert await wrapper.vm_exists(conn, "vm0a")
+        first = await wrapper.get_vm_info(conn, "vm0a")
+        assert await wrapper.vm_exists(conn, "vm0a")
+        second = await wrapper.get_vm_info(conn, "vm0a")
+        xml = await wrapper.clone_vm_definition(conn, "vm0a", "clone")
+
+        assert fake_libvirt.calls.count("XMLDesc") == 1
+        assert fake_libvirt.calls.count("lookupByName") == 2
+        assert second == first
+        assert "<name>clone</name>" in xml
+        assert wrapper.cache_stats().hits == 3
+        wrapper.close_all_connections()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_results_are_copies(self, fake_libvirt):
+        """Changing a returned VMInfo does not change the cached one."""
+        wrapper = LibvirtWrapper()
+        conn = SSHConnection("host0")
+
+        vm_info = await wrapper.get_vm_info(conn, "vm0a")
+        vm_info.disks.clear()
+
+        assert len((await wrapper.get_vm_info(conn, "vm0a")).disks) == 1
+        wrapper.close_all_connections()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "event",
+        [
+            "VIR_DOMAIN_EVENT_ID_LIFECYCLE",
+            "VIR_DOMAIN_EVENT_ID_BLOCK_JOB_2",
+            "VIR_DOMAIN_EVENT_ID_DEVICE_ADDED",
+            "VIR_DOMAIN_EVENT_ID_DEVICE_REMOVED",
+        ],
+    )
+    async def test_domain_events_invalidate_the_domain(self, fake_libvirt, event):
+        """A domain is fetched again after libvirt reported a change."""
+        wrapper = LibvirtWrapper()
+        conn = SSHConnection("host0")
+        await wrapper.get_vm_info(conn, "vm0a")
+        await wrapper.get_vm_info(conn, "vm0b")
+
+        fake_libvirt.emit("host0", "vm0a", getattr(fake_libvirt, event))
+        await wrapper.get_vm_info(conn, "vm0a")
+        await wrapper.get_vm_info(conn, "vm0b")
+
+        assert fake_libvirt.calls.count("XMLDesc") == 3
+        assert wrapper.cache_stats().invalidations == 1
+        wrapper.close_all_connections()
+        assert fake_libvirt.connections[0].callbacks == {}
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_hosts_without_events_are_not_cached(self, fake_libvirt, monkeypatch):
+        """Without event delivery every lookup goes to libvirt."""
+
+        def unsupported(self, *args):
+            raise fake_libvirt.libvirtError("events not supported")
+
+        monkeypatch.setattr(
+            FakeLibvirtConnection, "domainEventRegisterAny", unsupported
+        )
+        wrapper = LibvirtWrapper()
+        conn = SSHConnection("host0")
+
+        await wrapper.get_vm_info(conn, "vm0a")
+        await wrapper.get_vm_info(conn, "vm0a")
+
+        assert fake_libvirt.calls.count("XMLDesc") == 2
+        assert wrapper.cache_stats().entries == 0
+        wrapper.close_all_connections()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_hosts_missing_an_event_are_not_cached(
+        self, fake_libvirt, monkeypatch
+    ):
+        """Lifecycle events alone miss disk changes; nothing is cached."""
+        register = FakeLibvirtConnection.domainEventRegisterAny
+
+        def lifecycle_only(self, domain, event_id, callback, opaque):
+            if event_id != fake_libvirt.VIR_DOMAIN_EVENT_ID_LIFECYCLE:
+                raise fake_libvirt.libvirtError("unsupported event")
+            return register(self, domain, event_id, callback, opaque)
+
+        monkeypatch.setattr(
+            FakeLibvirtConnection, "domainEventRegisterAny", lifecycle_only
+        )
+        wrapper = LibvirtWrapper()
+        conn = SSHConnection("host0")
+
+        await wrapper.get_vm_info(conn, "vm0a")
+        await wrapper.get_vm_info(conn, "vm0a")
+
+        assert fake_libvirt.calls.count("XMLDesc") == 2
+        assert fake_libvirt.connections[0].callbacks == {}
+        wrapper.close_all_connections()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_refresh_reads_the_domain_and_updates_the_cache(self, fake_libvirt):
+        """A refreshed lookup goes to libvirt; later lookups reuse its result."""
+        wrapper = LibvirtWrapper()
+        conn = SSHConnection("host0")
+        await wrapper.get_vm_info(conn, "vm0a")
+
+        await wrapper.get_vm_info(conn, "vm0a", refresh=True)
+        await wrapper.clone_vm_definition(conn, "vm0a", "clone")
+
+        assert fake_libvirt.calls.count("XMLDesc") == 2
+        assert wrapper.cache_stats().hits == 1
+        wrapper.close_all_connections()
@@ -0,0 +1,166 @@
+"""Unit tests for resumable transfer journals."""
+
+import os
+
+import pytest
+
+from kvm_clone.cloner import VMCloner
+from kvm_clone.exceptions import ValidationError
+from kvm_clone.journal import JournalStore
+from kvm_clone.libvirt_wrapper import LibvirtWrapper
+from kvm_clone.models import ByteRange, CloneOptions
+from kvm_clone.transfer import StripedTransfer
+from tests.conftest import FakeTransport
+from tests.unit.test_transfer import striped_handler
+
+OPERATION = {
+    "source_host": "src",
+    "dest_host": "dst",
+    "vm_name": "vm",
+    "new_vm_name": "vm_clone",
+    "transfer_mode": "striped",
+    "stripe_size": 4096,
+}
+
+
+class TestTransferJournal:
+    """Test recording and reloading transfer progress."""
+
+    @pytest.mark.unit
+    def test_progress_survives_reopening(self, tmp_path):
+        """Disks, verified ranges and completed disks are reloaded."""
+        store = JournalStore(str(tmp_path))
+        journal = store.create("op-1", OPERATION)
+        journal.record_disk("/images/a.qcow2", "/dst/a.qcow2")
+        journal.record_range("/images/a.qcow2", ByteRange(0, 4096), "sum0")
+        journal.record_disk("/images/b.qcow2", "/dst/b.qcow2")
+        journal.record_disk_done("/images/b.qcow2", 1234)
+        journal.close()
+
+        reopened = store.open("op-1")
+
+        assert reopened.operation == OPERATION
+        disk = reopened.disk("/images/a.qcow2")
+        assert disk.ranges == {0: (4096, "sum0")}
+        assert disk.is_range_done(ByteRange(0, 4096))
+        assert not disk.is_range_done(ByteRange(0, 2048))
+        assert reopened.disk("/images/b.qcow2").done
+        assert reopened.disk("/images/b.qcow2").bytes_transferred == 1234
+        reopened.close()
+
+    @pytest.mark.unit
+    def test_torn_last_record_is_dropped(self, tmp_path):
+        """A record cut off by a crash is discarded before appending again."""
+        store = JournalStore(str(tmp_path))
+        journal = store.create("op-1", OPERATION)
+        journal.record_disk("/images/a.qcow2", "/dst/a.qcow2")
+        journal.close()
+        with open(store.path_for("op-1"), "ab") as f:
+            f.write(b'{"type":"range","source":"/ima')
+
+        journal = store.open("op-1")
+        journal.record_range("/images/a.qcow2", ByteRange(4096, 4096), "sum1")
+        journal.close()
+
+        assert store.open("op-1").disk("/images/a.qcow2").ranges == {
+            4096: (4096, "sum1")
+        }
+
+    @pytest.mark.unit
+    def test_corrupt_record_is_rejected(self, tmp_path):
+        """Damage before the last record makes the journal unusable."""
+        store = JournalStore(str(tmp_path))
+        store.create("op-1", OPERATION).close()
+        with open(store.path_for("op-1"), "ab") as f:
+            f.write(b"garbage\n{}\n")
+
+        with pytest.raises(ValueError, match="line 2"):
+            store.open("op-1")
+
+    @pytest.mark.unit
+    def test_range_records_are_synced_in_groups(self, tmp_path, monkeypatch):
+        """Ranges do not force a sync each; disk records do."""
+        synced = []
+        monkeypatch.setattr(os, "fdatasync", synced.append, raising=False)
+        store = JournalStore(str(tmp_path), sync_interval=3600, sync_records=10)
+        journal = store.create("op-1", OPERATION)
+        journal.record_disk("/images/a.qcow2", "/dst/a.qcow2")
+        synced.clear()
+
+        for offset in range(0, 25 * 4096, 4096):
+            journal.record_range("/images/a.qcow2", ByteRange(offset, 4096), "sum")
+
+        assert len(synced) == 2
+        journal.close()
+        assert len(synced) == 3
+
+
+class TestResumableTransfers:
+    """Test skipping work recorded in a journal."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_striped_transfer_skips_journaled_stripes(self, tmp_path):
+        """Only stripes missing from the journal are copied and recorded."""
+        journal = JournalStore(str(tmp_path)).create("op-1", OPERATION)
+        journal.record_disk("/images/vm.raw", "/images/clone.raw")
+        journal.record_range("/images/vm.raw", ByteRange(0, 4096), "sum0")
+        transport = FakeTransport(striped_handler(3 * 4096))
+        reported = []
+        striped = StripedTransfer(
+            transport,
+            "src",
+            "dst",
+            stripe_size=4096,
+            journal=journal,
+            progress=reported.append,
+        )
+
+        await striped.transfer("/images/vm.raw", "/images/clone.raw")
+
+        copies = [c for h, c in transport.commands if "conv=notrunc" in c]
+        assert len(copies) == 2
+        assert not any("skip=0 " in c for c in copies)
+        assert sorted(journal.disk("/images/vm.raw").ranges) == [0, 4096, 8192]
+        assert reported[-1] == 3 * 4096
+        journal.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_completed_disk_is_not_transferred_again(self, tmp_path):
+        """A disk the journal lists as done is skipped on resume."""
+        store = JournalStore(str(tmp_path))
+        journal = store.create("op-1", OPERATION)
+        dest_path = "/var/lib/libvirt/images/vm_clone_a.qcow2"
+        journal.record_disk("/images/a.qcow2", dest_path)
+        journal.record_disk_done("/images/a.qcow2", 4096)
+        transport = FakeTransport()
+        cloner = VMCloner(transport, LibvirtWrapper(), store)
+
+        path, stats = await cloner._transfer_disk_image(
+            "src",
+            "dst",
+            "/images/a.qcow2",
+            "vm_clone",
+            None,
+            "op-1",
+            CloneOptions(),
+            journal=journal,
+        )
+
+        assert path == dest_path
+        assert stats.bytes_transferred == 4096
+        assert transport.commands == []
+        journal.close()
+
+    @pytest.mark.unit
+    def test_resume_rejects_a_different_clone(self, tmp_path):
+        """A journal is only resumed for the clone it was written for."""
+        store = JournalStore(str(tmp_path))
+        store.create("op-1", OPERATION).close()
+        cloner = VMCloner(FakeTransport(), LibvirtWrapper(), store)
+
+        with pytest.raises(ValidationError, match="vm_name 'vm', not 'other'"):
+            cloner._open_journal("op-1", "src", "dst", "other", "vm_clone")
+        with pytest.raises(ValidationError, match="No transfer journal"):
+            cloner._open_journal("op-2", "src", "dst", "vm", "vm_clone")
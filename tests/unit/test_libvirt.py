@@ -0,0 +1,343 @@
+"""Unit tests for running libvirt calls off the event loop."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from kvm_clone.client import KVMCloneClient
+from kvm_clone.exceptions import TimeoutError, ValidationError, VMNotFoundError
+from kvm_clone.libvirt_executor import LibvirtExecutor
+from kvm_clone.libvirt_wrapper import DOMAIN_CHANGE_EVENTS, LibvirtWrapper
+from kvm_clone.transport import SSHConnection
+from tests.conftest import FakeTransport
+
+
+def hosts(count=4):
+    return [SSHConnection(f"host{i}") for i in range(count)]
+
+
+def make_client():
+    client = KVMCloneClient(config={})
+    client.transport = FakeTransport()
+    return client
+
+
+class TestLibvirtExecutor:
+    """Test the per-host thread pools."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_calls_per_host_are_bounded(self):
+        """No more than max_workers calls of one host run at once."""
+        executor = LibvirtExecutor(max_workers=2)
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def call():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+        await asyncio.gather(*(executor.run("a", "call", call) for _ in range(6)))
+
+        assert max(peak) == 2
+        executor.shutdown()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_slow_call_times_out(self):
+        """A call that does not return in time raises a timeout error."""
+        executor = LibvirtExecutor(call_timeout=0.05)
+
+        with pytest.raises(TimeoutError, match="host-a did not respond"):
+            await executor.run("host-a", "list_vms", time.sleep, 0.3)
+        executor.shutdown()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_cancelled_call_never_runs(self):
+        """Cancelling a queued call withdraws it from the host's pool."""
+        executor = LibvirtExecutor(max_workers=1)
+        ran = []
+
+        busy = asyncio.create_task(executor.run("a", "busy", time.sleep, 0.1))
+        queued = asyncio.create_task(executor.run("a", "queued", ran.append, 1))
+        await asyncio.sleep(0.02)
+        queued.cancel()
+        await busy
+
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert ran == []
+        executor.shutdown()
+
+
+class TestLibvirtWrapperConcurrency:
+    """Demonstrate the gains with a fake libvirt module injecting latency."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_hosts_are_listed_concurrently(self, fake_libvirt):
+        """Listing four hosts at once takes about as long as listing one."""
+        fake_libvirt.latency = 0.02
+        wrapper = LibvirtWrapper()
+        start = time.monotonic()
+        await wrapper.list_vms(SSHConnection("host0"), detail="full")
+        single = time.monotonic() - start
+        wrapper.close_all_connections()
+
+        start = time.monotonic()
+        listings = await asyncio.gather(
+            *(wrapper.list_vms(c, detail="full") for c in hosts())
+        )
+        elapsed = time.monotonic() - start
+
+        assert [[vm.name for vm in vms] for vms in listings] == [
+            [f"vm{i}a", f"vm{i}b"] for i in range(4)
+        ]
+        assert elapsed < 2 * single
+        assert fake_libvirt.max_in_flight >= 4
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_event_loop_stays_responsive(self, fake_libvirt):
+        """The event loop keeps running while libvirt calls block."""
+        fake_libvirt.latency = 0.05
+        wrapper = LibvirtWrapper()
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        await wrapper.list_vms(SSHConnection("host1"), detail="full")
+        task.cancel()
+
+        assert ticks > 10
+        wrapper.close_all_connections()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_each_host_uses_its_own_threads(self, fake_libvirt):
+        """Calls for a host only run in that host's pool."""
+        wrapper = LibvirtWrapper()
+
+        await asyncio.gather(*(wrapper.list_vms(c) for c in hosts()))
+
+        for host, threads in fake_libvirt.threads.items():
+            assert all(name.startswith(f"libvirt-{host}_") for name in threads)
+        wrapper.close_all_connections()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_connection(self, fake_libvirt):
+        """Only the first of many concurrent callers opens a connection."""
+        wrapper = LibvirtWrapper()
+        conn = SSHConnection("host2")
+
+        results = await asyncio.gather(
+            *(wrapper.vm_exists(conn, name) for name in ["vm2a", "vm2b", "other"])
+        )
+
+        assert results == [True, True, False]
+        assert fake_libvirt.opened == ["host2"]
+        with pytest.raises(VMNotFoundError):
+            await wrapper.get_vm_info(conn, "other")
+        wrapper.close_all_connections()
+
+
+class TestBulkListing:
+    """Test listing VMs with bulk domain stats."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_summary_takes_one_call_per_host(self, fake_libvirt):
+        """The summary comes from domain stats without reading any XML."""
+        wrapper = LibvirtWrapper()
+
+        vms = await wrapper.list_vms(SSHConnection("host0"))
+
+        assert fake_libvirt.calls == [
+            "open",
+            *["domainEventRegisterAny"] * len(DOMAIN_CHANGE_EVENTS),
+            "getAllDomainStats",
+        ]
+        assert [(vm.name, vm.memory, vm.vcpus) for vm in vms] == [
+            ("vm0a", 2048, 2),
+            ("vm0b", 2048, 2),
+        ]
+        disk = vms[0].disks[0]
+        assert (disk.target, disk.size, disk.format) == ("vda", 10737418240, "unknown")
+        assert disk.path == "/var/lib/libvirt/images/vm0a.qcow2"
+        assert vms[0].uuid == "uuid-vm0a"
+        assert vms[0].networks == []
+        wrapper.close_all_connections()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_full_detail_parses_xml(self, fake_libvirt):
+        """Full detail adds disk formats and networks from the domain XML."""
+        wrapper = LibvirtWrapper()
+
+        vms = await wrapper.list_vms(SSHConnection("host0"), detail="full")
+
+        assert fake_libvirt.calls.count("XMLDesc") == 2
+        assert "info" not in fake_libvirt.calls
+        disk = vms[0].disks[0]
+        assert (disk.format, disk.size) == ("qcow2", 10737418240)
+        assert vms[0].networks[0].network == "default"
+        wrapper.close_all_connections()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_only_full_detail_drops_host_devices(self, fake_libvirt):
+        """Summaries list every block device; full detail only file disks."""
+        wrapper = LibvirtWrapper()
+
+        summary = await wrapper.list_vms(SSHConnection("host0"))
+        full = await wrapper.list_vms(SSHConnection("host0"), detail="full")
+
+        assert [(d.target, d.path, d.format) for d in summary[0].disks] == [
+            ("vda", "/var/lib/libvirt/images/vm0a.qcow2", "unknown"),
+            ("hdc", "/dev/sr0", "unknown"),
+        ]
+        assert [disk.target for disk in full[0].disks] == ["vda"]
+        wrapper.close_all_connections()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_unknown_detail_is_rejected(self, fake_libvirt):
+        """Detail levels are validated before connecting."""
+        with pytest.raises(ValidationError, match="Unknown detail level"):
+            await LibvirtWrapper().list_vms(SSHConnection("host0"), detail="all")
+        assert fake_libvirt.calls == []
+
+
+class TestMultiHostListing:
+    """Test listing many hosts through the client."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_hosts_are_listed_with_bounded_concurrency(self, fake_libvirt):
+        """No more than max_concurrency hosts are listed at once."""
+        fake_libvirt.latency = 0.02
+        client = make_client()
+
+        results = await client.list_vms(
+            [f"host{i}" for i in (3, 2, 1, 0)], max_concurrency=2
+        )
+
+        assert list(results) == ["host3", "host2", "host1", "host0"]
+        assert [vm.name for vm in results["host1"]] == ["vm1a", "vm1b"]
+        assert fake_libvirt.max_in_flight == 2
+        client.libvirt.close_all_connections()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_wedged_host_does_not_block_the_others(self, fake_libvirt):
+        """Hosts are yielded as they answer and a slow one times out."""
+        fake_libvirt.latencies["host0"] = 0.5
+        client = make_client()
+
+        listings = [
+            listing
+            async for listing in client.iter_vms(
+                [f"host{i}" for i in range(4)], host_timeout=0.1
+            )
+        ]
+
+        assert [listing.host for listing in listings][-1] == "host0"
+        assert all(listing.success for listing in listings[:3])
+        assert not listings[-1].success
+        assert "No answer within 0.1s" in listings[-1].error
+        assert listings[-1].vms == []
+        client.libvirt.close_all_connections()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_closing_the_iterator_cancels_pending_hosts(self, fake_libvirt):
+        """Hosts that were not reached yet are never listed."""
+        fake_libvirt.latency = 0.02
+        client = make_client()
+        listings = client.iter_vms([f"host{i}" for i in range(4)], max_concurrency=1)
+
+        first = await listings.__anext__()
+        await listings.aclose()
+
+        # At most the next host was started before the iterator was closed
+        assert first.success
+        assert fake_libvirt.opened[0] == first.host
+        assert len(fake_libvirt.opened) <= 2
+        client.libvirt.close_all_connections()
+
+
+BACKING_CHAIN_XML = """<domain type='kvm'>
+  <name>overlay</name>
+  <devices>
+    <disk type='file' device='disk'>
+      <driver name='qemu' type='qcow2'/>
+      <source file='/images/overlay.qcow2'/>
+      <backingStore type='file'>
+        <format type='qcow2'/>
+        <source file='/images/base-v2.qcow2'/>
+        <backingStore type='file'>
+          <format type='raw'/>
+          <source file='/images/base.raw'/>
+          <backingStore/>
+        </backingStore>
+      </backingStore>
+      <target dev='vda' bus='virtio'/>
+    </disk>
+  </devices>
+</domain>"""
+
+
+class TestDiskSizes:
+    """Test discovery of disk sizes and backing chains."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_vm_info_reads_all_sizes_in_one_call(self, fake_libvirt):
+        """One blockInfo call per disk yields capacity, allocation and size."""
+        wrapper = LibvirtWrapper(cache_ttl=0)
+
+        vm_info = await wrapper.get_vm_info(SSHConnection("host0"), "vm0a")
+
+        disk = vm_info.disks[0]
+        assert fake_libvirt.calls.count("blockInfo") == 1
+        assert (disk.size, disk.allocation, disk.physical) == (
+            10737418240,
+            1073741824,
+            1075838976,
+        )
+        wrapper.close_all_connections()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_listing_takes_sizes_from_block_stats(self, fake_libvirt):
+        """Listed disks report host sizes without extra calls."""
+        wrapper = LibvirtWrapper()
+
+        vms = await wrapper.list_vms(SSHConnection("host0"), detail="full")
+
+        disk = vms[0].disks[0]
+        assert "blockInfo" not in fake_libvirt.calls
+        assert (disk.allocation, disk.physical) == (1073741824, 1075838976)
+        wrapper.close_all_connections()
+
+    @pytest.mark.unit
+    def test_backing_chain_is_followed(self):
+        """The first backing file and the depth of the chain are reported."""
+        disks, _ = LibvirtWrapper._parse_devices(BACKING_CHAIN_XML)
+
+        assert disks[0].backing_file == "/images/base-v2.qcow2"
+        assert disks[0].backing_depth == 2
@@ -0,0 +1,123 @@
+"""Unit tests for SSH tuning and link benchmarks."""
+
+import pytest
+
+from kvm_clone.exceptions import ConfigurationError
+from kvm_clone.link_tuning import (
+    LinkTuningCache,
+    benchmark_link,
+    candidate_tunings,
+    fastest,
+)
+from kvm_clone.models import LinkBenchmark, SSHTuning
+from kvm_clone.transport import SSH_BACKENDS, SSHTransport
+from tests.conftest import local_ssh_server
+
+pytest.importorskip("asyncssh")
+
+
+def negotiated_cipher(conn):
+    """Cipher the client uses to send, for either backend."""
+    if conn.client is not None:
+        return conn.client.get_transport().local_cipher
+    return conn.conn.get_extra_info("send_cipher")
+
+
+class TestTuningSelection:
+    """Test candidates, validation and the per host pair cache."""
+
+    @pytest.mark.unit
+    def test_candidates_cover_every_combination(self):
+        """Each cipher is paired with each window size."""
+        candidates = candidate_tunings(["a", "b"], [1024, None], max_packet_size=64)
+
+        assert [(t.ciphers, t.window_size) for t in candidates] == [
+            (["a"], 1024),
+            (["a"], None),
+            (["b"], 1024),
+            (["b"], None),
+        ]
+        assert {t.max_packet_size for t in candidates} == {64}
+
+    @pytest.mark.unit
+    def test_unsupported_algorithms_are_rejected(self):
+        """A backend refuses algorithms it cannot negotiate."""
+        chacha = SSHTuning(ciphers=["chacha20-poly1305@openssh.com"])
+
+        with pytest.raises(ConfigurationError, match="paramiko backend"):
+            SSHTransport(tuning=chacha)
+        transport = SSHTransport(backend="asyncssh")
+        transport.set_host_tuning("fast", chacha)
+
+        assert transport.tuning_for("fast") is chacha
+        assert transport.tuning_for("other") == SSHTuning()
+        transport.set_host_tuning("fast", None)
+        assert transport.tuning_for("fast") == SSHTuning()
+
+    @pytest.mark.unit
+    def test_cache_keeps_fastest_per_direction(self, tmp_path):
+        """Tunings are stored per source and destination and survive reloads."""
+        path = tmp_path / "state" / "link-tuning.json"
+        tuning = SSHTuning(ciphers=["aes128-gcm@openssh.com"], window_size=4096)
+        results = [
+            LinkBenchmark("a", "b", SSHTuning(ciphers=["x"]), bytes_per_second=5.0),
+            LinkBenchmark("a", "b", tuning, bytes_per_second=9.0),
+            LinkBenchmark("a", "b", SSHTuning(), bytes_per_second=0, error="boom"),
+        ]
+
+        LinkTuningCache(str(path)).put(fastest(results))
+
+        cache = LinkTuningCache(str(path))
+        assert cache.get("a", "b") == tuning
+        assert cache.get("b", "a") is None
+        path.write_text("{not json")
+        assert cache.get("a", "b") is None
+        assert fastest(results[2:]) is None
+
+
+class TestLinkBenchmark:
+    """Test measuring tunings against a local SSH server."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("backend", SSH_BACKENDS)
+    async def test_candidates_are_measured_with_their_tuning(self, tmp_path, backend):
+        """Each candidate connects with its cipher; failures are reported."""
+        async with local_ssh_server(tmp_path) as (port, key, known):
+            used = []
+
+            def factory(tuning):
+                transport = SSHTransport(
+                    key_path=key, backend=backend, known_hosts=known, tuning=tuning
+                )
+                used.append(transport)
+                return transport
+
+            candidates = [
+                SSHTuning(ciphers=["aes128-ctr"], window_size=256 * 1024),
+                SSHTuning(ciphers=["aes256-gcm@openssh.com"], max_packet_size=16384),
+                SSHTuning(ciphers=["chacha20-poly1305@openssh.com"]),
+            ]
+            results = await benchmark_link(
+                factory,
+                "127.0.0.1",
+                "127.0.0.1",
+                candidates,
+                size=1000000,
+                port=port,
+                reader_command="produce {size}",
+                writer_command="consume",
+            )
+
+            transport = factory(candidates[1])
+            async with transport.connect("127.0.0.1", port) as conn:
+                assert negotiated_cipher(conn) == "aes256-gcm@openssh.com"
+            await transport.close_all()
+
+        assert [r.bytes_transferred for r in results[:2]] == [1000000, 1000000]
+        assert all(r.bytes_per_second > 0 and r.error is None for r in results[:2])
+        if backend == "paramiko":
+            assert "does not support ciphers" in results[2].error
+        else:
+            assert results[2].error is None
+        assert fastest(results) in results
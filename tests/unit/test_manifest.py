@@ -0,0 +1,118 @@
+"""Unit tests for persistent block hash manifests."""
+
+import os
+
+import pytest
+
+from kvm_clone.delta import DeltaEngine
+from kvm_clone.manifest import ManifestStore
+from kvm_clone.models import BlockHashes, FileIdentity
+from tests.conftest import FakeTransport
+from tests.unit.test_delta import run_locally
+
+DIGESTS = ["00" * 16, "ab" * 16, "ff" * 16]
+IDENTITY = FileIdentity(size=12, mtime_ns=1234, inode=7)
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Manifest store in a temporary directory."""
+    return ManifestStore(str(tmp_path / "manifests"))
+
+
+def make_hashes(identity=IDENTITY):
+    """Build block hashes with three digests."""
+    return BlockHashes(size=12, block_size=4, digests=DIGESTS, identity=identity)
+
+
+class TestManifestStore:
+    """Test manifest persistence."""
+
+    @pytest.mark.unit
+    def test_round_trip(self, store):
+        """Saved manifests load back with identical digests and identity."""
+        store.save("host1", "uuid-1", "vda", make_hashes())
+
+        loaded = store.load("host1", "uuid-1", "vda")
+
+        assert loaded.block_size == 4
+        assert loaded.size == 12
+        assert list(loaded.digests) == DIGESTS
+        assert loaded.digests[-1] == DIGESTS[-1]
+        assert loaded.identity == FileIdentity(size=12, mtime_ns=1234, inode=7)
+
+    @pytest.mark.unit
+    def test_binary_format_is_fixed_width(self, store):
+        """Manifests hold raw fixed-width digests after the header."""
+        store.save("host1", "uuid-1", "vda", make_hashes())
+        path = store.path_for("host1", "uuid-1", "vda")
+        assert os.path.getsize(path) == 52 + 3 * 16
+
+    @pytest.mark.unit
+    def test_missing_and_corrupt_manifests_are_ignored(self, store):
+        """Missing or corrupt manifests load as None."""
+        assert store.load("host1", "uuid-1", "vda") is None
+
+        store.save("host1", "uuid-1", "vda", make_hashes())
+        path = store.path_for("host1", "uuid-1", "vda")
+        path.write_bytes(path.read_bytes()[:-1])
+
+        assert store.load("host1", "uuid-1", "vda") is None
+
+    @pytest.mark.unit
+    def test_save_requires_identity(self, store):
+        """Digests without file identity cannot be stored."""
+        with pytest.raises(ValueError):
+            store.save("host1", "uuid-1", "vda", make_hashes(identity=None))
+
+    @pytest.mark.unit
+    def test_path_components_are_sanitized(self, store):
+        """Host, UUID and target cannot escape the store directory."""
+        path = store.path_for("../etc", "a/b", "vda")
+        assert store.directory in path.parents
+        assert ".." not in path.relative_to(store.directory).parts
+
+
+class TestManifestReuse:
+    """Test reuse of manifests by the delta engine."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_unchanged_disk_is_not_rehashed(self, store, tmp_path):
+        """A disk whose identity matches its manifest is only stat'ed."""
+        disk = tmp_path / "disk.raw"
+        disk.write_bytes(b"x" * 8192)
+        transport = FakeTransport(run_locally)
+        engine = DeltaEngine(transport, block_size=4096, manifests=store)
+
+        hashes = await engine.hash_disk("src", str(disk), "uuid-1", "vda")
+        store.save("src", "uuid-1", "vda", hashes)
+        transport.commands.clear()
+
+        reused = await engine.hash_disk("src", str(disk), "uuid-1", "vda")
+
+        assert list(reused.digests) == list(hashes.digests)
+        assert len(transport.commands) == 1
+        assert "hashlib" not in transport.commands[0][1]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_modified_disk_is_rehashed(self, store, tmp_path):
+        """A disk modified after its manifest was stored is hashed again."""
+        disk = tmp_path / "disk.raw"
+        disk.write_bytes(b"x" * 8192)
+        engine = DeltaEngine(FakeTransport(run_locally), 4096, store)
+
+        store.save(
+            "src",
+            "uuid-1",
+            "vda",
+            await engine.hash_disk("src", str(disk), "uuid-1", "vda"),
+        )
+        disk.write_bytes(b"y" * 8192)
+        os.utime(disk, ns=(1, 1))
+
+        rehashed = await engine.hash_disk("src", str(disk), "uuid-1", "vda")
+
+        assert rehashed.identity.mtime_ns == 1
+        assert rehashed.digests[0] != store.load("src", "uuid-1", "vda").digests[0]
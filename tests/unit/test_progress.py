@@ -0,0 +1,135 @@
+"""Unit tests for transfer progress tracking."""
+
+import pytest
+
+from kvm_clone.libvirt_wrapper import LibvirtWrapper
+from kvm_clone.manifest import ManifestStore
+from kvm_clone.models import OperationType, SyncOptions
+from kvm_clone.progress import ProgressTracker, parse_rsync_progress
+from kvm_clone.sync import VMSynchronizer
+from tests.conftest import FakeTransport
+
+RSYNC_OUTPUT = (
+    "sending incremental file list\n"
+    "vm.qcow2\n"
+    "    32,768   0%    0.00kB/s    0:00:00\r"
+    "   524,288  50%  100.00MB/s    0:00:01\r"
+    " 1,048,576 100%  100.00MB/s    0:00:00 (xfr#1, to-chk=0/1)\n"
+    "\n"
+    "sent 1,048,832 bytes  received 35 bytes\n"
+)
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_tracker(updates, clock, total_bytes=1000, rate=4.0):
+    return ProgressTracker(
+        updates.append,
+        "op",
+        OperationType.CLONE,
+        total_bytes=total_bytes,
+        max_updates_per_second=rate,
+        clock=clock,
+    )
+
+
+class TestRsyncProgress:
+    """Test parsing of rsync progress output."""
+
+    @pytest.mark.unit
+    def test_parse_progress_lines(self):
+        """Byte counts are read regardless of thousands separators."""
+        assert parse_rsync_progress(" 1,048,576 100%  100.00MB/s    0:00:00") == (
+            1048576
+        )
+        assert parse_rsync_progress("  2.097.152  12%  1,00GB/s  0:00:09") == 2097152
+        assert parse_rsync_progress("sent 1,048,832 bytes  received 35 bytes") is None
+        assert parse_rsync_progress("vm.qcow2") is None
+
+
+class TestProgressTracker:
+    """Test rate limiting, throughput and ETA of progress updates."""
+
+    @pytest.mark.unit
+    def test_updates_are_rate_limited(self):
+        """Frequent reports are coalesced; forced updates always pass."""
+        updates, clock = [], FakeClock()
+        tracker = make_tracker(updates, clock)
+
+        for transferred in range(100):
+            tracker.update("disk", transferred)
+            clock.now += 0.001
+        tracker.update("disk", 100, force=True)
+
+        assert len(updates) == 2
+        assert updates[-1].bytes_transferred == 100
+
+    @pytest.mark.unit
+    def test_speed_and_eta(self):
+        """Throughput is smoothed and the ETA derived from it."""
+        updates, clock = [], FakeClock()
+        tracker = make_tracker(updates, clock)
+
+        for second in range(5):
+            tracker.update("disk", second * 100)
+            clock.now += 1.0
+
+        assert updates[-1].speed == pytest.approx(100.0)
+        assert updates[-1].instant_speed == pytest.approx(100.0)
+        assert updates[-1].eta == 6
+        assert updates[-1].progress_percent == pytest.approx(40.0)
+
+    @pytest.mark.unit
+    def test_concurrent_transfers_are_aggregated(self):
+        """Byte counts of different keys add up."""
+        updates, clock = [], FakeClock()
+        tracker = make_tracker(updates, clock)
+
+        tracker.update("vda", 300, force=True)
+        tracker.update("vdb", 200, force=True)
+        tracker.update("vda", 400, force=True)
+
+        assert [update.bytes_transferred for update in updates] == [300, 500, 600]
+
+
+class TestRsyncProgressReporting:
+    """Test progress reporting of rsync based transfers."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_sync_disk_reports_rsync_progress(self, tmp_path):
+        """rsync progress lines are reported while the command runs."""
+
+        def handler(host, command):
+            if command.startswith("rsync"):
+                return RSYNC_OUTPUT, "", 0
+            return "", "", 0
+
+        transport = FakeTransport(handler)
+        synchronizer = VMSynchronizer(
+            transport, LibvirtWrapper(), ManifestStore(str(tmp_path))
+        )
+        reported = []
+
+        stats = await synchronizer._sync_disk(
+            "src",
+            "dst",
+            "/images/vm.qcow2",
+            "/images/vm.qcow2",
+            SyncOptions(delta_only=False),
+            None,
+            "op",
+            bytes_callback=reported.append,
+        )
+
+        assert "--info=progress2" in transport.commands[0][1]
+        assert reported == [32768, 524288, 1048576]
+        assert stats["bytes_transferred"] == 1048576
@@ -3,12 +3,15 @@
 import pytest
 import tempfile
 import os
+import shlex
+import subprocess
 from pathlib import Path
 from unittest.mock import patch
 import paramiko
 
 from kvm_clone.security import SecurityValidator, CommandBuilder, SSHSecurity
 from kvm_clone.exceptions import ValidationError
+from kvm_clone.models import CompressionSpec
 
 
 class TestSecurityValidatorVMName:
@@ -204,6 +207,31 @@ class TestSecurityValidatorSnapshotName:
         assert result == max_name
 
 
+class TestSecurityValidatorCompression:
+    """Test SecurityValidator compression setting validation."""
+
+    def test_valid_settings(self):
+        """Test codecs, levels and boolean shortcuts are parsed."""
+        assert SecurityValidator.validate_compression(False) == CompressionSpec()
+        assert SecurityValidator.validate_compression("none") == CompressionSpec()
+        assert SecurityValidator.validate_compression(True) == CompressionSpec(
+            codec="zstd", adaptive=True
+        )
+        assert SecurityValidator.validate_compression("adaptive").adaptive
+        assert SecurityValidator.validate_compression("lz4") == CompressionSpec(
+            codec="lz4"
+        )
+        assert SecurityValidator.validate_compression("ZSTD:7") == CompressionSpec(
+            codec="zstd", level=7
+        )
+
+    def test_invalid_settings_rejected(self):
+        """Test unknown codecs and out of range levels are rejected."""
+        for value in ["gzip", "zstd:0", "zstd:20", "lz4:x", "none:3", "zstd; rm"]:
+            with pytest.raises(ValidationError):
+                SecurityValidator.validate_compression(value)
+
+
 class TestSecurityValidatorSanitizePath:
     """Test SecurityValidator path sanitization."""
 
@@ -321,6 +349,22 @@ class TestCommandBuilderRsyncCommand:
         assert "--delete" in cmd
         assert "--exclude=*.tmp" in cmd
 
+    def test_build_rsync_compression_choice(self):
+        """Test the configured codec replaces rsync's default zlib."""
+        cmd = CommandBuilder.build_rsync_command(
+            source_path="/source",
+            dest_path="/dest",
+            compression=CompressionSpec(codec="zstd", level=5),
+        )
+        assert cmd.startswith("rsync -av --progress --compress")
+        assert "--compress-choice=zstd --compress-level=5" in cmd
+
+        cmd = CommandBuilder.build_rsync_command(
+            source_path="/source", dest_path="/dest", compression=CompressionSpec()
+        )
+        assert "-avz" not in cmd
+        assert "--compress" not in cmd
+
     def test_build_rsync_invalid_option(self):
         """Test rsync with invalid option."""
         with pytest.raises(ValidationError):
@@ -331,6 +375,119 @@ class TestCommandBuilderRsyncCommand:
             )
 
 
+class TestCommandBuilderRangeCommands:
+    """Test CommandBuilder byte range command building."""
+
+    def test_build_range_copy_local(self):
+        """Test local range copy uses positional, non-truncating writes."""
+        cmd = CommandBuilder.build_range_copy_command("/src.raw", "/dst.raw", 4096, 512)
+        assert cmd.startswith("dd if=/src.raw")
+        assert "skip=4096 count=512" in cmd
+        assert "seek=4096" in cmd
+        assert "conv=notrunc" in cmd
+        assert "ssh" not in cmd
+
+    def test_build_range_copy_remote_quotes_writer(self):
+        """Test remote range copy runs the quoted writer over ssh."""
+        cmd = CommandBuilder.build_range_copy_command(
+            "/src.raw", "/dst dir/x.raw", 0, 10, dest_host="remote.com"
+        )
+        assert "| ssh remote.com 'dd of='" in cmd
+        assert "/dst dir/x.raw" in cmd
+
+    def test_build_range_copy_compresses_between_hosts(self):
+        """Test remote range copies compress before ssh and decompress after."""
+        cmd = CommandBuilder.build_range_copy_command(
+            "/src.raw",
+            "/dst.raw",
+            0,
+            10,
+            dest_host="remote.com",
+            compression=CompressionSpec(codec="lz4", level=3),
+        )
+        assert "status=none | lz4 -q -c -3 | ssh remote.com 'lz4 -q -d -c | dd" in cmd
+
+        local = CommandBuilder.build_range_copy_command(
+            "/src.raw", "/dst.raw", 0, 10, compression=CompressionSpec(codec="lz4")
+        )
+        assert "lz4" not in local
+
+    def test_build_stream_commands_with_compression(self):
+        """Test stream reader and writer apply the codec."""
+        adaptive = CompressionSpec(codec="zstd", adaptive=True)
+        assert CommandBuilder.build_stream_read_command("/a", adaptive) == (
+            "dd if=/a bs=4M status=none | zstd -q -c -T0 --adapt"
+        )
+        assert CommandBuilder.build_stream_write_command("/b", adaptive) == (
+            "zstd -q -d -c | dd of=/b bs=4M conv=fsync status=none"
+        )
+        assert CommandBuilder.build_compress_command(CompressionSpec(codec="zstd")) == (
+            "zstd -q -c -T0 -3"
+        )
+
+    def test_build_range_copy_invalid_range(self):
+        """Test invalid ranges are rejected."""
+        with pytest.raises(ValidationError):
+            CommandBuilder.build_range_copy_command("/a", "/b", -1, 10)
+        with pytest.raises(ValidationError):
+            CommandBuilder.build_range_checksum_command("/a", 0, 0)
+
+    def test_build_range_checksum(self):
+        """Test range checksum command."""
+        cmd = CommandBuilder.build_range_checksum_command("/a; rm -rf /", 8, 16)
+        assert "if='/a; rm -rf /'" in cmd
+        assert cmd.endswith("| sha256sum")
+
+    def test_build_guest_write_copies_through_qemu_io(self):
+        """Test guest writes pipe the reader into qemu-io at the guest offset."""
+        cmd = CommandBuilder.build_guest_write_command(
+            "/dst.qcow2",
+            "qcow2",
+            65536,
+            4096,
+            reader="head -c 4096 /dev/zero",
+            dest_host="remote.com",
+        )
+        assert cmd.startswith("bash -o pipefail -c ")
+        pipeline = shlex.split(cmd)[-1]
+        assert pipeline.startswith("head -c 4096 /dev/zero | ssh remote.com ")
+        writer = shlex.split(pipeline.split(" | ", 1)[1])[-1]
+        assert "head -c 4096 > " in writer
+        assert writer.endswith("'write -s /dev/stdin 65536 4096' /dst.qcow2 < \"$tmp\"")
+        assert "-f qcow2" in writer
+
+    @pytest.mark.parametrize(
+        "reader",
+        ["head -c 100 /dev/zero", "head -c 4096 /dev/zero; exit 3"],
+        ids=["short", "failed"],
+    )
+    def test_build_guest_write_rejects_incomplete_reads(self, tmp_path, reader):
+        """Test a short or failing reader fails the command."""
+        cmd = CommandBuilder.build_guest_write_command(
+            "/dst.qcow2", "qcow2", 0, 4096, reader=f"sh -c {shlex.quote(reader)}"
+        )
+        qemu_io = tmp_path / "qemu-io"
+        qemu_io.write_text("#!/bin/sh\ncat > /dev/null\n")
+        qemu_io.chmod(0o755)
+        env = {**os.environ, "PATH": f"{tmp_path}:{os.environ['PATH']}"}
+
+        result = subprocess.run(
+            cmd, shell=True, env=env, capture_output=True, check=False
+        )
+
+        assert result.returncode != 0
+
+    def test_build_guest_write_zeroes_without_source(self):
+        """Test guest writes without a source write zeroes."""
+        cmd = CommandBuilder.build_guest_write_command("/dst.qcow2", "qcow2", 0, 512)
+        assert cmd == "qemu-io -f qcow2 -c 'write -z 0 512' /dst.qcow2"
+
+    def test_build_guest_write_invalid_format(self):
+        """Test image formats are validated."""
+        with pytest.raises(ValidationError):
+            CommandBuilder.build_guest_write_command("/a", "qcow2; rm", 0, 512)
+
+
 class TestCommandBuilderVirshCommand:
     """Test CommandBuilder virsh command building."""
 
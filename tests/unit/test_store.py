@@ -0,0 +1,226 @@
+"""Unit tests for the content-addressed image store."""
+
+import pytest
+
+from kvm_clone.client import KVMCloneClient
+from kvm_clone.cloner import VMCloner
+from kvm_clone.exceptions import TransferError, ValidationError
+from kvm_clone.libvirt_wrapper import LibvirtWrapper
+from kvm_clone.models import CloneOptions, DiskInfo, TransferStats
+from kvm_clone.store import STORE_DIR, ImageStore
+from tests.conftest import FakeTransport
+
+OBJECTS = f"{STORE_DIR}/objects"
+KNOWN = "a" * 64
+MISSING = "b" * 64
+CLONE_MISSING = "/var/lib/libvirt/images/clone_missing.qcow2"
+
+
+def store_host(objects, reflink=True, added=True):
+    """Handler for a destination whose store holds ``objects``."""
+
+    def handler(host, command):
+        if command.startswith("sha256sum "):
+            path = command.split()[-1]
+            digest = KNOWN if path.endswith("known.qcow2") else MISSING
+            return f"{digest}  {path}\n", "", 0
+        if command.startswith(f"cd {OBJECTS}"):
+            names = [name for name in command.split()[7:-1] if name in objects]
+            return "".join(f"{name}\n" for name in names), "", 0 if names else 2
+        if command.startswith("cp --reflink=always"):
+            if reflink:
+                return "", "", 0
+            return "", "cp: failed to clone: Operation not supported", 1
+        if command.startswith('[ "$(sha256sum'):
+            return "", "", 0 if added else 1
+        return "", "", 0
+
+    return handler
+
+
+def disk(name, fmt="qcow2"):
+    return DiskInfo(
+        path=f"/var/lib/libvirt/images/{name}.qcow2",
+        size=10737418240,
+        format=fmt,
+        target="vda",
+        physical=2147483648,
+    )
+
+
+class TestImageStore:
+    """Test lookups, materialisation and garbage collection."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_present_digests_take_one_round_trip(self):
+        """The destination is asked about all digests at once."""
+        transport = FakeTransport(store_host({KNOWN}))
+        store = ImageStore(transport, "dst")
+
+        assert await store.present([KNOWN, MISSING, KNOWN]) == {KNOWN}
+        assert len(transport.commands) == 1
+        with pytest.raises(ValidationError, match="Invalid SHA-256 digest"):
+            await store.present(["../../etc/passwd"])
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_materialize_prefers_reflinks(self):
+        """Reflinks are used where supported, then overlays, then copies."""
+        reflinks = ImageStore(FakeTransport(store_host({KNOWN})), "dst")
+        transport = FakeTransport(store_host({KNOWN}, reflink=False))
+        plain = ImageStore(transport, "dst")
+
+        assert await reflinks.materialize(KNOWN, "/images/a.qcow2") == "reflink"
+        assert (
+            await plain.materialize(KNOWN, "/images/b.qcow2", overlay=True) == "overlay"
+        )
+        assert await plain.materialize(KNOWN, "/images/c.img") == "copy"
+        commands = [command for _, command in transport.commands]
+        assert (
+            f"qemu-img create -q -f qcow2 -F qcow2 -b {OBJECTS}/{KNOWN} "
+            "/images/b.qcow2" in commands
+        )
+        assert f"cp --sparse=always {OBJECTS}/{KNOWN} /images/c.img" in commands
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_gc_evicts_least_recently_used_unreferenced_files(self):
+        """Old unreferenced files go first; used and recent files stay."""
+        listing = "\n".join(
+            [
+                "10000",
+                f"100.0 400 {OBJECTS}/old",
+                f"200.0 300 {OBJECTS}/older-but-in-use",
+                f"300.0 200 {OBJECTS}/newer",
+                f"400.0 100 {OBJECTS}/newest",
+                f"9999.0 500 {OBJECTS}/{KNOWN}.part",
+            ]
+        )
+        transport = FakeTransport(
+            lambda host, command: (
+                (listing, "", 0) if command.startswith("date") else ("", "", 0)
+            )
+        )
+        store = ImageStore(transport, "dst")
+
+        result = await store.gc(
+            budget=900, referenced={f"{OBJECTS}/older-but-in-use"}, grace_period=60
+        )
+
+        assert result.total_bytes == 1500
+        assert result.evicted == [f"{OBJECTS}/old", f"{OBJECTS}/newer"]
+        assert result.freed_bytes == 600
+        assert transport.commands[-1][1] == (f"rm -f -- {OBJECTS}/old {OBJECTS}/newer")
+
+        dry_run = await store.gc(budget=0, referenced=set(), dry_run=True)
+        assert len(dry_run.evicted) == 4
+        assert not transport.commands[-1][1].startswith("rm")
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_gc_keeps_images_of_defined_vms(self, fake_libvirt):
+        """Disks of VMs on the host and their backing files are in use."""
+        chain = f'[{{"filename": "/x.qcow2"}}, {{"filename": "{OBJECTS}/{KNOWN}"}}]'
+
+        def handler(host, command):
+            if command.startswith("qemu-img info"):
+                return chain, "", 0
+            if command.startswith("date"):
+                return f"10000\n1.0 100 {OBJECTS}/{KNOWN}\n2.0 100 {OBJECTS}/x", "", 0
+            return "", "", 0
+
+        client = KVMCloneClient(config={})
+        client.transport = FakeTransport(handler)
+
+        result = await client.store_gc("host0", 0)
+
+        assert result.evicted == [f"{OBJECTS}/x"]
+        infos = [c for _, c in client.transport.commands if c.startswith("qemu-img")]
+        assert len(infos) == 2
+        client.libvirt.close_all_connections()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_gc_aborts_when_a_backing_chain_is_unreadable(self, fake_libvirt):
+        """Nothing is evicted unless every image in use could be inspected."""
+
+        def handler(host, command):
+            if command.startswith("qemu-img info"):
+                return "", "qemu-img: Could not open '/x.qcow2'", 1
+            if command.startswith("date"):
+                return f"10000\n1.0 100 {OBJECTS}/{KNOWN}", "", 0
+            return "", "", 0
+
+        client = KVMCloneClient(config={})
+        client.transport = FakeTransport(handler)
+
+        with pytest.raises(TransferError, match="Cannot read backing chain"):
+            await client.store_gc("host0", 0)
+
+        commands = [command for _, command in client.transport.commands]
+        assert not any(command.startswith(("date", "rm")) for command in commands)
+        client.libvirt.close_all_connections()
+
+
+class TestStoreClones:
+    """Test that clones only send images the store lacks."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_only_missing_images_are_sent(self, monkeypatch):
+        """A stored image is materialised and a missing one is sent and stored."""
+        transport = FakeTransport(store_host({KNOWN}))
+        cloner = VMCloner(transport, LibvirtWrapper())
+        sent = []
+
+        async def fake_transfer(source_host, dest_host, source_path, *args, **kwargs):
+            sent.append((source_path, kwargs["dest_path"]))
+            return kwargs["dest_path"], TransferStats(bytes_transferred=2147483648)
+
+        monkeypatch.setattr(cloner, "_transfer_disk_image", fake_transfer)
+        disks = [disk("known"), disk("missing")]
+
+        results = await cloner._transfer_disks(
+            "src", "dst", disks, "clone", CloneOptions(use_store=True), None, "op"
+        )
+
+        assert sent == [(disks[1].path, f"{OBJECTS}/{MISSING}.part")]
+        known_path, known = results[disks[0].path]
+        assert known_path == "/var/lib/libvirt/images/clone_known.qcow2"
+        assert (known.reused_bytes, known.materialized) == (2147483648, "reflink")
+        _, missing = results[disks[1].path]
+        assert (missing.reused_bytes, missing.materialized) == (0, "reflink")
+        assert (
+            "dst",
+            f"cp --reflink=always {OBJECTS}/{MISSING} {CLONE_MISSING}",
+        ) in transport.commands
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_changed_image_is_not_stored(self, monkeypatch):
+        """An image that changed while it was copied is used but not stored."""
+        transport = FakeTransport(store_host(set(), added=False))
+        cloner = VMCloner(transport, LibvirtWrapper())
+
+        async def fake_transfer(source_host, dest_host, source_path, *args, **kwargs):
+            return kwargs["dest_path"], TransferStats(bytes_transferred=1)
+
+        monkeypatch.setattr(cloner, "_transfer_disk_image", fake_transfer)
+
+        results = await cloner._transfer_disks(
+            "src",
+            "dst",
+            [disk("missing")],
+            "clone",
+            CloneOptions(use_store=True),
+            None,
+            "op",
+        )
+
+        _, stats = results[disk("missing").path]
+        assert stats.materialized is None
+        assert transport.commands[-1] == (
+            "dst",
+            f"mv -f {OBJECTS}/{MISSING}.part {CLONE_MISSING}",
+        )
@@ -0,0 +1,264 @@
+"""Unit tests for disk image transfer backends."""
+
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+
+from kvm_clone.exceptions import TransferError
+from kvm_clone.journal import JournalStore
+from kvm_clone.models import ByteRange, CompressionSpec, PipeResult
+from kvm_clone.transfer import SparseTransfer, StreamTransfer, StripedTransfer
+from tests.conftest import FakeTransport
+from tests.unit.test_delta import run_locally
+
+
+def striped_handler(size, corrupt_offsets=()):
+    """Command handler simulating a source image of ``size`` bytes.
+
+    Checksums of stripes listed in ``corrupt_offsets`` differ on the
+    destination until the stripe has been copied a second time.
+    """
+    copies = {}
+
+    def handler(host, command):
+        if command.startswith("stat"):
+            return f"{size}\n", "", 0
+        offset = int(command.split("skip=")[1].split()[0]) if "skip=" in command else 0
+        if "sha256sum" in command:
+            bad = offset in corrupt_offsets and copies.get(offset, 0) < 2
+            digest = "bad" if host == "dst" and bad else f"sum{offset}"
+            return f"{digest}  -\n", "", 0
+        if command.startswith("dd"):
+            copies[offset] = copies.get(offset, 0) + 1
+        return "", "", 0
+
+    return handler
+
+
+class TestStripedTransfer:
+    """Test striped transfer of a single disk image."""
+
+    @pytest.mark.unit
+    def test_plan_ranges_covers_file(self):
+        """Stripes cover the whole file with a short final stripe."""
+        ranges = StripedTransfer.plan_ranges(10, 4)
+        assert ranges == [ByteRange(0, 4), ByteRange(4, 4), ByteRange(8, 2)]
+        assert StripedTransfer.plan_ranges(0, 4) == []
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_transfer_copies_every_stripe(self):
+        """Each stripe is copied once with positional writes on the destination."""
+        transport = FakeTransport(striped_handler(10 * 1024))
+        striped = StripedTransfer(transport, "src", "dst", stripe_size=4096)
+
+        stats = await striped.transfer("/images/vm.raw", "/images/clone.raw")
+
+        copies = [c for h, c in transport.commands if "conv=notrunc" in c]
+        assert len(copies) == 3
+        assert all("ssh dst" in c for c in copies)
+        assert (
+            "dst",
+            "truncate -s 0 /images/clone.raw && truncate -s 10240 /images/clone.raw",
+        ) in transport.commands
+        assert stats.bytes_transferred == 10 * 1024
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_failed_stripe_is_retried_alone(self):
+        """A stripe with a checksum mismatch is copied again on its own."""
+        transport = FakeTransport(striped_handler(3 * 4096, corrupt_offsets={4096}))
+        striped = StripedTransfer(transport, "src", "dst", stripe_size=4096)
+
+        await striped.transfer("/images/vm.raw", "/images/clone.raw")
+
+        copies = [c for h, c in transport.commands if "conv=notrunc" in c]
+        assert len(copies) == 4
+        assert sum("skip=4096 " in c for c in copies) == 2
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stripe_gives_up_after_max_retries(self):
+        """A stripe that never verifies fails the transfer."""
+
+        def handler(host, command):
+            if command.startswith("stat"):
+                return "4096\n", "", 0
+            if "sha256sum" in command:
+                return f"{host}  -\n", "", 0
+            return "", "", 0
+
+        striped = StripedTransfer(FakeTransport(handler), "src", "dst", max_retries=2)
+
+        with pytest.raises(TransferError, match="after 2 attempts"):
+            await striped.transfer("/images/vm.raw", "/images/clone.raw")
+
+
+EXTENT_MAP = """[
+{ "start": 0, "length": 4096, "depth": 0, "present": true, "zero": false, "data": true, "offset": 0},
+{ "start": 4096, "length": 4096, "depth": 0, "present": true, "zero": false, "data": true, "offset": 4096},
+{ "start": 8192, "length": 1048576, "depth": 0, "present": false, "zero": true, "data": false},
+{ "start": 1056768, "length": 8192, "depth": 0, "present": true, "zero": false, "data": true, "offset": 1056768}
+]"""
+
+
+class TestSparseTransfer:
+    """Test sparse-aware transfer of a disk image."""
+
+    @pytest.mark.unit
+    def test_parse_extent_map_skips_holes_and_merges(self):
+        """Holes are dropped and adjacent data extents merged."""
+        assert SparseTransfer.parse_extent_map(EXTENT_MAP) == [
+            ByteRange(0, 8192),
+            ByteRange(1056768, 8192),
+        ]
+
+    @pytest.mark.unit
+    def test_parse_map_line_matches_whole_document(self):
+        """Parsing line by line yields the same entries as the full JSON."""
+        entries = [
+            SparseTransfer.parse_map_line(line) for line in EXTENT_MAP.split("\n")
+        ]
+        assert [entry for entry in entries if entry] == json.loads(EXTENT_MAP)
+
+    @pytest.mark.unit
+    def test_split_ranges_respects_stripe_size(self):
+        """Large extents are split into stripe sized ranges."""
+        ranges = SparseTransfer.split_ranges([ByteRange(100, 10)], 4)
+        assert ranges == [ByteRange(100, 4), ByteRange(104, 4), ByteRange(108, 2)]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_transfer_copies_only_allocated_extents(self):
+        """Only allocated ranges are copied into a sparse destination file."""
+        size = 1056768 + 8192
+        handler = striped_handler(size)
+
+        def sparse_handler(host, command):
+            if command.startswith("qemu-img map"):
+                return EXTENT_MAP, "", 0
+            return handler(host, command)
+
+        transport = FakeTransport(sparse_handler)
+        sparse = SparseTransfer(transport, "src", "dst", stripe_size=4096)
+
+        stats = await sparse.transfer("/images/vm.raw", "/images/clone.raw")
+
+        copies = [c for h, c in transport.commands if "conv=notrunc" in c]
+        offsets = sorted(int(c.split("skip=")[1].split()[0]) for c in copies)
+        assert offsets == [0, 4096, 1056768, 1060864]
+        assert (
+            "dst",
+            f"truncate -s 0 /images/clone.raw && truncate -s {size} /images/clone.raw",
+        ) in transport.commands
+        assert stats.bytes_transferred == 16384
+        assert stats.virtual_bytes == size
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("resume", [False, True], ids=["fresh", "resumed"])
+    async def test_existing_destination_is_emptied_unless_resumed(
+        self, tmp_path, resume
+    ):
+        """Holes read as zeroes in an overwritten destination, not stale data."""
+        source, dest = tmp_path / "vm.raw", tmp_path / "clone.raw"
+        source.write_bytes(b"a" * 4096 + b"\0" * 4096 + b"b" * 4096)
+        dest.write_bytes(b"x" * 12288)
+        extent_map = """[
+{ "start": 0, "length": 4096, "data": true},
+{ "start": 4096, "length": 4096, "data": false},
+{ "start": 8192, "length": 4096, "data": true}
+]"""
+
+        def handler(host, command):
+            if command.startswith("qemu-img map"):
+                return extent_map, "", 0
+            return run_locally(host, command)
+
+        journal = JournalStore(str(tmp_path / "journals")).create("op-1", {})
+        journal.record_disk(str(source), str(dest))
+        if resume:
+            journal.record_range(str(source), ByteRange(0, 4096), "sum0")
+        sparse = SparseTransfer(
+            FakeTransport(handler), "localhost", "localhost", journal=journal
+        )
+
+        await sparse.transfer(str(source), str(dest))
+        journal.close()
+
+        if resume:
+            # The journaled stripe and the hole are kept from the first run
+            assert dest.read_bytes() == b"x" * 8192 + b"b" * 4096
+        else:
+            assert dest.read_bytes() == source.read_bytes()
+
+
+def pipe_result(reader_exit_code=0, writer_exit_code=0, writer_stderr=""):
+    return PipeResult(
+        bytes_transferred=8192,
+        reader_exit_code=reader_exit_code,
+        writer_exit_code=writer_exit_code,
+        writer_stderr=writer_stderr,
+        duration=2.0,
+    )
+
+
+class TestStreamTransfer:
+    """Test streaming a disk image through the controller."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_transfer_pipes_reader_into_writer(self):
+        """The image is read on the source and written on the destination."""
+        transport = AsyncMock()
+        transport.pipe.return_value = pipe_result()
+        stream = StreamTransfer(transport, "src", "dst", chunk_size=1024, buffers=4)
+
+        stats = await stream.transfer("/images/vm.raw", "/images/clone raw")
+
+        args, kwargs = transport.pipe.call_args
+        assert args == (
+            "src",
+            "dd if=/images/vm.raw bs=4M status=none",
+            "dst",
+            "dd of='/images/clone raw' bs=4M conv=fsync status=none",
+        )
+        assert kwargs["chunk_size"] == 1024
+        assert kwargs["buffers"] == 4
+        assert stats.bytes_transferred == 8192
+        assert stats.average_speed == 4096
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_failed_writer_raises(self):
+        """A non-zero exit code of the writer fails the transfer."""
+        transport = AsyncMock()
+        transport.pipe.return_value = pipe_result(
+            writer_exit_code=1, writer_stderr="No space left on device\n"
+        )
+        stream = StreamTransfer(transport, "src", "dst")
+
+        with pytest.raises(TransferError, match="No space left on device"):
+            await stream.transfer("/images/vm.raw", "/images/clone.raw")
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_compressed_transfer_reports_image_size(self):
+        """Compressed streams count wire bytes and stat the image size."""
+        transport = FakeTransport(lambda host, command: ("1048576\n", "", 0))
+        transport.pipe = AsyncMock(return_value=pipe_result())
+        stream = StreamTransfer(
+            transport, "src", "dst", compression=CompressionSpec(codec="zstd")
+        )
+
+        stats = await stream.transfer("/images/vm.raw", "/images/clone.raw")
+
+        reader, writer = (
+            transport.pipe.call_args.args[1],
+            transport.pipe.call_args.args[3],
+        )
+        assert reader.endswith("| zstd -q -c -T0 -3")
+        assert writer.startswith("zstd -q -d -c | dd")
+        assert stats.bytes_transferred == 8192
+        assert stats.virtual_bytes == 1048576
@@ -0,0 +1,353 @@
+"""Unit tests for the SSH transport."""
+
+import asyncio
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from kvm_clone import transport as transport_module
+from kvm_clone.models import SSHTuning
+from kvm_clone.transport import (
+    ChannelPipe,
+    CommandStream,
+    SSHConnection,
+    SSHConnectionPool,
+    SSHTransport,
+)
+from tests.conftest import FakeChannel
+
+
+class FakeSSHConnection:
+    """SSH connection stand-in with controllable liveness."""
+
+    def __init__(self, host="host", port=22, username=None, **kwargs):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.tuning = kwargs.get("tuning")
+        self.alive = True
+        self.closed = False
+        self.active_channels = 0
+        self.last_used = time.monotonic()
+
+    async def connect(self):
+        pass
+
+    def is_alive(self):
+        return self.alive and not self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    """Build a pool of fake connections."""
+    return SSHConnectionPool(FakeSSHConnection, **kwargs)
+
+
+class TestSSHConnectionPool:
+    """Test connection pool limits, health checks and eviction."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_opens_connections_before_sharing_channels(self):
+        """Concurrent callers get separate connections up to the limit."""
+        pool = make_pool(max_connections=2, max_channels=2)
+
+        first = await pool.acquire()
+        second = await pool.acquire()
+        third = await pool.acquire()
+
+        assert first is not second
+        assert third in (first, second)
+        stats = pool.stats()
+        assert stats.connections == 2
+        assert stats.active_channels == 3
+        assert stats.opened == 2
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_saturated_pool_serves_waiters_in_order(self):
+        """Callers beyond the channel limit wait and are served FIFO."""
+        pool = make_pool(max_connections=1, max_channels=1)
+        held = await pool.acquire()
+        order = []
+
+        async def worker(name):
+            connection = await pool.acquire()
+            order.append(name)
+            await pool.release(connection)
+
+        tasks = [asyncio.create_task(worker(name)) for name in "abc"]
+        await asyncio.sleep(0)
+        assert pool.stats().waiting == 3
+
+        await pool.release(held)
+        await asyncio.gather(*tasks)
+
+        assert order == ["a", "b", "c"]
+        assert pool.stats().opened == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_dead_connection_is_replaced(self):
+        """A connection failing its health check is not handed out again."""
+        pool = make_pool()
+        connection = await pool.acquire()
+        await pool.release(connection)
+        connection.alive = False
+
+        replacement = await pool.acquire()
+
+        assert replacement is not connection
+        assert connection.closed
+        assert pool.stats().evicted == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_idle_connections_are_evicted(self):
+        """Connections unused for longer than idle_timeout are closed."""
+        pool = make_pool(idle_timeout=60)
+        connection = await pool.acquire()
+        await pool.release(connection)
+        connection.last_used -= 120
+
+        await pool.acquire()
+
+        assert connection.closed
+        assert connection not in pool.connections
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_failed_connect_frees_slot(self):
+        """A connection that cannot be opened does not use up the pool."""
+        attempts = []
+
+        def factory():
+            connection = FakeSSHConnection()
+            if not attempts:
+
+                async def fail():
+                    raise OSError("unreachable")
+
+                connection.connect = fail
+            attempts.append(connection)
+            return connection
+
+        pool = SSHConnectionPool(factory, max_connections=1)
+        with pytest.raises(OSError):
+            await pool.acquire()
+
+        assert await pool.acquire() is attempts[1]
+
+
+class TestSSHTransportPooling:
+    """Test the transport's use of per-host pools."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_connection_info_reports_pool_stats(self, monkeypatch):
+        """Pool statistics are exposed through get_connection_info."""
+        monkeypatch.setattr(transport_module, "SSHConnection", FakeSSHConnection)
+        transport = SSHTransport(max_connections=2, max_channels=3)
+
+        async with transport.connect("host.example", username="root"):
+            info = transport.get_connection_info("host.example")
+
+        assert info.username == "root"
+        assert info.pool.active_channels == 1
+        assert info.pool.max_connections == 2
+        assert info.pool.max_channels == 3
+        assert transport.get_connection_info("host.example").pool.idle_connections == 1
+        assert transport.get_connection_info("other.example") is None
+        assert [stats.name for stats in info.executors] == ["control", "stream"]
+
+        await transport.close_all()
+        assert len(transport.connections) == 0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_new_host_tuning_replaces_idle_connections(self, monkeypatch):
+        """Warm connections are reopened with a new tuning once they are idle."""
+        monkeypatch.setattr(transport_module, "SSHConnection", FakeSSHConnection)
+        transport = SSHTransport(max_connections=2, max_channels=1)
+        tuning = SSHTuning(window_size=16 * 1024 * 1024)
+
+        async with transport.connect("a") as busy:
+            async with transport.connect("a") as idle:
+                pass
+            transport.set_host_tuning("a", tuning)
+            async with transport.connect("a") as retuned:
+                assert retuned.tuning == tuning
+            assert idle.closed and not busy.closed
+        async with transport.connect("a") as reused:
+            assert reused is retuned
+
+        assert busy.closed
+        assert transport.connections == [retuned]
+        await transport.close_all()
+
+
+class TestCommandStream:
+    """Test streaming of remote command output."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_lines_split_on_newlines_and_carriage_returns(self):
+        """Lines are reassembled across chunks; progress redraws are lines."""
+        channel = FakeChannel(
+            stdout=b"first line\n  10%\r  55%\r 100%\nlast", stderr=b"warning\n"
+        )
+        stream = CommandStream(channel, "host")
+
+        lines = [line async for line in stream]
+
+        assert [text for name, text in lines if name == "stdout"] == [
+            "first line",
+            "  10%",
+            "  55%",
+            " 100%",
+            "last",
+        ]
+        assert [text for name, text in lines if name == "stderr"] == ["warning"]
+        assert stream.exit_code == 0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_output_is_read_only_once_available(self):
+        """Reads wait for data or end of file instead of blocking in recv."""
+
+        class LateChannel(FakeChannel):
+            eof_received = False
+
+            def _read(self, name, size):
+                assert self._data[name] or self.eof_received, "recv would block"
+                return super()._read(name, size)
+
+        channel = LateChannel()
+
+        def arrive():
+            channel._data["stdout"] = b"late\n"
+            channel.eof_received = True
+
+        asyncio.get_running_loop().call_later(0.05, arrive)
+        stream = CommandStream(channel, "host")
+
+        assert [line async for line in stream] == [("stdout", "late")]
+        assert stream.exit_code == 0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_buffer_is_bounded(self):
+        """A slow consumer never has more than max_buffer chunks queued."""
+        channel = FakeChannel(stdout=b"x" * 1000, chunk_size=10, exit_code=3)
+        stream = CommandStream(channel, "host", max_buffer=2)
+        high_water = 0
+
+        async for _ in stream.chunks():
+            high_water = max(high_water, stream._queue.qsize())
+            await asyncio.sleep(0.001)
+
+        assert high_water <= 2
+        assert await stream.wait() == 3
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_execute_command_reads_both_streams(self):
+        """execute_command collects stdout and stderr from the stream."""
+        channel = FakeChannel(stdout=b"out\n" * 100, stderr=b"err\n" * 100)
+        ssh_transport = MagicMock()
+        ssh_transport.open_session.return_value = channel
+        connection = SSHConnection("host")
+        connection.client = MagicMock()
+        connection.client.get_transport.return_value = ssh_transport
+
+        stdout, stderr, exit_code = await connection.execute_command("cmd")
+
+        assert stdout == "out\n" * 100
+        assert stderr == "err\n" * 100
+        assert exit_code == 0
+        assert channel.command == "cmd"
+        assert channel.closed
+
+
+class FakeWriterChannel(FakeChannel):
+    """Channel stand-in recording the data sent to it."""
+
+    def __init__(self, fail_after=None, delay=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.received = []
+        self.shut_down = False
+        self.fail_after = fail_after
+        self.delay = delay
+        self.on_send = None
+
+    def sendall(self, data):
+        if self.fail_after is not None and len(self.received) >= self.fail_after:
+            raise OSError("broken pipe")
+        if self.on_send:
+            self.on_send()
+        time.sleep(self.delay)
+        self.received.append(data)
+
+    def shutdown_write(self):
+        self.shut_down = True
+
+
+class TestChannelPipe:
+    """Test pumping data between two channels."""
+
+    @pytest.mark.unit
+    def test_data_is_copied_in_chunks(self):
+        """All bytes arrive in order, in chunks of at most chunk_size."""
+        data = bytes(range(256)) * 40
+        reader = FakeChannel(stdout=data, stderr=b"reader warning", chunk_size=100)
+        writer = FakeWriterChannel(stdout=b"done", exit_code=0)
+        reported = []
+
+        result = ChannelPipe(
+            reader, writer, chunk_size=1024, buffers=2, progress=reported.append
+        ).run()
+
+        assert b"".join(writer.received) == data
+        assert max(len(chunk) for chunk in writer.received) == 1024
+        assert writer.shut_down
+        assert result.bytes_transferred == len(data)
+        assert reported[-1] == len(data)
+        assert result.reader_stderr == "reader warning"
+        assert result.writer_stdout == "done"
+        assert result.reader_exit_code == result.writer_exit_code == 0
+
+    @pytest.mark.unit
+    def test_ring_is_bounded(self):
+        """A slow writer never has more than ``buffers`` chunks queued."""
+        reader = FakeChannel(stdout=b"x" * 4096, chunk_size=64)
+        writer = FakeWriterChannel(delay=0.001)
+        pipe = ChannelPipe(reader, writer, chunk_size=64, buffers=3)
+        high_water = []
+        writer.on_send = lambda: high_water.append(pipe._ring.qsize())
+
+        pipe.run()
+
+        assert len(writer.received) == 64
+        assert max(high_water) <= 3
+
+    @pytest.mark.unit
+    def test_writer_failure_aborts_both_channels(self):
+        """A failing writer stops the reader and surfaces the error."""
+        reader = FakeChannel(stdout=b"x" * 4096, chunk_size=64)
+        writer = FakeWriterChannel(fail_after=2)
+
+        with pytest.raises(OSError, match="broken pipe"):
+            ChannelPipe(reader, writer, chunk_size=64, buffers=2).run()
+
+        assert reader.closed
+        assert writer.closed
+        assert not writer.shut_down
+
+    @pytest.mark.unit
+    def test_rejects_invalid_sizes(self):
+        """Chunk size and buffer count must be positive."""
+        with pytest.raises(ValueError):
+            ChannelPipe(FakeChannel(), FakeWriterChannel(), buffers=0)
@@ -0,0 +1,128 @@
+"""Unit tests for the thread pools of the SSH transport."""
+
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from kvm_clone.exceptions import InsufficientResourcesError, SSHError
+from kvm_clone.transport import CommandStream, SSHConnection
+from kvm_clone.transport_executor import BlockingPool
+from tests.conftest import FakeChannel
+
+
+class TestBlockingPool:
+    """Test worker limits, backpressure and metrics."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_calls_wait_for_a_worker_then_are_refused(self):
+        """Calls beyond the workers queue; calls beyond the queue fail at once."""
+        pool = BlockingPool("stream", max_workers=1, max_queue=1)
+        release = threading.Event()
+
+        running = asyncio.create_task(pool.run(release.wait))
+        waiting = asyncio.create_task(pool.run(lambda: "next"))
+        await asyncio.sleep(0.01)
+
+        stats = pool.stats()
+        assert (stats.busy_workers, stats.queued) == (1, 1)
+        with pytest.raises(InsufficientResourcesError, match="SSH stream workers"):
+            await pool.run(lambda: None)
+
+        release.set()
+        assert await running is True
+        assert await waiting == "next"
+
+        stats = pool.stats()
+        assert (stats.busy_workers, stats.queued) == (0, 0)
+        assert (stats.completed, stats.rejected) == (2, 1)
+        assert stats.max_wait > 0
+        pool.shutdown()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_admitted_work_waits_beyond_the_queue_limit(self):
+        """Only new work is refused; calls of admitted work keep waiting."""
+        pool = BlockingPool("stream", max_workers=1, max_queue=1)
+        release = threading.Event()
+
+        running = asyncio.create_task(pool.run(release.wait))
+        queued = [
+            asyncio.create_task(pool.run_admitted(lambda i=i: i)) for i in range(3)
+        ]
+        await asyncio.sleep(0.01)
+
+        assert pool.stats().queued == 3
+        with pytest.raises(InsufficientResourcesError):
+            pool.admit()
+        release.set()
+        await running
+        assert [await task for task in queued] == [0, 1, 2]
+        pool.admit()
+        assert pool.stats().rejected == 1
+        pool.shutdown()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_cancelled_waiting_call_never_runs(self):
+        """A call withdrawn while queued frees its place and is not run."""
+        pool = BlockingPool("control", max_workers=1, max_queue=4)
+        release = threading.Event()
+        ran = []
+
+        running = asyncio.create_task(pool.run(release.wait))
+        waiting = asyncio.create_task(pool.run(ran.append, "cancelled"))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        await asyncio.sleep(0)
+
+        assert pool.stats().queued == 0
+        release.set()
+        await running
+        assert await pool.run(ran.append, "later") is None
+        assert ran == ["later"]
+        assert pool.stats().busy_workers == 0
+        pool.shutdown()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_commands_do_not_need_stream_workers(self):
+        """A saturated stream pool stalls neither output nor a full stderr."""
+        stream_pool = BlockingPool("stream", max_workers=1, max_queue=0)
+        release = threading.Event()
+        busy = asyncio.create_task(stream_pool.run(release.wait))
+        await asyncio.sleep(0.01)
+        channel = FakeChannel(stdout=b"out", stderr=b"e" * (1 << 20), chunk_size=4096)
+        ssh_transport = MagicMock()
+        ssh_transport.open_session.return_value = channel
+        connection = SSHConnection("host", stream_pool=stream_pool)
+        connection.client = MagicMock()
+        connection.client.get_transport.return_value = ssh_transport
+
+        stdout, stderr, exit_code = await asyncio.wait_for(
+            connection.execute_command("cmd"), 5
+        )
+
+        assert (stdout, len(stderr), exit_code) == ("out", 1 << 20, 0)
+        assert stream_pool.stats().completed == 0
+        release.set()
+        await busy
+        stream_pool.shutdown()
+        connection.control_pool.shutdown()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_read_errors_are_not_end_of_output(self):
+        """A failing read is raised to the consumer instead of ending the stream."""
+
+        class BrokenChannel(FakeChannel):
+            def recv(self, size):
+                raise OSError("connection reset")
+
+        stream = CommandStream(BrokenChannel(stderr=b"e"), "host")
+
+        with pytest.raises(SSHError, match="Reading stdout failed: connection reset"):
+            await stream.wait()
+        stream.close()
@@ -0,0 +1,195 @@
+"""Unit tests for disk integrity verification."""
+
+import hashlib
+import subprocess
+import sys
+from unittest.mock import AsyncMock
+
+import pytest
+
+from kvm_clone.exceptions import TransferError
+from kvm_clone.models import ByteRange, PipeResult
+from kvm_clone.transfer import StreamTransfer
+from kvm_clone.verify import (
+    HASHING_READER_SCRIPT,
+    HASHING_WRITER_SCRIPT,
+    DiskVerifier,
+    blocks_to_extents,
+    merkle_root,
+    parse_digests,
+    parse_reader_output,
+)
+from tests.conftest import FakeTransport
+
+
+def digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def run_script(script, *args, stdin=b""):
+    return subprocess.run(
+        [sys.executable, "-c", script, *map(str, args)],
+        input=stdin,
+        capture_output=True,
+        check=True,
+    )
+
+
+class TestMerkleRoot:
+    """Test folding block digests into a Merkle root."""
+
+    @pytest.mark.unit
+    def test_root_depends_on_content_and_order(self):
+        """Any changed, missing or reordered block changes the root."""
+        digests = [digest(bytes([i])) for i in range(5)]
+
+        assert merkle_root(digests) == merkle_root(list(digests))
+        assert merkle_root(digests) != merkle_root(digests[:4])
+        assert merkle_root(digests) != merkle_root(digests[::-1])
+        assert merkle_root(digests[:1]) != digests[0]
+        assert len(merkle_root([])) == 32
+
+    @pytest.mark.unit
+    def test_blocks_to_extents_merges_neighbours(self):
+        """Adjacent blocks form one extent that ends with the file."""
+        assert blocks_to_extents([0, 1, 3], 4, 14) == [
+            ByteRange(0, 8),
+            ByteRange(12, 2),
+        ]
+
+
+class TestHashingScripts:
+    """Run the remote hashing scripts locally."""
+
+    @pytest.mark.unit
+    def test_reader_and_writer_hash_the_same_blocks(self, tmp_path):
+        """Both ends report identical digests without reading the data again."""
+        data = bytes(range(256)) * 41
+        source = tmp_path / "source.img"
+        source.write_bytes(data)
+        dest = tmp_path / "dest.img"
+        dest.write_bytes(b"x" * 20000)
+
+        reader = run_script(HASHING_READER_SCRIPT, source, 4096, 0, -1)
+        writer = run_script(
+            HASHING_WRITER_SCRIPT, dest, 4096, 0, 1, stdin=reader.stdout
+        )
+
+        size, source_digests = parse_reader_output(reader.stderr.decode())
+        assert size == len(data)
+        assert source_digests == [
+            digest(data[offset : offset + 4096]) for offset in range(0, size, 4096)
+        ]
+        assert parse_digests(writer.stdout.decode()) == source_digests
+        assert dest.read_bytes() == data
+
+    @pytest.mark.unit
+    def test_range_rewrite_keeps_other_blocks(self, tmp_path):
+        """Re-sending one block writes it in place without truncating."""
+        data = b"a" * 4096 + b"b" * 4096 + b"c" * 100
+        source = tmp_path / "source.img"
+        source.write_bytes(data)
+        dest = tmp_path / "dest.img"
+        dest.write_bytes(b"a" * 4096 + b"X" * 4096 + b"c" * 100)
+
+        reader = run_script(HASHING_READER_SCRIPT, source, 4096, 4096, 4096)
+        writer = run_script(
+            HASHING_WRITER_SCRIPT, dest, 4096, 4096, 0, stdin=reader.stdout
+        )
+
+        assert parse_digests(writer.stdout.decode()) == [digest(b"b" * 4096)]
+        assert dest.read_bytes() == data
+
+
+def pipe_result(source_blocks, dest_blocks, size):
+    return PipeResult(
+        bytes_transferred=size,
+        reader_stderr="size %d\n" % size + "".join(f"{d}\n" for d in source_blocks),
+        writer_stdout="".join(f"{d}\n" for d in dest_blocks),
+        duration=1.0,
+    )
+
+
+class TestStreamVerification:
+    """Test inline verification of streamed disks."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_only_mismatched_blocks_are_resent(self):
+        """A block that arrived corrupted is streamed again on its own."""
+        blocks = [digest(bytes([i])) for i in range(3)]
+        transport = FakeTransport()
+        transport.pipe = AsyncMock(
+            side_effect=[
+                pipe_result(blocks, [blocks[0], "0" * 32, blocks[2]], 10000),
+                pipe_result(blocks[1:2], blocks[1:2], 4096),
+            ]
+        )
+        stream = StreamTransfer(transport, "src", "dst", verify=True, block_size=4096)
+
+        stats = await stream.transfer("/images/vm.raw", "/images/clone.raw")
+
+        resend = transport.pipe.call_args_list[1].args
+        assert resend[1].endswith(" 4096 4096 4096")
+        assert resend[3].endswith(" 4096 4096 0")
+        verification = stats.verification
+        assert verification.verified
+        assert verification.source_root == merkle_root(blocks)
+        assert verification.mismatched_blocks == 1
+        assert verification.resent_bytes == 4096
+        assert verification.inline
+        assert stats.virtual_bytes == 10000
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_short_read_fails(self):
+        """A reader that stopped early fails even if its exit code was lost."""
+        blocks = [digest(b"a")]
+        transport = FakeTransport()
+        transport.pipe = AsyncMock(return_value=pipe_result(blocks, blocks, 10000))
+        stream = StreamTransfer(transport, "src", "dst", verify=True, block_size=4096)
+
+        with pytest.raises(TransferError, match="stopped after 1 blocks"):
+            await stream.transfer("/images/vm.raw", "/images/clone.raw")
+
+
+class TestDiskVerifier:
+    """Test verification of disks copied by the other backends."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_repairs_differing_blocks(self):
+        """Differing blocks are repaired and the destination hashed again."""
+        repaired = []
+
+        def handler(host, command):
+            good = host == "src" or repaired
+            second = "b" * 32 if good else "f" * 32
+            return f"8192 1 1\n{'a' * 32}\n{second}\n", "", 0
+
+        async def repair(extents, size):
+            repaired.append((extents, size))
+
+        verifier = DiskVerifier(FakeTransport(handler), block_size=4096)
+        verification = await verifier.verify(
+            "src", "/images/vm.raw", "dst", "/images/clone.raw", repair
+        )
+
+        assert repaired == [([ByteRange(4096, 4096)], 8192)]
+        assert verification.verified
+        assert verification.mismatched_blocks == 1
+        assert verification.resent_bytes == 4096
+        assert not verification.inline
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_unrepairable_copy_fails(self):
+        """Without a repair callback a differing copy is an error."""
+
+        def handler(host, command):
+            return f"4096 1 1\n{('a' if host == 'src' else 'b') * 32}\n", "", 0
+
+        verifier = DiskVerifier(FakeTransport(handler), block_size=4096)
+
+        with pytest.raises(TransferError, match="1 blocks after 0 repairs"):
+            await verifier.verify("src", "/a", "dst", "/b")